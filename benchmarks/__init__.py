@@ -0,0 +1 @@
+"""End-to-end performance benchmarks for gemini-gitlab-workflow (see README: Benchmarks)."""
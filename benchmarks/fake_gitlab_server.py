@@ -0,0 +1,451 @@
+"""
+Local stand-in for the GitLab REST API (v4), for offline load and latency testing.
+
+`FakeGitlabServer` serves a `SyntheticProject` over HTTP on 127.0.0.1 and
+implements the endpoints ggw uses through python-gitlab: the current user,
+projects, issues (list/get/create/update/delete/reorder, with GitLab's pagination
+headers), issue links, notes, labels and boards/lists. Unlike the function-level
+fakes, clients go through python-gitlab's real HTTP, pagination and retry code.
+
+Network conditions are configurable:
+
+*   `latency` / `jitter`: seconds added to every response (latency +- jitter).
+*   `error_rate` / `throttle_rate`: fraction of requests answered with a 503 or a
+    429 (with `Retry-After`), decided by a seeded RNG so runs are repeatable.
+*   `rate_limit` / `rate_limit_period`: a fixed-window limit that adds GitLab's
+    `RateLimit-*` headers and answers 429 once the window is exhausted.
+
+    with FakeGitlabServer(generate_project(1_000), latency=0.02) as server:
+        os.environ["GGW_GITLAB_URL"] = server.url
+        ...
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+from benchmarks.generator import SyntheticProject
+
+DEFAULT_TOKEN = "benchmark-token"
+DEFAULT_BOARD_ID = 1
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# (method, path pattern, route name); patterns match the path after /api/v4.
+_ROUTES = [
+    ("GET", r"/user", "get_user"),
+    ("GET", r"/projects/(?P<project>[^/]+)", "get_project"),
+    ("GET", r"/projects/(?P<project>[^/]+)/issues", "list_issues"),
+    ("POST", r"/projects/(?P<project>[^/]+)/issues", "create_issue"),
+    ("GET", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)", "get_issue"),
+    ("PUT", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)", "update_issue"),
+    ("DELETE", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)", "delete_issue"),
+    ("PUT", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)/reorder", "reorder_issue"),
+    ("GET", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)/links", "list_links"),
+    ("POST", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)/links", "create_link"),
+    ("GET", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)/notes", "list_notes"),
+    ("POST", r"/projects/(?P<project>[^/]+)/issues/(?P<iid>\d+)/notes", "create_note"),
+    ("GET", r"/projects/(?P<project>[^/]+)/labels", "list_labels"),
+    ("POST", r"/projects/(?P<project>[^/]+)/labels", "create_label"),
+    ("DELETE", r"/projects/(?P<project>[^/]+)/labels/(?P<name>[^/]+)", "delete_label"),
+    ("GET", r"/projects/(?P<project>[^/]+)/boards/(?P<board>\d+)", "get_board"),
+    ("GET", r"/projects/(?P<project>[^/]+)/boards/(?P<board>\d+)/lists", "list_board_lists"),
+]
+_COMPILED_ROUTES = [(method, re.compile(rf"^/api/v4{pattern}/?$"), name) for method, pattern, name in _ROUTES]
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+class FakeGitlabServer:
+    """An in-memory GitLab project served over HTTP. Use as a context manager or call start()/stop()."""
+
+    def __init__(self, project: SyntheticProject, *, token: str = DEFAULT_TOKEN, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: int = 0, rate_limit: int | None = None, rate_limit_period: float = 60.0,
+                 board_id: int = DEFAULT_BOARD_ID, seed: int = 0):
+        self.project_id = str(project.project_id)
+        self._project_json_id = int(self.project_id) if self.project_id.isdigit() else self.project_id
+        self.token = token
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rate_limit = rate_limit
+        self.rate_limit_period = rate_limit_period
+        self.board_id = board_id
+        self.backbones = list(project.backbones)
+
+        self.requests: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._window_start = time.time()
+        self._window_count = 0
+
+        self.issues: dict[int, dict] = {}
+        self.notes: dict[int, list[dict]] = {}
+        self.links: list[dict] = []
+        self._links_by_iid: dict[int, list[dict]] = {}
+        self.labels: dict[str, dict] = {}
+        self._next_iid = 1
+        self._next_id = 1
+        self._load(project)
+        self._httpd: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    # --- Lifecycle ---
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+    def start(self) -> "FakeGitlabServer":
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-gitlab", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def __enter__(self) -> "FakeGitlabServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- Data ---
+
+    def _load(self, project: SyntheticProject):
+        for issue in project.issues:
+            self.issues[issue.iid] = {
+                "id": issue.id, "iid": issue.iid, "project_id": self._project_json_id,
+                "title": issue.title, "description": issue.description, "labels": list(issue.labels),
+                "state": issue.state, "web_url": issue.web_url, "created_at": issue.created_at,
+                "updated_at": issue.updated_at, "task_completion_status": dict(issue.task_completion_status),
+                "user_notes_count": issue.user_notes_count, "relative_position": issue.iid * 1000,
+            }
+            self.notes[issue.iid] = [
+                {"id": note.id, "body": note.body, "system": note.system, "created_at": note.updated_at,
+                 "updated_at": note.updated_at, "noteable_iid": issue.iid, "noteable_type": "Issue"}
+                for note in issue.notes
+            ]
+            for link in issue.links:
+                self._add_link(issue.iid, link.iid, link.link_type)
+            for label in issue.labels:
+                self.labels.setdefault(label, {"id": len(self.labels) + 1, "name": label, "color": "#428BCA"})
+        self._next_iid = max(self.issues, default=0) + 1
+        self._next_id = max((i["id"] for i in self.issues.values()), default=0) + 1
+        self._next_note_id = max((n["id"] for notes in self.notes.values() for n in notes), default=0) + 1
+
+    def _add_link(self, source_iid: int, target_iid: int, link_type: str) -> dict:
+        link = {"issue_link_id": len(self.links) + 1, "source": source_iid, "target": target_iid, "link_type": link_type}
+        self.links.append(link)
+        self._links_by_iid.setdefault(source_iid, []).append(link)
+        self._links_by_iid.setdefault(target_iid, []).append(link)
+        return link
+
+    def _issue(self, iid) -> dict:
+        issue = self.issues.get(int(iid))
+        if issue is None:
+            raise _HTTPError(404, "404 Issue Not Found")
+        return issue
+
+    # --- Network conditions ---
+
+    def _admit(self) -> tuple[int | None, dict]:
+        """
+        Applies fault injection and the rate limit to one request. Returns an
+        error status to answer with (or None) plus headers to add.
+        """
+        with self._lock:
+            headers = {}
+            if self.rate_limit:
+                now = time.time()
+                if now - self._window_start >= self.rate_limit_period:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                reset = self._window_start + self.rate_limit_period
+                headers.update({
+                    "RateLimit-Limit": str(self.rate_limit),
+                    "RateLimit-Observed": str(self._window_count),
+                    "RateLimit-Remaining": str(max(0, self.rate_limit - self._window_count)),
+                    "RateLimit-Reset": str(math.ceil(reset)),
+                    "RateLimit-ResetTime": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(reset)),
+                })
+                if self._window_count > self.rate_limit:
+                    headers["Retry-After"] = str(max(0, math.ceil(reset - now)))
+                    return 429, headers
+            roll = self._rng.random()
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)) if self.latency or self.jitter else 0.0
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            headers["Retry-After"] = str(self.retry_after)
+            return 429, headers
+        if roll < self.throttle_rate + self.error_rate:
+            return 503, headers
+        return None, headers
+
+    # --- Handlers ---
+    # Each returns (status, body) or (status, body, extra headers).
+
+    def get_user(self, handler, params, body):
+        return 200, {"id": 1, "username": "benchmark", "web_url": f"{handler.base_url}/benchmark"}
+
+    def get_project(self, handler, params, body, project):
+        return 200, {"id": self._project_json_id,
+                     "path_with_namespace": f"group/project-{self.project_id}",
+                     "web_url": f"{handler.base_url}/group/project-{self.project_id}"}
+
+    def list_issues(self, handler, params, body, project):
+        issues = sorted(self.issues.values(), key=lambda i: i["created_at"], reverse=True)
+        if "updated_after" in params:
+            issues = [i for i in issues if i["updated_at"] > params["updated_after"]]
+        if params.get("state") in ("opened", "closed"):
+            issues = [i for i in issues if i["state"] == params["state"]]
+        if params.get("labels"):
+            wanted = set(params["labels"].split(","))
+            issues = [i for i in issues if wanted <= set(i["labels"])]
+        return handler.paginate(issues, params)
+
+    def create_issue(self, handler, params, body, project):
+        with self._lock:
+            iid, issue_id = self._next_iid, self._next_id
+            self._next_iid += 1
+            self._next_id += 1
+        labels = body.get("labels", [])
+        issue = {
+            "id": issue_id, "iid": iid, "project_id": self._project_json_id,
+            "title": body.get("title", ""), "description": body.get("description", ""),
+            "labels": labels.split(",") if isinstance(labels, str) else list(labels),
+            "state": "opened", "web_url": f"{handler.base_url}/group/project-{self.project_id}/-/issues/{iid}",
+            "created_at": _now(), "updated_at": _now(),
+            "task_completion_status": {"count": 0, "completed_count": 0},
+            "user_notes_count": 0, "relative_position": iid * 1000,
+        }
+        self.issues[iid] = issue
+        self.notes[iid] = []
+        return 201, issue
+
+    def get_issue(self, handler, params, body, project, iid):
+        return 200, self._issue(iid)
+
+    def update_issue(self, handler, params, body, project, iid):
+        issue = self._issue(iid)
+        for key, value in body.items():
+            if key == "labels" and isinstance(value, str):
+                value = [label for label in value.split(",") if label]
+            issue[key] = value
+        issue["updated_at"] = _now()
+        return 200, issue
+
+    def delete_issue(self, handler, params, body, project, iid):
+        self._issue(iid)
+        del self.issues[int(iid)]
+        return 204, None
+
+    def reorder_issue(self, handler, params, body, project, iid):
+        issue = self._issue(iid)
+        before_id = body.get("move_before_id")
+        before = next((i for i in self.issues.values() if i["id"] == before_id), None)
+        if before is not None:
+            issue["relative_position"] = before["relative_position"] + 1
+        return 200, issue
+
+    def list_links(self, handler, params, body, project, iid):
+        iid = int(self._issue(iid)["iid"])
+        linked = []
+        for link in self._links_by_iid.get(iid, []):
+            other = link["target"] if link["source"] == iid else link["source"]
+            if other in self.issues:
+                linked.append({**self.issues[other], "issue_link_id": link["issue_link_id"], "link_type": link["link_type"]})
+        return handler.paginate(linked, params)
+
+    def create_link(self, handler, params, body, project, iid):
+        source = self._issue(iid)
+        target = self._issue(body.get("target_issue_iid"))
+        if any(target["iid"] in (link["source"], link["target"]) for link in self._links_by_iid.get(source["iid"], [])):
+            raise _HTTPError(409, "Issue(s) already assigned")
+        self._add_link(source["iid"], target["iid"], body.get("link_type", "relates_to"))
+        return 201, {"source_issue": source, "target_issue": target, "link_type": body.get("link_type", "relates_to")}
+
+    def list_notes(self, handler, params, body, project, iid):
+        self._issue(iid)
+        key = "updated_at" if params.get("order_by") == "updated_at" else "created_at"
+        notes = sorted(self.notes[int(iid)], key=lambda n: (n[key], n["id"]), reverse=params.get("sort", "desc") == "desc")
+        return handler.paginate(notes, params)
+
+    def create_note(self, handler, params, body, project, iid):
+        issue = self._issue(iid)
+        with self._lock:
+            note_id = self._next_note_id
+            self._next_note_id += 1
+        note = {"id": note_id, "body": body.get("body", ""), "system": False, "created_at": _now(),
+                "updated_at": _now(), "noteable_iid": issue["iid"], "noteable_type": "Issue"}
+        self.notes[issue["iid"]].append(note)
+        issue["user_notes_count"] += 1
+        issue["updated_at"] = note["updated_at"]
+        return 201, note
+
+    def list_labels(self, handler, params, body, project):
+        return handler.paginate(list(self.labels.values()), params)
+
+    def create_label(self, handler, params, body, project):
+        name = body.get("name", "")
+        if name in self.labels:
+            raise _HTTPError(409, "Label already exists")
+        label = {"id": len(self.labels) + 1, "name": name, "color": body.get("color", "#428BCA")}
+        self.labels[name] = label
+        return 201, label
+
+    def delete_label(self, handler, params, body, project, name):
+        if self.labels.pop(unquote(name), None) is None:
+            raise _HTTPError(404, "404 Label Not Found")
+        return 204, None
+
+    def get_board(self, handler, params, body, project, board):
+        if int(board) != self.board_id:
+            raise _HTTPError(404, "404 Board Not Found")
+        return 200, {"id": self.board_id, "name": "Development", "lists": self._board_lists()}
+
+    def list_board_lists(self, handler, params, body, project, board):
+        if int(board) != self.board_id:
+            raise _HTTPError(404, "404 Board Not Found")
+        return handler.paginate(self._board_lists(), params)
+
+    def _board_lists(self) -> list[dict]:
+        return [
+            {"id": position + 1, "position": position, "label": self.labels.get(f"Backbone::{backbone}", {"name": f"Backbone::{backbone}"})}
+            for position, backbone in enumerate(self.backbones)
+        ]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake: FakeGitlabServer
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle/delayed-ACK stalls on keep-alive connections.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.headers.get('Host')}"
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        raw = self.rfile.read(length).decode("utf-8")
+        if "json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(raw or "{}")
+        return {k: v[-1] for k, v in parse_qs(raw).items()}
+
+    def _dispatch(self, method: str):
+        fake = self.fake
+        parts = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        body = self._read_body()
+
+        route = next(((name, m) for verb, pattern, name in _COMPILED_ROUTES
+                      if verb == method and (m := pattern.match(parts.path))), None)
+        name = route[0] if route else "unknown"
+        with fake._lock:
+            fake.requests[name] += 1
+
+        if self.headers.get("PRIVATE-TOKEN") != fake.token:
+            return self._send(401, {"message": "401 Unauthorized"})
+        status, headers = fake._admit()
+        if status == 429:
+            return self._send(429, {"message": "429 Too Many Requests"}, headers)
+        if status:
+            return self._send(status, {"message": f"{status} Service Unavailable"}, headers)
+        if route is None:
+            return self._send(404, {"message": "404 Not Found"}, headers)
+
+        kwargs = {k: unquote(v) for k, v in route[1].groupdict().items()}
+        if "project" in kwargs and kwargs["project"] != fake.project_id:
+            return self._send(404, {"message": "404 Project Not Found"}, headers)
+        try:
+            result = getattr(fake, name)(self, params, body, **kwargs)
+        except _HTTPError as e:
+            return self._send(e.status, {"message": e.message}, headers)
+        status, payload, *extra = result
+        if extra:
+            headers.update(extra[0])
+        self._send(status, payload, headers)
+
+    def paginate(self, items: list, params: dict):
+        """Returns one page of `items` with GitLab's offset pagination headers."""
+        per_page = min(MAX_PER_PAGE, max(1, int(params.get("per_page", DEFAULT_PER_PAGE))))
+        page = max(1, int(params.get("page", 1)))
+        total_pages = max(1, math.ceil(len(items) / per_page))
+        headers = {
+            "X-Page": str(page), "X-Per-Page": str(per_page), "X-Total": str(len(items)),
+            "X-Total-Pages": str(total_pages), "X-Next-Page": str(page + 1) if page < total_pages else "",
+            "X-Prev-Page": str(page - 1) if page > 1 else "",
+        }
+        path = urlsplit(self.path).path
+
+        def page_url(n):
+            return f"{self.base_url}{quote(path)}?{urlencode({**params, 'page': n, 'per_page': per_page})}"
+        links = [f'<{page_url(1)}>; rel="first"', f'<{page_url(total_pages)}>; rel="last"']
+        if page < total_pages:
+            links.insert(0, f'<{page_url(page + 1)}>; rel="next"')
+        if page > 1:
+            links.insert(0, f'<{page_url(page - 1)}>; rel="prev"')
+        headers["Link"] = ", ".join(links)
+        return 200, items[(page - 1) * per_page: page * per_page], headers
+
+    def _send(self, status: int, payload, headers: dict | None = None):
+        with self.fake._lock:
+            self.fake.statuses[status] += 1
+        data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
@@ -0,0 +1,131 @@
+"""
+In-process stand-in for the `gitlab_client` module.
+
+`FakeGitlabClient` exposes the same functions as `gemini_gitlab_workflow.gitlab_client`,
+served from a `SyntheticProject`, and counts every call as one API request so
+benchmarks can report request volume without any network access.
+"""
+from collections import Counter
+from types import SimpleNamespace
+
+from benchmarks.generator import FakeIssue, FakeLink, FakeNote, SyntheticProject
+
+
+class FakeGitlabClient:
+    def __init__(self, project: SyntheticProject):
+        self.project = project
+        self.issues = {issue.iid: issue for issue in project.issues}
+        self.labels = sorted({label for issue in project.issues for label in issue.labels if not label.startswith("Epic::")})
+        self.requests: Counter = Counter()
+        self._next_iid = max(self.issues, default=0) + 1
+        self._next_note_id = 1 + max((n.id for i in project.issues for n in i.notes), default=0)
+        self.board = SimpleNamespace(
+            lists=SimpleNamespace(list=self._board_lists)
+        )
+
+    def _request(self, name: str):
+        self.requests[name] += 1
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+    # --- Read API ---
+
+    def get_gitlab_client(self):
+        self._request("auth")
+        return self
+
+    def get_project(self, project_id: str):
+        self._request("get_project")
+        return SimpleNamespace(id=project_id)
+
+    def get_project_board(self, project_id: str):
+        self._request("get_project_board")
+        return self.board
+
+    def _board_lists(self, **kwargs):
+        self._request("list_board_lists")
+        return [SimpleNamespace(label={"name": f"Backbone::{b}"}) for b in self.project.backbones]
+
+    def get_project_issues(self, project_id: str, **kwargs):
+        self._request("list_issues")
+        issues = list(self.issues.values())
+        updated_after = kwargs.get("updated_after")
+        if updated_after:
+            issues = [i for i in issues if i.updated_at > updated_after]
+        return issues
+
+    def get_project_issue(self, project_id: str, issue_iid: int):
+        self._request("get_issue")
+        return self.issues[int(issue_iid)]
+
+    def get_issue_links(self, project_id: str, issue_iid: int):
+        self._request("list_links")
+        return list(self.issues[int(issue_iid)].links)
+
+    def get_issue_notes(self, project_id: str, issue_iid: int, **kwargs):
+        notes = self.issues[int(issue_iid)].notes
+        if kwargs.get("order_by") == "updated_at":
+            notes = sorted(notes, key=lambda n: (n.updated_at, n.id), reverse=kwargs.get("sort", "desc") == "desc")
+        if not kwargs.get("iterator"):
+            self._request("list_notes")
+            return list(notes)
+        return self._pages("list_notes", list(notes), kwargs.get("per_page", 20))
+
+    def _pages(self, name: str, items: list, per_page: int):
+        """Yields `items` like a python-gitlab iterator: one request per page, made when the page is reached."""
+        for start in range(0, max(len(items), 1), per_page):
+            self._request(name)
+            yield from items[start:start + per_page]
+
+    def get_project_labels(self, project_id: str):
+        self._request("list_labels")
+        return [SimpleNamespace(name=name) for name in self.labels]
+
+    # --- Write API ---
+
+    def create_project_label(self, project_id: str, label_data: dict):
+        self._request("create_label")
+        self.labels.append(label_data["name"])
+        return SimpleNamespace(**label_data)
+
+    def delete_project_label(self, project_id: str, label_name: str):
+        self._request("delete_label")
+        self.labels.remove(label_name)
+
+    def create_project_issue(self, project_id: str, issue_data: dict):
+        self._request("create_issue")
+        iid = self._next_iid
+        self._next_iid += 1
+        issue = FakeIssue(
+            iid=iid, id=500_000 + iid, title=issue_data["title"], description=issue_data.get("description", ""),
+            labels=list(issue_data.get("labels", [])), state="opened",
+            web_url=f"https://gitlab.example.com/-/issues/{iid}",
+            created_at="2026-01-01T00:00:00.000Z", updated_at="2026-01-01T00:00:00.000Z",
+        )
+        self.issues[iid] = issue
+        return issue
+
+    def delete_project_issue(self, project_id: str, issue_iid: int):
+        self._request("delete_issue")
+        self.issues.pop(int(issue_iid), None)
+
+    def create_issue_note(self, project_id: str, issue_iid: int, note_data: dict):
+        self._request("create_note")
+        note = FakeNote(id=self._next_note_id, body=note_data["body"], updated_at="2026-01-01T00:00:00.000Z")
+        self._next_note_id += 1
+        issue = self.issues[int(issue_iid)]
+        issue.notes.append(note)
+        issue.user_notes_count += 1
+        return note
+
+    def create_issue_link(self, project_id: str, source_issue_iid: int, target_issue_iid: int, link_type: str = 'relates_to'):
+        self._request("create_link")
+        link = FakeLink(int(target_issue_iid), link_type)
+        self.issues[int(source_issue_iid)].links.append(link)
+        return link
+
+    def move_issue_in_board_list(self, project_id: str, issue_iid: int, move_before_id: int):
+        self._request("reorder_issue")
+        return self.issues[int(issue_iid)]
@@ -0,0 +1,182 @@
+"""
+Deterministic generator for synthetic GitLab projects.
+
+`generate_project(num_issues, seed)` returns a `SyntheticProject` with backbones,
+epics and stories laid out the way ggw expects them (labels, epic links,
+`/blocking` and "Blocked by" references in descriptions and notes). The same
+arguments always produce the same project, so benchmark numbers are comparable.
+"""
+import random
+from dataclasses import dataclass, field
+
+# Named project sizes used by the benchmark runner.
+SCALES = {"1k": 1_000, "10k": 10_000, "50k": 50_000}
+
+_WORDS = (
+    "user profile upload avatar search filter export report invoice payment "
+    "checkout cart login password reset notification email dashboard widget "
+    "admin role permission audit history comment share calendar schedule "
+    "booking review rating catalog inventory shipment tracking refund coupon"
+).split()
+
+
+@dataclass
+class FakeNote:
+    id: int
+    body: str
+    updated_at: str
+    system: bool = False
+
+
+@dataclass
+class FakeLink:
+    """Mirrors the attributes ggw reads from python-gitlab issue links."""
+    iid: int
+    link_type: str = "relates_to"
+
+
+@dataclass
+class FakeIssue:
+    """Mirrors the attributes ggw reads from python-gitlab ProjectIssue objects."""
+    iid: int
+    id: int
+    title: str
+    description: str
+    labels: list[str]
+    state: str
+    web_url: str
+    created_at: str
+    updated_at: str
+    task_completion_status: dict = field(default_factory=lambda: {"count": 0, "completed_count": 0})
+    links: list[FakeLink] = field(default_factory=list)
+    notes: list[FakeNote] = field(default_factory=list)
+    user_notes_count: int = 0
+
+    def save(self):
+        pass
+
+    def delete(self):
+        pass
+
+
+@dataclass
+class SyntheticProject:
+    project_id: str
+    issues: list[FakeIssue]
+    backbones: list[str]
+
+    @property
+    def epics(self) -> list[FakeIssue]:
+        return [i for i in self.issues if "Type::Epic" in i.labels]
+
+    @property
+    def stories(self) -> list[FakeIssue]:
+        return [i for i in self.issues if "Type::Story" in i.labels]
+
+
+def _timestamp(rng: random.Random) -> str:
+    return f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.000Z"
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _description(rng: random.Random, title: str) -> str:
+    criteria = "\n".join(f"- [ ] {_phrase(rng, 6).capitalize()}." for _ in range(rng.randint(2, 5)))
+    return (
+        f"# {title}\n\n### User Story\n\n**As a** user,\n**I want to** {_phrase(rng, 8)},\n"
+        f"**So that** {_phrase(rng, 8)}.\n\n---\n\n### Acceptance Criteria\n\n{criteria}\n"
+    )
+
+
+def generate_project(num_issues: int, seed: int = 0, project_id: str = "1000") -> SyntheticProject:
+    """
+    Generates a project with roughly one epic per 20 issues, spread over one
+    backbone per 500 issues (at least two), with the rest being stories.
+    About 10% of stories block another story, and issues carry 0-3 notes.
+    """
+    rng = random.Random(seed)
+    num_backbones = max(2, num_issues // 500)
+    num_epics = max(1, num_issues // 20)
+    backbones = [f"Backbone {b + 1} {rng.choice(_WORDS).title()}" for b in range(num_backbones)]
+    base_url = f"https://gitlab.example.com/group/project-{project_id}/-/issues"
+
+    issues: list[FakeIssue] = []
+    epics: list[FakeIssue] = []
+    for iid in range(1, num_issues + 1):
+        backbone = backbones[(iid - 1) % num_backbones]
+        if iid <= num_epics:
+            title = f"Epic {iid}: {_phrase(rng, 3).title()}"
+            labels = ["Type::Epic", f"Backbone::{backbone}", f"Epic::{title}"]
+        else:
+            title = f"Story {iid}: {_phrase(rng, 5).capitalize()}"
+            labels = ["Type::Story", f"Backbone::{backbone}"]
+        created_at = _timestamp(rng)
+        issue = FakeIssue(
+            iid=iid,
+            id=500_000 + iid,
+            title=title,
+            description=_description(rng, title),
+            labels=labels,
+            state="closed" if rng.random() < 0.2 else "opened",
+            web_url=f"{base_url}/{iid}",
+            created_at=created_at,
+            updated_at=max(created_at, _timestamp(rng)),
+        )
+        issues.append(issue)
+        if iid <= num_epics:
+            epics.append(issue)
+
+    stories = issues[num_epics:]
+    note_id = 1
+    for story in stories:
+        epic = rng.choice(epics)
+        backbone_label = next(label for label in epic.labels if label.startswith("Backbone::"))
+        story.labels = ["Type::Story", backbone_label]
+        if rng.random() < 0.8:
+            story.links.append(FakeLink(epic.iid))
+        else:
+            # Legacy stories reference their epic by label only.
+            story.labels.append(f"Epic::{epic.title}")
+        if rng.random() < 0.05:
+            story.description += f"\n/blocking #{rng.choice(stories).iid}\n"
+
+    for issue in issues:
+        for _ in range(rng.choice((0, 0, 1, 1, 2, 3))):
+            roll = rng.random()
+            if roll < 0.1:
+                body = f"Blocked by #{rng.choice(stories).iid}"
+            elif roll < 0.15:
+                body = f"/blocked by #{rng.choice(stories).iid}"
+            else:
+                body = _phrase(rng, rng.randint(5, 40)).capitalize() + "."
+            issue.notes.append(FakeNote(id=note_id, body=body, updated_at=issue.updated_at))
+            note_id += 1
+        issue.user_notes_count = len(issue.notes)
+
+    return SyntheticProject(project_id=project_id, issues=issues, backbones=backbones)
+
+
+def generate_plan(project: SyntheticProject, num_stories: int = 20, seed: int = 1) -> dict:
+    """
+    Generates an AI-style implementation plan (one new epic plus `num_stories`
+    stories chained by dependencies) targeting one of the project's backbones.
+    """
+    rng = random.Random(seed)
+    backbone = rng.choice(project.backbones)
+    epic_title = f"Benchmark Epic {_phrase(rng, 2).title()}"
+    epic_labels = ["Type::Epic", f"Epic::{epic_title}", f"Backbone::{backbone}"]
+    issues = [{"id": "NEW_1", "title": epic_title, "description": _description(rng, epic_title), "labels": epic_labels}]
+    for n in range(2, num_stories + 2):
+        title = f"Benchmark Story {n}: {_phrase(rng, 4).capitalize()}"
+        issue = {
+            "id": f"NEW_{n}",
+            "title": title,
+            "description": _description(rng, title),
+            "labels": ["Type::Story", f"Epic::{epic_title}", f"Backbone::{backbone}"],
+        }
+        if n > 2 and rng.random() < 0.5:
+            issue["dependencies"] = {"is_blocked_by": [f"NEW_{n - 1}"]}
+        issues.append(issue)
+    return {"proposed_issues": issues}
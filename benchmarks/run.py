@@ -0,0 +1,373 @@
+"""
+End-to-end benchmark runner.
+
+Drives the map builder, sync, local file generation, YAML I/O, the uploader,
+graph queries and full-text search against a synthetic project served by `FakeGitlabClient`, and
+reports wall time, GitLab request counts and peak Python memory per scenario.
+
+    python -m benchmarks.run --scale 1k
+    python -m benchmarks.run --scale 10k --baseline benchmarks/baseline.json
+    python -m benchmarks.run --scale 1k --baseline benchmarks/baseline.json --update-baseline
+    python -m benchmarks.run --scale 1k --http --latency 0.02 --jitter 0.01
+
+`--http` serves the project from `FakeGitlabServer` instead, so python-gitlab's
+HTTP, pagination and retry handling are part of the measurement.
+
+With `--baseline`, the run fails (exit code 1) when a scenario is slower or uses
+more memory than the baseline by more than `--max-regression` (a fraction), or
+issues more GitLab requests than it did.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+from unittest import mock
+
+from benchmarks.fake_gitlab_server import DEFAULT_TOKEN, FakeGitlabServer
+from benchmarks.fakes import FakeGitlabClient
+from benchmarks.generator import SCALES, SyntheticProject, generate_plan, generate_project
+from gemini_gitlab_workflow import (
+    ai_service, config, file_system_repo, gitlab_client, gitlab_service, gitlab_uploader, project_mapper
+)
+
+DEFAULT_BASELINE_PATH = Path(__file__).with_name("baseline.json")
+DEFAULT_MAX_REGRESSION = 0.25
+
+# gitlab_client functions routed to the fake during a benchmark.
+_CLIENT_FUNCTIONS = (
+    "get_gitlab_client", "get_project", "get_project_board", "get_project_issues", "get_project_issue",
+    "get_issue_links", "get_issue_notes", "get_project_labels", "create_project_label",
+    "delete_project_label", "create_project_issue", "delete_project_issue", "create_issue_note",
+    "create_issue_link", "move_issue_in_board_list",
+)
+
+
+@dataclass
+class Result:
+    name: str
+    seconds: float
+    requests: int
+    peak_mb: float
+
+
+@dataclass
+class Workspace:
+    """A temporary project directory with ggw's paths and GitLab access redirected to it."""
+    root: Path
+    project: SyntheticProject
+    # Either backend counts requests in `requests` / `total_requests`.
+    client: FakeGitlabClient | FakeGitlabServer
+
+
+@contextlib.contextmanager
+def workspace(project: SyntheticProject, server_options: dict | None = None):
+    """
+    Sets up an isolated workspace: temp paths, environment and a fake GitLab.
+    With `server_options` (FakeGitlabServer keyword arguments) GitLab is served
+    over HTTP; otherwise gitlab_client's functions are replaced in-process.
+    """
+    client = FakeGitlabServer(project, **server_options) if server_options is not None else FakeGitlabClient(project)
+    with tempfile.TemporaryDirectory(prefix="ggw-bench-") as tmp, contextlib.ExitStack() as stack:
+        root = Path(tmp)
+        # The mapper reports progress with print(); keep it out of the benchmark output.
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        paths = {
+            "PROJECT_ROOT": root,
+            "DATA_DIR": root / "gitlab_data",
+            "CACHE_DIR": root / ".gemini_cache",
+            "PROJECT_MAP_PATH": root / "project_map.yaml",
+            "TIMESTAMPS_CACHE_PATH": root / ".gemini_cache" / "timestamps.json",
+            "PROJECT_GRAPH_CACHE_PATH": root / ".gemini_cache" / "project_graph.pickle",
+            "ISSUE_NOTES_PATH": root / ".gemini_cache" / "issue_notes.json",
+            "SEARCH_INDEX_PATH": root / ".gemini_cache" / "search_index.pickle",
+            "WEBHOOK_STATE_PATH": root / ".gemini_cache" / "webhook.json",
+            "LLM_PREFIX_CACHE_PATH": root / ".gemini_cache" / "llm_prefix_cache.json",
+            "SUMMARY_CACHE_PATH": root / ".gemini_cache" / "summaries.json",
+            "DOCS_DIR": root / "docs",
+        }
+        for name, value in paths.items():
+            stack.enter_context(mock.patch.object(config, name, value))
+        # The uploader binds these at import time.
+        stack.enter_context(mock.patch.object(gitlab_uploader, "PROJECT_MAP_PATH", paths["PROJECT_MAP_PATH"]))
+        stack.enter_context(mock.patch.object(gitlab_uploader, "DATA_DIR", paths["DATA_DIR"]))
+        stack.enter_context(mock.patch.object(gitlab_uploader.time, "sleep"))
+        if isinstance(client, FakeGitlabServer):
+            stack.enter_context(client)
+            # The memoized python-gitlab client must connect to this server, and not outlive it.
+            gitlab_client.get_gitlab_client.cache_clear()
+            stack.callback(gitlab_client.get_gitlab_client.cache_clear)
+        else:
+            for name in _CLIENT_FUNCTIONS:
+                stack.enter_context(mock.patch.object(gitlab_client, name, getattr(client, name)))
+        stack.enter_context(mock.patch.dict(os.environ, {
+            "GGW_GITLAB_URL": client.url if isinstance(client, FakeGitlabServer) else "https://gitlab.example.com",
+            "GGW_GITLAB_PRIVATE_TOKEN": DEFAULT_TOKEN,
+            "GGW_GITLAB_PROJECT_ID": project.project_id,
+            "GGW_GITLAB_BOARD_ID": "1",
+        }))
+        file_system_repo._remember_project_map(None, {})
+        yield Workspace(root, project, client)
+        file_system_repo._remember_project_map(None, {})
+
+
+def _build_map(ws: Workspace) -> dict:
+    return project_mapper.build_project_map(ws.project.project_id)["map_data"]
+
+
+def _apply_plan(ws: Workspace) -> dict:
+    """Adds a generated plan's files and nodes to the workspace, returning the updated map."""
+    from rich.console import Console
+    from gemini_gitlab_workflow.cli import _generate_local_files
+
+    project_map = _build_map(ws)
+    _generate_local_files(generate_plan(ws.project), Console(file=io.StringIO()), project_map)
+    return project_map
+
+
+# --- Scenarios ---
+# Each scenario prepares the workspace and returns the callable being measured.
+
+def scenario_build_project_map(ws: Workspace) -> Callable:
+    return lambda: project_mapper.build_project_map(ws.project.project_id)
+
+
+def scenario_smart_sync(ws: Workspace) -> Callable:
+    # A previous sync saw every issue; 10% have been updated since.
+    timestamps = {str(issue.iid): issue.updated_at for issue in ws.project.issues}
+    for issue in ws.project.issues[::10]:
+        timestamps[str(issue.iid)] = "2000-01-01T00:00:00.000Z"
+    file_system_repo.write_timestamps_cache(timestamps)
+    return gitlab_service.smart_sync
+
+
+def scenario_sync_project_map(ws: Workspace) -> Callable:
+    return gitlab_service.sync_project_map
+
+
+def scenario_resync_project_map(ws: Workspace) -> Callable:
+    # A previous sync stored every issue's notes; 10% of the issues have changed since.
+    gitlab_service.sync_project_map()
+    issue_notes = file_system_repo.read_issue_notes()
+    for issue in ws.project.issues[::10]:
+        issue_notes[str(issue.iid)]["updated_at"] = "2000-01-01T00:00:00.000Z"
+    file_system_repo.write_issue_notes(issue_notes)
+    return gitlab_service.sync_project_map
+
+
+def scenario_generate_local_files(ws: Workspace) -> Callable:
+    from rich.console import Console
+    from gemini_gitlab_workflow import search_index
+    from gemini_gitlab_workflow.cli import _generate_local_files
+
+    project_map = _build_map(ws)
+    plan = generate_plan(ws.project)
+    # `create-feature` has loaded the search index for its pre-filter by then.
+    search_index.load_search_index()
+    return lambda: _generate_local_files(plan, Console(file=io.StringIO()), project_map)
+
+
+def scenario_yaml_write(ws: Workspace) -> Callable:
+    project_map = _build_map(ws)
+    return lambda: file_system_repo.write_project_map(project_map)
+
+
+def scenario_yaml_read(ws: Workspace) -> Callable:
+    _build_map(ws)
+
+    def read_uncached():
+        file_system_repo._remember_project_map(None, {})
+        return file_system_repo.read_project_map()
+    return read_uncached
+
+
+def scenario_upload(ws: Workspace) -> Callable:
+    project_map = _apply_plan(ws)
+    return lambda: gitlab_uploader.GitlabUploader(ws.project.project_id, project_map).upload()
+
+
+def scenario_plan_with_stub_llm(ws: Workspace) -> Callable:
+    from gemini_gitlab_workflow.cli import _get_context_from_project_map
+
+    project_map = _build_map(ws)
+    sources = [{"path": str(s["path"]), "summary": s["summary"]} for s in _get_context_from_project_map(project_map)]
+    existing = [{"title": n["title"], "labels": n["labels"], "state": n.get("state")} for n in project_map["nodes"]]
+    request = "Let users export their invoice history as a report"
+
+    def plan():
+        # Measure the pipeline itself rather than the response cache.
+        ai_service.clear_response_cache()
+        files = ai_service.get_relevant_context_files(request, sources, mock=True)
+        return ai_service.generate_implementation_plan(request, "\n".join(files), existing, mock=True)
+    return plan
+
+
+def scenario_query_graph(ws: Workspace) -> Callable:
+    from gemini_gitlab_workflow import project_graph
+
+    _build_map(ws)
+    project_graph.load_project_graph()  # Writes the persisted graph.
+    backbone = ws.project.backbones[0]
+    story_iid = ws.project.stories[-1].iid
+
+    def query():
+        # A fresh `ggw query` process: nothing memoized, the pickled graph on disk.
+        project_graph._loaded = None
+        graph = project_graph.load_project_graph()
+        graph.filter(state="opened", backbone=backbone, issue_type="Story")
+        return graph.all_blockers(story_iid)
+    return query
+
+
+def scenario_search(ws: Workspace) -> Callable:
+    from gemini_gitlab_workflow import search_index
+
+    gitlab_service.sync_project_map()
+    search_index.load_search_index()  # Builds and writes the persisted index.
+
+    def search():
+        # A fresh `ggw search` process: the index is loaded from disk and checked for changes.
+        search_index._index = None
+        return search_index.load_search_index().search("export invoice report")
+    return search
+
+
+SCENARIOS: dict[str, Callable[[Workspace], Callable]] = {
+    "build_project_map": scenario_build_project_map,
+    "smart_sync": scenario_smart_sync,
+    "sync_project_map": scenario_sync_project_map,
+    "resync_project_map": scenario_resync_project_map,
+    "generate_local_files": scenario_generate_local_files,
+    "yaml_write_project_map": scenario_yaml_write,
+    "yaml_read_project_map": scenario_yaml_read,
+    "upload": scenario_upload,
+    "plan_with_stub_llm": scenario_plan_with_stub_llm,
+    "query_graph": scenario_query_graph,
+    "search": scenario_search,
+}
+
+
+def measure(name: str, project: SyntheticProject, repeat: int = 3, server_options: dict | None = None) -> Result:
+    """
+    Runs a scenario `repeat` times in fresh workspaces and keeps the fastest time,
+    then once more under tracemalloc for the peak memory (tracing slows the code
+    down, so it is kept out of the timed runs).
+    """
+    setup = SCENARIOS[name]
+    best, requests = float("inf"), 0
+    for _ in range(repeat):
+        with workspace(project, server_options) as ws:
+            func = setup(ws)
+            ws.client.requests.clear()
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+            requests = ws.client.total_requests
+
+    with workspace(project, server_options) as ws:
+        func = setup(ws)
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return Result(name, best, requests, peak / (1024 * 1024))
+
+
+def run(scale: str, scenarios: list[str] | None = None, repeat: int = 3,
+        server_options: dict | None = None) -> list[Result]:
+    """Generates the project for `scale` and measures the selected scenarios."""
+    project = generate_project(SCALES[scale])
+    return [measure(name, project, repeat, server_options) for name in (scenarios or SCENARIOS)]
+
+
+def compare(results: list[Result], baseline: dict, max_regression: float) -> list[str]:
+    """Returns a description of every regression against `baseline` (scenario name -> metrics)."""
+    regressions = []
+    for result in results:
+        expected = baseline.get(result.name)
+        if not expected:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            limit = expected[metric] * (1 + max_regression)
+            actual = getattr(result, metric)
+            if actual > limit:
+                regressions.append(f"{result.name}: {metric} {actual:.3f} > {limit:.3f} "
+                                   f"(baseline {expected[metric]:.3f} +{max_regression:.0%})")
+        if result.requests > expected["requests"]:
+            regressions.append(f"{result.name}: requests {result.requests} > baseline {expected['requests']}")
+    return regressions
+
+
+def _print_results(scale: str, results: list[Result], baseline: dict):
+    print(f"\nBenchmarks ({scale})")
+    print(f"{'scenario':<26}{'time (s)':>12}{'requests':>10}{'peak MB':>10}{'vs baseline':>14}")
+    for r in results:
+        expected = baseline.get(r.name)
+        delta = f"{(r.seconds / expected['seconds'] - 1):+.0%}" if expected and expected["seconds"] else "-"
+        print(f"{r.name:<26}{r.seconds:>12.3f}{r.requests:>10}{r.peak_mb:>10.1f}{delta:>14}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable). Defaults to all.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario; the fastest is kept.")
+    parser.add_argument("--baseline", type=Path, help="Baseline JSON to compare against.")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write this run's numbers to the baseline instead of comparing.")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="Allowed slowdown / memory growth as a fraction (default: 0.25).")
+    parser.add_argument("--http", action="store_true", help="Serve GitLab over HTTP with FakeGitlabServer.")
+    parser.add_argument("--latency", type=float, default=0.0, help="With --http: seconds added to each response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="With --http: random +- variation of the latency.")
+    parser.add_argument("--json", type=Path, help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    # The uploader logs every created issue at INFO level.
+    logging.disable(logging.INFO)
+    server_options = {"latency": args.latency, "jitter": args.jitter} if args.http else None
+    results = run(args.scale, args.scenario, args.repeat, server_options)
+
+    # HTTP runs are not comparable with in-process ones, so they get their own baseline key.
+    key = f"{args.scale}-http" if args.http else args.scale
+    baseline_path = args.baseline or DEFAULT_BASELINE_PATH
+    all_baselines = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    baseline = all_baselines.get(key, {})
+    _print_results(key, results, baseline)
+
+    if args.json:
+        args.json.write_text(json.dumps({key: {r.name: asdict(r) for r in results}}, indent=2))
+
+    if args.update_baseline:
+        all_baselines.setdefault(key, {}).update(
+            {r.name: {"seconds": round(r.seconds, 4), "requests": r.requests, "peak_mb": round(r.peak_mb, 2)}
+             for r in results}
+        )
+        baseline_path.write_text(json.dumps(all_baselines, indent=2, sort_keys=True) + "\n")
+        print(f"\nBaseline written to {baseline_path}")
+        return 0
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
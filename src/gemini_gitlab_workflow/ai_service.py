@@ -1,17 +1,20 @@
 import json
 import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
 from typing import List, Optional
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 from pydantic import BaseModel, Field
-from gemini_gitlab_workflow import config
+from gemini_gitlab_workflow import config, instrumentation, llm_backend, llm_scheduler, response_parser
 
-# Configure the generative AI client
-try:
-    genai.configure(api_key=os.getenv("GEMINI_WORKER_API_KEY"))
-except Exception as e:
-    print(f"Error configuring Google Gemini API: {e}")
-    genai = None
+# In-process LRU cache of raw model responses. Calls use temperature=0, so an
+# identical request (model, messages, schema) can reuse the previous answer.
+# Mostly benefits the long-running `ggw serve` daemon.
+RESPONSE_CACHE_SIZE = 128
+_response_cache: OrderedDict[str, str] = OrderedDict()
+_response_cache_lock = threading.Lock()
 
 # --- Pydantic Schemas for Structured Output ---
 
@@ -19,6 +22,15 @@ class RelevantFiles(BaseModel):
     """Schema for the list of relevant files."""
     relevant_files: List[str] = Field(description="A list of file paths relevant to the user's request.")
 
+class DocumentSummary(BaseModel):
+    """Schema for the summary of one document."""
+    id: str = Field(description="The id of the summarized document.")
+    summary: str = Field(description="A one- or two-sentence summary of the document.")
+
+class DocumentSummaries(BaseModel):
+    """Schema for the summaries of a batch of documents."""
+    summaries: List[DocumentSummary] = Field(description="One summary per document.")
+
 class Dependencies(BaseModel):
     """Schema for issue dependencies."""
     is_blocked_by: Optional[List[str]] = None
@@ -35,26 +47,6 @@ class ImplementationPlan(BaseModel):
     """Schema for the entire implementation plan."""
     proposed_issues: List[ProposedIssue] = Field(description="A list of all the new epics and stories to be created.")
 
-# Define safety settings to block harmful content
-safety_settings = [
-    {
-        "category": HarmCategory.HARM_CATEGORY_HARASSMENT,
-        "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    },
-    {
-        "category": HarmCategory.HARM_CATEGORY_HATE_SPEECH,
-        "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    },
-    {
-        "category": HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-        "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    },
-    {
-        "category": HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-        "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-    },
-]
-
 # --- Manual Schemas for Gemini API ---
 
 RELEVANT_FILES_SCHEMA = {
@@ -68,6 +60,24 @@ RELEVANT_FILES_SCHEMA = {
     "required": ["relevant_files"]
 }
 
+DOCUMENT_SUMMARIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summaries": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "summary": {"type": "string"}
+                },
+                "required": ["id", "summary"]
+            }
+        }
+    },
+    "required": ["summaries"]
+}
+
 IMPLEMENTATION_PLAN_SCHEMA = {
     "type": "object",
     "properties": {
@@ -100,31 +110,108 @@ IMPLEMENTATION_PLAN_SCHEMA = {
     "required": ["proposed_issues"]
 }
 
+# A revision returns only what changed: new or modified issues, and the ids of removed ones.
+PLAN_REVISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "proposed_issues": IMPLEMENTATION_PLAN_SCHEMA["properties"]["proposed_issues"],
+        "removed_issue_ids": {
+            "type": "array",
+            "items": {"type": "string"}
+        }
+    },
+    "required": ["proposed_issues", "removed_issue_ids"]
+}
 
-def call_google_gemini_api(messages: list, model_name: str, response_schema: dict) -> str:
-    """Calls the Google Gemini API with a structured list of messages and a response schema."""
-    if not genai:
-        print("Error: Google Gemini API client is not configured.")
-        return ''
-    try:
-        model = genai.GenerativeModel(model_name, safety_settings=safety_settings)
-        config = genai.GenerationConfig(
-            temperature=0,
-            response_mime_type="application/json",
-            response_schema=response_schema,
-        )
-        response = model.generate_content(messages, generation_config=config)
-        return response.text
-    except Exception as e:
-        print(f"An error occurred while calling the Gemini API: {e}")
-        return None
-
-def get_relevant_context_files(user_prompt: str, context_sources: list[dict], mock: bool = False) -> list[str] | None:
-    """Uses an AI model to select the most relevant context files for a given user prompt."""
-    if mock:
-        print("--- AI API CALL (MOCKED for get_relevant_context_files) ---")
-        return ["docs/architecture-design-document.md", "docs/feature-ai-story-map-creation.md"]
 
+def _response_cache_key(messages: list, model_name: str, response_schema: dict, backend_name: str = "gemini") -> str:
+    payload = json.dumps([backend_name, model_name, messages, response_schema], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def call_google_gemini_api(messages: list, model_name: str, response_schema: dict, backend: str | None = None,
+                           prefix_messages: int = 0) -> str:
+    """
+    Calls the configured LLM backend (Google Gemini by default, see GGW_LLM_BACKEND)
+    with a structured list of messages and a response schema. `backend` overrides
+    the configured backend by name. Successful responses are memoized in-process
+    (see RESPONSE_CACHE_SIZE). The first `prefix_messages` messages are a static
+    prompt prefix the backend may cache across calls and runs (see LLM_PREFIX_CACHE_TTL).
+
+    The request is scheduled by `llm_scheduler`: it may be routed to the fast
+    model, is retried on retryable errors and stays within the command's budget.
+    """
+    llm = llm_backend.get_backend(backend)
+    model_name = llm_scheduler.route(messages, model_name)
+    cache_key = _response_cache_key(messages, model_name, response_schema, llm.name)
+    with _response_cache_lock:
+        if cache_key in _response_cache:
+            instrumentation.count("llm.cache_hits")
+            _response_cache.move_to_end(cache_key)
+            return _response_cache[cache_key]
+
+    response_text, used_model = llm_scheduler.call(
+        lambda model: llm.generate(messages, model, response_schema, prefix_messages), model_name
+    )
+    # An answer of the budget fallback model is not what this request would normally get.
+    if response_text and used_model == model_name:
+        with _response_cache_lock:
+            _response_cache[cache_key] = response_text
+            while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                _response_cache.popitem(last=False)
+    return response_text
+
+@lru_cache(maxsize=1)
+def _get_executor() -> ThreadPoolExecutor:
+    """The worker threads shared by all `call_many` batches (LLM_CONCURRENCY of them)."""
+    return ThreadPoolExecutor(max_workers=config.LLM_CONCURRENCY, thread_name_prefix="ggw-llm")
+
+def call_many(requests: list[dict], timeout: float | None = None) -> list[str | None]:
+    """
+    Issues several independent `call_google_gemini_api` calls concurrently, each
+    given as a dict of its keyword arguments, and returns their responses in order.
+    A call that fails, or is still running when `timeout` seconds have passed,
+    yields None. `timeout` defaults to what is left of the command's LLM budget.
+    """
+    if timeout is None:
+        timeout = llm_scheduler.remaining()
+    if len(requests) == 1:
+        return [call_google_gemini_api(**requests[0])]
+    with instrumentation.span("llm.call_many", requests=len(requests)):
+        futures = [_get_executor().submit(call_google_gemini_api, **request) for request in requests]
+        done, not_done = wait(futures, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+        instrumentation.count("llm.deadline_exceeded")
+    results = []
+    for future in futures:
+        if future not in done or future.exception() is not None:
+            results.append(None)
+        else:
+            results.append(future.result())
+    return results
+
+def discard_cached_response(messages: list, model_name: str, response_schema: dict, backend: str | None = None):
+    """Drops a memoized response, e.g. because it failed schema validation."""
+    backend_name = llm_backend.get_backend(backend).name
+    model_name = llm_scheduler.route(messages, model_name, record=False)
+    with _response_cache_lock:
+        _response_cache.pop(_response_cache_key(messages, model_name, response_schema, backend_name), None)
+
+def clear_response_cache():
+    """Empties the in-process response cache."""
+    with _response_cache_lock:
+        _response_cache.clear()
+
+def _parse_items(raw_response: str, key: str, item_type, what: str) -> response_parser.ParsedList:
+    """Salvages the valid items of a response (see `response_parser`), warning about everything repaired or dropped."""
+    parsed = response_parser.parse_list(raw_response, key, item_type)
+    for problem in parsed.problems:
+        print(f"[WARN] AI response for {what}: {problem}")
+    if parsed.problems:
+        instrumentation.count("llm.repaired_responses")
+    return parsed
+
+def _context_files_messages(user_prompt: str, context_sources: list[dict]) -> list:
     system_prompt = "Your task is to select the most relevant context files for a new software development task."
     
     user_content = f"""
@@ -134,33 +221,94 @@ Available context files:
 {os.linesep.join([f'- File: {s["path"]}, Description: {s["summary"]}' for s in context_sources])}
 """
 
-    messages = [
+    return [
         {'role': 'model', 'parts': [system_prompt.strip()]},
         {'role': 'user', 'parts': [user_content.strip()]}
     ]
 
-    raw_response = call_google_gemini_api(
-        messages,
-        model_name=config.GEMINI_FAST_MODEL,
-        response_schema=RELEVANT_FILES_SCHEMA
+def get_relevant_context_files(user_prompt: str, context_sources: list[dict], mock: bool = False) -> list[str] | None:
+    """
+    Uses an AI model to select the most relevant context files for a given user prompt.
+    With `mock`, the offline stub backend answers instead of the configured one.
+    More than PREFILTER_SHARD_SIZE sources are split into shards that are sent
+    concurrently; the files selected in each are merged.
+    """
+    backend = "stub" if mock else None
+    shard_size = config.PREFILTER_SHARD_SIZE or len(context_sources) or 1
+    shards = [context_sources[i:i + shard_size] for i in range(0, len(context_sources), shard_size)] or [[]]
+    requests = [{
+        "messages": _context_files_messages(user_prompt, shard),
+        "model_name": config.GEMINI_FAST_MODEL,
+        "response_schema": RELEVANT_FILES_SCHEMA,
+        "backend": backend,
+    } for shard in shards]
+
+    relevant_files = None
+    for request, raw_response in zip(requests, call_many(requests)):
+        if raw_response is None:
+            continue
+        parsed = _parse_items(raw_response, "relevant_files", str, "context files")
+        if parsed.problems and not parsed.items:
+            print("[ERROR] Failed to validate the AI response for context files.")
+            discard_cached_response(request["messages"], config.GEMINI_FAST_MODEL, RELEVANT_FILES_SCHEMA, backend)
+            continue
+        relevant_files = list(dict.fromkeys((relevant_files or []) + parsed.items))
+    return relevant_files
+
+def _document_summaries_messages(documents: list[dict]) -> list:
+    system_prompt = (
+        "Summarize each document in one or two sentences (at most 40 words), naming the features, "
+        "user roles and decisions it covers. The summaries are used to decide which documents are "
+        "relevant to a new software development task. Return one summary per document, with its id."
     )
-    if raw_response is None:
-        return None
-
-    try:
-        validated_response = RelevantFiles.model_validate_json(raw_response)
-        return validated_response.relevant_files
-    except Exception as e:
-        print(f"[ERROR] Failed to validate the AI response for context files: {e}")
-        return None
-
-
-def generate_implementation_plan(user_prompt: str, context_content: str, existing_issues: list[dict], mock: bool = False) -> dict | None:
-    """Uses a powerful AI model to generate a structured implementation plan from a business perspective."""
-    if mock:
-        # This mock would need to be updated to return a JSON string matching the Pydantic schema
-        pass
+    user_content = "\n\n".join(
+        f"=== Document {d['id']} ===\n{d['content'][:config.SUMMARY_INPUT_CHARS]}" for d in documents
+    )
+    return [
+        {'role': 'model', 'parts': [system_prompt]},
+        {'role': 'user', 'parts': [user_content]}
+    ]
 
+def summarize_documents(documents: list[dict], mock: bool = False) -> dict[str, str]:
+    """
+    Uses the fast AI model to summarize documents, given as {"id", "content"} dicts.
+    They are sent SUMMARY_BATCH_SIZE per request, with the requests sent concurrently
+    within a budget scaled to their number.
+    Returns {id: summary}; documents of a failed request are missing from it.
+    With `mock`, the offline stub backend answers instead of the configured one.
+    """
+    backend = "stub" if mock else None
+    batch_size = max(config.SUMMARY_BATCH_SIZE, 1)
+    batches = [documents[i:i + batch_size] for i in range(0, len(documents), batch_size)]
+    requests = [{
+        "messages": _document_summaries_messages(batch),
+        "model_name": config.GEMINI_FAST_MODEL,
+        "response_schema": DOCUMENT_SUMMARIES_SCHEMA,
+        "backend": backend,
+    } for batch in batches]
+
+    with llm_scheduler.scaled_budget(len(requests)):
+        responses = call_many(requests)
+    summaries = {}
+    for request, raw_response in zip(requests, responses):
+        if raw_response is None:
+            continue
+        # Documents missing from the response are summarized again by the next refresh.
+        parsed = _parse_items(raw_response, "summaries", DocumentSummary, "document summaries")
+        if parsed.problems and not parsed.items:
+            print("[ERROR] Failed to validate the AI response for document summaries.")
+            discard_cached_response(request["messages"], config.GEMINI_FAST_MODEL, DOCUMENT_SUMMARIES_SCHEMA, backend)
+            continue
+        summaries.update({s.id: s.summary.strip() for s in parsed.items if s.summary.strip()})
+    return summaries
+
+
+def _plan_prefix_message(existing_issues: list[dict]) -> dict:
+    """
+    The static start of every planning prompt: the instructions and the existing
+    issues. Plans and their revisions share it, so the backend's prefix cache
+    (see LLM_PREFIX_CACHE_TTL) serves them all.
+    """
     existing_issues_str = "\n".join(
         f"- Title: \"{issue['title']}\", Labels: {issue['labels']}, State: \"{issue.get('state', 'unknown')}\"" for issue in existing_issues
     ) if existing_issues else "N/A"
@@ -207,6 +355,25 @@ Based on the "User Request", create a plan of user stories. Before you begin, ca
 Generate the business-functional user story map now.
 """
     
+    # The existing issues only change with the project, so they belong to the
+    # static prefix (with the instructions) that the backend can cache.
+    existing_issues_content = f"""
+**Already Existing Epics and Stories (Analyze these first!):**
+---
+{existing_issues_str}
+---
+"""
+
+    return {'role': 'model', 'parts': [system_prompt.strip(), existing_issues_content.strip()]}
+
+
+def generate_implementation_plan(user_prompt: str, context_content: str, existing_issues: list[dict], mock: bool = False) -> dict | None:
+    """
+    Uses a powerful AI model to generate a structured implementation plan from a business perspective.
+    With `mock`, the offline stub backend answers instead of the configured one.
+    """
+    backend = "stub" if mock else None
+
     user_content = f"""
 **User Request:** "{user_prompt}"
 
@@ -214,30 +381,143 @@ Generate the business-functional user story map now.
 ---
 {context_content}
 ---
-
-**Already Existing Epics and Stories (Analyze these first!):**
----
-{existing_issues_str}
----
 """
 
     messages = [
-        {'role': 'model', 'parts': [system_prompt.strip()]},
+        _plan_prefix_message(existing_issues),
         {'role': 'user', 'parts': [user_content.strip()]}
     ]
 
     raw_response = call_google_gemini_api(
         messages,
         model_name=config.GEMINI_SMART_MODEL,
-        response_schema=IMPLEMENTATION_PLAN_SCHEMA
+        response_schema=IMPLEMENTATION_PLAN_SCHEMA,
+        backend=backend,
+        prefix_messages=1
     )
     if raw_response is None:
         return None
 
+    parsed = _parse_items(raw_response, "proposed_issues", ProposedIssue, "the implementation plan")
+    issues = parsed.items
+    if parsed.problems:
+        # Epics first, as the plan rules require, also when one had to be requested again.
+        issues = sorted(issues + _request_missing_issues(messages, parsed, backend),
+                        key=lambda issue: "Type::Story" in issue.labels)
+    if parsed.problems and not issues:
+        print("[ERROR] Failed to validate the AI response for the implementation plan.")
+        discard_cached_response(messages, config.GEMINI_SMART_MODEL, IMPLEMENTATION_PLAN_SCHEMA, backend)
+        return None
+
+    # Return as a dictionary for compatibility with the rest of the system
+    return ImplementationPlan(proposed_issues=issues).model_dump(exclude_none=True)
+
+
+def _missing_issues_messages(messages: list, received: list[ProposedIssue], problems: list[str]) -> list:
+    received_str = "\n".join(f'- {issue.id}: "{issue.title}"' for issue in received) or "None"
+    problems_str = "\n".join(f"- {problem}" for problem in problems)
+    follow_up = f"""
+**Your previous response could not be used completely:**
+{problems_str}
+
+**These proposed issues were received correctly (do NOT repeat them):**
+{received_str}
+
+Return ONLY the proposed issues that are missing or were dropped, complete and following all the rules above. Keep their original ids.
+"""
+    return messages + [{'role': 'user', 'parts': [follow_up.strip()]}]
+
+def _request_missing_issues(messages: list, parsed: response_parser.ParsedList, backend: str | None) -> list[ProposedIssue]:
+    """
+    Asks the model, in the same conversation, for just the issues that were
+    missing from or invalid in its plan, instead of generating the plan again.
+    """
+    instrumentation.count("llm.follow_ups")
+    raw_response = call_google_gemini_api(
+        _missing_issues_messages(messages, parsed.items, parsed.problems),
+        model_name=config.GEMINI_SMART_MODEL,
+        response_schema=IMPLEMENTATION_PLAN_SCHEMA,
+        backend=backend,
+        prefix_messages=1
+    )
+    if raw_response is None:
+        return []
+    recovered = _parse_items(raw_response, "proposed_issues", ProposedIssue, "the missing issues")
+    known = {issue.id for issue in parsed.items} | {issue.title for issue in parsed.items}
+    return [issue for issue in recovered.items if issue.id not in known and issue.title not in known]
+
+
+def _apply_revision(issues: list[dict], changed: list[dict], removed: set[str]) -> list[dict]:
+    """
+    The plan `issues` with the `changed` issues replaced or added and the `removed`
+    ones dropped, also as blockers. Added issues are renamed to NEW_<id>, and so are
+    the blockers referring to them.
+    """
+    changed_by_id = {issue["id"]: issue for issue in changed}
+    revised = [changed_by_id.pop(issue["id"], issue) for issue in issues if issue["id"] not in removed]
+    renamed = {}  # Maps the id the model gave an added issue to its NEW_ id
+    for issue in changed_by_id.values():
+        # The uploader recognizes new issues by this prefix.
+        if not issue["id"].startswith("NEW_"):
+            renamed[issue["id"]] = f"NEW_{issue['id']}"
+            issue = {**issue, "id": renamed[issue["id"]]}
+        revised.append(issue)
+    for position, issue in enumerate(revised):
+        blockers = (issue.get("dependencies") or {}).get("is_blocked_by")
+        if blockers and (removed.intersection(blockers) or renamed.keys() & set(blockers)):
+            issue = {key: value for key, value in issue.items() if key != "dependencies"}
+            remaining = [renamed.get(b, b) for b in blockers if b not in removed]
+            revised[position] = {**issue, "dependencies": {"is_blocked_by": remaining}} if remaining else issue
+    return sorted(revised, key=lambda issue: "Type::Story" in issue["labels"])
+
+def revise_implementation_plan(proposed_issues: list[dict], feedback: str, existing_issues: list[dict],
+                               mock: bool = False) -> dict | None:
+    """
+    Revises a plan according to the user's feedback with one short smart-model
+    call. The prompt starts with the same static prefix as the plan itself, so
+    the backend's prefix cache is reused, followed only by the current plan and
+    the feedback (the context files are not sent again). The model returns just
+    the changed issues and the removed ids, which are applied locally.
+    Returns the revised plan, or None if the revision failed.
+    """
+    backend = "stub" if mock else None
+    current_plan = json.dumps(proposed_issues, separators=(",", ":"), ensure_ascii=False)
+    user_content = f"""
+**Current Plan:**
+{current_plan}
+
+**Requested Changes:** "{feedback}"
+
+Revise the plan following all the rules above. Return ONLY the issues you add or change, complete, in "proposed_issues" (changed issues keep their id, new issues get new ids starting with NEW_), and the ids of the issues to drop in "removed_issue_ids".
+"""
+    messages = [
+        _plan_prefix_message(existing_issues),
+        {'role': 'user', 'parts': [user_content.strip()]}
+    ]
+
+    with instrumentation.span("llm.revise_plan"):
+        raw_response = call_google_gemini_api(
+            messages,
+            model_name=config.GEMINI_SMART_MODEL,
+            response_schema=PLAN_REVISION_SCHEMA,
+            backend=backend,
+            prefix_messages=1
+        )
+    if raw_response is None:
+        return None
+
+    parsed = _parse_items(raw_response, "proposed_issues", ProposedIssue, "the plan revision")
     try:
-        validated_plan = ImplementationPlan.model_validate_json(raw_response)
-        # Return as a dictionary for compatibility with the rest of the system
-        return validated_plan.model_dump(exclude_none=True)
-    except Exception as e:
-        print(f"[ERROR] Failed to validate the AI response for the implementation plan: {e}")
+        data, _ = response_parser.loads(raw_response)
+        removed = data.get("removed_issue_ids") if isinstance(data, dict) else None
+    except ValueError:
+        removed = None
+    if not isinstance(removed, list):
+        removed = []
+    if parsed.problems and not parsed.items and not removed:
+        print("[ERROR] Failed to validate the AI response for the plan revision.")
+        discard_cached_response(messages, config.GEMINI_SMART_MODEL, PLAN_REVISION_SCHEMA, backend)
         return None
+
+    changed = [issue.model_dump(exclude_none=True) for issue in parsed.items]
+    return {"proposed_issues": _apply_revision(proposed_issues, changed, {str(r) for r in removed})}
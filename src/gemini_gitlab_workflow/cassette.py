@@ -0,0 +1,288 @@
+"""
+Record/replay of GitLab and LLM traffic.
+
+While recording, every HTTP exchange made through the python-gitlab session and
+every LLM backend call is captured into a gzip-compressed JSON cassette. Project
+identifiers (GitLab URL, project ID, group), people's names and email addresses
+are anonymized with `Sanitizer`, paths under the project root are stored relative
+to it, and request headers, including the private token, are never stored.
+
+Replaying serves the same traffic back without touching GitLab or Gemini, either
+at full speed or with the recorded timings, so a real session can be re-run
+locally as a reproducible performance fixture:
+
+    ggw --record session.cassette.gz create-feature "..."
+    ggw --replay session.cassette.gz --replay-timing recorded create-feature "..."
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from gemini_gitlab_workflow import ai_service, config, gitlab_client, llm_backend
+from gemini_gitlab_workflow.sanitizer import Sanitizer
+
+CASSETTE_VERSION = 2
+
+# Stands for config.PROJECT_ROOT, so that a cassette replays from another checkout.
+ROOT_PLACEHOLDER = "[PROJECT_ROOT]"
+
+# Response headers kept in the cassette; python-gitlab needs the pagination and
+# rate-limit ones, everything else is noise (or sensitive).
+RECORDED_HEADERS = (
+    "Content-Type", "Link", "X-Page", "X-Per-Page", "X-Next-Page", "X-Prev-Page", "X-Total", "X-Total-Pages",
+    "RateLimit-Limit", "RateLimit-Observed", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After",
+)
+
+
+class CassetteMiss(LookupError):
+    """Raised when a replayed session makes a request the cassette does not contain."""
+
+
+def _normalize_url(url: str) -> str:
+    """Sorts query parameters so equivalent requests produce the same key."""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def _relative_to_root(text: str) -> str:
+    """Replaces the project root (as given and resolved) with ROOT_PLACEHOLDER."""
+    if not text:
+        return text
+    roots = {str(config.PROJECT_ROOT), str(config.PROJECT_ROOT.resolve())}
+    for root in sorted(roots, key=len, reverse=True):
+        if root != os.sep:
+            text = text.replace(root, ROOT_PLACEHOLDER)
+    return text
+
+
+def _body_text(body) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        return body.decode("utf-8", errors="replace")
+    return str(body)
+
+
+class Cassette:
+    """An ordered list of recorded interactions plus the sanitizer used for them."""
+
+    def __init__(self, interactions: list[dict] | None = None, sanitizer: Sanitizer | None = None):
+        self.interactions = interactions or []
+        # Names and emails get value-derived placeholders: requests still produce the same
+        # keys on replay, but values first seen in a response stay anonymized.
+        self.sanitizer = sanitizer or Sanitizer(entities=["url", "project_id", "group", "names", "emails"])
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    # --- Persistence ---
+
+    @classmethod
+    def load(cls, path) -> "Cassette":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version {data.get('version')!r} in {path}.")
+        return cls(data["interactions"])
+
+    def save(self, path):
+        data = {
+            "version": CASSETTE_VERSION,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "interactions": self.interactions,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    # --- Anonymization ---
+
+    def anonymize(self, text: str) -> str:
+        return self.sanitizer.anonymize_text(_relative_to_root(text))
+
+    def deanonymize(self, text: str) -> str:
+        return self.sanitizer.deanonymize_text(text).replace(ROOT_PLACEHOLDER, str(config.PROJECT_ROOT))
+
+    # --- Keys ---
+
+    def http_key(self, method: str, url: str, body) -> str:
+        anonymized = self.anonymize(f"{method.upper()} {_normalize_url(url)}\n{_body_text(body)}")
+        return hashlib.sha256(anonymized.encode("utf-8")).hexdigest()
+
+    def llm_key(self, backend_name: str, model_name: str, messages: list, response_schema: dict) -> str:
+        payload = json.dumps([backend_name, model_name, messages, response_schema], sort_keys=True, default=str)
+        return hashlib.sha256(self.anonymize(payload).encode("utf-8")).hexdigest()
+
+    def add(self, interaction: dict):
+        interaction["offset"] = round(time.perf_counter() - self._started, 6)
+        with self._lock:
+            self.interactions.append(interaction)
+
+
+# --- GitLab (HTTP) ---
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter that performs requests normally and records them."""
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        content = response.content
+        anonymize = self.cassette.anonymize
+        self.cassette.add({
+            "kind": "http",
+            "key": self.cassette.http_key(request.method, request.url, request.body),
+            "method": request.method,
+            "url": anonymize(request.url),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {h: anonymize(response.headers[h]) for h in RECORDED_HEADERS if h in response.headers},
+            "body": anonymize(content.decode("utf-8", errors="replace")),
+            "duration": round(time.perf_counter() - start, 6),
+        })
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    Transport adapter answering from a cassette. Identical requests are served in
+    recorded order; once exhausted, GETs keep returning the last recorded answer.
+    """
+
+    def __init__(self, cassette: Cassette, realtime: bool = False):
+        super().__init__()
+        self.cassette = cassette
+        self.realtime = realtime
+        self._queues: dict[str, deque] = defaultdict(deque)
+        self._last: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        for interaction in cassette.interactions:
+            if interaction["kind"] == "http":
+                self._queues[interaction["key"]].append(interaction)
+
+    def send(self, request, **kwargs):
+        key = self.cassette.http_key(request.method, request.url, request.body)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                interaction = self._last[key] = queue.popleft()
+            elif request.method == "GET" and key in self._last:
+                interaction = self._last[key]
+            else:
+                raise CassetteMiss(f"No recorded response for {request.method} {request.url}")
+        if self.realtime:
+            time.sleep(interaction["duration"])
+
+        deanonymize = self.cassette.deanonymize
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction.get("reason")
+        response.headers = CaseInsensitiveDict({k: deanonymize(v) for k, v in interaction["headers"].items()})
+        response._content = deanonymize(interaction["body"]).encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(seconds=interaction["duration"])
+        return response
+
+
+# --- LLM ---
+
+class RecordingBackend(llm_backend.LLMBackend):
+    """Wraps a backend and records its responses."""
+
+    def __init__(self, inner: llm_backend.LLMBackend, cassette: Cassette):
+        self.inner = inner
+        self.name = inner.name
+        self.cassette = cassette
+
+    def generate(self, messages: list, model_name: str, response_schema: dict, prefix_messages: int = 0) -> str | None:
+        start = time.perf_counter()
+        text = self.inner.generate(messages, model_name, response_schema, prefix_messages)
+        self.cassette.add({
+            "kind": "llm",
+            "key": self.cassette.llm_key(self.name, model_name, messages, response_schema),
+            "backend": self.name,
+            "model": model_name,
+            "response": None if text is None else self.cassette.anonymize(text),
+            "duration": round(time.perf_counter() - start, 6),
+        })
+        return text
+
+    def warm_up(self):
+        self.inner.warm_up()
+
+
+class ReplayBackend(llm_backend.LLMBackend):
+    """Answers LLM calls from a cassette, in recorded order per identical request."""
+
+    def __init__(self, name: str, cassette: Cassette, realtime: bool = False):
+        self.name = name
+        self.cassette = cassette
+        self.realtime = realtime
+        self._queues: dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        for interaction in cassette.interactions:
+            if interaction["kind"] == "llm":
+                self._queues[interaction["key"]].append(interaction)
+
+    def generate(self, messages: list, model_name: str, response_schema: dict, prefix_messages: int = 0) -> str | None:
+        key = self.cassette.llm_key(self.name, model_name, messages, response_schema)
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded {self.name} response for a {model_name} request")
+            interaction = queue.popleft()
+        if self.realtime:
+            time.sleep(interaction["duration"])
+        response = interaction["response"]
+        return None if response is None else self.cassette.deanonymize(response)
+
+
+# --- Sessions ---
+
+class _Session:
+    """An active recording or replay, undone by `stop()`."""
+
+    def __init__(self, cassette: Cassette, path=None):
+        self.cassette = cassette
+        self.path = path
+
+    def stop(self):
+        gitlab_client.set_transport_adapter(None)
+        llm_backend.set_backend_wrapper(None)
+        if self.path:
+            self.cassette.save(self.path)
+
+
+def start_recording(path) -> _Session:
+    """Records GitLab and LLM traffic until `stop()` is called on the returned session, then writes it to `path`."""
+    cassette = Cassette()
+    # Memoized responses would bypass the backend and never reach the cassette.
+    ai_service.clear_response_cache()
+    gitlab_client.set_transport_adapter(RecordingAdapter(cassette))
+    llm_backend.set_backend_wrapper(lambda backend: RecordingBackend(backend, cassette))
+    return _Session(cassette, path)
+
+
+def start_replay(path, realtime: bool = False) -> _Session:
+    """Serves GitLab and LLM traffic from the cassette at `path` until `stop()` is called."""
+    cassette = Cassette.load(path)
+    ai_service.clear_response_cache()
+    gitlab_client.set_transport_adapter(ReplayAdapter(cassette, realtime=realtime))
+    llm_backend.set_backend_wrapper(lambda backend: ReplayBackend(backend.name, cassette, realtime=realtime))
+    return _Session(cassette)
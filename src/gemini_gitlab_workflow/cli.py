@@ -1,27 +1,112 @@
+from __future__ import annotations
+
 from dotenv import load_dotenv
 load_dotenv()
 
 import typer
-import yaml
 import os
+import sys
 import glob
-from gemini_gitlab_workflow import gitlab_service, ai_service, file_system_repo
+import json
+from typing import TYPE_CHECKING
 from gemini_gitlab_workflow.sanitizer import Sanitizer
-from rich.console import Console
-from rich.pretty import pprint
 import re
-from gemini_gitlab_workflow import config
+from gemini_gitlab_workflow import config, instrumentation
 import unicodedata
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Heavy dependencies (rich, yaml, python-gitlab, google-generativeai, pydantic,
+# ruamel) are imported inside the commands that need them so that `ggw --help`,
+# `ggw init` and shell completion start instantly.
+if TYPE_CHECKING:
+    from rich.console import Console
 
 app = typer.Typer()
 sanitizer = Sanitizer() # Instantiate the sanitizer globally or pass it around
 
+# Number of threads used to read the AI-selected context files.
+CONTEXT_READ_WORKERS = 8
+
+@app.callback()
+def configure_run(
+    ctx: typer.Context,
+    profile: bool = typer.Option(False, "--profile", help="Print a per-stage timing and counter summary after the command."),
+    trace: Path = typer.Option(None, "--trace", help="Write a Chrome trace (chrome://tracing, Perfetto) of the command to this file."),
+    cprofile: Path = typer.Option(None, "--cprofile", help="Write cProfile statistics of the command's main thread to this file."),
+    record: Path = typer.Option(None, "--record", help="Record all GitLab and Gemini traffic of the command to this cassette file."),
+    replay: Path = typer.Option(None, "--replay", help="Serve GitLab and Gemini traffic from this cassette file instead of the network."),
+    replay_timing: str = typer.Option("fast", "--replay-timing", help="With --replay: 'fast' or 'recorded' (sleep for the recorded durations)."),
+):
+    """
+    Synchronize GitLab issues, plan features with Gemini and upload story maps.
+    """
+    if record and replay:
+        raise typer.BadParameter("--record and --replay cannot be combined.")
+    if replay_timing not in ("fast", "recorded"):
+        raise typer.BadParameter("--replay-timing must be 'fast' or 'recorded'.")
+    cassette_session = None
+    if record or replay:
+        from gemini_gitlab_workflow import cassette
+        if record:
+            cassette_session = cassette.start_recording(record)
+        else:
+            try:
+                cassette_session = cassette.start_replay(replay, realtime=replay_timing == "recorded")
+            except (OSError, ValueError) as e:
+                print(f"Error: could not load cassette '{replay}': {e}")
+                raise typer.Exit(1)
+
+    instrumentation.recorder.reset(enabled=bool(profile or trace))
+    from gemini_gitlab_workflow import llm_scheduler
+    ctx.with_resource(llm_scheduler.budget())
+    profiler = None
+    if cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def report():
+        if cassette_session:
+            cassette_session.stop()
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(cprofile)
+        if trace:
+            instrumentation.recorder.write_chrome_trace(trace)
+        if profile:
+            _print_profile_summary()
+        instrumentation.recorder.reset()
+
+    ctx.call_on_close(report)
+
+def _print_profile_summary():
+    """Prints the recorded spans and counters as tables."""
+    from rich.console import Console
+    from rich.table import Table
+
+    console = Console()
+    spans = Table(title="Profile: stages")
+    for column in ("Stage", "Calls", "Total (ms)", "Mean (ms)", "Max (ms)"):
+        spans.add_column(column, justify="left" if column == "Stage" else "right")
+    for row in instrumentation.recorder.summary():
+        spans.add_row(row["name"], str(row["calls"]), f"{row['total'] * 1000:.1f}",
+                      f"{row['mean'] * 1000:.1f}", f"{row['max'] * 1000:.1f}")
+    console.print(spans)
+
+    counters = Table(title="Profile: counters")
+    counters.add_column("Counter")
+    counters.add_column("Value", justify="right")
+    for name, value in sorted(instrumentation.recorder.counters.items()):
+        counters.add_row(name, str(value))
+    console.print(counters)
+
 @app.command()
 def init():
     """
     Initializes the current directory for use with ggw by creating a .env file.
     """
+    from rich.console import Console
     console = Console()
     env_path = config.PROJECT_ROOT / ".env"
 
@@ -43,6 +128,13 @@ GEMINI_WORKER_API_KEY=""
 
 # Optional: Specify the GitLab Board ID for automatic story reordering.
 # GGW_GITLAB_BOARD_ID=""
+
+# Optional: Secret token of the GitLab webhook served by `ggw webhook serve`.
+# GGW_WEBHOOK_SECRET=""
+
+# Optional: Sync a whole group and/or several projects into one map.
+# GGW_GITLAB_GROUP_ID=""
+# GGW_GITLAB_PROJECT_IDS=""
 """
     try:
         with open(env_path, "w") as f:
@@ -54,37 +146,54 @@ GEMINI_WORKER_API_KEY=""
         raise typer.Exit(1)
 
 def _get_context_from_docs() -> list[dict]:
-    """Gathers context from all markdown files in the docs directory."""
+    """
+    Gathers context from all markdown files in the docs directory. A file is
+    described by its cached AI summary (see `ggw sync summaries`), or else its first line.
+    """
+    from gemini_gitlab_workflow import summary_cache
+    summaries = summary_cache.load()
     sources = []
     for filepath in glob.glob(f"{config.DOCS_DIR}/**/*.md", recursive=True):
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                summary = f.readline().strip().replace('#', '').strip()
+            summary = summaries.summary(filepath)
+            if summary is None:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    summary = f.readline().strip().replace('#', '').strip()
             sources.append({"path": filepath, "summary": summary})
         except Exception:
             continue
     return sources
 
-def _get_context_from_project_map() -> list[dict]:
+
+# Node ids of a multi-project map: "group/app#12"
+_QUALIFIED_ID_RE = re.compile(r"^\S+#\d+$")
+
+
+def _get_context_from_project_map(project_map: dict | None = None) -> list[dict]:
     """
-    Gathers context from the project_map.yaml file, including only issues
-    that have a real, numeric GitLab IID.
+    Gathers context from the project map, including only issues
+    that exist on GitLab: those with a numeric IID, or a project-qualified
+    one ("group/app#12") in a multi-project map. Reads project_map.yaml
+    when no in-memory map is given. An issue is described by the cached
+    AI summary of its file, or else its title.
     """
+    from gemini_gitlab_workflow import file_system_repo, summary_cache
+    summaries = summary_cache.load()
     sources = []
-    if not os.path.exists(config.PROJECT_MAP_PATH):
+    if project_map is None:
+        project_map = file_system_repo.read_project_map()
+    if not project_map:
         return sources
     
-    with open(config.PROJECT_MAP_PATH, 'r') as f:
-        project_map = yaml.safe_load(f)
-    
     for node in project_map.get("nodes", []):
-        # Only include nodes that have a numeric IID (i.e., they exist on GitLab)
-        if isinstance(node.get("id"), int):
-            summary = node.get("title", "No title")
+        # Only include nodes that have a numeric or qualified IID (i.e., they exist on GitLab)
+        node_id = node.get("id")
+        if isinstance(node_id, int) or (isinstance(node_id, str) and _QUALIFIED_ID_RE.match(node_id)):
             relative_path = node.get("local_path")
             if relative_path:
                 # Always construct an absolute path
-                path = config.DATA_DIR / relative_path
+                path = Path(config.DATA_DIR) / relative_path
+                summary = summaries.summary(path) or node.get("title", "No title")
                 sources.append({"path": path, "summary": summary})
         
     return sources
@@ -100,81 +209,184 @@ def _slugify(text):
 
 # ... (rest of _get_context functions)
 
-def _generate_local_files(plan: dict, console: Console):
+def _narrow_sources(feature_description: str, sources: list[dict], index=None) -> list[dict]:
+    """
+    Keeps the PREFILTER_MAX_SOURCES sources that best match the feature
+    description in the local search index, in their original order otherwise.
+    Lists at or below the limit are returned unchanged. An already loaded
+    `index` can be passed to avoid checking the files again.
+    """
+    if len(sources) <= config.PREFILTER_MAX_SOURCES:
+        return sources
+    from gemini_gitlab_workflow import search_index
+
+    with instrumentation.span("feature.narrow_sources", sources=len(sources)):
+        scores = (index or search_index.load_search_index()).scores(feature_description)
+        ranked = sorted(sources, key=lambda s: -scores.get(os.path.normpath(os.path.abspath(str(s["path"]))), 0.0))
+    return ranked[:config.PREFILTER_MAX_SOURCES]
+
+
+def _remap_temp_ids(proposed_issues: list[dict], graph, console: Console) -> list[dict]:
+    """
+    Gives a fresh NEW_<n> id to every proposed issue whose temp id is already
+    in the map (e.g. a pending issue of an earlier plan) or repeated in the
+    plan. References to a remapped id in the plan's dependencies follow it;
+    those to a repeated id keep pointing to its first issue.
+    """
+    used = {node["id"] for node in graph.nodes()} | {issue["id"] for issue in proposed_issues}
+    counter = 0
+
+    def fresh_id() -> str:
+        nonlocal counter
+        while True:
+            counter += 1
+            if f"NEW_{counter}" not in used:
+                used.add(f"NEW_{counter}")
+                return f"NEW_{counter}"
+
+    renamed, seen, remapped = {}, set(), []
+    for issue in proposed_issues:
+        temp_id = issue["id"]
+        if temp_id in graph or temp_id in seen:
+            new_id = fresh_id()
+            console.print(f"[yellow]Warning: Temporary id '{temp_id}' is already in use. Using '{new_id}' for '{issue.get('title')}'.[/yellow]")
+            if temp_id not in seen:
+                renamed[temp_id] = new_id
+            issue = {**issue, "id": new_id}
+        seen.add(temp_id)
+        remapped.append(issue)
+    if not renamed:
+        return remapped
+
+    def rename(refs):
+        if isinstance(refs, list):
+            return [renamed.get(ref, ref) if isinstance(ref, str) else ref for ref in refs]
+        return renamed.get(refs, refs) if isinstance(refs, str) else refs
+
+    for position, issue in enumerate(remapped):
+        dependencies = issue.get("dependencies")
+        if dependencies:
+            remapped[position] = {**issue, "dependencies": {key: rename(refs) for key, refs in dependencies.items()}}
+    return remapped
+
+
+def _generate_local_files(plan: dict, console: Console, project_map: dict | None = None):
     """
     Generates local .md files and updates project_map.yaml based on the AI plan.
     This function uses a two-pass approach to correctly place new stories
     under their corresponding new epics and create the 'contains' link.
+    An in-memory `project_map` from the sync step is reused when given.
     """
+    import yaml
+    from gemini_gitlab_workflow import duplicates, file_system_repo, search_index
+    from gemini_gitlab_workflow.project_graph import ProjectGraph
+
     console.print("\n[bold green]Plan approved. Generating local files...[/bold green]")
     
-    if not os.path.exists(config.PROJECT_MAP_PATH):
-        project_map = {"nodes": [], "links": []}
-    else:
-        with open(config.PROJECT_MAP_PATH, 'r') as f:
-            project_map = yaml.safe_load(f)
-
-    existing_titles = {node['title']: node['id'] for node in project_map.get("nodes", [])}
-    new_nodes, new_links, skipped_count = [], [], 0
+    if project_map is None:
+        project_map = file_system_repo.read_project_map()
+    graph = ProjectGraph.from_map(project_map or None)
+    new_nodes_count, new_links_count, skipped_count = 0, 0, 0
     
     proposed_issues = plan.get("proposed_issues", [])
     if not proposed_issues:
         console.print("[yellow]Warning: No new issues proposed in the plan.[/yellow]")
         return
+    proposed_issues = _remap_temp_ids(proposed_issues, graph, console)
+    proposed_ids = {p_issue["id"] for p_issue in proposed_issues}
+    pending_files = []  # (path, content) of the new issue files
 
-    # --- Pass 1: Map out all epics (new and existing) ---
-    existing_epic_map = {} # Maps 'Epic::<name>' to a dict with {'path': ..., 'id': ...}
-    for node in project_map.get("nodes", []):
-        labels = node.get("labels", [])
-        if "Type::Epic" in labels:
-            epic_title = node.get("title")
-            epic_label = f"Epic::{epic_title}"
-            existing_epic_map[epic_label] = {
-                "path": Path(os.path.dirname(config.DATA_DIR / node.get("local_path"))),
-                "id": node.get("id")
-            }
+    # Near-duplicates of synced or earlier proposed issues are skipped; links to them go to the issue they duplicate.
+    near_duplicates = {}
+    aliases = {}  # Maps the id of a skipped near-duplicate to the id of the issue it duplicates
+    if config.DUPLICATE_THRESHOLD > 0:
+        proposed_by_id = {p_issue["id"]: p_issue for p_issue in proposed_issues}
+
+        def _is_epic(issue: dict | None) -> bool:
+            return "Type::Epic" in ((issue or {}).get("labels") or [])
 
+        with instrumentation.span("feature.find_duplicates", issues=len(proposed_issues)):
+            for duplicate in duplicates.find_duplicates(proposed_issues, search_index.load_search_index()):
+                if duplicate["existing"]:
+                    target_id = graph.id_for_title(duplicate["duplicate_title"]) or graph.resolve(duplicate["duplicate_of"])
+                else:
+                    target_id = aliases.get(duplicate["duplicate_of"], duplicate["duplicate_of"])
+                # An epic is only replaced by an epic; its stories cannot go under a story.
+                if _is_epic(proposed_by_id[duplicate["id"]]) and not _is_epic(proposed_by_id.get(target_id) or graph.node(target_id)):
+                    continue
+                if target_id is not None:
+                    near_duplicates[duplicate["id"]] = duplicate
+                    aliases[duplicate["id"]] = target_id
+
+    def _epic_node_info(epic_node: dict | None) -> dict | None:
+        if not epic_node or not epic_node.get("local_path"):
+            return None
+        # Paths in the map are relative to DATA_DIR; keep them that way.
+        return {"path": Path(epic_node["local_path"]).parent, "id": epic_node["id"]}
+
+    def _existing_epic_info(epic_label: str) -> dict | None:
+        return _epic_node_info(graph.epic_for_label(epic_label))
+
+    # --- Pass 1: Map out the new epics (existing ones are looked up in the graph) ---
     new_epic_map = {} # Maps 'Epic::<name>' label to a dict with {'path': ..., 'id': ...}
+    duplicate_epic_labels = {}  # Maps the label of a near-duplicate epic to the id of the epic it duplicates
     for issue in proposed_issues:
         labels = issue.get("labels", [])
         if "Type::Epic" in labels:
+            temp_epic_label = next((l for l in labels if l.startswith("Epic::")), None)
+            if issue["id"] in aliases:
+                if temp_epic_label:
+                    duplicate_epic_labels[temp_epic_label] = aliases[issue["id"]]
+                continue
             epic_dir_path_str = file_system_repo.get_issue_filepath(issue.get("title"), labels)
             if epic_dir_path_str:
-                temp_epic_label = next((l for l in labels if l.startswith("Epic::")), None)
                 if temp_epic_label:
                     new_epic_map[temp_epic_label] = {
                         "path": Path(os.path.dirname(epic_dir_path_str)),
                         "id": issue["id"]
                     }
+    # Stories of a near-duplicate epic go under the epic it duplicates.
+    for temp_epic_label, epic_id in duplicate_epic_labels.items():
+        epic_info = next((info for info in new_epic_map.values() if info["id"] == epic_id), None)
+        epic_info = epic_info or _epic_node_info(graph.node(epic_id))
+        if epic_info and temp_epic_label not in new_epic_map:
+            new_epic_map[temp_epic_label] = epic_info
+
+    def add_link(source, target, link_type):
+        nonlocal new_links_count
+        if graph.add_link(source, target, link_type):
+            new_links_count += 1
 
     # --- Pass 2: Generate all files, creating 'contains' and 'blocks' links ---
     for issue in proposed_issues:
         title = issue["title"]
-        if title in existing_titles:
+        if graph.id_for_title(title) is not None:
             console.print(f"[yellow]Warning: Issue '{title}' already exists. Skipping.[/yellow]")
             skipped_count += 1
             continue
+        if issue["id"] in near_duplicates:
+            duplicate = near_duplicates[issue["id"]]
+            console.print(f"[yellow]Warning: Issue '{title}' looks like a duplicate of '{duplicate['duplicate_title']}' "
+                          f"(similarity {duplicate['score']:.2f}). Skipping.[/yellow]")
+            skipped_count += 1
+            continue
 
         temp_id = issue["id"]
         labels = issue.get("labels", [])
         relative_filepath = None
+        parent_epic_id = None
 
-        # If it's a story, try to find its parent epic's path and ID from our maps
+        # If it's a story, try to find its parent epic's path and ID
         if "Type::Story" in labels:
             temp_epic_label = next((l for l in labels if l.startswith("Epic::")), None)
             parent_epic_info = None
             if temp_epic_label:
-                if temp_epic_label in new_epic_map:
-                    parent_epic_info = new_epic_map[temp_epic_label]
-                elif temp_epic_label in existing_epic_map:
-                    parent_epic_info = existing_epic_map[temp_epic_label]
+                parent_epic_info = new_epic_map.get(temp_epic_label) or _existing_epic_info(temp_epic_label)
 
             if parent_epic_info:
-                parent_epic_path = parent_epic_info["path"]
                 parent_epic_id = parent_epic_info["id"]
                 story_filename = f"story-{_slugify(title)}.md"
-                relative_filepath = parent_epic_path / story_filename
-                new_links.append({"source": parent_epic_id, "target": temp_id, "type": "contains"})
+                relative_filepath = parent_epic_info["path"] / story_filename
 
         # If path wasn't determined above, use the default logic
         if not relative_filepath:
@@ -185,16 +397,15 @@ def _generate_local_files(plan: dict, console: Console):
         if not relative_filepath: # Fallback for unassigned items
             relative_filepath = Path("_unassigned") / f"{_slugify(title)}.md"
 
-        # Create file and node
+        # Render the file (written with all the others at the end) and create the node
         frontmatter = {"iid": temp_id, "title": title, "state": "opened", "labels": labels}
         markdown_content = f"---\n{yaml.dump(frontmatter, sort_keys=False)}---\n\n{issue.get('description', '')}\n"
-        full_filepath = config.DATA_DIR / relative_filepath
-        full_filepath.parent.mkdir(parents=True, exist_ok=True)
-        with open(full_filepath, 'w', encoding='utf-8') as f: f.write(markdown_content)
-        console.print(f"  - Created file: {full_filepath}")
+        pending_files.append((Path(config.DATA_DIR) / relative_filepath, markdown_content))
 
-        new_node = {"id": temp_id, "title": title, "type": "Issue", "state": "opened", "labels": labels, "local_path": str(relative_filepath)}
-        new_nodes.append(new_node)
+        graph.add_node({"id": temp_id, "title": title, "type": "Issue", "state": "opened", "labels": labels, "local_path": str(relative_filepath)})
+        new_nodes_count += 1
+        if parent_epic_id is not None:
+            add_link(parent_epic_id, temp_id, "contains")
         
         # Handle dependencies
         dependencies = issue.get("dependencies", {})
@@ -208,18 +419,21 @@ def _generate_local_files(plan: dict, console: Console):
 
         def resolve_and_add_link(source, target_ref, link_type):
             target_id = None
-            # Check if target is another new issue by its temp ID
-            if any(p_issue['id'] == target_ref for p_issue in proposed_issues):
+            source = aliases.get(source, source)
+            # Check if target is a skipped near-duplicate, or another new issue by its temp ID
+            if target_ref in aliases:
+                target_id = aliases[target_ref]
+            elif target_ref in proposed_ids:
                 target_id = target_ref
             # Check if target is an existing issue by its title
-            elif target_ref in existing_titles:
-                target_id = existing_titles[target_ref]
+            elif graph.id_for_title(target_ref) is not None:
+                target_id = graph.id_for_title(target_ref)
             
             if target_id:
                 # Ensure IDs are converted to integers if they are numeric
                 source_val = _to_int_if_possible(source)
                 target_val = _to_int_if_possible(target_id)
-                new_links.append({"source": source_val, "target": target_val, "type": link_type})
+                add_link(source_val, target_val, link_type)
             else:
                 console.print(f"[yellow]Warning: Could not resolve dependency '{target_ref}'. Link not created.[/yellow]")
 
@@ -240,49 +454,334 @@ def _generate_local_files(plan: dict, console: Console):
         console.print("[bold yellow]All proposed issues already exist. No changes made.[/bold yellow]")
         return
 
-    project_map["nodes"].extend(new_nodes)
-    if "links" not in project_map: project_map["links"] = []
-    project_map["links"].extend(new_links)
+    _write_files(pending_files)
+    for full_filepath, _ in pending_files:
+        console.print(f"  - Created file: {full_filepath}")
+    file_system_repo.write_project_map(graph.project_map)
+    console.print(f"[green]✓ Project map updated with {new_nodes_count} new issues and {new_links_count} new links.[/green]")
+
+
+def _write_files(files: list[tuple[Path, str]]):
+    """
+    Writes all `files` or none of them: each is written to a temporary file
+    first, and they are only moved into place once all were written.
+    """
+    temp_paths = []
+    try:
+        for path, content in files:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f".{path.name}.tmp")
+            temp_paths.append(temp_path)
+            temp_path.write_text(content, encoding="utf-8")
+    except BaseException:
+        for temp_path in temp_paths:
+            temp_path.unlink(missing_ok=True)
+        raise
+    for (path, _), temp_path in zip(files, temp_paths):
+        os.replace(temp_path, path)
+
+
+def _read_context_file(file_path_str: str, console: Console) -> str | None:
+    """
+    Reads a single context file returned by the AI, resolving it against the
+    project root. Returns the formatted content block, or None if skipped.
+    """
+    # --- Robust Path Resolution (v3 using pathlib) ---
+    file_path = Path(file_path_str)
+
+    # If the path is not absolute, resolve it relative to the project root.
+    if not file_path.is_absolute():
+        absolute_path = config.PROJECT_ROOT / file_path
+    else:
+        absolute_path = file_path
+
+    # Security check: ensure the final path is within the project directory.
+    try:
+        safe_path = absolute_path.resolve(strict=True)
+        if not safe_path.is_relative_to(config.PROJECT_ROOT.resolve(strict=True)):
+            console.print(f"[yellow]Warning: Skipping file outside project directory: {file_path_str}[/yellow]")
+            return None
+    except (FileNotFoundError, RuntimeError): # RuntimeError for symlink loops
+        console.print(f"[yellow]Warning: Skipping invalid or non-existent file path: {file_path_str}[/yellow]")
+        return None
+
+    try:
+        with open(safe_path, 'r', encoding='utf-8') as f:
+            # Use the original file_path for the log message for consistency
+            return f"---\nFile: {file_path_str}\nContent: {f.read()}\n---"
+    except FileNotFoundError:
+        # Use the original file_path in the warning message
+        console.print(f"[yellow]Warning: Could not find file {file_path_str}. Skipping.[/yellow]")
+    except Exception as e:
+        console.print(f"[yellow]Warning: Could not read file {file_path_str} due to {e}. Skipping.[/yellow]")
+    return None
+
+def _read_context_files(file_paths: list[str], console: Console) -> str:
+    """Reads the selected context files concurrently, preserving the AI's ordering."""
+    with ThreadPoolExecutor(max_workers=CONTEXT_READ_WORKERS) as executor:
+        contents = executor.map(lambda path: _read_context_file(path, console), file_paths)
+        return "\n".join(content for content in contents if content is not None)
 
-    with open(config.PROJECT_MAP_PATH, 'w') as f: yaml.dump(project_map, f, sort_keys=False)
-    console.print(f"[green]✓ Project map updated with {len(new_nodes)} new issues and {len(new_links)} new links.[/green]")
+def _existing_issues_context(project_map: dict) -> list[dict]:
+    """The existing issues (title and labels) that help the AI avoid duplicates and reuse epics."""
+    return [
+        {"title": node.get("title", ""), "labels": node.get("labels", []), "state": node.get("state")}
+        for node in project_map.get("nodes", [])
+    ]
+
+
+def _plan_feature(feature_description: str, context_content: str, project_map: dict, mock_ai: bool) -> dict | None:
+    """
+    Asks the smart model for the implementation plan of one feature. What is sent
+    is anonymized, and the proposed issues that come back are restored.
+    """
+    from gemini_gitlab_workflow import ai_service
+
+    existing_issues_context = _existing_issues_context(project_map)
+
+    # Anonymize context before sending to AI
+    anonymized_feature_description, anonymized_context_content, anonymized_existing_issues = sanitizer.anonymize(
+        [feature_description, context_content, existing_issues_context]
+    )
+
+    with instrumentation.span("feature.plan"):
+        plan = ai_service.generate_implementation_plan(
+            anonymized_feature_description, anonymized_context_content, anonymized_existing_issues, mock_ai
+        )
+
+    # Deanonymize the response from AI
+    if plan and plan.get("proposed_issues"):
+        plan["proposed_issues"] = sanitizer.deanonymize(plan["proposed_issues"])
+    return plan
+
+
+def _revise_plan(plan: dict, feedback: str, project_map: dict, mock_ai: bool) -> dict | None:
+    """
+    Asks the smart model to revise a plan according to the user's feedback, in
+    one short call (see `ai_service.revise_implementation_plan`). Anonymized like
+    `_plan_feature`, which keeps the prompt prefix identical to the plan's.
+    """
+    from gemini_gitlab_workflow import ai_service
+
+    anonymized_issues, anonymized_feedback, anonymized_existing_issues = sanitizer.anonymize(
+        [plan["proposed_issues"], feedback, _existing_issues_context(project_map)]
+    )
+    with instrumentation.span("feature.revise_plan"):
+        revised = ai_service.revise_implementation_plan(
+            anonymized_issues, anonymized_feedback, anonymized_existing_issues, mock_ai
+        )
+    if revised:
+        revised["proposed_issues"] = sanitizer.deanonymize(revised["proposed_issues"])
+    return revised
+
+
+def _read_batch_file(batch_file: Path) -> list[str]:
+    """
+    Reads the feature descriptions of a batch file: a YAML list of descriptions
+    (or of mappings with a "description"), optionally under a "features" key.
+    Raises ValueError if the file has another shape.
+    """
+    import yaml
+
+    with open(batch_file, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    if isinstance(data, dict):
+        data = data.get("features")
+    if not isinstance(data, list):
+        raise ValueError("expected a list of feature descriptions")
+    features = []
+    for item in data:
+        description = item.get("description") if isinstance(item, dict) else item
+        if not isinstance(description, str) or not description.strip():
+            raise ValueError(f"invalid feature entry: {item!r}")
+        features.append(description.strip())
+    return features
+
+
+def _merge_plans(plans: list[dict | None]) -> tuple[dict, list[dict]]:
+    """
+    Combines the plans of a batch into one plan for `_generate_local_files`.
+    Temporary IDs are made unique per feature ("NEW_1" of the second feature
+    becomes "NEW_F2_1"). An epic (same "Epic::" label) or story (same title)
+    proposed by several features is an overlap: it is kept once, and the other
+    features' dependencies on it point to the kept issue.
+    Returns the merged plan and the overlaps, as [{"title", "features"}] with
+    1-based feature numbers.
+    """
+    merged, kept, overlaps = [], {}, {}
+    for number, plan in enumerate(plans, 1):
+        ids, added = {}, []
+        for issue in (plan or {}).get("proposed_issues", []):
+            labels = issue.get("labels", [])
+            epic_label = next((l for l in labels if l.startswith("Epic::")), None)
+            if "Type::Epic" in labels and epic_label:
+                key = epic_label.lower()
+            else:
+                key = _slugify(issue.get("title", ""))
+            if key in kept:
+                ids[issue["id"]] = kept[key]["id"]
+                overlap = overlaps.setdefault(key, {"title": kept[key]["title"], "features": [kept[key]["feature"]]})
+                if number not in overlap["features"]:
+                    overlap["features"].append(number)
+                continue
+            new_id = f"NEW_F{number}_{str(issue['id']).removeprefix('NEW_')}"
+            ids[issue["id"]] = new_id
+            kept[key] = {"id": new_id, "title": issue.get("title", ""), "feature": number}
+            added.append({**issue, "id": new_id})
+
+        for issue in added:
+            dependencies = issue.get("dependencies") or {}
+            issue["dependencies"] = {
+                kind: [ids.get(ref, ref) for ref in (refs if isinstance(refs, list) else [refs])]
+                for kind, refs in dependencies.items() if refs
+            }
+        merged.extend(added)
+    return {"proposed_issues": merged}, list(overlaps.values())
+
+
+def _create_features_batch(batch_file: Path, mock_ai: bool, console: Console):
+    """
+    `create-feature --batch`: syncs and indexes once, then pre-filters and plans
+    every feature concurrently (up to LLM_CONCURRENCY at a time), reports the
+    overlaps between the plans and, once approved, writes all of their files
+    and the project map update together.
+    """
+    from rich.table import Table
+    from gemini_gitlab_workflow import gitlab_service, ai_service, search_index
+
+    try:
+        features = _read_batch_file(batch_file)
+    except (OSError, ValueError) as e:
+        console.print(f"[bold red]Error reading batch file {batch_file}:[/bold red] {e}")
+        raise typer.Exit(1)
+    console.print(f"[bold]Starting AI-assisted creation for {len(features)} features from[/bold] '{batch_file}'")
+
+    with console.status("[bold green]Synchronizing with GitLab and indexing context...[/bold green]"):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            sync_future = executor.submit(gitlab_service.sync_project_map)
+            doc_sources = _get_context_from_docs()
+            with instrumentation.span("feature.wait_for_sync"):
+                sync_result = sync_future.result()
+        if sync_result["status"] == "error":
+            console.print(f"[bold red]Error rebuilding project map:[/bold red] {sync_result['message']}")
+            raise typer.Exit(1)
+        project_map = sync_result["map_data"] or {}
+        sources = doc_sources + _get_context_from_project_map(project_map)
+        index = search_index.load_search_index() if len(sources) > config.PREFILTER_MAX_SOURCES else None
+    console.print(f"[green]✓ Project map is up-to-date.[/green] Found {len(sources)} potential context sources.")
+
+    def plan_feature(feature_description: str) -> dict | None:
+        with instrumentation.span("feature.batch_item"):
+            relevant_files = ai_service.get_relevant_context_files(
+                feature_description, _narrow_sources(feature_description, sources, index), mock_ai
+            )
+            context_content = _read_context_files(relevant_files, console) if relevant_files else ""
+            return _plan_feature(feature_description, context_content, project_map, mock_ai)
+
+    from gemini_gitlab_workflow import llm_scheduler
+
+    with console.status(f"[bold green]Planning {len(features)} features...[/bold green]"), \
+            instrumentation.span("feature.batch_plan", features=len(features)), \
+            llm_scheduler.scaled_budget(len(features)):
+        with ThreadPoolExecutor(max_workers=config.LLM_CONCURRENCY) as executor:
+            plans = list(executor.map(plan_feature, features))
+
+    table = Table("#", "Feature", "Proposed issues")
+    for number, (feature_description, plan) in enumerate(zip(features, plans), 1):
+        titles = [issue["title"] for issue in (plan or {}).get("proposed_issues", [])]
+        summary = "\n".join(titles) if titles else ("[red]No plan[/red]" if plan is None else "Already covered")
+        table.add_row(str(number), feature_description, summary)
+    console.print(table)
+
+    merged_plan, overlaps = _merge_plans(plans)
+    for overlap in overlaps:
+        features_list = ", ".join(f"#{n}" for n in overlap["features"])
+        console.print(f"[yellow]Overlap: '{overlap['title']}' is proposed by features {features_list}; it is created once.[/yellow]")
+    if not merged_plan["proposed_issues"]:
+        console.print("[green]✓ No new issues are needed for these features.[/green]")
+        return
+
+    console.print("\n")
+    typer.confirm(
+        f"Do you approve these plans ({len(merged_plan['proposed_issues'])} new issues)?", abort=True
+    )
+    with instrumentation.span("feature.generate_files"):
+        _generate_local_files(merged_plan, console, project_map)
+    console.print("\n[bold]Workflow finished.[/bold]")
 
 
 @app.command("create-feature")
 def create_feature(
-    feature_description: str = typer.Argument(..., help="A high-level description of the new feature."),
-    mock_ai: bool = typer.Option(False, "--mock-ai", help="Use a mocked AI response for testing.")
+    feature_description: str = typer.Argument(None, help="A high-level description of the new feature."),
+    batch: Path = typer.Option(None, "--batch", help="A YAML file listing several feature descriptions to plan in one run."),
+    mock_ai: bool = typer.Option(False, "--mock-ai", help="Use the offline stub LLM backend instead of the configured one.")
 ):
     """
     Initiates the AI-assisted workflow to create a new feature by generating local story map files.
     Use the `gemini-cli upload story-map` command to push these changes to GitLab.
     """
+    from rich.console import Console
+    from rich.pretty import pprint
+    from gemini_gitlab_workflow import gitlab_service, ai_service
+
     console = Console()
+
+    if batch is not None:
+        if feature_description:
+            console.print("[bold red]Error:[/bold red] Pass either a feature description or --batch, not both.")
+            raise typer.Exit(1)
+        _create_features_batch(batch, mock_ai, console)
+        return
+    if not feature_description:
+        console.print("[bold red]Error:[/bold red] Missing the feature description (or --batch FILE).")
+        raise typer.Exit(1)
     
     console.print(f"[bold]Starting AI-assisted creation for feature:[/bold] '{feature_description}'")
     
-    # Step 1: Smart Sync and build project map
-    with console.status("[bold green]Performing smart sync and rebuilding project map...[/bold green]"):
-        # First, ensure the cache is up-to-date
-        gitlab_service.smart_sync()
-        
-        # Always rebuild the map and local files to ensure consistency
-        build_result = gitlab_service.build_project_map_and_sync_files()
-        if build_result["status"] == "error":
-            console.print(f"[bold red]Error rebuilding project map:[/bold red] {build_result['message']}")
-            raise typer.Exit(1)
-        with open(config.PROJECT_MAP_PATH, 'w') as f:
-            yaml.dump(build_result["map_data"], f, sort_keys=False)
-    console.print("[green]✓ Project map is up-to-date and local files are consistent.[/green]")
-
-    # Step 2: Gather context
-    with console.status("[bold green]Gathering context sources...[/bold green]"):
-        all_sources = _get_context_from_docs() + _get_context_from_project_map()
-    console.print(f"Found {len(all_sources)} potential context sources.")
-
-    # Step 3: AI Pre-filtering
-    with console.status("[bold green]Sending to AI for pre-filtering analysis...[/bold green]"):
-        relevant_files = ai_service.get_relevant_context_files(feature_description, all_sources, mock_ai)
+    # Steps 1-3 overlap: the GitLab sync runs on a worker thread while the docs
+    # (and the previously synced project map) are indexed and sent to the fast
+    # model. Issue sources that only appear after the sync are pre-filtered
+    # separately once it lands.
+    executor = ThreadPoolExecutor(max_workers=2)
+    try:
+        with console.status("[bold green]Performing smart sync and pre-filtering context in parallel...[/bold green]"):
+            # Snapshot the previous map before the sync thread can rewrite it.
+            cached_map_sources = _get_context_from_project_map()
+            sync_future = executor.submit(gitlab_service.sync_project_map)
+
+            early_sources = _get_context_from_docs() + cached_map_sources
+            prefilter_future = executor.submit(
+                ai_service.get_relevant_context_files, feature_description,
+                _narrow_sources(feature_description, early_sources), mock_ai
+            )
+
+            with instrumentation.span("feature.wait_for_sync"):
+                sync_result = sync_future.result()
+            if sync_result["status"] == "error":
+                console.print(f"[bold red]Error rebuilding project map:[/bold red] {sync_result['message']}")
+                raise typer.Exit(1)
+            # The synced map is persisted by the sync step and shared in memory from here on.
+            project_map = sync_result["map_data"] or {}
+            console.print("[green]✓ Project map is up-to-date and local files are consistent.[/green]")
+
+            known_paths = {str(source["path"]) for source in early_sources}
+            late_sources = [s for s in _get_context_from_project_map(project_map) if str(s["path"]) not in known_paths]
+            all_sources_count = len(early_sources) + len(late_sources)
+            console.print(f"Found {all_sources_count} potential context sources.")
+
+            with instrumentation.span("feature.wait_for_prefilter"):
+                relevant_files = prefilter_future.result()
+            if late_sources:
+                with instrumentation.span("feature.prefilter_late_sources"):
+                    late_files = ai_service.get_relevant_context_files(
+                        feature_description, _narrow_sources(feature_description, late_sources), mock_ai
+                    )
+                if late_files:
+                    relevant_files = list(dict.fromkeys((relevant_files or []) + late_files))
+    finally:
+        # Do not block an early exit on a pre-filter call that is still in flight.
+        executor.shutdown(wait=False, cancel_futures=True)
+
     if relevant_files:
         console.print(f"[green]✓ AI identified {len(relevant_files)} relevant files:[/green]")
         for file_path in relevant_files:
@@ -293,77 +792,13 @@ def create_feature(
     # Step 4: Read relevant content
     context_content = ""
     if relevant_files:
-        with console.status("[bold green]Reading content of relevant files...[/bold green]"):
-            contents = []
-            for file_path_str in relevant_files:
-                # --- Robust Path Resolution (v3 using pathlib) ---
-                file_path = Path(file_path_str)
-                
-                # If the path is not absolute, resolve it relative to the project root.
-                if not file_path.is_absolute():
-                    absolute_path = config.PROJECT_ROOT / file_path
-                else:
-                    absolute_path = file_path
-
-                # Security check: ensure the final path is within the project directory.
-                try:
-                    safe_path = absolute_path.resolve(strict=True)
-                    if not safe_path.is_relative_to(config.PROJECT_ROOT.resolve(strict=True)):
-                        console.print(f"[yellow]Warning: Skipping file outside project directory: {file_path_str}[/yellow]")
-                        continue
-                except (FileNotFoundError, RuntimeError): # RuntimeError for symlink loops
-                     console.print(f"[yellow]Warning: Skipping invalid or non-existent file path: {file_path_str}[/yellow]")
-                     continue
-
-                try:
-                    with open(safe_path, 'r', encoding='utf-8') as f:
-                        # Use the original file_path for the log message for consistency
-                        contents.append(f"---\nFile: {file_path_str}\nContent: {f.read()}\n---")
-                except FileNotFoundError:
-                    # Use the original file_path in the warning message
-                    console.print(f"[yellow]Warning: Could not find file {file_path_str}. Skipping.[/yellow]")
-                except Exception as e:
-                    console.print(f"[yellow]Warning: Could not read file {file_path_str} due to {e}. Skipping.[/yellow]")
-            context_content = "\n".join(contents)
+        with console.status("[bold green]Reading content of relevant files...[/bold green]"), \
+                instrumentation.span("feature.read_context"):
+            context_content = _read_context_files(relevant_files, console)
     
     # Step 5: AI Deep Analysis
     with console.status("[bold green]Sending to AI for deep analysis to generate plan...[/bold green]"):
-        # Gather existing issues (title and labels) to help AI avoid duplicates and reuse epics
-        existing_issues_context = []
-        if os.path.exists(config.PROJECT_MAP_PATH):
-            with open(config.PROJECT_MAP_PATH, 'r') as f:
-                project_map = yaml.safe_load(f)
-                if project_map and "nodes" in project_map:
-                    for node in project_map["nodes"]:
-                        existing_issues_context.append({
-                            "title": node.get("title"),
-                            "labels": node.get("labels", []),
-                            "state": node.get("state")
-                        })
-
-        # Anonymize context before sending to AI
-        anonymized_feature_description = sanitizer.anonymize_text(feature_description)
-        anonymized_context_content = sanitizer.anonymize_text(context_content)
-        
-        anonymized_existing_issues = []
-        for issue in existing_issues_context:
-            anonymized_issue = {
-                "title": sanitizer.anonymize_text(issue.get("title", "")),
-                "labels": [sanitizer.anonymize_text(label) for label in issue.get("labels", [])],
-                "state": issue.get("state")
-            }
-            anonymized_existing_issues.append(anonymized_issue)
-
-        plan = ai_service.generate_implementation_plan(
-            anonymized_feature_description, anonymized_context_content, anonymized_existing_issues, mock_ai
-        )
-
-    # Deanonymize the response from AI
-    if plan and plan.get("proposed_issues"):
-        for issue in plan["proposed_issues"]:
-            issue["title"] = sanitizer.deanonymize_text(issue.get("title", ""))
-            issue["description"] = sanitizer.deanonymize_text(issue.get("description", ""))
-            issue["labels"] = [sanitizer.deanonymize_text(label) for label in issue.get("labels", [])]
+        plan = _plan_feature(feature_description, context_content, project_map, mock_ai)
 
     console.print("\n[bold green]✓ AI generated the following implementation plan:[/bold green]")
     
@@ -373,13 +808,29 @@ def create_feature(
         
     pprint(plan)
 
-    # Step 6: Structured Dialogue (User Confirmation)
+    # Step 6: Structured Dialogue (User Confirmation). A rejected plan is revised
+    # from the user's feedback, reusing the synced map and the model's prompt prefix.
     console.print("\n")
-    approved = typer.confirm("Do you approve this implementation plan?", abort=True)
-    
-    if approved:
-        # Step 7: Local Generation
-        _generate_local_files(plan, console)
+    while not typer.confirm("Do you approve this implementation plan?"):
+        feedback = typer.prompt("What should change? (leave empty to abort)", default="", show_default=False).strip()
+        if not feedback:
+            raise typer.Abort()
+        with console.status("[bold green]Revising the plan...[/bold green]"):
+            revised = _revise_plan(plan, feedback, project_map, mock_ai)
+        if not revised:
+            console.print("[yellow]Warning: The plan could not be revised; it is unchanged.[/yellow]")
+            continue
+        plan = revised
+        if not plan["proposed_issues"]:
+            console.print("[green]✓ The revised plan has no issues left. Nothing to generate.[/green]")
+            return
+        console.print("\n[bold green]✓ Revised implementation plan:[/bold green]")
+        pprint(plan)
+        console.print("\n")
+
+    # Step 7: Local Generation
+    with instrumentation.span("feature.generate_files"):
+        _generate_local_files(plan, console, project_map)
     
     console.print("\n[bold]Workflow finished.[/bold]")
 
@@ -390,19 +841,40 @@ app.add_typer(sync_app, name="sync", help="Synchronize data from GitLab.")
 @sync_app.command("map")
 def sync_map():
     """Synchronize GitLab issues and build the project map."""
+    from rich.console import Console
+    from gemini_gitlab_workflow import gitlab_service
+
     console = Console()
     with console.status("[bold green]Synchronizing with GitLab and building project map...[/bold green]"):
-        result = gitlab_service.build_project_map_and_sync_files()
+        # An explicit sync always polls GitLab, even while webhooks keep the mirror current.
+        result = gitlab_service.sync_project_map(force=True)
 
     if result["status"] == "error":
         console.print(f"[bold red]Error building project map:[/bold red] {result['message']}")
         raise typer.Exit(1)
 
-    map_data = result["map_data"]
-    with open(config.PROJECT_MAP_PATH, 'w') as f:
-        yaml.dump(map_data, f, sort_keys=False)
-
     console.print(f"[green]✓ Project map successfully built with {result['issues_found']} issues and saved to {config.PROJECT_MAP_PATH}.[/green]")
+    if config.SUMMARIZE_ON_SYNC:
+        _refresh_summaries(console, mock_ai=False)
+
+
+def _refresh_summaries(console, mock_ai: bool):
+    from gemini_gitlab_workflow import summary_cache
+
+    with console.status("[bold green]Summarizing changed docs and issue files...[/bold green]"):
+        stats = summary_cache.refresh(mock=mock_ai)
+    console.print(f"[green]✓ {stats['summarized']} files summarized, {stats['cached']} unchanged.[/green]")
+    if stats["failed"]:
+        console.print(f"[yellow]Warning: {stats['failed']} files could not be summarized; they are retried on the next run.[/yellow]")
+
+
+@sync_app.command("summaries")
+def sync_summaries(
+    mock_ai: bool = typer.Option(False, "--mock-ai", help="Use the offline stub LLM backend instead of the configured one.")
+):
+    """Generate AI summaries of the docs and issue files that changed since the last run."""
+    from rich.console import Console
+    _refresh_summaries(Console(), mock_ai)
 
 
 upload_app = typer.Typer()
@@ -413,6 +885,9 @@ def upload_story_map():
     """
     Uploads the locally generated story map (from project_map.yaml) to GitLab.
     """
+    from rich.console import Console
+    from gemini_gitlab_workflow import gitlab_service, file_system_repo
+
     console = Console()
     console.print("[bold]Initiating upload of story map to GitLab...[/bold]")
 
@@ -421,8 +896,7 @@ def upload_story_map():
         raise typer.Exit(1)
 
     try:
-        with open(config.PROJECT_MAP_PATH, 'r') as f:
-            project_map = yaml.safe_load(f)
+        project_map = file_system_repo.read_project_map()
     except Exception as e:
         console.print(f"[bold red]Error:[/bold red] Failed to read {config.PROJECT_MAP_PATH}: {e}")
         raise typer.Exit(1)
@@ -441,5 +915,219 @@ def upload_story_map():
 
     console.print("\n[bold]Upload workflow finished.[/bold]")
 
+@app.command()
+def search(
+    query: str = typer.Argument(..., help="Words to look for in issue titles, descriptions, notes and docs."),
+    limit: int = typer.Option(10, "--limit", "-n", help="Show at most this many results."),
+    kind: str = typer.Option(None, "--kind", help="Only 'issue' or 'doc' results."),
+    as_json: bool = typer.Option(False, "--json", help="Print JSON instead of formatted results."),
+):
+    """
+    Full-text search over the local GitLab mirror and docs, ranked by relevance.
+    Run `ggw sync map` first to include the latest issues.
+    """
+    from gemini_gitlab_workflow import search_index
+
+    if kind not in (None, "issue", "doc"):
+        raise typer.BadParameter("--kind must be 'issue' or 'doc'.")
+    results = search_index.load_search_index().search(query, limit=limit, kind=kind)
+    if as_json:
+        print(json.dumps(results, indent=2))
+        return
+
+    from rich.console import Console
+    from rich.markup import escape
+
+    console = Console()
+    if not results:
+        console.print(f"[yellow]No results for '{escape(query)}'.[/yellow]")
+        return
+    for result in results:
+        label = f"#{result['iid']} " if result["kind"] == "issue" and result["iid"] is not None else ""
+        console.print(f"[bold]{escape(label + result['title'])}[/bold] [dim]({result['score']}) {escape(result['path'])}[/dim]")
+        if result["snippet"]:
+            console.print(f"    {escape(result['snippet'])}")
+
+query_app = typer.Typer()
+app.add_typer(query_app, name="query", help="Answer questions about the project from the local project map.")
+
+def _load_graph_or_exit():
+    """Loads the (cached) project graph, exiting with an error if there is no project map."""
+    from gemini_gitlab_workflow.project_graph import load_project_graph
+
+    graph = load_project_graph()
+    if graph is None:
+        print(f"Error: {config.PROJECT_MAP_PATH} not found. Run 'ggw sync map' first.")
+        raise typer.Exit(1)
+    return graph
+
+def _resolve_issue_or_exit(graph, ref: str):
+    """Resolves an IID or title to a node id, exiting with an error if it is unknown."""
+    node_id = graph.resolve(ref)
+    if node_id is None:
+        print(f"Error: no issue matching '{ref}' in the project map.")
+        raise typer.Exit(1)
+    return node_id
+
+def _print_issues(nodes: list[dict], as_json: bool, title: str | None = None):
+    """Prints issues as a table, or as a JSON list for scripting."""
+    rows = [
+        {"id": n["id"], "title": n.get("title"), "state": n.get("state"), "labels": n.get("labels", []),
+         "local_path": n.get("local_path")}
+        for n in nodes
+    ]
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=title)
+    for column in ("ID", "Title", "State", "Labels"):
+        table.add_column(column)
+    for row in rows:
+        table.add_row(str(row["id"]), row["title"] or "", row["state"] or "", ", ".join(row["labels"]))
+    console = Console()
+    console.print(table)
+    console.print(f"{len(rows)} issue(s)")
+
+@query_app.command("issues")
+def query_issues(
+    label: list[str] = typer.Option(None, "--label", "-l", help="Only issues carrying this label (repeatable)."),
+    state: str = typer.Option(None, "--state", help="'opened' or 'closed'. Defaults to both."),
+    backbone: str = typer.Option(None, "--backbone", "-b", help="Only issues in this backbone (the part after 'Backbone::')."),
+    epic: str = typer.Option(None, "--epic", "-e", help="Only issues belonging to this epic (IID or title)."),
+    issue_type: str = typer.Option(None, "--type", "-t", help="Only issues of this type, e.g. 'Story' or 'Epic'."),
+    limit: int = typer.Option(None, "--limit", help="Show at most this many issues."),
+    as_json: bool = typer.Option(False, "--json", help="Print JSON instead of a table."),
+):
+    """Lists issues matching all the given filters."""
+    if state not in (None, "opened", "closed"):
+        raise typer.BadParameter("--state must be 'opened' or 'closed'.")
+    graph = _load_graph_or_exit()
+    if epic is not None:
+        _resolve_issue_or_exit(graph, epic)
+    nodes = graph.filter(labels=label or (), state=state, backbone=backbone, epic=epic, issue_type=issue_type)
+    _print_issues(nodes[:limit] if limit else nodes, as_json, title="Issues")
+
+@query_app.command("blockers")
+def query_blockers(
+    issue: str = typer.Argument(..., help="IID or title of the issue."),
+    transitive: bool = typer.Option(False, "--all", "-a", help="Include indirect blockers."),
+    open_only: bool = typer.Option(False, "--open", help="Only blockers that are still open."),
+    as_json: bool = typer.Option(False, "--json", help="Print JSON instead of a table."),
+):
+    """Shows what blocks an issue."""
+    graph = _load_graph_or_exit()
+    node_id = _resolve_issue_or_exit(graph, issue)
+    blocker_ids = graph.all_blockers(node_id) if transitive else graph.blockers(node_id)
+    nodes = [graph.node(i) or {"id": i, "title": None, "state": None} for i in blocker_ids]
+    if open_only:
+        nodes = [n for n in nodes if n.get("state") != "closed"]
+    _print_issues(nodes, as_json, title=f"Blockers of #{node_id}")
+
+@query_app.command("children")
+def query_children(
+    epic: str = typer.Argument(..., help="IID or title of the epic."),
+    as_json: bool = typer.Option(False, "--json", help="Print JSON instead of a table."),
+):
+    """Lists the issues an epic contains."""
+    graph = _load_graph_or_exit()
+    epic_id = _resolve_issue_or_exit(graph, epic)
+    nodes = [n for n in (graph.node(i) for i in graph.children(epic_id)) if n]
+    _print_issues(nodes, as_json, title=f"Children of #{epic_id}")
+
+@query_app.command("critical-path")
+def query_critical_path(
+    issue: str = typer.Argument(None, help="IID or title; defaults to the longest chain in the whole project."),
+    as_json: bool = typer.Option(False, "--json", help="Print JSON instead of a table."),
+):
+    """Shows the longest chain of open blockers, in the order they have to be done."""
+    graph = _load_graph_or_exit()
+    node_id = _resolve_issue_or_exit(graph, issue) if issue is not None else None
+    try:
+        path = graph.critical_path(node_id)
+    except ValueError as e:
+        print(f"Error: {e}")
+        raise typer.Exit(1)
+    _print_issues([graph.node(i) for i in path if graph.node(i)], as_json, title="Critical path")
+
+webhook_app = typer.Typer()
+app.add_typer(webhook_app, name="webhook", help="Keep the local mirror up to date from GitLab webhooks.")
+
+@webhook_app.command("serve")
+def webhook_serve(
+    host: str = typer.Option(None, "--host", help="Address to listen on. Defaults to GGW_WEBHOOK_HOST (127.0.0.1)."),
+    port: int = typer.Option(None, "--port", "-p", help="Port to listen on. Defaults to GGW_WEBHOOK_PORT (8765)."),
+    secret: str = typer.Option(None, "--secret", help="Secret token GitLab sends. Defaults to GGW_WEBHOOK_SECRET."),
+    record: Path = typer.Option(None, "--record", help="Also save every received payload to this directory.")
+):
+    """
+    Receives GitLab Issue and Note webhooks and applies them to the local mirror.
+    While it runs, syncs use the mirror instead of polling GitLab.
+    """
+    from rich.console import Console
+    from gemini_gitlab_workflow import webhook
+
+    console = Console()
+    address = f"{host or config.WEBHOOK_HOST}:{config.WEBHOOK_PORT if port is None else port}"
+    console.print(f"[bold]Listening for GitLab webhooks on http://{address}[/bold] (Ctrl+C to stop)")
+    try:
+        webhook.serve(host=host, port=port, secret=secret, record_dir=record)
+    except RuntimeError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        raise typer.Exit(1)
+    console.print("[bold]Webhook receiver stopped.[/bold]")
+
+@webhook_app.command("replay")
+def webhook_replay(
+    paths: list[Path] = typer.Argument(..., help="Recorded payload files (one payload or a list) or directories of them.")
+):
+    """Applies recorded webhook payloads to the local mirror, in order."""
+    from gemini_gitlab_workflow import webhook
+
+    try:
+        results = webhook.replay(paths)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        raise typer.Exit(1)
+    for result in results:
+        print(f"[{result['status']}] {result['message']}")
+    applied = sum(1 for r in results if r["status"] == "applied")
+    print(f"{applied} of {len(results)} event(s) applied.")
+
+@app.command()
+def serve(
+    sync_interval: int = typer.Option(None, "--sync-interval", help="Seconds between background syncs (0 disables). Defaults to GGW_DAEMON_SYNC_INTERVAL.")
+):
+    """
+    Runs a persistent daemon that keeps the GitLab client, project map and AI caches warm.
+    Other ggw commands run in this directory use it automatically while it is running.
+    """
+    from rich.console import Console
+    from gemini_gitlab_workflow import daemon
+
+    console = Console()
+    console.print(f"[bold]Starting ggw daemon on {config.DAEMON_SOCKET_PATH}[/bold] (Ctrl+C to stop)")
+    try:
+        daemon.serve(app, sync_interval=sync_interval)
+    except RuntimeError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        raise typer.Exit(1)
+    console.print("[bold]Daemon stopped.[/bold]")
+
+def main():
+    """
+    Console-script entry point. Delegates the command to a running `ggw serve`
+    daemon when one is available and falls back to in-process execution otherwise.
+    """
+    from gemini_gitlab_workflow import daemon
+
+    exit_code = daemon.run_in_daemon(sys.argv[1:])
+    if exit_code is not None:
+        sys.exit(exit_code)
+    app()
+
 if __name__ == "__main__":
-    app()
\ No newline at end of file
+    main()
\ No newline at end of file
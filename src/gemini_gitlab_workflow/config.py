@@ -22,13 +22,104 @@ CACHE_DIR = PROJECT_ROOT / ".gemini_cache"
 PROJECT_MAP_PATH = PROJECT_ROOT / "project_map.yaml"
 DOCS_DIR = PROJECT_ROOT / "docs"
 TIMESTAMPS_CACHE_PATH = CACHE_DIR / "timestamps.json"
+# Pickled ProjectGraph of the project map, reused by `ggw query` until the map changes.
+PROJECT_GRAPH_CACHE_PATH = CACHE_DIR / "project_graph.pickle"
+# Issue notes fetched by the last sync, and the full-text index used by `ggw search`.
+ISSUE_NOTES_PATH = CACHE_DIR / "issue_notes.json"
+SEARCH_INDEX_PATH = CACHE_DIR / "search_index.pickle"
+# Prompt prefixes registered with the LLM backend's context cache (see LLM_PREFIX_CACHE_TTL).
+LLM_PREFIX_CACHE_PATH = CACHE_DIR / "llm_prefix_cache.json"
+# Generated summaries of the docs and issue files, by content hash (see summary_cache.py).
+SUMMARY_CACHE_PATH = CACHE_DIR / "summaries.json"
+
+# --- Daemon Configuration ---
+# `ggw serve` listens on this Unix socket; other ggw commands use it when present.
+DAEMON_SOCKET_PATH = Path(os.getenv("GGW_DAEMON_SOCKET", str(CACHE_DIR / "ggw.sock")))
+# Seconds between the daemon's background incremental syncs (0 disables them).
+DAEMON_SYNC_INTERVAL = int(os.getenv("GGW_DAEMON_SYNC_INTERVAL", "300"))
+
+# --- Webhook Configuration ---
+# `ggw webhook serve` accepts GitLab webhooks carrying this secret token (X-Gitlab-Token).
+WEBHOOK_SECRET = os.getenv("GGW_WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("GGW_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("GGW_WEBHOOK_PORT", "8765"))
+# The receiver refreshes its heartbeat in this file every WEBHOOK_HEARTBEAT_INTERVAL seconds;
+# syncs skip polling GitLab while it is fresh.
+WEBHOOK_STATE_PATH = CACHE_DIR / "webhook.json"
+WEBHOOK_HEARTBEAT_INTERVAL = int(os.getenv("GGW_WEBHOOK_HEARTBEAT_INTERVAL", "30"))
 
 # --- Gemini Model Configuration ---
 # Allows overriding the default models via environment variables.
 GEMINI_SMART_MODEL = os.getenv("GGW_GEMINI_SMART_MODEL", "gemini-2.5-pro")
 GEMINI_FAST_MODEL = os.getenv("GGW_GEMINI_FAST_MODEL", "gemini-2.5-flash-lite")
 
+# --- Context Pre-filter ---
+# Above this many candidate sources, create-feature keeps only the best matches
+# of the local search index before asking the fast model to choose among them.
+PREFILTER_MAX_SOURCES = int(os.getenv("GGW_PREFILTER_MAX_SOURCES", "200"))
+# Sources per fast-model request: larger lists are split into shards that are
+# sent concurrently and whose selections are merged.
+PREFILTER_SHARD_SIZE = int(os.getenv("GGW_PREFILTER_SHARD_SIZE", "100"))
+# Files summarized per fast-model request by `ggw sync summaries`, and the number
+# of characters of each file sent along.
+SUMMARY_BATCH_SIZE = int(os.getenv("GGW_SUMMARY_BATCH_SIZE", "20"))
+SUMMARY_INPUT_CHARS = int(os.getenv("GGW_SUMMARY_INPUT_CHARS", "4000"))
+# Also refresh the summaries of changed files after `ggw sync map` and the daemon's background syncs.
+SUMMARIZE_ON_SYNC = os.getenv("GGW_SUMMARIZE_ON_SYNC", "false").lower() in ("1", "true", "yes")
+
+# Proposed issues at least this similar (TF-IDF cosine of title and description)
+# to a synced issue or to an earlier proposed one are skipped as near-duplicates
+# when a plan is written (0 disables the check).
+DUPLICATE_THRESHOLD = float(os.getenv("GGW_DUPLICATE_THRESHOLD", "0.85"))
+
+# --- LLM Backend Configuration ---
+# "gemini" calls Google Gemini; "stub" is a deterministic offline stand-in for
+# running and benchmarking the AI stages without network access.
+LLM_BACKEND = os.getenv("GGW_LLM_BACKEND", "gemini")
+# Deadline of a single model request, in seconds.
+LLM_TIMEOUT = float(os.getenv("GGW_LLM_TIMEOUT", "120"))
+# Seconds a command may spend on model calls in total (0: no limit); batches get
+# this much per LLM_CONCURRENCY items. Once less than LLM_FALLBACK_SECONDS
+# remain, smart-model requests go to the fast model.
+LLM_BUDGET = float(os.getenv("GGW_LLM_BUDGET", "300"))
+LLM_FALLBACK_SECONDS = float(os.getenv("GGW_LLM_FALLBACK_SECONDS", "30"))
+# Retries of rate-limited, overloaded or timed-out requests, with an exponential
+# backoff (full jitter) starting at LLM_RETRY_BASE_DELAY seconds, capped at LLM_RETRY_MAX_DELAY.
+LLM_MAX_RETRIES = int(os.getenv("GGW_LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("GGW_LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("GGW_LLM_RETRY_MAX_DELAY", "20"))
+# Smart-model requests whose whole prompt (existing issues, feature request and
+# context) is estimated at no more than this many tokens are sent to the fast
+# model (0 disables routing).
+LLM_ROUTE_FAST_MAX_TOKENS = int(os.getenv("GGW_LLM_ROUTE_FAST_MAX_TOKENS", "1000"))
+# Model requests in flight at the same time for `ai_service.call_many`.
+LLM_CONCURRENCY = int(os.getenv("GGW_LLM_CONCURRENCY", "4"))
+# The static start of the planner prompt (instructions and existing issues) is
+# cached by the backend for this many seconds and reused by later runs (0 disables
+# it). Shorter prefixes are not cached: Gemini requires a minimum size.
+LLM_PREFIX_CACHE_TTL = int(os.getenv("GGW_LLM_PREFIX_CACHE_TTL", "3600"))
+LLM_PREFIX_CACHE_MIN_TOKENS = int(os.getenv("GGW_LLM_PREFIX_CACHE_MIN_TOKENS", "4096"))
+# Simulated latency of the stub backend: fixed seconds per call, plus output
+# tokens divided by the tokens-per-second rate (0 disables that part).
+LLM_STUB_LATENCY = float(os.getenv("GGW_LLM_STUB_LATENCY", "0"))
+LLM_STUB_TOKENS_PER_SECOND = float(os.getenv("GGW_LLM_STUB_TOKENS_PER_SECOND", "0"))
+
 # --- GitLab Configuration ---
+# Maximum GitLab API requests per second, shared by all threads (0 disables the limit).
+GITLAB_RATE_LIMIT = float(os.getenv("GGW_GITLAB_RATE_LIMIT", "0"))
+# Projects synced at the same time by a multi-project sync.
+SYNC_CONCURRENCY = int(os.getenv("GGW_SYNC_CONCURRENCY", "4"))
+
+def multi_project_scope() -> tuple[str, list[str]]:
+    """
+    The scope of a multi-project sync: a group (GGW_GITLAB_GROUP_ID) and/or a
+    comma-separated list of projects (GGW_GITLAB_PROJECT_IDS), as IDs or paths.
+    Both are empty when ggw works with the single GGW_GITLAB_PROJECT_ID.
+    """
+    group_id = os.getenv("GGW_GITLAB_GROUP_ID", "").strip()
+    project_ids = [p.strip() for p in os.getenv("GGW_GITLAB_PROJECT_IDS", "").split(",") if p.strip()]
+    return group_id, project_ids
+
 @dataclass
 class GitlabConfig:
     """A dataclass to hold all GitLab-related configuration."""
@@ -39,7 +130,8 @@ class GitlabConfig:
 
     def __post_init__(self):
         """Validate that essential GitLab configuration is present."""
-        if not self.url or not self.private_token or not self.project_id:
+        group_id, project_ids = multi_project_scope()
+        if not self.url or not self.private_token or not (self.project_id or group_id or project_ids):
             raise ValueError(
                 "Essential GitLab configuration (GGW_GITLAB_URL, "
                 "GGW_GITLAB_PRIVATE_TOKEN, GGW_GITLAB_PROJECT_ID) is missing. "
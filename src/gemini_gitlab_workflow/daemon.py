@@ -0,0 +1,306 @@
+"""
+Persistent `ggw serve` daemon.
+
+The daemon keeps an authenticated GitLab client, the parsed project map and the
+AI response cache warm in a single long-running process, runs incremental syncs
+on a timer, and executes ggw commands sent by the CLI over a local Unix socket.
+
+Wire protocol (newline-delimited JSON over the socket):
+  client -> daemon: {"argv": [...], "cwd": "...", "env": {GGW_* variables}, "isatty": bool,
+                    "columns": int} followed by raw stdin lines (answers to interactive prompts)
+  daemon -> client: {"accepted": true} or {"refused": "<reason>"}, then any number
+                    of {"out": "..."} / {"err": "..."} frames and a final {"exit": <code>}
+"""
+import contextlib
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from pathlib import Path
+
+from gemini_gitlab_workflow import config
+
+# Commands that always run in the calling process.
+LOCAL_COMMANDS = {"serve", "init", "webhook"}
+# Arguments that are answered faster locally than over the socket.
+LOCAL_FLAGS = {"--help", "--install-completion", "--show-completion"}
+# Set by the shell when it asks Typer for completions.
+COMPLETION_ENV_VAR = "_GGW_COMPLETE"
+# Configuration variables that only concern the client.
+CLIENT_ENV_VARS = {"GGW_NO_DAEMON"}
+
+
+def _config_env() -> dict:
+    """The GGW_* variables of this process, which the configuration is read from."""
+    return {k: v for k, v in os.environ.items() if k.startswith("GGW_") and k not in CLIENT_ENV_VARS}
+
+
+def _socket_path() -> Path:
+    return Path(config.DAEMON_SOCKET_PATH)
+
+
+def _send(wfile, message: dict, lock: threading.Lock):
+    data = (json.dumps(message) + "\n").encode("utf-8")
+    with lock:
+        wfile.write(data)
+        wfile.flush()
+
+
+class _FrameWriter:
+    """A text stream that forwards everything written to it as JSON frames."""
+
+    def __init__(self, wfile, lock: threading.Lock, channel: str, isatty: bool):
+        self._wfile = wfile
+        self._lock = lock
+        self._channel = channel
+        self._isatty = isatty
+
+    def write(self, text: str | bytes) -> int:
+        if isinstance(text, bytes): # click echoes prompts through the binary stream
+            text = text.decode("utf-8", errors="replace")
+        if text:
+            _send(self._wfile, {self._channel: text}, self._lock)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return self._isatty
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+
+def _run_command(app, argv: list[str]) -> int:
+    """Runs a Typer app in-process and returns its exit code."""
+    try:
+        app(args=argv, prog_name="ggw")
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class _DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, app, project_root: Path):
+        self.app = app
+        self.project_root = project_root
+        # Commands swap the process-wide stdio streams, so they run one at a time.
+        self.command_lock = threading.Lock()
+        self.config_env = _config_env()
+        super().__init__(path, _CommandHandler)
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server: _DaemonServer = self.server
+        send_lock = threading.Lock()
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            return
+
+        if Path(request.get("cwd", "")).resolve() != server.project_root:
+            _send(self.wfile, {"refused": f"daemon serves {server.project_root}"}, send_lock)
+            return
+        # The configuration is read once at startup: a client with other settings runs in-process.
+        if request.get("env", {}) != server.config_env:
+            _send(self.wfile, {"refused": "the GGW_* environment differs from the daemon's"}, send_lock)
+            return
+        _send(self.wfile, {"accepted": True}, send_lock)
+
+        isatty = bool(request.get("isatty"))
+        stdout = _FrameWriter(self.wfile, send_lock, "out", isatty)
+        stderr = _FrameWriter(self.wfile, send_lock, "err", isatty)
+        # Stdin lines following the request answer interactive prompts (typer.confirm).
+        stdin = io.TextIOWrapper(self.rfile, encoding="utf-8")
+
+        with server.command_lock:
+            previous_stdin, previous_columns = sys.stdin, os.environ.get("COLUMNS")
+            if request.get("columns"):
+                os.environ["COLUMNS"] = str(request["columns"])
+            sys.stdin = stdin
+            try:
+                with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                    exit_code = _run_command(server.app, list(request.get("argv", [])))
+            finally:
+                sys.stdin = previous_stdin
+                stdin.detach() # Leave closing the socket file to the request handler
+                if previous_columns is None:
+                    os.environ.pop("COLUMNS", None)
+                else:
+                    os.environ["COLUMNS"] = previous_columns
+        try:
+            _send(self.wfile, {"exit": exit_code}, send_lock)
+        except OSError:
+            pass
+
+
+def _warm_up():
+    """Pays the one-off costs (auth, map parsing, Gemini client setup) before serving."""
+    from gemini_gitlab_workflow import gitlab_client, file_system_repo, llm_backend
+    try:
+        gitlab_client.get_gitlab_client()
+    except (ValueError, ConnectionError) as e:
+        logging.warning(f"Daemon could not authenticate with GitLab yet: {e}")
+    file_system_repo.read_project_map()
+    try:
+        llm_backend.get_backend().warm_up()
+    except ValueError as e:
+        logging.warning(f"Daemon could not set up the LLM backend: {e}")
+
+
+def _sync_once():
+    """One background sync, and the summary refresh that may follow it (under its own LLM budget)."""
+    from gemini_gitlab_workflow import gitlab_service, llm_scheduler, summary_cache
+    try:
+        result = gitlab_service.sync_project_map()
+    except Exception as e:
+        logging.error(f"Background sync failed: {e}")
+        return
+    if result["status"] != "success":
+        logging.error(f"Background sync failed: {result['message']}")
+        return
+    logging.info(f"Background sync finished: {result.get('updated_count', 0)} updated issues.")
+    if config.SUMMARIZE_ON_SYNC:
+        try:
+            with llm_scheduler.budget():
+                stats = summary_cache.refresh()
+            logging.info(f"Background summaries refreshed: {stats['summarized']} files summarized.")
+        except Exception as e:
+            logging.error(f"Background summary refresh failed: {e}")
+
+
+def _sync_periodically(server: _DaemonServer, interval: int, stop: threading.Event):
+    """
+    Runs an incremental sync every `interval` seconds until `stop` is set. A sync
+    that falls due while a command runs (possibly waiting at a prompt) is skipped.
+    """
+    while not stop.wait(interval):
+        if not server.command_lock.acquire(blocking=False):
+            logging.info("Background sync skipped: a command is running.")
+            continue
+        try:
+            _sync_once()
+        finally:
+            server.command_lock.release()
+
+
+def is_running() -> bool:
+    """Returns True if a daemon is accepting connections on the configured socket."""
+    path = _socket_path()
+    if not path.exists():
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return False
+    return True
+
+
+def serve(app, sync_interval: int | None = None, ready: threading.Event | None = None,
+          stop: threading.Event | None = None):
+    """
+    Runs the daemon until interrupted (or until `stop` is set).
+    Raises RuntimeError if another daemon already serves the socket.
+    """
+    path = _socket_path()
+    if is_running():
+        raise RuntimeError(f"A ggw daemon is already running on {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True) # Stale socket left by a crashed daemon
+
+    _warm_up()
+    interval = config.DAEMON_SYNC_INTERVAL if sync_interval is None else sync_interval
+    stop = stop or threading.Event()
+    server = _DaemonServer(str(path), app, Path(config.PROJECT_ROOT).resolve())
+    os.chmod(path, 0o600)
+    if interval > 0:
+        threading.Thread(target=_sync_periodically, args=(server, interval, stop), daemon=True).start()
+    threading.Thread(target=lambda: (stop.wait(), server.shutdown()), daemon=True).start()
+
+    logging.info(f"ggw daemon listening on {path}")
+    if ready:
+        ready.set()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+def _forward_stdin(sock: socket.socket, stdin):
+    """Forwards the client's stdin to the daemon so interactive prompts work."""
+    try:
+        for line in stdin:
+            sock.sendall(line.encode("utf-8"))
+        sock.shutdown(socket.SHUT_WR)
+    except (OSError, ValueError):
+        pass
+
+
+def run_in_daemon(argv: list[str]) -> int | None:
+    """
+    Runs a ggw command on a running daemon, streaming its output.
+    Returns the exit code, or None if the command should run in-process instead.
+    """
+    if os.getenv("GGW_NO_DAEMON") or os.getenv(COMPLETION_ENV_VAR):
+        return None
+    if not argv or argv[0] in LOCAL_COMMANDS or LOCAL_FLAGS.intersection(argv):
+        return None
+    path = _socket_path()
+    if not path.exists():
+        return None
+    stdin, stdout, stderr = sys.stdin, sys.stdout, sys.stderr
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+
+    with sock, sock.makefile("rb") as reader:
+        try:
+            columns = os.get_terminal_size().columns
+        except OSError:
+            columns = None
+        request = {"argv": argv, "cwd": str(Path.cwd()), "env": _config_env(), "isatty": stdout.isatty(), "columns": columns}
+        sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+
+        reply = reader.readline()
+        if not reply or "accepted" not in json.loads(reply):
+            return None
+        threading.Thread(target=_forward_stdin, args=(sock, stdin), daemon=True).start()
+
+        for line in reader:
+            frame = json.loads(line)
+            if "out" in frame:
+                stdout.write(frame["out"])
+                stdout.flush()
+            elif "err" in frame:
+                stderr.write(frame["err"])
+                stderr.flush()
+            elif "exit" in frame:
+                return frame["exit"]
+
+    # The command was accepted but the daemon went away; it may have partially run.
+    stderr.write("Error: lost connection to the ggw daemon.\n")
+    return 1
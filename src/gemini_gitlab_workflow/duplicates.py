@@ -0,0 +1,114 @@
+"""
+Local near-duplicate detection for proposed issues.
+
+Before a plan is written, each proposed issue is compared with the synced
+issues and with the issues proposed before it by the TF-IDF cosine similarity
+of their titles and descriptions (title terms weighted as in the search index).
+Between proposed issues, terms are further weighted by their inverse frequency
+in the plan, since the feature's own vocabulary is in most of them.
+The term frequencies of the synced issues are those of the search index
+(search_index.py). Candidates are found through the postings of the proposal's
+distinctive terms (those in at most CANDIDATE_MAX_DF of the documents, and at
+least its MIN_CANDIDATE_TERMS rarest ones), and only the MAX_CANDIDATES sharing
+the most weight with it are scored in full, so a check takes milliseconds even
+against thousands of issues.
+"""
+import heapq
+import math
+from collections import Counter
+
+from gemini_gitlab_workflow import config
+from gemini_gitlab_workflow.search_index import TITLE_WEIGHT, SearchIndex, tokenize
+
+# Terms found in a larger share of the documents only select candidates when
+# they are among a proposal's rarest; they all count in the similarity.
+CANDIDATE_MAX_DF = 0.05
+MIN_CANDIDATE_TERMS = 5
+# Synced issues compared in full with each proposal.
+MAX_CANDIDATES = 20
+
+
+def _frequencies(title: str, description: str) -> Counter:
+    frequencies = Counter(tokenize(description or ""))
+    for term in tokenize(title or ""):
+        frequencies[term] += TITLE_WEIGHT
+    return frequencies
+
+
+def find_duplicates(proposed_issues: list[dict], index: SearchIndex | None = None,
+                    threshold: float | None = None) -> list[dict]:
+    """
+    The proposed issues whose similarity to a synced issue of `index`, or to an
+    earlier proposed issue, reaches `threshold` (default DUPLICATE_THRESHOLD;
+    0 disables the check). Each is returned as {"id", "title", "duplicate_of",
+    "duplicate_title", "existing", "score"}, where "duplicate_of" is the iid of
+    the synced issue ("existing" True) or the id of the proposed one.
+    """
+    threshold = config.DUPLICATE_THRESHOLD if threshold is None else threshold
+    if threshold <= 0 or not proposed_issues:
+        return []
+    docs = index.docs if index is not None else {}
+    postings = index.postings if index is not None else {}
+
+    proposals = [_frequencies(issue.get("title", ""), issue.get("description", "")) for issue in proposed_issues]
+    proposal_df = Counter(term for frequencies in proposals for term in frequencies)
+    num_docs = len(docs) + len(proposals)
+    max_candidate_df = num_docs * CANDIDATE_MAX_DF
+    idf_memo: dict[str, float] = {}
+
+    def df(term: str) -> int:
+        return len(postings.get(term, ())) + proposal_df[term]
+
+    def idf(term: str) -> float:
+        if term not in idf_memo:
+            idf_memo[term] = math.log((1 + num_docs) / (1 + df(term))) + 1
+        return idf_memo[term]
+
+    doc_vectors: dict[int, tuple[dict, float]] = {}
+
+    def doc_vector(doc_id: int) -> tuple[dict, float]:
+        if doc_id not in doc_vectors:
+            weights = {term: postings[term][doc_id] * idf(term) for term in docs[doc_id]["terms"]}
+            doc_vectors[doc_id] = (weights, math.sqrt(sum(w * w for w in weights.values())))
+        return doc_vectors[doc_id]
+
+    def cosine(weights: dict, norm: float, other: tuple[dict, float]) -> float:
+        other_weights, other_norm = other
+        if not other_norm:
+            return 0.0
+        return sum(w * other_weights.get(term, 0.0) for term, w in weights.items()) / (norm * other_norm)
+
+    duplicates = []
+    kept: list[tuple[dict, tuple[dict, float]]] = []  # Earlier proposals that are not duplicates themselves
+    for issue, frequencies in zip(proposed_issues, proposals):
+        weights = {term: frequency * idf(term) for term, frequency in frequencies.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm:
+            continue
+        shared: dict[int, float] = {}
+        indexed_terms = sorted((term for term in weights if term in postings), key=df)
+        for position, term in enumerate(indexed_terms):
+            if position >= MIN_CANDIDATE_TERMS and df(term) > max_candidate_df:
+                break
+            term_weight = weights[term] * idf(term)
+            for doc_id, frequency in postings[term].items():
+                shared[doc_id] = shared.get(doc_id, 0.0) + term_weight * frequency
+        candidates = heapq.nlargest(MAX_CANDIDATES, (d for d in shared if docs[d]["kind"] == "issue"), key=shared.get)
+        best = None
+        for doc_id in candidates:
+            score = cosine(weights, norm, doc_vector(doc_id))
+            if score >= threshold and (best is None or score > best["score"]):
+                doc = docs[doc_id]
+                best = {"duplicate_of": doc["iid"], "duplicate_title": doc["title"], "existing": True, "score": score}
+        sibling_weights = {term: w * (math.log((1 + len(proposals)) / (1 + proposal_df[term])) + 1)
+                           for term, w in weights.items()}
+        sibling_vector = (sibling_weights, math.sqrt(sum(w * w for w in sibling_weights.values())))
+        for other, vector in kept:
+            score = cosine(*sibling_vector, vector)
+            if score >= threshold and (best is None or score > best["score"]):
+                best = {"duplicate_of": other["id"], "duplicate_title": other.get("title", ""), "existing": False, "score": score}
+        if best:
+            duplicates.append({"id": issue["id"], "title": issue.get("title", ""), **best, "score": round(best["score"], 3)})
+        else:
+            kept.append((issue, sibling_vector))
+    return duplicates
@@ -1,8 +1,23 @@
 import json
+import os
+import pickle
 import re
+import threading
 import yaml
 from pathlib import Path
-from gemini_gitlab_workflow import config
+from gemini_gitlab_workflow import config, instrumentation
+
+# Prefer the libyaml-backed loader/dumper when available; the project map is
+# the largest YAML document we handle and the pure-Python codec dominates I/O.
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# In-process memo of the parsed project map, keyed by the file's (path, mtime, size).
+# The map is stored pickled so every caller gets an independent copy; unpickling
+# is orders of magnitude faster than re-parsing the YAML. Mostly benefits the
+# long-running `ggw serve` daemon.
+_project_map_memo: tuple[tuple, bytes] | None = None
+_project_map_memo_lock = threading.Lock()
 
 def _slugify(text: str) -> str:
     """Converts text to a URL-friendly slug."""
@@ -61,21 +76,61 @@ def write_issue_file(relative_filepath: Path, issue_data) -> Path:
     Writes the content of a GitLab issue to a local Markdown file.
     `issue_data` is expected to be a GitLab issue object.
     """
-    content = _generate_markdown_content(issue_data)
-    full_filepath = config.DATA_DIR / relative_filepath
-    full_filepath.parent.mkdir(parents=True, exist_ok=True)
-    full_filepath.write_text(content, encoding='utf-8')
+    with instrumentation.span("fs.render_issue"):
+        content = _generate_markdown_content(issue_data)
+    with instrumentation.span("fs.write_issue"):
+        full_filepath = config.DATA_DIR / relative_filepath
+        full_filepath.parent.mkdir(parents=True, exist_ok=True)
+        full_filepath.write_text(content, encoding='utf-8')
     return full_filepath
 
+def _project_map_fingerprint() -> tuple | None:
+    """Returns the (path, mtime, size) fingerprint of the project map file, or None if missing."""
+    try:
+        stat = os.stat(config.PROJECT_MAP_PATH)
+    except FileNotFoundError:
+        return None
+    return (str(config.PROJECT_MAP_PATH), stat.st_mtime_ns, stat.st_size)
+
+def _remember_project_map(fingerprint: tuple | None, project_map_data: dict):
+    global _project_map_memo
+    with _project_map_memo_lock:
+        _project_map_memo = (fingerprint, pickle.dumps(project_map_data)) if fingerprint else None
+
 def write_project_map(project_map_data: dict):
-    """Writes the project map data to the YAML file."""
-    with open(config.PROJECT_MAP_PATH, 'w', encoding='utf-8') as f:
-        yaml.dump(project_map_data, f, sort_keys=False)
+    """
+    Writes the project map data to the YAML file. The file is replaced
+    atomically, so readers never see a partially written map.
+    """
+    temp_path = f"{config.PROJECT_MAP_PATH}.tmp"
+    with instrumentation.span("yaml.write_project_map"), open(temp_path, 'w', encoding='utf-8') as f:
+        yaml.dump(project_map_data, f, sort_keys=False, Dumper=_YamlDumper)
+    os.replace(temp_path, config.PROJECT_MAP_PATH)
+    _remember_project_map(_project_map_fingerprint(), project_map_data)
+
+def read_project_map() -> dict | None:
+    """
+    Reads the project map YAML file. Returns None if it does not exist.
+    Repeated reads of an unchanged file are served from an in-process memo.
+    """
+    fingerprint = _project_map_fingerprint()
+    if fingerprint is None:
+        return None
+    with _project_map_memo_lock:
+        memo = _project_map_memo
+    if memo and memo[0] == fingerprint:
+        instrumentation.count("yaml.project_map_memo_hits")
+        return pickle.loads(memo[1])
+
+    with instrumentation.span("yaml.read_project_map"), open(config.PROJECT_MAP_PATH, 'r', encoding='utf-8') as f:
+        project_map_data = yaml.load(f, Loader=_YamlLoader) or {}
+    _remember_project_map(fingerprint, project_map_data)
+    return project_map_data
 
 def read_timestamps_cache() -> dict:
     """Reads the timestamps cache file."""
-    config.CACHE_DIR.mkdir(exist_ok=True)
-    if not config.TIMESTAMPS_CACHE_PATH.exists():
+    Path(config.CACHE_DIR).mkdir(exist_ok=True)
+    if not Path(config.TIMESTAMPS_CACHE_PATH).exists():
         return {}
     try:
         with open(config.TIMESTAMPS_CACHE_PATH, 'r') as f:
@@ -85,6 +140,25 @@ def read_timestamps_cache() -> dict:
 
 def write_timestamps_cache(timestamps: dict):
     """Writes data to the timestamps cache file."""
-    config.CACHE_DIR.mkdir(exist_ok=True)
+    Path(config.CACHE_DIR).mkdir(exist_ok=True)
     with open(config.TIMESTAMPS_CACHE_PATH, 'w') as f:
         json.dump(timestamps, f, indent=2)
+
+def read_issue_notes() -> dict:
+    """
+    Reads the locally stored issue notes and the relationships parsed from them:
+    {"<iid>": {"updated_at", "user_notes_count", "cursor", "relationships", "event_updated_at",
+               "notes": [{"id", "body", "updated_at", "system", "relationships", "parser"}]}}.
+    Returns an empty dict if none have been stored yet.
+    """
+    try:
+        with open(config.ISSUE_NOTES_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, FileNotFoundError):
+        return {}
+
+def write_issue_notes(issue_notes: dict):
+    """Stores the issue notes fetched by a sync (see `read_issue_notes`)."""
+    Path(config.CACHE_DIR).mkdir(parents=True, exist_ok=True)
+    with instrumentation.span("fs.write_issue_notes"), open(config.ISSUE_NOTES_PATH, 'w', encoding='utf-8') as f:
+        json.dump(issue_notes, f, default=str)
@@ -1,7 +1,63 @@
 import os
+import threading
+import time
 import gitlab
 from functools import lru_cache
-from .config import GitlabConfig
+from requests.adapters import HTTPAdapter
+from .config import GitlabConfig, GITLAB_RATE_LIMIT, SYNC_CONCURRENCY
+from . import instrumentation
+
+# Optional requests transport adapter mounted on the python-gitlab session,
+# e.g. by the cassette module to record or replay traffic.
+_transport_adapter = None
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second on average (bursts of up
+    to `burst`), shared by every thread that calls `acquire`.
+    """
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Take the token now, even if it has yet to be earned: later callers queue behind.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            instrumentation.count("gitlab.rate_limited")
+            time.sleep(wait)
+
+class _RateLimitedAdapter(HTTPAdapter):
+    """Sends every request through a shared `RateLimiter`."""
+
+    def __init__(self, limiter: RateLimiter):
+        # One pooled connection per concurrently syncing project, at least.
+        super().__init__(pool_maxsize=max(10, SYNC_CONCURRENCY))
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        self.limiter.acquire()
+        return super().send(request, **kwargs)
+
+def set_transport_adapter(adapter):
+    """
+    Routes all GitLab HTTP traffic through `adapter` (a requests transport
+    adapter), or restores the default transport when None. The memoized client
+    is dropped so the next call picks the change up.
+    """
+    global _transport_adapter
+    _transport_adapter = adapter
+    get_gitlab_client.cache_clear()
 
 @lru_cache(maxsize=1)
 def get_gitlab_client():
@@ -13,7 +69,18 @@ def get_gitlab_client():
     try:
         config = GitlabConfig()
         gl = gitlab.Gitlab(config.url, private_token=config.private_token)
-        gl.auth()
+        # Lets --profile/--trace account for every HTTP request python-gitlab makes.
+        gl.session.hooks["response"].append(instrumentation.record_http_response)
+        if _transport_adapter is not None:
+            gl.session.mount("http://", _transport_adapter)
+            gl.session.mount("https://", _transport_adapter)
+        elif GITLAB_RATE_LIMIT > 0:
+            # A single client serves all threads, so concurrent syncs share the limit.
+            limited = _RateLimitedAdapter(RateLimiter(GITLAB_RATE_LIMIT))
+            gl.session.mount("http://", limited)
+            gl.session.mount("https://", limited)
+        with instrumentation.span("gitlab.auth"):
+            gl.auth()
         return gl
     except ValueError as e:
         # Re-raise the specific config error from the dataclass
@@ -38,6 +105,19 @@ def get_project_board(project_id: str):
         # The board with the given ID was not found
         return None
 
+def get_group_projects(group_id: str):
+    """Lists the projects of a group, including its subgroups, that have issues enabled."""
+    group = get_gitlab_client().groups.get(group_id, lazy=True)
+    return group.projects.list(all=True, include_subgroups=True, archived=False, with_issues_enabled=True)
+
+def get_group_issues(group_id: str, **kwargs):
+    """
+    Lists the issues of all projects in a group (one paginated listing instead
+    of one per project). Accepts the same filter arguments as `get_project_issues`.
+    """
+    group = get_gitlab_client().groups.get(group_id, lazy=True)
+    return group.issues.list(**kwargs)
+
 def get_project_issues(project_id: str, **kwargs):
     """
     Lists all issues for a given project.
@@ -57,10 +137,15 @@ def get_issue_links(project_id: str, issue_iid: int):
     issue = get_project_issue(project_id, issue_iid)
     return issue.links.list(all=True)
 
-def get_issue_notes(project_id: str, issue_iid: int):
-    """Lists all notes (comments) for a given issue."""
-    issue = get_project_issue(project_id, issue_iid)
-    return issue.notes.list(all=True)
+def get_issue_notes(project_id: str, issue_iid: int, **kwargs):
+    """
+    Lists the notes (comments) of an issue: all of them by default, or as
+    selected by python-gitlab list() arguments such as 'order_by', 'sort' and
+    'iterator' (with iterator=True, pages are only fetched while iterating).
+    """
+    # A lazy issue object: listing its notes does not need the issue itself.
+    issue = get_project(project_id).issues.get(issue_iid, lazy=True)
+    return issue.notes.list(**(kwargs or {"all": True}))
 
 def get_project_labels(project_id: str):
     """Lists all labels for a given project."""
@@ -1,5 +1,7 @@
 import os
-from . import gitlab_client, file_system_repo, project_mapper, gitlab_uploader
+from concurrent.futures import ThreadPoolExecutor
+import gitlab
+from . import config, gitlab_client, file_system_repo, project_mapper, gitlab_uploader, instrumentation, webhook
 
 def smart_sync() -> dict:
     """
@@ -35,10 +37,134 @@ def smart_sync() -> dict:
         "total_issues": len(current_timestamps)
     }
 
+def sync_project_map(force: bool = False) -> dict:
+    """
+    Performs a single sync step: lists the project's issues once, rebuilds the
+    project map and local files from that listing, and refreshes the timestamps
+    cache. The map is persisted once (by the mapper) and returned in memory
+    under "map_data" so callers do not need to re-read it from disk.
+
+    While a `ggw webhook serve` receiver keeps the mirror up to date, GitLab is
+    not polled and the local map is returned as is, unless `force` is set.
+    """
+    group_id, project_ids = config.multi_project_scope()
+    if group_id or project_ids:
+        return _sync_projects(group_id, project_ids)
+
+    project_id = os.getenv("GGW_GITLAB_PROJECT_ID")
+    if not project_id:
+        return {"status": "error", "message": "GGW_GITLAB_PROJECT_ID must be set."}
+
+    if not force and webhook.mirror_is_live():
+        project_map = file_system_repo.read_project_map()
+        if project_map is not None:
+            instrumentation.count("sync.skipped_for_webhook")
+            return {
+                "status": "success", "map_data": project_map, "issues_found": len(project_map.get("nodes", [])),
+                "updated_count": 0, "updated_issues": [], "source": "webhook",
+            }
+
+    try:
+        with instrumentation.span("sync.list_issues"):
+            all_issues = gitlab_client.get_project_issues(project_id, all=True)
+    except (ValueError, ConnectionError, gitlab.exceptions.GitlabError) as e:
+        return {"status": "error", "message": str(e)}
+    instrumentation.count("sync.issues", len(all_issues))
+
+    last_timestamps = file_system_repo.read_timestamps_cache()
+    current_timestamps = {str(issue.iid): issue.updated_at for issue in all_issues}
+    updated_issues = [
+        issue for issue in all_issues
+        if str(issue.iid) not in last_timestamps or last_timestamps[str(issue.iid)] < issue.updated_at
+    ]
+
+    with instrumentation.span("map.build"):
+        result = project_mapper.build_project_map(project_id, issues_list=all_issues)
+    if result["status"] != "success":
+        return result
+
+    file_system_repo.write_timestamps_cache(current_timestamps)
+    result["updated_count"] = len(updated_issues)
+    result["updated_issues"] = [{"iid": i.iid, "title": i.title} for i in updated_issues]
+    return result
+
+def _sync_projects(group_id: str, project_ids: list[str]) -> dict:
+    """
+    Syncs several projects into one map: those of the group `group_id` and/or
+    `project_ids`. A group's issues are listed in one paginated request instead
+    of one per project; the projects are then mapped concurrently (up to
+    SYNC_CONCURRENCY at a time), so a whole group takes about as long as its
+    largest project. Node ids are qualified with the project path ("group/app#12"),
+    which also resolves "blocked by other-app#3" across projects.
+    """
+    try:
+        with instrumentation.span("sync.list_projects"):
+            projects = {}
+            if group_id:
+                for project in gitlab_client.get_group_projects(group_id):
+                    projects[str(project.id)] = project.path_with_namespace
+            in_group = set(projects)
+            for project_id in project_ids:
+                project = gitlab_client.get_project(project_id)
+                projects[str(project.id)] = getattr(project, "path_with_namespace", str(project_id))
+
+        issues_by_project = {project_id: [] for project_id in projects}
+        with instrumentation.span("sync.list_issues"):
+            if group_id:
+                for issue in gitlab_client.get_group_issues(group_id, all=True):
+                    issues_by_project.setdefault(str(issue.project_id), []).append(issue)
+            listed = [p for p in projects if p not in in_group]
+            with ThreadPoolExecutor(max_workers=config.SYNC_CONCURRENCY) as pool:
+                for project_id, issues in zip(listed, pool.map(
+                        lambda p: gitlab_client.get_project_issues(p, all=True), listed)):
+                    issues_by_project[project_id] = issues
+    except (ValueError, ConnectionError, gitlab.exceptions.GitlabError) as e:
+        return {"status": "error", "message": str(e)}
+
+    def build(project_id: str) -> dict:
+        return project_mapper.build_project_map(
+            project_id, issues_list=issues_by_project[project_id], qualifier=projects[project_id], persist=False,
+        )
+
+    with instrumentation.span("map.build", projects=len(projects)):
+        with ThreadPoolExecutor(max_workers=config.SYNC_CONCURRENCY) as pool:
+            results = list(pool.map(build, projects))
+    failed = next((r for r in results if r["status"] != "success"), None)
+    if failed:
+        return failed
+
+    project_map = project_mapper.merge_project_maps([r["map_data"] for r in results])
+    issue_notes = {key: entry for r in results for key, entry in r["issue_notes"].items()}
+    file_system_repo.write_project_map(project_map)
+    file_system_repo.write_issue_notes(issue_notes)
+
+    last_timestamps = file_system_repo.read_timestamps_cache()
+    current_timestamps, updated_issues = {}, []
+    for project_id, issues in issues_by_project.items():
+        if project_id not in projects:
+            continue  # Listed by the group, but issues are disabled or the project is archived
+        instrumentation.count("sync.issues", len(issues))
+        for issue in issues:
+            key = project_mapper.qualify(int(issue.iid), projects[project_id])
+            current_timestamps[key] = issue.updated_at
+            if key not in last_timestamps or last_timestamps[key] < issue.updated_at:
+                updated_issues.append({"iid": key, "title": issue.title})
+    file_system_repo.write_timestamps_cache(current_timestamps)
+
+    return {
+        "status": "success", "map_data": project_map, "issues_found": len(project_map["nodes"]),
+        "updated_count": len(updated_issues), "updated_issues": updated_issues,
+        "projects": sorted(projects.values()),
+    }
+
 def build_project_map_and_sync_files() -> dict:
     """
     Orchestrates building the project map and syncing files from GitLab.
     """
+    group_id, project_ids = config.multi_project_scope()
+    if group_id or project_ids:
+        return _sync_projects(group_id, project_ids)
+
     project_id = os.getenv("GGW_GITLAB_PROJECT_ID")
     if not project_id:
         return {"status": "error", "message": "GGW_GITLAB_PROJECT_ID must be set."}
@@ -49,6 +175,12 @@ def upload_new_artifacts(project_map: dict) -> dict:
     """
     Orchestrates uploading new artifacts from the project map to GitLab.
     """
+    group_id, project_ids = config.multi_project_scope()
+    if group_id or project_ids:
+        # A merged map has path-qualified ids from several projects; it cannot be uploaded to one.
+        return {"status": "error", "message": "Upload is single-project only: unset GGW_GITLAB_GROUP_ID and "
+                                              "GGW_GITLAB_PROJECT_IDS and sync the project to upload to first."}
+
     project_id = os.getenv("GGW_GITLAB_PROJECT_ID")
     if not project_id:
         return {"status": "error", "message": "GGW_GITLAB_PROJECT_ID must be set."}
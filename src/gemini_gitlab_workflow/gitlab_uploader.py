@@ -1,7 +1,8 @@
 import time
 import gitlab
 import logging
-from . import gitlab_client
+from . import gitlab_client, instrumentation
+from .project_graph import ProjectGraph
 from .config import GitlabConfig, PROJECT_MAP_PATH, DATA_DIR
 from pathlib import Path
 import re
@@ -18,6 +19,7 @@ class GitlabUploader:
     def __init__(self, project_id: str, project_map: dict):
         self.project_id = project_id
         self.project_map = project_map
+        self.graph = ProjectGraph.from_map(project_map)
         self.config = GitlabConfig()
         self.yaml = YAML()
         self.yaml.preserve_quotes = True
@@ -30,14 +32,20 @@ class GitlabUploader:
     def upload(self) -> dict:
         """Main orchestration method."""
         try:
-            self._create_labels()
-            self._create_issues()
-            self._create_links()
-            self._update_project_map_iids()
-            self._reorder_stories_on_board()
+            with instrumentation.span("upload.create_labels"):
+                self._create_labels()
+            with instrumentation.span("upload.create_issues"):
+                self._create_issues()
+            with instrumentation.span("upload.create_links"):
+                self._create_links()
+            with instrumentation.span("upload.update_project_map"):
+                self._update_project_map_iids()
+            with instrumentation.span("upload.reorder_stories"):
+                self._reorder_stories_on_board()
         except gitlab.exceptions.GitlabError as e:
             logging.error(f"A GitLab API error occurred: {e}")
-            self._rollback()
+            with instrumentation.span("upload.rollback"):
+                self._rollback()
             return {"status": "error", "message": f"Failed to upload artifacts: {e}"}
         except Exception as e:
             logging.error(f"An unexpected error occurred: {e}")
@@ -97,8 +105,7 @@ class GitlabUploader:
         """Creates new issues in GitLab and prepares the reorder list."""
         logging.info("Step 2: Creating issues...")
         nodes_to_create = [node for node in self.project_map.get("nodes", []) if str(node.get("id", "")).startswith("NEW_")]
-        
-        id_to_node_map = {str(node['id']): node for node in self.project_map.get("nodes", [])}
+        epic_issues = {} # Epic IID -> issue object, fetched once per epic
 
         for node in nodes_to_create:
             description = self._read_description_from_md_file(node.get("local_path", ""))
@@ -113,12 +120,13 @@ class GitlabUploader:
             self.new_issue_id_map[node["id"]] = new_issue.iid
             
             if self.config.board_id and "Type::Story" in node.get("labels", []):
-                parent_epic_link = next((link for link in self.project_map.get("links", []) if link.get("type") == "contains" and str(link.get("target")) == str(node["id"])), None)
-                if parent_epic_link:
-                    epic_iid = self._resolve_iid(parent_epic_link.get("source"))
+                parent_epic_id = self.graph.parent_epic(node["id"])
+                if parent_epic_id is not None:
+                    epic_iid = self._resolve_iid(parent_epic_id)
                     if epic_iid:
-                        epic_issue = gitlab_client.get_project_issue(self.project_id, epic_iid)
-                        self.reorder_list.append((new_issue, epic_issue))
+                        if epic_iid not in epic_issues:
+                            epic_issues[epic_iid] = gitlab_client.get_project_issue(self.project_id, epic_iid)
+                        self.reorder_list.append((new_issue, epic_issues[epic_iid]))
 
             time.sleep(0.1)
         logging.info(f"Created {len(self.created_issues)} new issues.")
@@ -0,0 +1,161 @@
+"""
+Lightweight span instrumentation and counters for profiling ggw commands.
+
+Stages wrap their work in `span("name")` and report volumes with `count("name", n)`.
+Recording is off by default, in which case both calls are near no-ops; the CLI's
+`--profile` / `--trace` options switch it on for a single command.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Span:
+    """A single timed stage."""
+    name: str
+    start: float
+    duration: float
+    thread_id: int
+    args: dict = field(default_factory=dict)
+
+
+class Recorder:
+    """Collects spans and counters for the current command."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, enabled: bool = False):
+        """Discards everything recorded so far and switches recording on or off."""
+        with self._lock:
+            self.enabled = enabled
+            self.origin = time.perf_counter()
+            self.spans: list[Span] = []
+            self.counters: dict[str, int] = defaultdict(int)
+
+    @contextlib.contextmanager
+    def _span(self, name: str, args: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter() - start, **args)
+
+    def span(self, name: str, **args):
+        """Context manager timing the enclosed block as a span called `name`."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._span(name, args)
+
+    def add_span(self, name: str, start: float, duration: float, **args):
+        """Records an already measured span (`start` is a time.perf_counter() value)."""
+        if not self.enabled:
+            return
+        span = Span(name, start, duration, threading.get_ident(), args)
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, name: str, value: int = 1):
+        """Adds `value` to the counter called `name`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self) -> list[dict]:
+        """Aggregates spans by name, slowest total first."""
+        rows: dict[str, dict] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows.setdefault(span.name, {"name": span.name, "calls": 0, "total": 0.0, "max": 0.0})
+            row["calls"] += 1
+            row["total"] += span.duration
+            row["max"] = max(row["max"], span.duration)
+        for row in rows.values():
+            row["mean"] = row["total"] / row["calls"]
+        return sorted(rows.values(), key=lambda r: r["total"], reverse=True)
+
+    def to_chrome_trace(self) -> dict:
+        """Returns the recording in Chrome trace event format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        events = [
+            {
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (span.start - self.origin) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {k: str(v) for k, v in span.args.items()},
+            }
+            for span in spans
+        ]
+        end_ts = max((e["ts"] + e["dur"] for e in events), default=0)
+        events.extend(
+            {"name": name, "ph": "C", "ts": end_ts, "pid": pid, "tid": 0, "args": {"value": value}}
+            for name, value in sorted(counters.items())
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": counters}}
+
+    def write_chrome_trace(self, path):
+        """Writes the Chrome trace JSON to `path`."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+# Process-wide recorder used by all modules.
+recorder = Recorder()
+
+
+def span(name: str, **args):
+    """Times the enclosed block as a span on the global recorder."""
+    return recorder.span(name, **args)
+
+
+def count(name: str, value: int = 1):
+    """Increments a counter on the global recorder."""
+    recorder.count(name, value)
+
+
+def record_http_response(response, *args, **kwargs):
+    """
+    `requests` response hook installed on the python-gitlab session. Records one
+    span per HTTP request plus request, byte and retryable-status counters.
+    """
+    if not recorder.enabled:
+        return
+    elapsed = response.elapsed.total_seconds()
+    recorder.add_span(f"http.{response.request.method}", time.perf_counter() - elapsed, elapsed,
+                      url=response.url, status=response.status_code)
+    recorder.count("http.requests")
+    recorder.count("http.bytes", len(response.content or b""))
+    # python-gitlab retries 429s (and 5xx with retry_transient_errors) transparently.
+    if response.status_code == 429 or response.status_code >= 500:
+        recorder.count("http.retries")
+
+
+def record_llm_usage(response):
+    """Adds the token counts reported in a Gemini response's usage_metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    if not recorder.enabled or usage is None:
+        return
+    for attribute, counter in (
+        ("prompt_token_count", "llm.prompt_tokens"),
+        ("candidates_token_count", "llm.output_tokens"),
+        ("total_token_count", "llm.total_tokens"),
+        ("cached_content_token_count", "llm.cached_tokens"),
+    ):
+        value = getattr(usage, attribute, None)
+        if isinstance(value, int):
+            recorder.count(counter, value)
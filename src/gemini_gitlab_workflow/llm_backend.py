@@ -0,0 +1,489 @@
+"""
+LLM backends used by `ai_service.call_google_gemini_api`.
+
+A backend turns (messages, model name, response schema) into the raw JSON text
+of a structured response. `GeminiBackend` talks to Google Gemini; `StubBackend`
+is an offline stand-in that derives schema-valid payloads deterministically from
+the prompt, with configurable latency and estimated token accounting, so the AI
+stages can be run and benchmarked without network access.
+
+The active backend is chosen with GGW_LLM_BACKEND ("gemini" or "stub").
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from functools import lru_cache
+from types import SimpleNamespace
+
+from gemini_gitlab_workflow import config, instrumentation, llm_scheduler
+
+# HTTP statuses of Gemini errors that a later attempt may not run into
+# (google.api_core exceptions carry them as `code`).
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Errors creating cached content that asking again will not change
+_PREFIX_REFUSAL_RE = re.compile(r"too small|min_total_token_count|not supported|unsupported", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1)
+def _get_genai():
+    """
+    Imports and configures the Google Gemini client on first use.
+    google.generativeai is slow to import, so it is kept off the CLI startup path.
+    Returns None if the client cannot be configured.
+    """
+    try:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_WORKER_API_KEY"))
+        return genai
+    except Exception as e:
+        print(f"Error configuring Google Gemini API: {e}")
+        return None
+
+
+@lru_cache(maxsize=1)
+def _get_safety_settings() -> list[dict]:
+    """Defines safety settings to block harmful content."""
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+    return [
+        {
+            "category": HarmCategory.HARM_CATEGORY_HARASSMENT,
+            "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        },
+        {
+            "category": HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+            "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        },
+        {
+            "category": HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+            "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        },
+        {
+            "category": HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+            "threshold": HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        },
+    ]
+
+
+# Models are pooled by name (the safety settings are the same for every call):
+# each keeps its own API client, so its connections are reused across calls and threads.
+@lru_cache(maxsize=None)
+def _get_model(model_name: str):
+    return _get_genai().GenerativeModel(model_name, safety_settings=_get_safety_settings())
+
+
+_generation_configs: dict[str, object] = {}
+_generation_configs_lock = threading.Lock()
+
+
+def _get_generation_config(response_schema: dict):
+    """The GenerationConfig of a response schema, built once per distinct schema."""
+    key = json.dumps(response_schema, sort_keys=True)
+    with _generation_configs_lock:
+        if key not in _generation_configs:
+            _generation_configs[key] = _get_genai().GenerationConfig(
+                temperature=0,
+                response_mime_type="application/json",
+                response_schema=response_schema,
+            )
+        return _generation_configs[key]
+
+
+# --- Prompt prefix cache ---
+# Registry of the prompt prefixes a backend has cached, keyed by a hash of the
+# model and the prefix messages. It is persisted so that later runs find the
+# prefixes registered by earlier ones; entries expire with the backend's cache.
+
+_prefix_cache_lock = threading.Lock()
+
+
+def prefix_cache_key(model_name: str, prefix: list) -> str:
+    payload = json.dumps([model_name, prefix], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _read_prefix_cache() -> dict:
+    try:
+        with open(config.LLM_PREFIX_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _write_prefix_cache(entries: dict):
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    temp_path = f"{config.LLM_PREFIX_CACHE_PATH}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(temp_path, config.LLM_PREFIX_CACHE_PATH)
+
+
+def lookup_prefix(key: str) -> dict | None:
+    """The registry entry of a cached prefix ({"name", "tokens", "expires_at"}), or None if unknown or expired."""
+    with _prefix_cache_lock:
+        entry = _read_prefix_cache().get(key)
+    if entry and entry["expires_at"] > time.time():
+        return entry
+    return None
+
+
+def register_prefix(key: str, name: str | None, tokens: int):
+    """Records a prefix cached under `name` (None: the backend refused to cache it) for LLM_PREFIX_CACHE_TTL seconds."""
+    now = time.time()
+    with _prefix_cache_lock:
+        entries = {k: e for k, e in _read_prefix_cache().items() if e["expires_at"] > now}
+        entries[key] = {"name": name, "tokens": tokens, "expires_at": now + config.LLM_PREFIX_CACHE_TTL}
+        _write_prefix_cache(entries)
+
+
+def discard_prefix(key: str):
+    with _prefix_cache_lock:
+        entries = _read_prefix_cache()
+        if entries.pop(key, None) is not None:
+            _write_prefix_cache(entries)
+
+
+def _prefix_tokens(prefix: list) -> int:
+    return sum(estimate_tokens(str(part)) for m in prefix for part in m.get("parts", []))
+
+
+def _cacheable_prefix(messages: list, prefix_messages: int) -> list | None:
+    """The first `prefix_messages` messages, if prefix caching is enabled and they are large enough."""
+    if not prefix_messages or config.LLM_PREFIX_CACHE_TTL <= 0:
+        return None
+    prefix = messages[:prefix_messages]
+    if _prefix_tokens(prefix) < config.LLM_PREFIX_CACHE_MIN_TOKENS:
+        return None
+    return prefix
+
+
+class LLMBackend:
+    """
+    Interface of a backend. `generate` returns the response text, or None on failure.
+    The first `prefix_messages` messages are the static part of the prompt, which
+    backends may cache and reuse across calls.
+    """
+    name = "base"
+
+    def generate(self, messages: list, model_name: str, response_schema: dict, prefix_messages: int = 0) -> str | None:
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Pays one-off setup costs ahead of the first request (used by `ggw serve`)."""
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google.generativeai."""
+    name = "gemini"
+
+    def generate(self, messages: list, model_name: str, response_schema: dict, prefix_messages: int = 0) -> str | None:
+        genai = _get_genai()
+        if not genai:
+            print("Error: Google Gemini API client is not configured.")
+            return ''
+        try:
+            model = _get_model(model_name)
+            prefix = _cacheable_prefix(messages, prefix_messages)
+            if prefix:
+                cached_model = self._cached_prefix_model(genai, model_name, prefix)
+                if cached_model is not None:
+                    model, messages = cached_model, messages[prefix_messages:]
+            with instrumentation.span("llm.generate_content", model=model_name):
+                response = model.generate_content(
+                    messages, generation_config=_get_generation_config(response_schema),
+                    request_options={"timeout": llm_scheduler.request_timeout()},
+                )
+            instrumentation.count("llm.requests")
+            instrumentation.record_llm_usage(response)
+            return response.text
+        except Exception as e:
+            if isinstance(e, (TimeoutError, ConnectionError)) or getattr(e, "code", None) in RETRYABLE_STATUS_CODES:
+                raise llm_scheduler.RetryableLLMError(str(e)) from e
+            print(f"An error occurred while calling the Gemini API: {e}")
+            return None
+
+    def _cached_prefix_model(self, genai, model_name: str, prefix: list):
+        """
+        A model bound to the Gemini context cache holding `prefix`, created on
+        first use and reused until it expires. None if the prefix cannot be cached.
+        """
+        key = prefix_cache_key(model_name, prefix)
+        entry = lookup_prefix(key)
+        if entry and entry["name"] is None:
+            return None  # Refused before; not retried until the entry expires
+        try:
+            if entry:
+                instrumentation.count("llm.prefix_cache_hits")
+                return _get_cached_content_model(entry["name"])
+            instrumentation.count("llm.prefix_cache_misses")
+            with instrumentation.span("llm.cache_prefix", model=model_name):
+                cached_content = genai.caching.CachedContent.create(
+                    model=model_name, contents=prefix, ttl=timedelta(seconds=config.LLM_PREFIX_CACHE_TTL),
+                )
+            register_prefix(key, cached_content.name, _prefix_tokens(prefix))
+            return genai.GenerativeModel.from_cached_content(cached_content, safety_settings=_get_safety_settings())
+        except Exception as e:
+            # Send the whole prompt. Only a prefix the model cannot cache is remembered;
+            # after other errors (expired on the server, a network error) the next call tries again.
+            print(f"[WARN] Could not use a cached prompt prefix: {e}")
+            if _PREFIX_REFUSAL_RE.search(str(e)):
+                register_prefix(key, None, 0)
+            else:
+                discard_prefix(key)
+                _get_cached_content_model.cache_clear()
+            return None
+
+    def warm_up(self):
+        _get_genai()
+
+
+@lru_cache(maxsize=32)
+def _get_cached_content_model(cached_content_name: str):
+    genai = _get_genai()
+    cached_content = genai.caching.CachedContent.get(cached_content_name)
+    return genai.GenerativeModel.from_cached_content(cached_content, safety_settings=_get_safety_settings())
+
+
+# --- Offline stand-in ---
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SOURCE_LINE_RE = re.compile(r"^- File: (?P<path>.+?), Description: (?P<summary>.*)$", re.MULTILINE)
+_USER_REQUEST_RE = re.compile(r'User Request:\**\s*"(?P<request>.*?)"', re.DOTALL)
+_DOCUMENT_RE = re.compile(r"^=== Document (?P<id>\S+) ===\n(?P<content>.*?)(?=^=== Document |\Z)", re.MULTILINE | re.DOTALL)
+_FRONTMATTER_RE = re.compile(r"\A---\n.*?\n---\n", re.DOTALL)
+_FEEDBACK_RE = re.compile(r'Requested Changes:\**\s*"(?P<feedback>.*?)"', re.DOTALL)
+_NEW_ID_RE = re.compile(r"\bNEW_\w+")
+_BACKBONE_LABEL_RE = re.compile(r"'(Backbone::[^']+)'")
+_STOPWORDS = frozenset("a an and are as at be by for from in into is it of on or so that the this to with".split())
+
+# Upper bound of files the stub selects for a context-file request.
+STUB_MAX_RELEVANT_FILES = 5
+# Length in words of a stub document summary.
+STUB_SUMMARY_WORDS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), as used by the stub's accounting."""
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+def _words(text: str) -> list[str]:
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and len(w) > 2]
+
+
+def _message_text(messages: list, role: str) -> str:
+    return "\n".join(str(part) for m in messages if m.get("role") == role for part in m.get("parts", []))
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic offline backend. The same prompt always yields the same payload.
+
+    `latency` seconds are added to every call, plus the estimated output tokens
+    divided by `tokens_per_second` when that is set, to mimic generation time.
+    Token estimates are reported through the usual llm.* counters and summed in `usage`.
+    """
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0, tokens_per_second: float = 0.0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.usage: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def generate(self, messages: list, model_name: str, response_schema: dict, prefix_messages: int = 0) -> str | None:
+        cached_tokens = self._cached_prefix_tokens(messages, model_name, prefix_messages)
+        with instrumentation.span("llm.generate_content", model=model_name, backend=self.name):
+            user_text = _message_text(messages, "user")
+            properties = response_schema.get("properties", {})
+            if "relevant_files" in properties:
+                payload = self._relevant_files(user_text)
+            elif "removed_issue_ids" in properties:
+                payload = self._plan_revision(user_text)
+            elif "summaries" in properties:
+                payload = self._document_summaries(user_text)
+            elif "proposed_issues" in properties:
+                payload = self._implementation_plan(user_text, _message_text(messages, "model"))
+            else:
+                payload = _instance_from_schema(response_schema)
+            text = json.dumps(payload)
+
+            prompt_tokens = sum(estimate_tokens(str(part)) for m in messages for part in m.get("parts", []))
+            output_tokens = estimate_tokens(text)
+            delay = self.latency + (output_tokens / self.tokens_per_second if self.tokens_per_second else 0.0)
+            if delay:
+                time.sleep(delay)
+
+        with self._lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["output_tokens"] += output_tokens
+            self.usage["cached_tokens"] += cached_tokens
+        instrumentation.count("llm.requests")
+        instrumentation.record_llm_usage(SimpleNamespace(usage_metadata=SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+            cached_content_token_count=cached_tokens,
+        )))
+        return text
+
+    def _cached_prefix_tokens(self, messages: list, model_name: str, prefix_messages: int) -> int:
+        """
+        Simulates Gemini's context cache with the same registry: the first call
+        registers the prefix, later ones (also in later runs) report its tokens
+        as cached, like Gemini's cached_content_token_count.
+        """
+        prefix = _cacheable_prefix(messages, prefix_messages)
+        if not prefix:
+            return 0
+        key = prefix_cache_key(model_name, prefix)
+        entry = lookup_prefix(key)
+        if entry:
+            instrumentation.count("llm.prefix_cache_hits")
+            return entry["tokens"]
+        instrumentation.count("llm.prefix_cache_misses")
+        register_prefix(key, f"stub/{key[:16]}", _prefix_tokens(prefix))
+        return 0
+
+    def _relevant_files(self, user_text: str) -> dict:
+        """Ranks the listed sources by word overlap with the user request."""
+        match = _USER_REQUEST_RE.search(user_text)
+        request_words = set(_words(match.group("request") if match else user_text))
+        scored = []
+        for source in _SOURCE_LINE_RE.finditer(user_text):
+            overlap = len(request_words & set(_words(f"{source['path']} {source['summary']}")))
+            if overlap:
+                scored.append((-overlap, source["path"]))
+        return {"relevant_files": [path for _, path in sorted(scored)[:STUB_MAX_RELEVANT_FILES]]}
+
+    def _plan_revision(self, user_text: str) -> dict:
+        """Drops the issues whose ids the feedback mentions ("drop NEW_3"); nothing is added or changed."""
+        match = _FEEDBACK_RE.search(user_text)
+        removed = _NEW_ID_RE.findall(match.group("feedback")) if match else []
+        return {"proposed_issues": [], "removed_issue_ids": list(dict.fromkeys(removed))}
+
+    def _document_summaries(self, user_text: str) -> dict:
+        """Summarizes each document by its first lines of text, without Markdown markup and frontmatter."""
+        summaries = []
+        for document in _DOCUMENT_RE.finditer(user_text):
+            content = _FRONTMATTER_RE.sub("", document["content"].strip() + "\n")
+            lines = [line.strip("#->*` ").strip() for line in content.splitlines()]
+            words = " ".join(line for line in lines if line).split()
+            summaries.append({"id": document["id"], "summary": " ".join(words[:STUB_SUMMARY_WORDS])})
+        return {"summaries": summaries}
+
+    def _implementation_plan(self, user_text: str, system_text: str = "") -> dict:
+        """
+        Builds one new epic plus 2-4 chained stories named after the request, in
+        one of the backbones of the existing issues (listed in either message).
+        """
+        match = _USER_REQUEST_RE.search(user_text)
+        request = (match.group("request") if match else user_text).strip()
+        words = _words(request) or ["feature"]
+        digest = int(hashlib.sha256(request.encode("utf-8")).hexdigest(), 16)
+
+        backbones = sorted(set(_BACKBONE_LABEL_RE.findall(system_text + user_text)))
+        backbone = backbones[digest % len(backbones)] if backbones else "Backbone::General"
+        epic_title = " ".join(words[:4]).title()
+        epic_label = f"Epic::{epic_title}"
+
+        issues = [{
+            "id": "NEW_1",
+            "title": epic_title,
+            "description": _story_description(epic_title, request),
+            "labels": ["Type::Epic", epic_label, backbone],
+        }]
+        num_stories = 2 + digest % 3
+        for n in range(num_stories):
+            focus = words[n % len(words)]
+            title = f"{focus.capitalize()} for {epic_title.lower()} ({n + 1})"
+            issue = {
+                "id": f"NEW_{n + 2}",
+                "title": title,
+                "description": _story_description(title, request),
+                "labels": ["Type::Story", epic_label, backbone],
+            }
+            if n:
+                issue["dependencies"] = {"is_blocked_by": [f"NEW_{n + 1}"]}
+            issues.append(issue)
+        return {"proposed_issues": issues}
+
+
+def _story_description(title: str, request: str) -> str:
+    return (
+        f"# {title}\n\n### User Story\n\n**As a** user,\n**I want to** {request[:1].lower()}{request[1:120]},\n"
+        f"**So that** I can get my work done.\n\n---\n\n### Acceptance Criteria\n\n"
+        f"- [ ] {title} works as described.\n"
+    )
+
+
+def _instance_from_schema(schema: dict):
+    """Minimal value satisfying a JSON schema (required properties only)."""
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        return {key: _instance_from_schema(properties.get(key, {})) for key in schema.get("required", [])}
+    if schema_type == "array":
+        return []
+    if schema_type in ("integer", "number"):
+        return 0
+    if schema_type == "boolean":
+        return False
+    return ""
+
+
+# --- Backend selection ---
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+_backends: dict[str, LLMBackend] = {}
+_backends_lock = threading.Lock()
+# Optional callable wrapping every backend on creation (used for record/replay).
+_backend_wrapper = None
+
+
+def _create_backend(name: str) -> LLMBackend:
+    if name == "stub":
+        return StubBackend(latency=config.LLM_STUB_LATENCY, tokens_per_second=config.LLM_STUB_TOKENS_PER_SECOND)
+    return BACKENDS[name]()
+
+
+def get_backend(name: str | None = None) -> LLMBackend:
+    """
+    Returns the (process-wide) backend called `name`, defaulting to GGW_LLM_BACKEND.
+    Raises ValueError for unknown names.
+    """
+    name = (name or config.LLM_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'. Available backends: {', '.join(sorted(BACKENDS))}.")
+    with _backends_lock:
+        if name not in _backends:
+            backend = _create_backend(name)
+            _backends[name] = _backend_wrapper(backend) if _backend_wrapper else backend
+        return _backends[name]
+
+
+def reset_backends():
+    """Forgets created backends, e.g. after the configuration changed."""
+    with _backends_lock:
+        _backends.clear()
+    _get_model.cache_clear()
+    _get_cached_content_model.cache_clear()
+    with _generation_configs_lock:
+        _generation_configs.clear()
+
+
+def set_backend_wrapper(wrapper):
+    """
+    Installs `wrapper(backend) -> backend`, applied to every backend handed out
+    from now on, or removes it when None.
+    """
+    global _backend_wrapper
+    with _backends_lock:
+        _backend_wrapper = wrapper
+        _backends.clear()
@@ -0,0 +1,129 @@
+"""
+Scheduling of LLM calls: a latency budget per command, retries and model routing.
+
+Every `ggw` command may spend LLM_BUDGET seconds on model calls (see `budget`);
+work made of many independent model calls, like a batch of features, gets a
+budget scaled to its size (see `scaled_budget`). `call` runs one request within it:
+
+- Routing: a smart-model request whose whole prompt (including the cacheable
+  prefix, which holds the existing issues) is estimated at no more than
+  LLM_ROUTE_FAST_MAX_TOKENS tokens goes to the fast model.
+- Retries: failures the backend reports as retryable (rate limits, overload,
+  timeouts) are retried up to LLM_MAX_RETRIES times, after an exponential
+  backoff with full jitter, as long as the budget allows.
+- Fallback: once less than LLM_FALLBACK_SECONDS of the budget remain, smart-model
+  requests go to the fast model; with nothing left, no request is made.
+
+Every decision is logged and counted (llm.routed_fast, llm.retries,
+llm.fallbacks, llm.deadline_exceeded).
+"""
+import contextlib
+import logging
+import math
+import random
+import threading
+import time
+from typing import Callable
+
+from gemini_gitlab_workflow import config, instrumentation
+
+
+class RetryableLLMError(Exception):
+    """A backend failure worth retrying: rate limiting, overload or a timeout."""
+
+
+_deadline: float | None = None  # time.monotonic() value, None without a budget
+_deadline_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def budget(seconds: float | None = None):
+    """Limits the model calls made inside the block to `seconds` in total (default LLM_BUDGET; 0: no limit)."""
+    global _deadline
+    seconds = config.LLM_BUDGET if seconds is None else seconds
+    with _deadline_lock:
+        previous = _deadline
+        _deadline = time.monotonic() + seconds if seconds > 0 else None
+    try:
+        yield
+    finally:
+        with _deadline_lock:
+            _deadline = previous
+
+
+def scaled_budget(items: int):
+    """
+    A budget for `items` independent units of work (features of a batch, summary
+    requests), run LLM_CONCURRENCY at a time: LLM_BUDGET for each round of them,
+    so that the last units are not starved by the first ones.
+    """
+    rounds = max(1, math.ceil(items / max(config.LLM_CONCURRENCY, 1)))
+    return budget(config.LLM_BUDGET * rounds)
+
+
+def remaining() -> float | None:
+    """Seconds left in the current budget, or None without a budget."""
+    deadline = _deadline
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def request_timeout() -> float:
+    """The deadline of a single request: LLM_TIMEOUT, or less if the budget runs out sooner."""
+    left = remaining()
+    return config.LLM_TIMEOUT if left is None else min(config.LLM_TIMEOUT, left)
+
+
+def route(messages: list, model_name: str, record: bool = True) -> str:
+    """
+    The model a request is sent to: the fast one for a smart-model request of
+    low estimated complexity. With `record`, the decision is logged and counted.
+    """
+    from gemini_gitlab_workflow.llm_backend import estimate_tokens
+
+    if model_name != config.GEMINI_SMART_MODEL or config.LLM_ROUTE_FAST_MAX_TOKENS <= 0:
+        return model_name
+    complexity = sum(estimate_tokens(str(part)) for m in messages for part in m.get("parts", []))
+    if complexity > config.LLM_ROUTE_FAST_MAX_TOKENS:
+        if record:
+            logging.info(f"LLM routing: {model_name} (complexity {complexity} tokens)")
+        return model_name
+    if record:
+        logging.info(f"LLM routing: {model_name} -> {config.GEMINI_FAST_MODEL} "
+                     f"(complexity {complexity} <= {config.LLM_ROUTE_FAST_MAX_TOKENS} tokens)")
+        instrumentation.count("llm.routed_fast")
+    return config.GEMINI_FAST_MODEL
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(config.LLM_RETRY_MAX_DELAY, config.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def call(generate: Callable[[str], str | None], model_name: str) -> tuple[str | None, str]:
+    """
+    Runs `generate(model)` with retries and the budget fallback described above.
+    Returns the response (None on failure) and the model that produced it.
+    """
+    for attempt in range(config.LLM_MAX_RETRIES + 1):
+        left = remaining()
+        if left is not None and left <= 0:
+            logging.warning(f"LLM budget exhausted: {model_name} request not sent.")
+            instrumentation.count("llm.deadline_exceeded")
+            return None, model_name
+        if left is not None and left < config.LLM_FALLBACK_SECONDS and model_name == config.GEMINI_SMART_MODEL:
+            logging.warning(f"LLM routing: {model_name} -> {config.GEMINI_FAST_MODEL} "
+                            f"({left:.0f}s of the budget left)")
+            instrumentation.count("llm.fallbacks")
+            model_name = config.GEMINI_FAST_MODEL
+
+        try:
+            return generate(model_name), model_name
+        except RetryableLLMError as e:
+            delay = _backoff(attempt)
+            left = remaining()
+            if attempt == config.LLM_MAX_RETRIES or (left is not None and delay >= left):
+                print(f"An error occurred while calling the {model_name} model: {e}")
+                return None, model_name
+            logging.warning(f"Retrying {model_name} request in {delay:.1f}s ({e})")
+            instrumentation.count("llm.retries")
+            time.sleep(delay)
+    return None, model_name
@@ -0,0 +1,395 @@
+"""
+In-memory graph model of the project map.
+
+`ProjectGraph` indexes the `{"nodes": [...], "links": [...]}` project map by id,
+title, label, backbone, epic and link direction, so consumers do not have to
+re-scan the node and link lists. Derived queries (children of an epic, blockers,
+topological order, cycles, critical path) are cached until the graph changes.
+Graph algorithms run on a networkx view built on first use; networkx is slow to
+import, so plain lookups never load it.
+
+The graph writes through: its mutations (`add_node`, `add_link`, `relabel`, ...)
+also update the underlying map dict, which can be persisted with `file_system_repo.write_project_map`.
+`load_project_graph` keeps the pickled graph, indexes included, next to the other
+caches, so commands such as `ggw query` skip both the YAML parse and the indexing.
+"""
+import os
+import pickle
+import threading
+from collections import defaultdict
+from functools import wraps
+
+from gemini_gitlab_workflow import config, file_system_repo, instrumentation
+
+CONTAINS = "contains"
+BLOCKS = "blocks"
+
+
+def _cached(method):
+    """Caches a query's result per arguments until the next mutation of the graph."""
+    @wraps(method)
+    def wrapper(self, *args):
+        key = (method.__name__, args)
+        if key not in self._cache:
+            self._cache[key] = method(self, *args)
+        return self._cache[key]
+    return wrapper
+
+
+class ProjectGraph:
+    """Indexed graph view over a project map. Build it with `ProjectGraph.from_map`."""
+
+    def __init__(self, project_map: dict | None = None):
+        self.project_map = project_map if project_map is not None else {}
+        self.project_map.setdefault("nodes", [])
+        self.project_map.setdefault("links", [])
+        self._reindex()
+
+    @classmethod
+    def from_map(cls, project_map: dict | None) -> "ProjectGraph":
+        """Builds the graph over `project_map` (an empty map when None)."""
+        return cls(project_map if project_map is not None else {"nodes": [], "links": []})
+
+    def __getstate__(self):
+        # Indexes are pickled with the map; query caches and the networkx view are not.
+        state = self.__dict__.copy()
+        state["_cache"] = {}
+        state["_nx_graph"] = None
+        return state
+
+    # --- Indexing ---
+
+    def _reindex(self):
+        self._nodes: dict = {}
+        self._by_title: dict[str, object] = {}
+        self._by_label: dict[str, set] = defaultdict(set)
+        self._epic_by_label: dict[str, object] = {}
+        self._epic_by_title: dict[str, object] = {}
+        self._links: set = set()
+        self._out: dict[str, dict[object, list]] = {} # link type -> source -> targets
+        self._in: dict[str, dict[object, list]] = {} # link type -> target -> sources
+        self._cache: dict = {}
+        self._nx_graph = None
+        for node in self.project_map["nodes"]:
+            self._index_node(node)
+        for link in self.project_map["links"]:
+            self._index_link(link["source"], link["target"], link.get("type"))
+
+    def _index_node(self, node: dict):
+        node_id = node["id"]
+        self._nodes[node_id] = node
+        title = node.get("title")
+        if title is not None:
+            self._by_title.setdefault(title, node_id)
+        labels = node.get("labels") or []
+        for label in labels:
+            self._by_label[label].add(node_id)
+        if "Type::Epic" in labels:
+            if title is not None:
+                self._epic_by_label.setdefault(f"Epic::{title}", node_id)
+                self._epic_by_title.setdefault(title.strip().lower(), node_id)
+            for label in labels:
+                if label.startswith("Epic::"):
+                    self._epic_by_label.setdefault(label, node_id)
+
+    def _index_link(self, source, target, link_type: str):
+        self._links.add((source, target, link_type))
+        self._out.setdefault(link_type, {}).setdefault(source, []).append(target)
+        self._in.setdefault(link_type, {}).setdefault(target, []).append(source)
+
+    def _changed(self):
+        self._cache.clear()
+        self._nx_graph = None
+
+    # --- Lookups ---
+
+    def __contains__(self, node_id) -> bool:
+        return node_id in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def node(self, node_id) -> dict | None:
+        """The map node with `node_id`, or None."""
+        return self._nodes.get(node_id)
+
+    def nodes(self) -> list[dict]:
+        return list(self.project_map["nodes"])
+
+    def links(self) -> list[dict]:
+        return list(self.project_map["links"])
+
+    def id_for_title(self, title: str):
+        """The id of the (first) node titled `title`, or None."""
+        return self._by_title.get(title)
+
+    def resolve(self, ref):
+        """
+        The id of the node referenced by `ref`: an id (numeric strings included),
+        an exact title, or a case-insensitive epic title. None if nothing matches.
+        """
+        if ref in self._nodes:
+            return ref
+        if isinstance(ref, str):
+            if ref.strip().isdigit() and int(ref) in self._nodes:
+                return int(ref)
+            if ref in self._by_title:
+                return self._by_title[ref]
+            return self._epic_by_title.get(ref.strip().lower())
+        return None
+
+    def with_label(self, label: str) -> set:
+        """Ids of all nodes carrying `label`."""
+        return set(self._by_label.get(label, ()))
+
+    def in_backbone(self, backbone: str) -> set:
+        """Ids of all nodes labelled `Backbone::<backbone>`."""
+        return self.with_label(f"Backbone::{backbone}")
+
+    def epic_for_label(self, epic_label: str) -> dict | None:
+        """The epic node identified by an `Epic::<title>` label, or None."""
+        node_id = self._epic_by_label.get(epic_label)
+        return None if node_id is None else self.node(node_id)
+
+    def epic_for_title(self, title: str) -> dict | None:
+        """The epic node whose title matches `title` case-insensitively, or None."""
+        node_id = self._epic_by_title.get(title.strip().lower())
+        return None if node_id is None else self.node(node_id)
+
+    def has_link(self, source, target, link_type: str) -> bool:
+        return (source, target, link_type) in self._links
+
+    @property
+    def graph(self):
+        """The graph as a networkx MultiDiGraph (one edge per link, keyed by type), built on first use."""
+        if self._nx_graph is None:
+            import networkx as nx
+            graph = nx.MultiDiGraph()
+            graph.add_nodes_from((node_id, {"node": node}) for node_id, node in self._nodes.items())
+            for link in self.project_map["links"]:
+                graph.add_edge(link["source"], link["target"], key=link.get("type"), link=link)
+            self._nx_graph = graph
+        return self._nx_graph
+
+    # --- Derived queries (cached) ---
+
+    @_cached
+    def children(self, epic_id) -> list:
+        """Ids of the issues an epic contains."""
+        return list(self._out.get(CONTAINS, {}).get(epic_id, ()))
+
+    @_cached
+    def parent_epic(self, node_id):
+        """Id of the epic containing `node_id`, or None."""
+        parents = self._in.get(CONTAINS, {}).get(node_id)
+        return parents[0] if parents else None
+
+    @_cached
+    def blockers(self, node_id) -> list:
+        """Ids of the issues directly blocking `node_id`."""
+        return list(self._in.get(BLOCKS, {}).get(node_id, ()))
+
+    @_cached
+    def blocked_by_this(self, node_id) -> list:
+        """Ids of the issues `node_id` directly blocks."""
+        return list(self._out.get(BLOCKS, {}).get(node_id, ()))
+
+    @_cached
+    def all_blockers(self, node_id) -> list:
+        """Ids of every issue `node_id` transitively depends on, nearest first."""
+        seen, order, frontier = {node_id}, [], [node_id]
+        while frontier:
+            next_frontier = []
+            for current in frontier:
+                for blocker in self.blockers(current):
+                    if blocker not in seen:
+                        seen.add(blocker)
+                        order.append(blocker)
+                        next_frontier.append(blocker)
+            frontier = next_frontier
+        return order
+
+    def filter(self, labels=(), state: str | None = None, backbone: str | None = None,
+               epic=None, issue_type: str | None = None) -> list[dict]:
+        """
+        Nodes matching every given criterion, in map order. `epic` is an epic id or
+        title; it matches the epic's children and issues labelled `Epic::<title>`.
+        """
+        candidates = None
+        required = list(labels)
+        if backbone:
+            required.append(f"Backbone::{backbone}")
+        if issue_type:
+            required.append(f"Type::{issue_type}")
+        for label in required:
+            ids = self._by_label.get(label, set())
+            candidates = set(ids) if candidates is None else candidates & ids
+        if epic is not None:
+            epic_id = self.resolve(epic)
+            epic_node = self.node(epic_id) if epic_id is not None else None
+            members = set(self.children(epic_id)) if epic_id is not None else set()
+            if epic_node:
+                members |= self._by_label.get(f"Epic::{epic_node['title']}", set())
+            candidates = members if candidates is None else candidates & members
+        nodes = self.project_map["nodes"] if candidates is None else [n for n in self.project_map["nodes"] if n["id"] in candidates]
+        if state:
+            nodes = [n for n in nodes if n.get("state", "opened") == state]
+        return list(nodes)
+
+    def _blocks_graph(self, open_only: bool = False):
+        import networkx as nx
+        blocks = nx.DiGraph()
+        for link in self.project_map["links"]:
+            if link.get("type") != BLOCKS:
+                continue
+            u, v = link["source"], link["target"]
+            if open_only and not (self._is_open(u) and self._is_open(v)):
+                continue
+            blocks.add_edge(u, v)
+        return blocks
+
+    def _is_open(self, node_id) -> bool:
+        node = self.node(node_id)
+        return node is not None and node.get("state", "opened") != "closed"
+
+    @_cached
+    def cycles(self) -> list[list]:
+        """Blocking cycles (each a list of ids); empty when the dependencies form a DAG."""
+        import networkx as nx
+        return [list(cycle) for cycle in nx.simple_cycles(self._blocks_graph())]
+
+    @_cached
+    def topological_order(self) -> list:
+        """
+        All node ids ordered so that every blocker precedes the issues it blocks.
+        Raises ValueError if the blocking links contain a cycle.
+        """
+        import networkx as nx
+        order = nx.DiGraph()
+        order.add_nodes_from(self._nodes)
+        order.add_edges_from(self._blocks_graph().edges)
+        try:
+            return list(nx.topological_sort(order))
+        except nx.NetworkXUnfeasible as e:
+            raise ValueError(f"Blocking links contain a cycle: {self.cycles()[0]}") from e
+
+    @_cached
+    def critical_path(self, node_id=None) -> list:
+        """
+        Longest chain of open blockers, in dependency order. With `node_id`, the
+        longest chain ending at that issue; otherwise across the whole project.
+        """
+        import networkx as nx
+        blocks = self._blocks_graph(open_only=True)
+        if not nx.is_directed_acyclic_graph(blocks):
+            raise ValueError(f"Blocking links contain a cycle: {self.cycles()[0]}")
+        if node_id is None:
+            return nx.dag_longest_path(blocks)
+        if node_id not in blocks:
+            return [node_id]
+        ancestors = nx.ancestors(blocks, node_id) | {node_id}
+        return nx.dag_longest_path(blocks.subgraph(ancestors))
+
+    # --- Incremental updates ---
+
+    def add_node(self, node: dict) -> dict:
+        """Adds `node` to the graph and the map."""
+        if node["id"] in self._nodes:
+            raise ValueError(f"Node {node['id']!r} already exists.")
+        self.project_map["nodes"].append(node)
+        self._index_node(node)
+        self._changed()
+        return node
+
+    def add_link(self, source, target, link_type: str) -> bool:
+        """Adds a link to the graph and the map unless it already exists. Returns True if added."""
+        if self.has_link(source, target, link_type):
+            return False
+        self.project_map["links"].append({"source": source, "target": target, "type": link_type})
+        self._index_link(source, target, link_type)
+        self._changed()
+        return True
+
+    def update_node(self, node_id, **fields) -> dict:
+        """Updates the fields of an existing node in the graph and the map."""
+        node = self._nodes.get(node_id)
+        if node is None:
+            raise ValueError(f"Node {node_id!r} does not exist.")
+        node.update(fields)
+        self._reindex()
+        return node
+
+    def remove_links(self, node_id, link_type: str) -> int:
+        """Removes all `link_type` links from or to `node_id`. Returns how many were removed."""
+        links = self.project_map["links"]
+        kept = [l for l in links if l.get("type") != link_type or node_id not in (l["source"], l["target"])]
+        if len(kept) == len(links):
+            return 0
+        removed = len(links) - len(kept)
+        links[:] = kept
+        self._reindex()
+        return removed
+
+    def relabel(self, mapping: dict):
+        """Renames node ids (e.g. temporary "NEW_" ids to GitLab IIDs) in the graph and the map."""
+        mapping = {old: new for old, new in mapping.items() if old in self._nodes}
+        if not mapping:
+            return
+        for node in self.project_map["nodes"]:
+            node["id"] = mapping.get(node["id"], node["id"])
+        for link in self.project_map["links"]:
+            link["source"] = mapping.get(link["source"], link["source"])
+            link["target"] = mapping.get(link["target"], link["target"])
+        self._reindex()
+
+
+# --- Persisted graph ---
+
+_loaded: tuple[tuple, ProjectGraph] | None = None
+_loaded_lock = threading.Lock()
+
+
+def load_project_graph() -> ProjectGraph | None:
+    """
+    Returns the graph of the local project map, or None if there is no map.
+
+    The graph is pickled to PROJECT_GRAPH_CACHE_PATH together with the map file's
+    fingerprint and reused until the map changes; within a process (e.g. `ggw
+    serve`) the loaded graph is kept in memory as well.
+    """
+    global _loaded
+    fingerprint = file_system_repo._project_map_fingerprint()
+    if fingerprint is None:
+        return None
+    with _loaded_lock:
+        if _loaded and _loaded[0] == fingerprint:
+            instrumentation.count("graph.memo_hits")
+            return _loaded[1]
+
+    graph = _read_graph_cache(fingerprint)
+    if graph is None:
+        with instrumentation.span("graph.build"):
+            graph = ProjectGraph.from_map(file_system_repo.read_project_map())
+        _write_graph_cache(fingerprint, graph)
+    with _loaded_lock:
+        _loaded = (fingerprint, graph)
+    return graph
+
+
+def _read_graph_cache(fingerprint: tuple) -> ProjectGraph | None:
+    try:
+        with instrumentation.span("graph.load_cache"), open(config.PROJECT_GRAPH_CACHE_PATH, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if cached.get("fingerprint") != fingerprint:
+        return None
+    return cached["graph"]
+
+
+def _write_graph_cache(fingerprint: tuple, graph: ProjectGraph):
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    temp_path = f"{config.PROJECT_GRAPH_CACHE_PATH}.tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump({"fingerprint": fingerprint, "graph": graph}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, config.PROJECT_GRAPH_CACHE_PATH)
@@ -1,40 +1,157 @@
 from pathlib import Path
 import gitlab
-import re
-from . import gitlab_client, file_system_repo
-
-def _parse_relationships(current_issue_iid: int, text: str) -> list[dict]:
-    """Parses blocking/blocked by relationships from issue description or comments."""
-    relationships = []
-    # Using a simplified regex for demonstration
-    blocking_pattern = re.compile(r"/blocking\s+#(\d+)", re.IGNORECASE)
-    for match in blocking_pattern.finditer(text):
-        target_iid = int(match.group(1))
-        relationships.append({"source": current_issue_iid, "target": target_iid, "type": "blocks"})
-    
-    blocked_by_pattern = re.compile(r"/blocked by\s+#(\d+)", re.IGNORECASE)
-    for match in blocked_by_pattern.finditer(text):
-        source_iid = int(match.group(1))
-        relationships.append({"source": source_iid, "target": current_issue_iid, "type": "blocks"})
-        
+from . import gitlab_client, file_system_repo, instrumentation
+from .project_graph import ProjectGraph
+from .relationships import PARSER_VERSION, extract_relationships, local_only
+
+# Notes per page when only the notes added or edited since the last sync are fetched.
+NOTES_PAGE_SIZE = 20
+
+def note_entry(issue_iid: int, note, cached_notes: dict) -> dict:
+    """
+    The stored form of a note, with the relationships it declares. They are only
+    parsed when the note is new or was edited since the last sync (or was parsed
+    by an older version of the parser).
+    """
+    updated_at = getattr(note, "updated_at", None)
+    updated_at = str(updated_at) if updated_at else None
+    cached = cached_notes.get(note.id)
+    if cached and cached.get("updated_at") == updated_at and cached.get("parser") == PARSER_VERSION:
+        return cached
+    instrumentation.count("sync.notes_parsed")
+    return {
+        "id": note.id, "body": note.body, "updated_at": updated_at,
+        "system": getattr(note, "system", False),
+        "relationships": extract_relationships(issue_iid, note.body), "parser": PARSER_VERSION,
+    }
+
+def stored_relationships(entry: dict) -> list[dict]:
+    """All relationships recorded in a stored notes entry: its issue's description and notes."""
+    relationships = list(entry.get("relationships", []))
+    for note in entry.get("notes", []):
+        relationships.extend(note.get("relationships", []))
     return relationships
 
-def build_project_map(project_id: str) -> dict:
+def _cursor_key(note: dict) -> tuple:
+    return (note.get("updated_at") or "", note["id"])
+
+def _fetch_new_notes(project_id: str, issue_iid: int, cursor: dict, cached_notes: dict) -> list[dict]:
+    """
+    Fetches the notes added or edited after `cursor` (the most recently updated
+    note seen by the last sync), newest first and page by page, stopping at the
+    first page that reaches the cursor. Returns them merged into `cached_notes`.
+    """
+    cursor_key = (cursor.get("updated_at") or "", cursor["id"])
+    notes = dict(cached_notes)
+    fetched = 0
+    with instrumentation.span("gitlab.issue_notes", iid=issue_iid):
+        pages = gitlab_client.get_issue_notes(
+            project_id, issue_iid, order_by="updated_at", sort="desc", iterator=True, per_page=NOTES_PAGE_SIZE,
+        )
+        for note in pages:
+            updated_at = getattr(note, "updated_at", None)
+            if (str(updated_at) if updated_at else "", note.id) <= cursor_key:
+                break
+            notes[note.id] = note_entry(issue_iid, note, cached_notes)
+            fetched += 1
+    instrumentation.count("sync.notes", fetched)
+    return list(notes.values())
+
+def _sync_issue_notes(project_id: str, issue, cached: dict) -> dict:
+    """
+    Returns the stored notes entry of `issue`, given the entry `cached` by the
+    last sync. GitLab bumps an issue's updated_at and user_notes_count when a note
+    is added or edited, so the notes of unchanged issues are not requested at all;
+    for changed ones only the notes after the stored cursor are fetched.
+    """
+    version = {"updated_at": str(issue.updated_at), "user_notes_count": getattr(issue, "user_notes_count", None)}
+    if cached and all(cached.get(key) == value for key, value in version.items()):
+        instrumentation.count("sync.notes_cached")
+        for note in cached.get("notes", []):
+            if note.get("parser") != PARSER_VERSION:  # Parsed again from the stored body
+                note.update(relationships=extract_relationships(issue.iid, note.get("body")), parser=PARSER_VERSION)
+        return cached
+
+    cached_notes = {n["id"]: n for n in cached.get("notes", [])}
+    notes = None
+    if cached.get("cursor") and cached_notes:
+        notes = _fetch_new_notes(project_id, issue.iid, cached["cursor"], cached_notes)
+        user_notes = sum(1 for n in notes if not n.get("system"))
+        if version["user_notes_count"] is not None and user_notes != version["user_notes_count"]:
+            notes = None  # Notes were deleted; only a full fetch tells which
+    if notes is None:
+        with instrumentation.span("gitlab.issue_notes", iid=issue.iid):
+            fetched = gitlab_client.get_issue_notes(project_id, issue.iid)
+        instrumentation.count("sync.notes", len(fetched))
+        notes = [note_entry(issue.iid, note, cached_notes) for note in fetched]
+
+    notes.sort(key=lambda n: n["id"])
+    latest = max(notes, key=_cursor_key, default=None)
+    cursor = {"id": latest["id"], "updated_at": latest["updated_at"]} if latest else None
+    return {**version, "cursor": cursor, "notes": notes}
+
+
+def qualify(ref, qualifier: str | None):
+    """
+    The project-qualified id of a reference made in the project `qualifier`
+    ("group/app"): 12 -> "group/app#12", "lib#3" -> "group/lib#3" (a project in
+    the same namespace). Qualified references and those of a single-project map
+    (qualifier None) are returned unchanged.
+    """
+    if qualifier is None:
+        return ref
+    if isinstance(ref, int):
+        return f"{qualifier}#{ref}"
+    project, _, iid = str(ref).rpartition("#")
+    if project and "/" not in project and "/" in qualifier:
+        return f"{qualifier.rsplit('/', 1)[0]}/{project}#{iid}"
+    return ref
+
+def merge_project_maps(project_maps: list[dict]) -> dict:
+    """Merges the (project-qualified) maps of several projects into one; duplicate links are dropped."""
+    graph = ProjectGraph.from_map({"doctrine": (project_maps[0] if project_maps else {}).get("doctrine"), "nodes": [], "links": []})
+    for project_map in project_maps:
+        for node in project_map.get("nodes", []):
+            graph.add_node(node)
+    for project_map in project_maps:
+        for link in project_map.get("links", []):
+            graph.add_link(link["source"], link["target"], link["type"])
+    return graph.project_map
+
+def build_project_map(project_id: str, issues_list: list | None = None, qualifier: str | None = None,
+                      persist: bool = True) -> dict:
     """
     Builds a map of the GitLab project, fetches all issues,
     and organizes them into a local file structure.
+    An already fetched `issues_list` can be passed to avoid listing the issues again.
+
+    For a multi-project sync, `qualifier` (the project's path) qualifies node ids
+    ("group/app#12") and places the files below DATA_DIR/<qualifier>; with
+    `persist=False` the map and notes are returned (as "map_data" and
+    "issue_notes") instead of being written, so they can be merged first.
     """
-    try:
-        issues_list = gitlab_client.get_project_issues(project_id, all=True)
-    except (ValueError, ConnectionError, gitlab.exceptions.GitlabError) as e:
-        return {"status": "error", "message": str(e)}
-
-    nodes_data = []
-    links_data = []
-    unique_links_set = set()
-    
+    if issues_list is None:
+        try:
+            with instrumentation.span("sync.list_issues"):
+                issues_list = gitlab_client.get_project_issues(project_id, all=True)
+        except (ValueError, ConnectionError, gitlab.exceptions.GitlabError) as e:
+            return {"status": "error", "message": str(e)}
+
+    graph = ProjectGraph.from_map({
+        "doctrine": {"gemini_md_path": "/docs/spec/GEMINI.md", "gemini_md_commit_hash": "TODO"},
+        "nodes": [],
+        "links": []
+    })
     all_issues_map = {i.iid: i for i in issues_list}
-    epic_map = {}
+
+    def node_id(iid: int):
+        return qualify(int(iid), qualifier)
+
+    def local_path(relative_filepath: Path) -> Path:
+        return Path(qualifier) / relative_filepath if qualifier else relative_filepath
+
+    def epic_path(epic_node: dict | None) -> Path | None:
+        return Path(epic_node["local_path"]).parent if epic_node else None
 
     # Pass 1: Process Epics and other non-Story items
     for issue in issues_list:
@@ -45,21 +162,13 @@ def build_project_map(project_id: str) -> dict:
         if not relative_filepath:
             continue
 
-        if "Type::Epic" in issue.labels:
-            # Store the issue title along with the path for the fallback mechanism
-            epic_map[issue.iid] = {"path": relative_filepath.parent, "title": issue.title}
-
+        relative_filepath = local_path(relative_filepath)
         file_system_repo.write_issue_file(relative_filepath, issue)
-        nodes_data.append({
-            "id": issue.iid, "title": issue.title, "type": "Issue", "state": issue.state,
+        graph.add_node({
+            "id": node_id(issue.iid), "title": issue.title, "type": "Issue", "state": issue.state,
             "web_url": issue.web_url, "labels": issue.labels, "local_path": str(relative_filepath)
         })
 
-    # Create a reverse map from title to IID for the Epic label fallback
-    epic_title_to_iid_map = {
-        details["title"].lower(): iid for iid, details in epic_map.items()
-    }
-
     # Pass 2: Process Stories and their relationships
     for issue in issues_list:
         if "Type::Story" not in issue.labels:
@@ -70,10 +179,14 @@ def build_project_map(project_id: str) -> dict:
 
         # Modern Approach: Check for "relates_to" issue links first
         try:
-            for link in gitlab_client.get_issue_links(project_id, issue.iid):
+            with instrumentation.span("gitlab.issue_links", iid=issue.iid):
+                issue_links = gitlab_client.get_issue_links(project_id, issue.iid)
+            for link in issue_links:
+                if qualifier and str(getattr(link, "project_id", project_id)) != str(project_id):
+                    continue  # An issue of another project with the same iid
                 if link.iid in all_issues_map and "Type::Epic" in all_issues_map[link.iid].labels:
-                    parent_epic_iid = link.iid
-                    parent_epic_path = epic_map.get(parent_epic_iid, {}).get("path")
+                    parent_epic_iid = node_id(link.iid)
+                    parent_epic_path = epic_path(graph.node(parent_epic_iid))
                     break
         except gitlab.exceptions.GitlabHttpError as e:
             print(f"[WARN] Could not retrieve links for issue {issue.iid}: {e}")
@@ -83,56 +196,56 @@ def build_project_map(project_id: str) -> dict:
             for label in issue.labels:
                 if label.startswith("Epic::"):
                     epic_title = label.split("::", 1)[1].strip().lower()
-                    found_iid = epic_title_to_iid_map.get(epic_title)
-                    if found_iid:
-                        parent_epic_iid = found_iid
-                        parent_epic_path = epic_map.get(found_iid, {}).get("path")
+                    epic_node = graph.epic_for_title(epic_title)
+                    if epic_node:
+                        parent_epic_iid = epic_node["id"]
+                        parent_epic_path = epic_path(epic_node)
                         print(f"[INFO] Found legacy epic link for Story #{issue.iid} -> Epic '{epic_title}' (#{parent_epic_iid})")
                         break
         
         story_filename = f"story-{file_system_repo._slugify(issue.title)}.md"
         if parent_epic_path:
             relative_filepath = parent_epic_path / story_filename
-            # Ensure IDs are integers and link is unique before adding
-            link_tuple = (int(parent_epic_iid), int(issue.iid), "contains")
-            if link_tuple not in unique_links_set:
-                unique_links_set.add(link_tuple)
-                links_data.append({"source": int(parent_epic_iid), "target": int(issue.iid), "type": "contains"})
+            # The graph ignores duplicate links
+            graph.add_link(parent_epic_iid, node_id(issue.iid), "contains")
         else:
-            relative_filepath = file_system_repo.get_issue_filepath(issue.title, issue.labels)
+            relative_filepath = local_path(file_system_repo.get_issue_filepath(issue.title, issue.labels))
 
         file_system_repo.write_issue_file(relative_filepath, issue)
-        nodes_data.append({
-            "id": issue.iid, "title": issue.title, "type": "Issue", "state": issue.state,
+        graph.add_node({
+            "id": node_id(issue.iid), "title": issue.title, "type": "Issue", "state": issue.state,
             "web_url": issue.web_url, "labels": issue.labels, "local_path": str(relative_filepath)
         })
 
     # Pass 3: Process text-based relationships
+    # Notes are stored locally (for `ggw search`) together with the relationships
+    # parsed from them and from the description, and only fetched again where they changed.
+    previous_notes = file_system_repo.read_issue_notes()
+    issue_notes = {}
     for issue in issues_list:
-        all_text_to_parse = [issue.description or ""]
+        key = str(node_id(issue.iid))
+        cached = previous_notes.get(key)
+        if not isinstance(cached, dict):
+            cached = {}  # Nothing stored yet, or the format of an older version
         try:
-            for note in gitlab_client.get_issue_notes(project_id, issue.iid):
-                all_text_to_parse.append(note.body)
+            entry = _sync_issue_notes(project_id, issue, cached)
         except gitlab.exceptions.GitlabHttpError as e:
             print(f"[WARN] Could not retrieve notes for issue {issue.iid}: {e}")
+            entry = {**cached, "updated_at": None}  # Fetched again next time
+        entry["relationships"] = extract_relationships(issue.iid, issue.description)
+        issue_notes[key] = entry
+
+        relationships = stored_relationships(entry)
+        if qualifier is None:
+            relationships = local_only(relationships)  # A single-project map has no nodes for other projects
+        for rel in relationships:
+            graph.add_link(qualify(rel["source"], qualifier), qualify(rel["target"], qualifier), rel["type"])
+
+    project_map_data = graph.project_map
+    if not persist:
+        return {"status": "success", "map_data": project_map_data, "issues_found": len(graph), "issue_notes": issue_notes}
 
-        for text in all_text_to_parse:
-            for rel in _parse_relationships(issue.iid, text):
-                link_tuple = (rel["source"], rel["target"], rel["type"])
-                if link_tuple not in unique_links_set:
-                    unique_links_set.add(link_tuple)
-                    links_data.append({
-                        "source": int(rel["source"]),
-                        "target": int(rel["target"]),
-                        "type": rel["type"]
-                    })
-
-    project_map_data = {
-        "doctrine": {"gemini_md_path": "/docs/spec/GEMINI.md", "gemini_md_commit_hash": "TODO"},
-        "nodes": nodes_data,
-        "links": links_data
-    }
-    
     file_system_repo.write_project_map(project_map_data)
+    file_system_repo.write_issue_notes(issue_notes)
 
-    return {"status": "success", "map_data": project_map_data, "issues_found": len(nodes_data)}
+    return {"status": "success", "map_data": project_map_data, "issues_found": len(graph)}
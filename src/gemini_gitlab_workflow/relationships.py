@@ -0,0 +1,62 @@
+"""
+Extraction of "blocks" relationships from issue descriptions and notes.
+
+A single compiled pattern recognizes every form we read:
+
+    /blocking #12          the current issue blocks #12
+    /blocks #12            (GitLab's own quick action)
+    /blocked by #12        #12 blocks the current issue
+    /blocked_by #12        (GitLab's own quick action)
+    Blocked by #12         the note the uploader writes for every "blocks" link
+                           (only as a line of its own, spelled exactly so)
+    /blocked by #12 #13    several references after one keyword
+    /blocking group/app#7  a cross-project reference
+
+Keywords in ordinary prose ("this blocks #3") are not relationships.
+References to the current project resolve to integer iids. Cross-project
+references keep their qualified form ("group/app#7") so they can never collide
+with a local iid; only a multi-project map has nodes for them (see `local_only`).
+"""
+import re
+
+BLOCKS = "blocks"
+# Stored with parsed notes; relationships stored by an older parser are parsed again.
+PARSER_VERSION = 2
+
+# One alternation over the quick actions, whose trailing group captures the list of
+# references, and the uploader's note, which is matched case-sensitively.
+_RELATIONSHIP_RE = re.compile(
+    r"(?<![\w/])/(?:(?P<blocking>blocking|blocks)|(?P<blocked_by>blocked[ _]by))"
+    r"(?P<refs>(?:[ \t]*,?[ \t]*(?:[\w.\-]+(?:/[\w.\-]+)*)?#\d+\b)+)"
+    r"|^[ \t]*(?-i:Blocked by)(?P<note_refs>[ \t]+#\d+)[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_REFERENCE_RE = re.compile(r"(?P<project>[\w.\-]+(?:/[\w.\-]+)*)?#(?P<iid>\d+)")
+
+
+def _reference(match: re.Match) -> int | str:
+    project = match.group("project")
+    return f"{project}#{match.group('iid')}" if project else int(match.group("iid"))
+
+
+def extract_relationships(issue_iid: int, text: str | None) -> list[dict]:
+    """
+    Returns the relationships declared in `text` (a description or note of issue
+    `issue_iid`) as links: {"source": ..., "target": ..., "type": "blocks"}.
+    """
+    if not text or "#" not in text:
+        return []
+    relationships = []
+    for match in _RELATIONSHIP_RE.finditer(text):
+        for reference in _REFERENCE_RE.finditer(match.group("refs") or match.group("note_refs")):
+            other = _reference(reference)
+            if match.group("blocking"):
+                relationships.append({"source": issue_iid, "target": other, "type": BLOCKS})
+            else:
+                relationships.append({"source": other, "target": issue_iid, "type": BLOCKS})
+    return relationships
+
+
+def local_only(relationships: list[dict]) -> list[dict]:
+    """The relationships between issues of the current project (dropping cross-project ones)."""
+    return [r for r in relationships if isinstance(r["source"], int) and isinstance(r["target"], int)]
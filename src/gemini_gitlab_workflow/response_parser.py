@@ -0,0 +1,143 @@
+"""
+Tolerant parsing of structured model responses.
+
+A response that does not validate as a whole is not thrown away. `parse_list`
+salvages the items of its one list field:
+
+- Markdown code fences and prose around the JSON are ignored.
+- A truncated response is cut back to its last complete value and closed.
+- `null` fields are left out, so optional ones fall back to their defaults,
+  and a string where a list is expected becomes a one-item list.
+- Items that still do not validate are dropped.
+
+Each repair is reported as a problem, so that the caller can warn about it and
+ask the model again for what is missing.
+"""
+import json
+import types
+import typing
+from dataclasses import dataclass, field
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+
+@dataclass
+class ParsedList:
+    """The valid items of a response, and a description of everything that had to be repaired or dropped."""
+    items: list = field(default_factory=list)
+    problems: list[str] = field(default_factory=list)
+    truncated: bool = False
+    invalid: list = field(default_factory=list)  # The raw items that were dropped
+
+
+def _close_truncated(text: str) -> str | None:
+    """
+    The JSON document at the start of `text`: as is if it is complete, or cut
+    after its last complete value and closed if it was truncated. None if no
+    complete value was found.
+    """
+    closers: list[str] = []
+    in_string = escaped = False
+    cut = None  # (end, closers) after the last complete value inside a container
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not closers or closers[-1] != char:
+                return None
+            closers.pop()
+            if not closers:
+                return text[:i + 1]
+            cut = (i + 1, list(closers))
+        elif char == "," and closers:
+            cut = (i, list(closers))
+    if cut is None:
+        return None
+    end, closers = cut
+    return text[:end] + "".join(reversed(closers))
+
+
+def loads(raw: str) -> tuple[object, bool]:
+    """
+    Parses the JSON document in a model response. Returns it and whether it
+    was truncated; raises ValueError if the response holds no JSON at all.
+    """
+    starts = [i for i in (raw.find("{"), raw.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("the response holds no JSON")
+    text = raw[min(starts):]
+    try:
+        return json.JSONDecoder().raw_decode(text)[0], False
+    except json.JSONDecodeError:
+        pass
+    closed = _close_truncated(text)
+    if closed is None:
+        raise ValueError("the response holds no complete JSON value")
+    try:
+        data = json.loads(closed)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"the response is not valid JSON: {e}")
+    # A complete document would have been decoded above: this one was cut short.
+    return data, True
+
+
+def _repair_item(item, item_type):
+    """Leaves out null fields and wraps strings given for list fields (of a pydantic model's items)."""
+    if not (isinstance(item, dict) and isinstance(item_type, type) and issubclass(item_type, BaseModel)):
+        return item
+    repaired = {}
+    for key, value in item.items():
+        if value is None:
+            continue
+        field_info = item_type.model_fields.get(key)
+        annotation = field_info.annotation if field_info else None
+        if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+            annotation = next((a for a in typing.get_args(annotation) if a is not type(None)), annotation)
+        if isinstance(value, str) and typing.get_origin(annotation) is list:
+            value = [value]
+        repaired[key] = value
+    return repaired
+
+
+def _describe(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+def parse_list(raw: str, key: str, item_type) -> ParsedList:
+    """Salvages the valid items of the list `key` of a response; `item_type` is a pydantic model or a type like str."""
+    result = ParsedList()
+    try:
+        data, result.truncated = loads(raw or "")
+    except ValueError as e:
+        result.problems.append(str(e))
+        return result
+    if result.truncated:
+        result.problems.append("the response was cut off; its last complete items were kept")
+
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        result.problems.append(f"the response has no '{key}' list")
+        return result
+
+    adapter = TypeAdapter(item_type)
+    for position, item in enumerate(items, start=1):
+        try:
+            result.items.append(adapter.validate_python(_repair_item(item, item_type)))
+        except ValidationError as e:
+            label = f"item {position}"
+            if isinstance(item, dict) and item.get("id"):
+                label += f" ({item['id']})"
+            result.problems.append(f"{label} was dropped: {_describe(e)}")
+            result.invalid.append(item)
+    return result
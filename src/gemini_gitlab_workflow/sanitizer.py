@@ -1,18 +1,120 @@
+import hashlib
 import os
+import re
+import threading
+from urllib.parse import urlsplit
+
+# Entities anonymized unless GGW_SANITIZE_ENTITIES (comma-separated) says otherwise.
+DEFAULT_ENTITIES = ("url", "project_id", "group", "names", "emails", "issue_urls")
+
+_EMAIL_PATTERN = r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"
+# Any placeholder this class emits: [PROJECT_URL], [EMAIL_1a2b3c], ...
+_PLACEHOLDER_RE = re.compile(r"\[[A-Z]+(?:_[A-Z]+)*(?:_[0-9a-f]{6})?\]")
+
 
 class Sanitizer:
-    def __init__(self):
+    """
+    Replaces project-specific identifiers with placeholders before text leaves
+    the machine, and restores them in what comes back.
+
+    All identifiers are matched by one compiled alternation, so anonymizing a
+    text is a single scan however many entities are configured:
+
+    - url, project_id, group: GGW_GITLAB_URL, GGW_GITLAB_PROJECT_ID and
+      GGW_GITLAB_GROUP_ID, as [PROJECT_URL], [PROJECT_ID] and [GROUP].
+    - names: the group and user names listed in GGW_SANITIZE_NAMES.
+    - emails: any email address.
+    - issue_urls: issue URLs on the GitLab host, of any project.
+
+    Names, emails and issue URLs get a placeholder derived from their value
+    ([NAME_1a2b3c]), which is stable across sessions; the table of the values
+    seen by this instance is what makes them reversible.
+    """
+
+    def __init__(self, entities: list[str] | None = None):
         self.GGW_GITLAB_URL = os.environ.get("GGW_GITLAB_URL", "[PROJECT_URL]")
         self.GGW_GITLAB_PROJECT_ID = os.environ.get("GGW_GITLAB_PROJECT_ID", "[PROJECT_ID]")
+        if entities is None:
+            configured = os.environ.get("GGW_SANITIZE_ENTITIES", "")
+            entities = [e.strip() for e in configured.split(",") if e.strip()] or DEFAULT_ENTITIES
+        self.entities = set(entities)
+
+        # Placeholder -> original value, for every placeholder emitted so far.
+        self.table: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._fixed: dict[str, str] = {}
+        alternatives = []
+
+        # Issue URLs come first: they are longer than the GitLab URL they start with.
+        host = urlsplit(self.GGW_GITLAB_URL).netloc
+        if "issue_urls" in self.entities and host:
+            alternatives.append(rf"(?P<issue_url>https?://{re.escape(host)}/[\w.\-/]+/-/issues/\d+)")
+
+        # Empty values are skipped: an empty pattern would match between every character.
+        literals = []
+        if "url" in self.entities and self.GGW_GITLAB_URL:
+            literals.append((self.GGW_GITLAB_URL.rstrip("/"), "[PROJECT_URL]", False))
+        if "project_id" in self.entities and self.GGW_GITLAB_PROJECT_ID:
+            literals.append((self.GGW_GITLAB_PROJECT_ID, "[PROJECT_ID]", True))
+        group = os.environ.get("GGW_GITLAB_GROUP_ID", "").strip()
+        if "group" in self.entities and group:
+            literals.append((group, "[GROUP]", True))
+        # Longest first, so that a value is never cut short by one of its prefixes.
+        for value, placeholder, whole_word in sorted(literals, key=lambda l: -len(l[0])):
+            if placeholder == value:
+                continue  # Not configured: nothing to hide
+            self._fixed[value] = placeholder
+            self.table[placeholder] = value
+            boundary = r"(?!\w)" if whole_word else r"(?![\w\-])"
+            alternatives.append((r"(?<!\w)" if whole_word else "") + re.escape(value) + boundary)
+
+        if "names" in self.entities:
+            names = [n.strip() for n in os.environ.get("GGW_SANITIZE_NAMES", "").split(",") if n.strip()]
+            if names:
+                names_pattern = "|".join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+                alternatives.append(rf"(?<![\w@])(?P<name>{names_pattern})(?![\w@])")
+        if "emails" in self.entities:
+            alternatives.append(rf"(?P<email>{_EMAIL_PATTERN})")
+
+        self._pattern = re.compile("|".join(alternatives)) if alternatives else None
+
+    def _placeholder(self, match: re.Match) -> str:
+        value = match.group(0)
+        fixed = self._fixed.get(value)
+        if fixed:
+            return fixed
+        kind = {"name": "NAME", "issue_url": "ISSUE_URL", "email": "EMAIL"}[match.lastgroup]
+        placeholder = f"[{kind}_{hashlib.sha1(value.encode('utf-8')).hexdigest()[:6]}]"
+        with self._lock:
+            self.table.setdefault(placeholder, value)
+        return placeholder
 
     def anonymize_text(self, text: str) -> str:
         """Replaces project-specific identifiers with generic placeholders."""
-        text = text.replace(self.GGW_GITLAB_URL, "[PROJECT_URL]")
-        text = text.replace(self.GGW_GITLAB_PROJECT_ID, "[PROJECT_ID]")
-        return text
+        if not text or self._pattern is None:
+            return text
+        return self._pattern.sub(self._placeholder, text)
 
     def deanonymize_text(self, text: str) -> str:
         """Restores project-specific identifiers from generic placeholders."""
-        text = text.replace("[PROJECT_URL]", self.GGW_GITLAB_URL)
-        text = text.replace("[PROJECT_ID]", self.GGW_GITLAB_PROJECT_ID)
-        return text
\ No newline at end of file
+        if not text or not self.table:
+            return text
+        return _PLACEHOLDER_RE.sub(lambda m: self.table.get(m.group(0), m.group(0)), text)
+
+    def anonymize(self, payload):
+        """Anonymizes every string in a (nested) dict / list payload; other values are kept."""
+        return _map_strings(payload, self.anonymize_text)
+
+    def deanonymize(self, payload):
+        """Restores every string in a (nested) dict / list payload."""
+        return _map_strings(payload, self.deanonymize_text)
+
+
+def _map_strings(payload, transform):
+    if isinstance(payload, str):
+        return transform(payload)
+    if isinstance(payload, dict):
+        return {key: _map_strings(value, transform) for key, value in payload.items()}
+    if isinstance(payload, (list, tuple)):
+        return type(payload)(_map_strings(value, transform) for value in payload)
+    return payload
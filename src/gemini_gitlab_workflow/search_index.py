@@ -0,0 +1,321 @@
+"""
+Persistent full-text index over the local mirror.
+
+`SearchIndex` is a BM25-ranked inverted index over the issue files in DATA_DIR
+(title, description and the notes stored by the last sync) and the Markdown
+files in DOCS_DIR. It is pickled to SEARCH_INDEX_PATH and brought up to date
+incrementally: files whose (mtime, size) did not change are skipped, and issue
+files rewritten by a sync are only re-indexed when the issue's `updated_at`
+moved (GitLab bumps it for new notes as well). After a completed sync that is
+read from the timestamps cache, so unchanged issue files are not even opened.
+
+Used by `ggw search` and to narrow the context sources handed to the AI pre-filter.
+"""
+import heapq
+import math
+import os
+import pickle
+import re
+import sys
+import threading
+from pathlib import Path
+
+import yaml
+
+from gemini_gitlab_workflow import config, file_system_repo, instrumentation
+
+INDEX_VERSION = 1
+
+# Title terms count this many times as much as body terms.
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_CHARS = 160
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have i in into is it its of on or so that the this to was we "
+    "will with you your".split()
+)
+_FRONTMATTER_RE = re.compile(r"\A---\n(?P<frontmatter>.*?)\n---\n?(?P<body>.*)\Z", re.DOTALL)
+_UPDATED_AT_RE = re.compile(r"^updated_at: '?(?P<updated_at>[^'\n]*)'?$", re.MULTILINE)
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def _normalize(token: str) -> str:
+    """Folds simple plurals ("invoices" -> "invoice") so they match their singular."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased, plural-folded word tokens without stopwords, interned to keep the pickled index small."""
+    return [sys.intern(_normalize(t)) for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _path_key(path) -> str:
+    return os.path.normpath(os.path.abspath(str(path)))
+
+
+def _walk_markdown(root: str):
+    """Yields the directory entries of all .md files below `root` (os.scandir avoids a stat per file)."""
+    try:
+        entries = list(os.scandir(root))
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk_markdown(entry.path)
+        elif entry.name.endswith(".md"):
+            yield entry
+
+
+def _split_frontmatter(text: str) -> tuple[dict, str]:
+    match = _FRONTMATTER_RE.match(text)
+    if not match:
+        return {}, text
+    try:
+        frontmatter = yaml.load(match.group("frontmatter"), Loader=_YamlLoader) or {}
+    except yaml.YAMLError:
+        frontmatter = {}
+    return (frontmatter if isinstance(frontmatter, dict) else {}), match.group("body")
+
+
+class SearchIndex:
+    """
+    Inverted index: `postings[term][doc_id] = weighted term frequency`. Documents
+    are keyed by their normalized absolute path and carry the metadata shown in
+    search results.
+    """
+
+    def __init__(self):
+        self.version = INDEX_VERSION
+        self.docs: dict[int, dict] = {}
+        self.doc_ids: dict[str, int] = {}
+        self.postings: dict[str, dict[int, int]] = {}
+        self.total_length = 0
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    # --- Maintenance ---
+
+    def _remove(self, key: str):
+        doc_id = self.doc_ids.pop(key)
+        doc = self.docs.pop(doc_id)
+        for term in doc["terms"]:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= doc["length"]
+
+    def _add(self, key: str, doc: dict, title: str, body: str):
+        if key in self.doc_ids:
+            self._remove(key)
+        title_terms, body_terms = tokenize(title), tokenize(body)
+        frequencies: dict[str, int] = {}
+        for term in body_terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term in title_terms:
+            frequencies[term] = frequencies.get(term, 0) + TITLE_WEIGHT
+
+        doc_id = self._next_id
+        self._next_id += 1
+        doc["terms"] = tuple(frequencies)
+        doc["length"] = len(title_terms) + len(body_terms)
+        self.docs[doc_id] = doc
+        self.doc_ids[key] = doc_id
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.total_length += doc["length"]
+
+    def _local_files(self) -> dict[str, tuple[str, os.DirEntry]]:
+        """Maps the key of every indexable file to (kind, directory entry)."""
+        files = {}
+        for kind, root in (("doc", config.DOCS_DIR), ("issue", config.DATA_DIR)):
+            # Entries below a normalized root have normalized paths already.
+            for entry in _walk_markdown(_path_key(root)):
+                files[entry.path] = (kind, entry)
+        return files
+
+    def update(self) -> dict:
+        """
+        Brings the index in line with the files on disk.
+        Returns the number of documents added, updated, removed and unchanged.
+        """
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        files = self._local_files()
+        for key in [k for k in self.doc_ids if k not in files]:
+            self._remove(key)
+            stats["removed"] += 1
+
+        issue_notes = timestamps = None
+        try:
+            timestamps_mtime = os.stat(config.TIMESTAMPS_CACHE_PATH).st_mtime_ns
+        except FileNotFoundError:
+            timestamps_mtime = -1
+        for key, (kind, entry) in files.items():
+            path = entry.path
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            file_version = (stat.st_mtime_ns, stat.st_size)
+            doc = self.docs.get(self.doc_ids.get(key))
+            if doc and doc["file_version"] == file_version:
+                stats["unchanged"] += 1
+                continue
+            if doc and kind == "issue" and doc.get("updated_at") and timestamps_mtime >= stat.st_mtime_ns:
+                # Written by a finished sync: the timestamps cache says whether the issue changed.
+                if timestamps is None:
+                    timestamps = file_system_repo.read_timestamps_cache()
+                if timestamps.get(str(doc["iid"])) == doc["updated_at"]:
+                    doc["file_version"] = file_version
+                    stats["unchanged"] += 1
+                    continue
+            try:
+                text = Path(path).read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            if doc and kind == "issue" and doc.get("updated_at"):
+                # A sync rewrites every issue file; only re-index issues that changed on GitLab.
+                match = _UPDATED_AT_RE.search(text, 0, text.find("\n---", 3))
+                if match and match.group("updated_at") == doc["updated_at"]:
+                    doc["file_version"] = file_version
+                    stats["unchanged"] += 1
+                    continue
+
+            frontmatter, body = _split_frontmatter(text)
+            if kind == "issue":
+                if issue_notes is None:
+                    issue_notes = file_system_repo.read_issue_notes()
+                iid = frontmatter.get("iid")
+                notes = [n["body"] for n in _notes_of(issue_notes, iid) if not n.get("system") and n.get("body")]
+                title = str(frontmatter.get("title", ""))
+                updated_at = frontmatter.get("updated_at")
+                body = "\n".join([body, *notes])
+            else:
+                iid, updated_at = None, None
+                title = next((line.strip("# ").strip() for line in body.splitlines() if line.strip()), "")
+            stats["updated" if doc else "added"] += 1
+            self._add(key, {
+                "kind": kind, "path": path, "title": title, "iid": iid,
+                "updated_at": str(updated_at) if updated_at else None, "file_version": file_version,
+            }, title, body)
+        return stats
+
+    # --- Queries ---
+
+    def scores(self, query: str) -> dict[str, float]:
+        """BM25 score of every document matching `query`, keyed by normalized path."""
+        terms = set(tokenize(query))
+        if not terms or not self.docs:
+            return {}
+        num_docs = len(self.docs)
+        average_length = self.total_length / num_docs or 1.0
+        docs = self.docs
+        scores: dict[int, float] = {}
+        norms: dict[int, float] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = norms.get(doc_id)
+                if norm is None:
+                    norm = norms[doc_id] = BM25_K1 * (1 - BM25_B + BM25_B * docs[doc_id]["length"] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return {docs[doc_id]["path"]: score for doc_id, score in scores.items()}
+
+    def search(self, query: str, limit: int = 10, kind: str | None = None) -> list[dict]:
+        """Top `limit` matches of `query` (optionally only "issue" or "doc" documents), best first, with snippets."""
+        scores = self.scores(query)
+        if kind:
+            scores = {key: score for key, score in scores.items() if self.docs[self.doc_ids[key]]["kind"] == kind}
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        pattern = re.compile("|".join(re.escape(t) for t in set(tokenize(query))) or "$^", re.IGNORECASE)
+        issue_notes = None
+        results = []
+        for key, score in ranked:
+            doc = self.docs[self.doc_ids[key]]
+            snippet = _snippet(_read_body(doc["path"]), pattern)
+            if snippet is None and doc["kind"] == "issue":
+                if issue_notes is None:
+                    issue_notes = file_system_repo.read_issue_notes()
+                notes = _notes_of(issue_notes, doc["iid"])
+                snippet = next((s for s in (_snippet(n["body"], pattern) for n in notes if not n.get("system")) if s), None)
+            results.append({
+                "kind": doc["kind"], "iid": doc["iid"], "title": doc["title"], "path": doc["path"],
+                "score": round(score, 3), "snippet": snippet or "",
+            })
+        return results
+
+
+def _notes_of(issue_notes: dict, iid) -> list[dict]:
+    entry = issue_notes.get(str(iid))
+    return entry.get("notes", []) if isinstance(entry, dict) else []
+
+
+def _read_body(path: str) -> str:
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        return ""
+    match = _FRONTMATTER_RE.match(text)
+    return match.group("body") if match else text
+
+
+def _snippet(text, pattern: re.Pattern) -> str | None:
+    """About SNIPPET_CHARS characters of `text` around the first match of `pattern`, or None."""
+    text = " ".join(str(text or "").split())
+    match = pattern.search(text)
+    if not match:
+        return None
+    start = max(0, match.start() - SNIPPET_CHARS // 3)
+    snippet = text[start:start + SNIPPET_CHARS]
+    return ("…" if start else "") + snippet + ("…" if start + SNIPPET_CHARS < len(text) else "")
+
+
+# --- Persistence ---
+
+_index: SearchIndex | None = None
+_index_lock = threading.Lock()
+
+
+def load_search_index() -> SearchIndex:
+    """
+    Returns the search index, updated to the current files. The index is read
+    from SEARCH_INDEX_PATH (and kept in memory afterwards), and written back
+    whenever the update changed it.
+    """
+    global _index
+    with _index_lock:
+        index = _index or _read_index()
+        with instrumentation.span("search.update_index"):
+            stats = index.update()
+        if stats["added"] or stats["updated"] or stats["removed"] or index is not _index:
+            _write_index(index)
+        _index = index
+        return index
+
+
+def _read_index() -> SearchIndex:
+    try:
+        with instrumentation.span("search.load_index"), open(config.SEARCH_INDEX_PATH, "rb") as f:
+            index = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return SearchIndex()
+    return index if getattr(index, "version", None) == INDEX_VERSION else SearchIndex()
+
+
+def _write_index(index: SearchIndex):
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    temp_path = f"{config.SEARCH_INDEX_PATH}.tmp"
+    with instrumentation.span("search.write_index"), open(temp_path, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, config.SEARCH_INDEX_PATH)
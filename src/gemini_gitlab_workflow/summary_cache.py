@@ -0,0 +1,187 @@
+"""
+Cached AI summaries of the context sources (docs and issue files).
+
+The AI pre-filter chooses context files from a short description of each. A
+doc's first line or an issue's title says little, so every file gets a summary
+written by the fast model instead, stored in SUMMARY_CACHE_PATH under the
+SHA-256 of the file's content: a summary is only generated again when the file
+changes. Files whose (mtime, size) did not change are not even read.
+
+Summaries are generated by `ggw sync summaries` (and, with GGW_SUMMARIZE_ON_SYNC,
+by `ggw sync map` and the daemon's background syncs), SUMMARY_BATCH_SIZE files
+per request, with the requests sent concurrently. Looking a summary up never
+calls the model.
+"""
+import hashlib
+import json
+import os
+import threading
+
+from gemini_gitlab_workflow import config, instrumentation
+
+CACHE_VERSION = 1
+
+_cache = None
+_cache_mtime = None  # mtime_ns of SUMMARY_CACHE_PATH when _cache was read or written
+_cache_lock = threading.Lock()
+
+
+def _path_key(path) -> str:
+    return os.path.normpath(os.path.abspath(str(path)))
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def context_files() -> list[str]:
+    """The Markdown files in DOCS_DIR and DATA_DIR, i.e. every context source that can be summarized."""
+    files = []
+    for root in (config.DOCS_DIR, config.DATA_DIR):
+        for directory, _, names in os.walk(root):
+            files.extend(os.path.join(directory, name) for name in names if name.endswith(".md"))
+    return sorted(files)
+
+
+class SummaryCache:
+    """
+    `summaries[content hash] = summary`, plus the (mtime_ns, size, hash) of every
+    file seen, so unchanged files are not hashed again.
+    """
+
+    def __init__(self):
+        self.version = CACHE_VERSION
+        self.files: dict[str, list] = {}
+        self.summaries: dict[str, str] = {}
+
+    def _file_hash(self, key: str) -> str | None:
+        """The content hash of a file, from its stored fingerprint while the file is unchanged."""
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        known = self.files.get(key)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+        try:
+            with open(key, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        content_hash = _content_hash(data)
+        self.files[key] = [stat.st_mtime_ns, stat.st_size, content_hash]
+        return content_hash
+
+    def summary(self, path) -> str | None:
+        """The cached summary of the file's current content, or None."""
+        content_hash = self._file_hash(_path_key(path))
+        return self.summaries.get(content_hash) if content_hash else None
+
+    def refresh(self, paths: list | None = None, mock: bool = False) -> dict:
+        """
+        Summarizes the files among `paths` (default: all context files) whose
+        current content has no summary yet. Summaries of content no longer found
+        in any file are dropped when all files are refreshed.
+        Returns {"summarized", "cached", "failed"} file counts.
+        """
+        from gemini_gitlab_workflow import ai_service
+        from gemini_gitlab_workflow.sanitizer import Sanitizer
+
+        keys = [_path_key(p) for p in (context_files() if paths is None else paths)]
+        pending: dict[str, str] = {}  # content hash -> text
+        stats = {"summarized": 0, "cached": 0, "failed": 0}
+        hashes = {}
+        for key in keys:
+            content_hash = self._file_hash(key)
+            if content_hash is None:
+                continue
+            hashes[key] = content_hash
+            if content_hash in self.summaries:
+                stats["cached"] += 1
+            elif content_hash not in pending:
+                try:
+                    with open(key, "r", encoding="utf-8", errors="replace") as f:
+                        pending[content_hash] = f.read()
+                except OSError:
+                    continue
+
+        if pending:
+            # What leaves the machine is anonymized, like the planner's prompt.
+            sanitizer = Sanitizer()
+            content_hashes = list(pending)
+            documents = [
+                {"id": str(i), "content": sanitizer.anonymize_text(pending[h])} for i, h in enumerate(content_hashes)
+            ]
+            with instrumentation.span("summaries.generate", documents=len(documents)):
+                generated = ai_service.summarize_documents(documents, mock)
+            for document_id, summary in generated.items():
+                if document_id.isdigit() and int(document_id) < len(content_hashes):
+                    self.summaries[content_hashes[int(document_id)]] = sanitizer.deanonymize_text(summary)
+        for key, content_hash in hashes.items():
+            if content_hash in pending:
+                stats["summarized" if content_hash in self.summaries else "failed"] += 1
+        instrumentation.count("summaries.generated", stats["summarized"])
+
+        if paths is None:
+            self.files = {key: self.files[key] for key in hashes}
+            live = set(hashes.values())
+            self.summaries = {h: s for h, s in self.summaries.items() if h in live}
+        return stats
+
+
+def _stored_mtime():
+    try:
+        return os.stat(config.SUMMARY_CACHE_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load() -> SummaryCache:
+    """
+    The summary cache, read from SUMMARY_CACHE_PATH and kept in memory until the
+    file is rewritten (e.g. by `ggw sync summaries` in another process).
+    """
+    global _cache, _cache_mtime
+    with _cache_lock:
+        mtime = _stored_mtime()
+        if _cache is None or mtime != _cache_mtime:
+            _cache, _cache_mtime = _read_cache(), mtime
+        return _cache
+
+
+def refresh(paths: list | None = None, mock: bool = False) -> dict:
+    """Brings the summaries of `paths` (default: all context files) up to date and saves the cache."""
+    cache = load()
+    global _cache_mtime
+    with _cache_lock:
+        stats = cache.refresh(paths, mock)
+        _write_cache(cache)
+        _cache_mtime = _stored_mtime()
+    return stats
+
+
+def _read_cache() -> SummaryCache:
+    cache = SummaryCache()
+    try:
+        with open(config.SUMMARY_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return cache
+    if data.get("version") == CACHE_VERSION:
+        cache.files, cache.summaries = data.get("files", {}), data.get("summaries", {})
+    return cache
+
+
+def _write_cache(cache: SummaryCache):
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    temp_path = f"{config.SUMMARY_CACHE_PATH}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": cache.version, "files": cache.files, "summaries": cache.summaries}, f)
+    os.replace(temp_path, config.SUMMARY_CACHE_PATH)
+
+
+def reset():
+    """Forgets the in-memory cache, e.g. after the paths changed."""
+    global _cache, _cache_mtime
+    with _cache_lock:
+        _cache = _cache_mtime = None
@@ -0,0 +1,444 @@
+"""
+Local receiver for GitLab Issue and Note webhooks (`ggw webhook serve`).
+
+Every accepted event is applied straight to the local mirror: the issue's
+Markdown file, its node (and the "blocks" links touching it) in the project map,
+and the stored notes with their parsed relationships. No GitLab request is made.
+
+While the receiver runs it refreshes a heartbeat in WEBHOOK_STATE_PATH.
+`gitlab_service.sync_project_map` skips polling GitLab as long as the heartbeat
+is fresh and the receiver has been up since the last polling sync
+(`mirror_is_live`); after any downtime, the next sync polls again.
+
+Payloads can be recorded (`--record DIR`) and applied again offline with
+`ggw webhook replay`, which is also how the receiver is tested.
+"""
+import hmac
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+from gemini_gitlab_workflow import config, file_system_repo, instrumentation, project_mapper
+from gemini_gitlab_workflow.project_graph import BLOCKS, CONTAINS, ProjectGraph
+from gemini_gitlab_workflow.relationships import extract_relationships, local_only
+
+# Events are applied one at a time: each one reads and rewrites the mirror.
+_apply_lock = threading.Lock()
+
+_TASK_RE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+\[(?P<mark>[ xX])\]", re.MULTILINE)
+
+
+def _parse_timestamp(value) -> datetime | None:
+    """A webhook ("2025-01-02 10:00:00 UTC") or REST API (ISO 8601) timestamp in UTC, or None."""
+    if not value:
+        return None
+    text = str(value).strip()
+    try:
+        parsed = datetime.strptime(text, "%Y-%m-%d %H:%M:%S %Z")
+    except ValueError:
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def _api_timestamp(value) -> str | None:
+    """
+    Converts a webhook timestamp ("2025-01-02 10:00:00 UTC", or ISO 8601) to the
+    format of the REST API ("2025-01-02T10:00:00.000Z"), so both compare equal.
+    """
+    parsed = _parse_timestamp(value)
+    if parsed is None:
+        return str(value).strip() if value else None
+    return parsed.strftime("%Y-%m-%dT%H:%M:%S.") + f"{parsed.microsecond // 1000:03d}Z"
+
+
+def _task_completion_status(description: str | None) -> dict:
+    """Counts Markdown task list items the way GitLab does for `task_completion_status`."""
+    marks = [m.group("mark") for m in _TASK_RE.finditer(description or "")]
+    return {"count": len(marks), "completed_count": sum(1 for mark in marks if mark != " ")}
+
+
+def _label_titles(labels) -> list[str] | None:
+    if labels is None:
+        return None
+    return [label["title"] if isinstance(label, dict) else str(label) for label in labels]
+
+
+def _issue_from_payload(attributes: dict, labels: list[str] | None, node: dict | None) -> SimpleNamespace:
+    """An issue object as `file_system_repo.write_issue_file` expects, from webhook attributes."""
+    node = node or {}
+    return SimpleNamespace(
+        iid=int(attributes["iid"]),
+        title=attributes.get("title", node.get("title", "")),
+        description=attributes.get("description") or "",
+        state=attributes.get("state", node.get("state", "opened")),
+        labels=labels if labels is not None else list(node.get("labels", [])),
+        web_url=attributes.get("url", node.get("web_url", "")),
+        created_at=_api_timestamp(attributes.get("created_at")),
+        updated_at=_api_timestamp(attributes.get("updated_at")),
+        task_completion_status=_task_completion_status(attributes.get("description")),
+    )
+
+
+def _is_this_project(payload: dict) -> bool:
+    project_id = os.getenv("GGW_GITLAB_PROJECT_ID")
+    project = payload.get("project") or {}
+    if not project_id or not project:
+        return True
+    return project_id in (str(project.get("id")), project.get("path_with_namespace"))
+
+
+# --- Applying events ---
+
+def _story_path(graph: ProjectGraph, issue) -> Path | None:
+    """Where a story lives: under its epic (from the map, or a legacy Epic:: label), as in `build_project_map`."""
+    epic_id = graph.parent_epic(issue.iid)
+    epic = graph.node(epic_id) if epic_id is not None else None
+    if epic is None:
+        for label in issue.labels:
+            if label.startswith("Epic::"):
+                epic = graph.epic_for_title(label.split("::", 1)[1].strip().lower())
+                if epic:
+                    graph.add_link(epic["id"], issue.iid, CONTAINS)
+                    break
+    if epic is None:
+        return None
+    return Path(epic["local_path"]).parent / f"story-{file_system_repo._slugify(issue.title)}.md"
+
+
+def _move_file(old_path: str, new_path: Path):
+    data_dir = Path(config.DATA_DIR)
+    source = data_dir / old_path
+    if source.exists():
+        (data_dir / new_path).parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, data_dir / new_path)
+
+
+def _apply_issue(graph: ProjectGraph, issue) -> str:
+    """Writes the issue's file and updates its node; moves files whose path changed."""
+    node = graph.node(issue.iid)
+    relative_path = None
+    if "Type::Story" in issue.labels:
+        relative_path = _story_path(graph, issue)
+    if relative_path is None:
+        relative_path = file_system_repo.get_issue_filepath(issue.title, issue.labels)
+    if relative_path is None:
+        return f"Issue #{issue.iid} is not mirrored locally."
+
+    old_path = node.get("local_path") if node else None
+    file_system_repo.write_issue_file(relative_path, issue)
+    if old_path and old_path != str(relative_path):
+        (Path(config.DATA_DIR) / old_path).unlink(missing_ok=True)
+    fields = {
+        "title": issue.title, "state": issue.state, "web_url": issue.web_url,
+        "labels": list(issue.labels), "local_path": str(relative_path),
+    }
+    if node:
+        graph.update_node(issue.iid, **fields)
+    else:
+        graph.add_node({"id": issue.iid, "type": "Issue", **fields})
+
+    if old_path and old_path != str(relative_path) and "Type::Epic" in issue.labels:
+        # The epic's directory changed (e.g. a new title): its stories move with it.
+        for child_id in graph.children(issue.iid):
+            child = graph.node(child_id)
+            if child and child.get("local_path"):
+                child_path = relative_path.parent / Path(child["local_path"]).name
+                _move_file(child["local_path"], child_path)
+                graph.update_node(child_id, local_path=str(child_path))
+    return f"Issue #{issue.iid} written to {relative_path}."
+
+
+def _relink(graph: ProjectGraph, issue_notes: dict, iid: int):
+    """Rebuilds the "blocks" links touching `iid` from the relationships stored for all issues."""
+    graph.remove_links(iid, BLOCKS)
+    for entry in issue_notes.values():
+        if not isinstance(entry, dict):
+            continue
+        for rel in local_only(project_mapper.stored_relationships(entry)):
+            if iid in (rel["source"], rel["target"]):
+                graph.add_link(rel["source"], rel["target"], rel["type"])
+
+
+def _is_older(updated_at, stored) -> bool:
+    """Whether an event's `updated_at` precedes the one already stored (in any GitLab format)."""
+    updated_at, stored = _parse_timestamp(updated_at), _parse_timestamp(stored)
+    return bool(updated_at and stored and updated_at < stored)
+
+
+def _issue_updated_at(issue_notes: dict, iid: int) -> datetime | None:
+    """The latest updated_at of the issue seen so far, by a polling sync or an event."""
+    entry = issue_notes.get(str(iid))
+    if not isinstance(entry, dict):
+        return None
+    seen = [_parse_timestamp(entry.get(key)) for key in ("updated_at", "event_updated_at")]
+    return max((t for t in seen if t), default=None)
+
+
+def _stale_event(issue_notes: dict, kind: str, payload: dict) -> str | None:
+    """
+    Why an event is older than what the mirror holds, or None. GitLab may deliver
+    events out of order or again, and an older payload must not roll the mirror back.
+    """
+    attributes = payload["object_attributes"]
+    if kind == "issue":
+        iid = int(attributes["iid"])
+        if _is_older(attributes.get("updated_at"), _issue_updated_at(issue_notes, iid)):
+            return f"Event for issue #{iid} is older than the mirrored issue."
+        return None
+    iid = int((payload.get("issue") or {}).get("iid") or attributes.get("noteable_iid"))
+    entry = issue_notes.get(str(iid))
+    stored = next((n for n in entry.get("notes", []) if n["id"] == attributes["id"]), None) if isinstance(entry, dict) else None
+    if stored and _is_older(attributes.get("updated_at"), stored.get("updated_at")):
+        return f"Event for note {attributes['id']} is older than the mirrored note."
+    return None
+
+
+def _notes_entry(issue_notes: dict, iid: int) -> dict:
+    entry = issue_notes.get(str(iid))
+    if not isinstance(entry, dict):
+        # Not synced yet: the next polling sync fetches the issue's notes.
+        entry = issue_notes[str(iid)] = {"updated_at": None, "user_notes_count": None, "cursor": None, "notes": []}
+    return entry
+
+
+def _apply_issue_event(graph: ProjectGraph, issue_notes: dict, payload: dict) -> str:
+    attributes = payload["object_attributes"]
+    labels = _label_titles(payload.get("labels", attributes.get("labels")))
+    issue = _issue_from_payload(attributes, labels, graph.node(int(attributes["iid"])))
+    message = _apply_issue(graph, issue)
+    entry = _notes_entry(issue_notes, issue.iid)
+    entry["relationships"] = extract_relationships(issue.iid, issue.description)
+    if issue.updated_at:
+        entry["event_updated_at"] = issue.updated_at
+    _relink(graph, issue_notes, issue.iid)
+    return message
+
+
+def _apply_note_event(graph: ProjectGraph, issue_notes: dict, payload: dict) -> str:
+    attributes = payload["object_attributes"]
+    issue_data = payload.get("issue") or {}
+    iid = int(issue_data.get("iid") or attributes.get("noteable_iid"))
+    note = SimpleNamespace(
+        id=attributes["id"], body=attributes.get("note", ""),
+        updated_at=_api_timestamp(attributes.get("updated_at")), system=bool(attributes.get("system")),
+    )
+    entry = _notes_entry(issue_notes, iid)
+    # The stored version and cursor are left alone: after a downtime, the next
+    # polling sync still fetches whatever was missed since the last one.
+    notes = {n["id"]: n for n in entry.get("notes", [])}
+    notes[note.id] = project_mapper.note_entry(iid, note, notes)
+    entry["notes"] = sorted(notes.values(), key=lambda n: n["id"])
+
+    if issue_data.get("title") and graph.node(iid) and not _is_older(issue_data.get("updated_at"), _issue_updated_at(issue_notes, iid)):
+        # The issue's updated_at moved; rewriting its file lets `ggw search` pick up the note.
+        labels = _label_titles(issue_data.get("labels"))
+        issue = _issue_from_payload({**issue_data, "iid": iid}, labels, graph.node(iid))
+        _apply_issue(graph, issue)
+        if issue.updated_at:
+            entry["event_updated_at"] = issue.updated_at
+    _relink(graph, issue_notes, iid)
+    return f"Note {note.id} on issue #{iid} applied."
+
+
+def apply_event(payload: dict) -> dict:
+    """
+    Applies a GitLab Issue or Note webhook payload to the local mirror.
+    Returns {"status": "applied" | "ignored", "message": "..."}.
+    """
+    kind = payload.get("object_kind")
+    attributes = payload.get("object_attributes") or {}
+    if kind not in ("issue", "note") or not attributes:
+        return {"status": "ignored", "message": f"Unsupported event: {kind!r}."}
+    if kind == "note" and attributes.get("noteable_type") != "Issue":
+        return {"status": "ignored", "message": "Only notes on issues are mirrored."}
+    if any(config.multi_project_scope()):
+        return {"status": "ignored", "message": "Multi-project mirrors are only synced by polling."}
+    if not _is_this_project(payload):
+        return {"status": "ignored", "message": "Event for another project."}
+
+    with _apply_lock, instrumentation.span("webhook.apply", kind=kind):
+        project_map = file_system_repo.read_project_map()
+        if project_map is None:
+            return {"status": "ignored", "message": "No local project map yet; run `ggw sync map` first."}
+        issue_notes = file_system_repo.read_issue_notes()
+        stale = _stale_event(issue_notes, kind, payload)
+        if stale:
+            instrumentation.count("webhook.stale_events")
+            return {"status": "ignored", "message": stale}
+        graph = ProjectGraph.from_map(project_map)
+        if kind == "issue":
+            message = _apply_issue_event(graph, issue_notes, payload)
+        else:
+            message = _apply_note_event(graph, issue_notes, payload)
+        file_system_repo.write_project_map(graph.project_map)
+        file_system_repo.write_issue_notes(issue_notes)
+    return {"status": "applied", "message": message}
+
+
+def replay(paths: list[Path]) -> list[dict]:
+    """
+    Applies recorded payloads: JSON files holding one payload or a list of them,
+    or directories of such files (in name order). Returns one result per payload.
+    """
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("*.json")) if path.is_dir() else [path])
+    results = []
+    for file in files:
+        payloads = json.loads(file.read_text(encoding="utf-8"))
+        for payload in payloads if isinstance(payloads, list) else [payloads]:
+            results.append(apply_event(payload))
+    return results
+
+
+# --- Receiver state ---
+
+def read_state() -> dict | None:
+    """The running receiver's state ({"pid", "url", "started_at", "heartbeat_at", "events", ...}), or None."""
+    try:
+        with open(config.WEBHOOK_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_state(state: dict):
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    temp_path = f"{config.WEBHOOK_STATE_PATH}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temp_path, config.WEBHOOK_STATE_PATH)
+
+
+def mirror_is_live(now: float | None = None) -> bool:
+    """
+    True if a receiver is running (its heartbeat is fresh) and has been since
+    before the last polling sync, so every change since then reached the mirror.
+    """
+    state = read_state()
+    if not state:
+        return False
+    now = time.time() if now is None else now
+    if now - state.get("heartbeat_at", 0) > 2 * config.WEBHOOK_HEARTBEAT_INTERVAL:
+        return False
+    try:
+        last_sync = os.stat(config.TIMESTAMPS_CACHE_PATH).st_mtime
+    except FileNotFoundError:
+        return False
+    return state.get("started_at", now) <= last_sync
+
+
+# --- HTTP receiver ---
+
+class _WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, secret: str, record_dir: Path | None):
+        super().__init__(address, _Handler)
+        self.secret = secret.encode("utf-8")
+        self.record_dir = record_dir
+        host, port = self.server_address[:2]
+        self.state = {
+            "pid": os.getpid(), "url": f"http://{host}:{port}", "started_at": time.time(),
+            "heartbeat_at": time.time(), "events": 0,
+        }
+        self.state_lock = threading.Lock()
+
+    def heartbeat(self, event: bool = False):
+        """Refreshes the state file; `event` counts an applied event."""
+        with self.state_lock:
+            now = time.time()
+            if event:
+                self.state["events"] += 1
+                self.state["last_event_at"] = now
+            self.state["heartbeat_at"] = now
+            _write_state(self.state)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _WebhookServer
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        token = self.headers.get("X-Gitlab-Token", "").encode("utf-8")
+        if not hmac.compare_digest(token, self.server.secret):
+            self._reply(401, {"status": "error", "message": "Invalid X-Gitlab-Token."})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except (ValueError, UnicodeDecodeError):
+            self._reply(400, {"status": "error", "message": "Body is not JSON."})
+            return
+        if not isinstance(payload, dict):
+            self._reply(400, {"status": "error", "message": "Body is not a webhook payload."})
+            return
+
+        if self.server.record_dir:
+            name = f"{time.time_ns()}-{payload.get('object_kind', 'event')}.json"
+            (self.server.record_dir / name).write_text(json.dumps(payload), encoding="utf-8")
+        try:
+            result = apply_event(payload)
+        except Exception as e:
+            logging.exception("Could not apply webhook event")
+            self._reply(500, {"status": "error", "message": str(e)})
+            return
+        self.server.heartbeat(event=True)
+        logging.info(f"Webhook {payload.get('object_kind')}: {result['message']}")
+        self._reply(200, result)
+
+    def log_message(self, format, *args):
+        logging.debug("webhook: " + format % args)
+
+
+def serve(host: str | None = None, port: int | None = None, secret: str | None = None,
+          record_dir: Path | None = None, ready: threading.Event | None = None,
+          stop: threading.Event | None = None):
+    """
+    Runs the receiver until interrupted (or until `stop` is set).
+    Raises RuntimeError if no secret token is configured or the port is taken.
+    """
+    secret = config.WEBHOOK_SECRET if secret is None else secret
+    if not secret:
+        raise RuntimeError("A webhook secret is required: set GGW_WEBHOOK_SECRET (or pass --secret).")
+    if record_dir:
+        record_dir = Path(record_dir)
+        record_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        server = _WebhookServer((host or config.WEBHOOK_HOST, config.WEBHOOK_PORT if port is None else port),
+                                secret, record_dir)
+    except OSError as e:
+        raise RuntimeError(f"Could not listen for webhooks: {e}") from e
+
+    stop = stop or threading.Event()
+    server.heartbeat()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"ggw webhook receiver listening on {server.state['url']}")
+    if ready:
+        ready.set()
+    try:
+        while not stop.wait(config.WEBHOOK_HEARTBEAT_INTERVAL):
+            server.heartbeat()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        # Without a receiver, the next sync has to poll GitLab again.
+        Path(config.WEBHOOK_STATE_PATH).unlink(missing_ok=True)
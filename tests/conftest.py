@@ -13,6 +13,13 @@ def isolated_filesystem(mocker, tmp_path):
     data_dir = tmp_path / "gitlab_data"
     cache_dir = tmp_path / ".gemini_cache"
     timestamps_cache_path = cache_dir / "timestamps.json"
+    daemon_socket_path = cache_dir / "ggw.sock"
+    project_graph_cache_path = cache_dir / "project_graph.pickle"
+    issue_notes_path = cache_dir / "issue_notes.json"
+    search_index_path = cache_dir / "search_index.pickle"
+    webhook_state_path = cache_dir / "webhook.json"
+    llm_prefix_cache_path = cache_dir / "llm_prefix_cache.json"
+    summary_cache_path = cache_dir / "summaries.json"
     
     # Ensure cache directory exists
     cache_dir.mkdir(parents=True, exist_ok=True)
@@ -22,6 +29,16 @@ def isolated_filesystem(mocker, tmp_path):
     mocker.patch('gemini_gitlab_workflow.config.DATA_DIR', str(data_dir))
     mocker.patch('gemini_gitlab_workflow.config.CACHE_DIR', str(cache_dir))
     mocker.patch('gemini_gitlab_workflow.config.TIMESTAMPS_CACHE_PATH', str(timestamps_cache_path))
+    mocker.patch('gemini_gitlab_workflow.config.DAEMON_SOCKET_PATH', str(daemon_socket_path))
+    mocker.patch('gemini_gitlab_workflow.config.PROJECT_GRAPH_CACHE_PATH', str(project_graph_cache_path))
+    mocker.patch('gemini_gitlab_workflow.config.ISSUE_NOTES_PATH', str(issue_notes_path))
+    mocker.patch('gemini_gitlab_workflow.config.SEARCH_INDEX_PATH', str(search_index_path))
+    mocker.patch('gemini_gitlab_workflow.config.WEBHOOK_STATE_PATH', str(webhook_state_path))
+    mocker.patch('gemini_gitlab_workflow.config.LLM_PREFIX_CACHE_PATH', str(llm_prefix_cache_path))
+    mocker.patch('gemini_gitlab_workflow.config.SUMMARY_CACHE_PATH', str(summary_cache_path))
+    # Summaries held in memory belong to the previous test's files
+    from gemini_gitlab_workflow import summary_cache
+    summary_cache.reset()
         
     # The test will run after this yield, using the patched paths
     yield
@@ -38,3 +55,11 @@ def mock_env_vars(mocker):
         "GGW_GITLAB_PRIVATE_TOKEN": "mock-token",
         "GGW_GITLAB_PROJECT_ID": "12345"
     })
+
+@pytest.fixture(autouse=True)
+def clear_ai_response_cache():
+    """Ensures memoized AI responses do not leak between tests."""
+    from gemini_gitlab_workflow import ai_service
+    ai_service.clear_response_cache()
+    yield
+    ai_service.clear_response_cache()
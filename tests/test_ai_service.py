@@ -91,7 +91,8 @@ class TestAIService:
     def test_generate_implementation_plan_handles_validation_error(self, mock_generate_content):
         """
         Tests that the function returns None when the AI API returns a JSON
-        that does not match the Pydantic schema.
+        that does not match the Pydantic schema, also after the follow-up
+        request for the dropped issue.
         """
         # Arrange
         user_prompt = "A test prompt"
@@ -114,7 +115,7 @@ class TestAIService:
         plan = generate_implementation_plan(user_prompt, context_content, [])
 
         # Assert
-        mock_generate_content.assert_called_once()
+        assert mock_generate_content.call_count == 2
         assert plan is None
 
     @patch('google.generativeai.GenerativeModel.generate_content')
@@ -165,4 +166,101 @@ class TestAIService:
         assert "You are a **Product Owner**" in system_message['parts'][0]
 
 
+def test_context_files_are_selected_per_shard_and_merged(mocker):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.config.PREFILTER_SHARD_SIZE', 2)
+    call_many = mocker.patch('gemini_gitlab_workflow.ai_service.call_many', return_value=[
+        json.dumps({"relevant_files": ["a.md"]}), json.dumps({"relevant_files": ["c.md", "a.md"]}), None,
+    ])
+    sources = [{"path": f"{name}.md", "summary": ""} for name in "abcde"]
+
+    # Act
+    relevant_files = get_relevant_context_files("request", sources)
+
+    # Assert
+    requests = call_many.call_args.args[0]
+    assert len(requests) == 3
+    assert "e.md" in requests[2]["messages"][1]["parts"][0] and "a.md" not in requests[2]["messages"][1]["parts"][0]
+    assert relevant_files == ["a.md", "c.md"]
+
+
+def test_plan_prompt_keeps_existing_issues_in_the_cacheable_prefix(mocker):
+    # Arrange
+    call = mocker.patch('gemini_gitlab_workflow.ai_service.call_google_gemini_api', return_value=None)
+
+    # Act
+    generate_implementation_plan("Add a wishlist", "Some context", [{"title": "Cart", "labels": ["Type::Story"], "state": "opened"}])
+
+    # Assert
+    messages = call.call_args.args[0]
+    assert call.call_args.kwargs["prefix_messages"] == 1
+    assert "Cart" in messages[0]["parts"][1]
+    assert "Cart" not in messages[1]["parts"][0] and "Add a wishlist" in messages[1]["parts"][0]
+
+
+def test_plan_keeps_valid_issues_and_requests_only_the_dropped_ones(mocker):
+    # Arrange
+    epic = {"id": "NEW_1", "title": "Wishlist", "description": "# Wishlist", "labels": ["Type::Epic"]}
+    story = {"id": "NEW_2", "title": "Save items", "description": "# Save items", "labels": ["Type::Story"]}
+    truncated = json.dumps({"proposed_issues": [story, {"id": "NEW_1", "title": "Wishlist"}]})[:-20]
+    call = mocker.patch('gemini_gitlab_workflow.ai_service.call_google_gemini_api', side_effect=[
+        "```json\n" + truncated,
+        json.dumps({"proposed_issues": [epic, story]}),
+    ])
+
+    # Act
+    plan = generate_implementation_plan("Add a wishlist", "Some context", [])
+
+    # Assert
+    assert [issue["id"] for issue in plan["proposed_issues"]] == ["NEW_1", "NEW_2"]  # Epic first, story not repeated
+    follow_up = call.call_args_list[1].args[0]
+    assert len(follow_up) == 3
+    assert '- NEW_2: "Save items"' in follow_up[2]["parts"][0]
+    assert "NEW_1" in follow_up[2]["parts"][0]
+
+
+def test_revision_sends_only_the_plan_and_feedback_and_applies_the_changes(mocker):
+    # Arrange
+    from gemini_gitlab_workflow.ai_service import PLAN_REVISION_SCHEMA, revise_implementation_plan
+    issues = [
+        {"id": "NEW_1", "title": "Wishlist", "description": "", "labels": ["Type::Epic"]},
+        {"id": "NEW_2", "title": "Save items", "description": "", "labels": ["Type::Story"]},
+        {"id": "NEW_3", "title": "Share list", "description": "", "labels": ["Type::Story"],
+         "dependencies": {"is_blocked_by": ["NEW_2"]}},
+    ]
+    merged = {"id": "NEW_3", "title": "Save and share items", "description": "", "labels": ["Type::Story"]}
+    call = mocker.patch('gemini_gitlab_workflow.ai_service.call_google_gemini_api',
+                        return_value=json.dumps({"proposed_issues": [merged], "removed_issue_ids": ["NEW_2"]}))
+
+    # Act
+    plan = revise_implementation_plan(issues, "Merge stories 2 and 3", [{"title": "Cart", "labels": [], "state": "opened"}])
+
+    # Assert
+    messages = call.call_args.args[0]
+    assert call.call_args.kwargs["response_schema"] == PLAN_REVISION_SCHEMA
+    assert call.call_args.kwargs["prefix_messages"] == 1
+    assert "Cart" in messages[0]["parts"][1]
+    assert "Merge stories 2 and 3" in messages[1]["parts"][0] and "Save items" in messages[1]["parts"][0]
+    assert [issue["title"] for issue in plan["proposed_issues"]] == ["Wishlist", "Save and share items"]
+
+
+def test_revision_renames_added_issues_and_their_blockers(mocker):
+    # Arrange
+    from gemini_gitlab_workflow.ai_service import revise_implementation_plan
+    issues = [
+        {"id": "NEW_1", "title": "Wishlist", "description": "", "labels": ["Type::Epic"]},
+        {"id": "NEW_2", "title": "Save items", "description": "", "labels": ["Type::Story"]},
+    ]
+    added = {"id": "share", "title": "Share list", "description": "", "labels": ["Type::Story"]}
+    blocked = {"id": "NEW_2", "title": "Save items", "description": "", "labels": ["Type::Story"],
+               "dependencies": {"is_blocked_by": ["share"]}}
+    mocker.patch('gemini_gitlab_workflow.ai_service.call_google_gemini_api',
+                 return_value=json.dumps({"proposed_issues": [blocked, added], "removed_issue_ids": []}))
+
+    # Act
+    plan = revise_implementation_plan(issues, "Sharing comes first", [])
 
+    # Assert
+    by_title = {issue["title"]: issue for issue in plan["proposed_issues"]}
+    assert by_title["Share list"]["id"] == "NEW_share"
+    assert by_title["Save items"]["dependencies"] == {"is_blocked_by": ["NEW_share"]}
@@ -0,0 +1,66 @@
+from benchmarks import run
+from benchmarks.generator import generate_plan, generate_project
+
+
+def test_generate_project_is_deterministic():
+    # Act
+    first = generate_project(200, seed=7)
+    second = generate_project(200, seed=7)
+
+    # Assert
+    assert [i.title for i in first.issues] == [i.title for i in second.issues]
+    assert [i.description for i in first.issues] == [i.description for i in second.issues]
+    assert len(first.epics) == 10
+    assert len(first.epics) + len(first.stories) == 200
+
+
+def test_generate_plan_targets_project_backbone():
+    # Arrange
+    project = generate_project(100)
+
+    # Act
+    plan = generate_plan(project, num_stories=5)
+
+    # Assert
+    issues = plan["proposed_issues"]
+    assert len(issues) == 6
+    backbone_labels = {label for issue in issues for label in issue["labels"] if label.startswith("Backbone::")}
+    assert backbone_labels <= {f"Backbone::{b}" for b in project.backbones}
+
+
+def test_all_scenarios_run_against_fakes():
+    # Arrange
+    project = generate_project(100)
+
+    # Act
+    results = {name: run.measure(name, project, repeat=1) for name in run.SCENARIOS}
+
+    # Assert
+    assert results["build_project_map"].requests > 0
+    assert results["smart_sync"].requests > 0
+    assert results["upload"].requests > 0
+    assert results["yaml_read_project_map"].requests == 0
+    assert all(r.seconds > 0 and r.peak_mb > 0 for r in results.values())
+
+
+def test_compare_flags_time_and_request_regressions():
+    # Arrange
+    baseline = {"upload": {"seconds": 1.0, "requests": 10, "peak_mb": 5.0}}
+    results = [run.Result("upload", seconds=1.3, requests=11, peak_mb=5.0)]
+
+    # Act
+    regressions = run.compare(results, baseline, max_regression=0.25)
+
+    # Assert
+    assert len(regressions) == 2
+    assert regressions[0].startswith("upload: seconds")
+    assert "requests 11 > baseline 10" in regressions[1]
+
+
+def test_compare_accepts_results_within_threshold():
+    # Arrange
+    baseline = {"upload": {"seconds": 1.0, "requests": 10, "peak_mb": 5.0}}
+    results = [run.Result("upload", seconds=1.2, requests=9, peak_mb=6.0)]
+
+    # Act / Assert
+    assert run.compare(results, baseline, max_regression=0.25) == []
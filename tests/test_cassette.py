@@ -0,0 +1,188 @@
+import gzip
+import os
+
+import pytest
+from typer.testing import CliRunner
+
+from benchmarks.fake_gitlab_server import DEFAULT_TOKEN, FakeGitlabServer
+from benchmarks.generator import generate_project
+from gemini_gitlab_workflow import ai_service, cassette, gitlab_client, llm_backend
+from gemini_gitlab_workflow.cli import app
+
+runner = CliRunner()
+PROJECT_ID = "1000"
+
+
+@pytest.fixture
+def cassette_path(tmp_path):
+    return tmp_path / "session.cassette.gz"
+
+
+@pytest.fixture
+def gitlab_env(mocker):
+    """Points gitlab_client at a URL of the test's choosing."""
+    def _configure(url: str):
+        mocker.patch.dict(os.environ, {
+            "GGW_GITLAB_URL": url, "GGW_GITLAB_PRIVATE_TOKEN": DEFAULT_TOKEN, "GGW_GITLAB_PROJECT_ID": PROJECT_ID,
+        })
+        gitlab_client.get_gitlab_client.cache_clear()
+    yield _configure
+    gitlab_client.set_transport_adapter(None)
+    llm_backend.set_backend_wrapper(None)
+
+
+def test_records_and_replays_gitlab_traffic_without_the_server(cassette_path, gitlab_env):
+    # Arrange
+    with FakeGitlabServer(generate_project(40)) as server:
+        gitlab_env(server.url)
+        session = cassette.start_recording(cassette_path)
+        recorded = [i.title for i in gitlab_client.get_project_issues(PROJECT_ID, all=True)]
+        session.stop()
+
+    # Act: the server is gone, and replay runs under a different URL.
+    gitlab_env("http://replayed.invalid")
+    session = cassette.start_replay(cassette_path)
+    replayed = [i.title for i in gitlab_client.get_project_issues(PROJECT_ID, all=True)]
+    session.stop()
+
+    # Assert
+    assert replayed == recorded
+    assert len(replayed) == 40
+
+
+def test_cassette_is_compressed_and_anonymized(cassette_path, gitlab_env):
+    # Arrange
+    with FakeGitlabServer(generate_project(10)) as server:
+        gitlab_env(server.url)
+        session = cassette.start_recording(cassette_path)
+        gitlab_client.get_project_issue(PROJECT_ID, 3)
+
+        # Act
+        session.stop()
+
+        # Assert
+        content = gzip.open(cassette_path, "rt").read()
+        assert server.url not in content
+        assert DEFAULT_TOKEN not in content
+        assert "[PROJECT_URL]/api/v4/projects/[PROJECT_ID]/issues/3" in content
+
+
+def test_replay_raises_on_unrecorded_requests(cassette_path, gitlab_env):
+    # Arrange
+    with FakeGitlabServer(generate_project(10)) as server:
+        gitlab_env(server.url)
+        session = cassette.start_recording(cassette_path)
+        gitlab_client.get_project_issue(PROJECT_ID, 3)
+        session.stop()
+    session = cassette.start_replay(cassette_path)
+
+    # Act / Assert
+    with pytest.raises(cassette.CassetteMiss):
+        gitlab_client.get_project_issue(PROJECT_ID, 4)
+    session.stop()
+
+
+def test_records_and_replays_llm_calls(cassette_path, gitlab_env, mocker):
+    # Arrange
+    gitlab_env("http://gitlab.invalid")
+    session = cassette.start_recording(cassette_path)
+    recorded = ai_service.generate_implementation_plan("Add a dark mode", "context", [], mock=True)
+    session.stop()
+    stub_generate = mocker.spy(llm_backend.StubBackend, "generate")
+
+    # Act
+    session = cassette.start_replay(cassette_path)
+    replayed = ai_service.generate_implementation_plan("Add a dark mode", "context", [], mock=True)
+    session.stop()
+
+    # Assert
+    assert replayed == recorded
+    stub_generate.assert_not_called()
+
+
+def test_replay_with_recorded_timings_sleeps(cassette_path, gitlab_env, mocker):
+    # Arrange
+    gitlab_env("http://gitlab.invalid")
+    mocker.patch('gemini_gitlab_workflow.config.LLM_STUB_LATENCY', 0.01)
+    llm_backend.reset_backends()
+    session = cassette.start_recording(cassette_path)
+    ai_service.get_relevant_context_files("Dark mode", [{"path": "docs/ui.md", "summary": "Dark mode theme"}], mock=True)
+    session.stop()
+    sleep = mocker.patch('gemini_gitlab_workflow.cassette.time.sleep')
+
+    # Act
+    session = cassette.start_replay(cassette_path, realtime=True)
+    files = ai_service.get_relevant_context_files("Dark mode", [{"path": "docs/ui.md", "summary": "Dark mode theme"}], mock=True)
+    session.stop()
+    llm_backend.reset_backends()
+
+    # Assert
+    assert files == ["docs/ui.md"]
+    assert sleep.call_args[0][0] >= 0.01
+
+
+def test_cli_record_then_replay_sync(cassette_path, gitlab_env, mocker, tmp_path):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.gitlab_service.file_system_repo.write_issue_file')
+    mocker.patch('gemini_gitlab_workflow.config.CACHE_DIR', tmp_path / ".gemini_cache")
+    mocker.patch('gemini_gitlab_workflow.config.TIMESTAMPS_CACHE_PATH', tmp_path / ".gemini_cache" / "timestamps.json")
+    with FakeGitlabServer(generate_project(30)) as server:
+        gitlab_env(server.url)
+        recorded = runner.invoke(app, ["--record", str(cassette_path), "sync", "map"])
+    gitlab_env("http://replayed.invalid")
+
+    # Act
+    replayed = runner.invoke(app, ["--replay", str(cassette_path), "sync", "map"])
+
+    # Assert
+    assert recorded.exit_code == 0, recorded.stdout
+    assert replayed.exit_code == 0, replayed.stdout
+    assert "built with 30 issues" in replayed.stdout
+
+
+def test_cli_rejects_missing_cassette(tmp_path):
+    result = runner.invoke(app, ["--replay", str(tmp_path / "missing.gz"), "sync", "map"])
+    assert result.exit_code == 1
+
+
+def test_llm_calls_replay_from_another_project_root(cassette_path, gitlab_env, mocker, tmp_path):
+    # Arrange
+    gitlab_env("http://gitlab.invalid")
+    mocker.patch('gemini_gitlab_workflow.config.PROJECT_ROOT', tmp_path / "checkout")
+    session = cassette.start_recording(cassette_path)
+    ai_service.get_relevant_context_files(
+        "Dark mode", [{"path": str(tmp_path / "checkout" / "docs" / "ui.md"), "summary": "Dark mode theme"}], mock=True,
+    )
+    session.stop()
+    mocker.patch('gemini_gitlab_workflow.config.PROJECT_ROOT', tmp_path / "elsewhere")
+
+    # Act
+    session = cassette.start_replay(cassette_path)
+    files = ai_service.get_relevant_context_files(
+        "Dark mode", [{"path": str(tmp_path / "elsewhere" / "docs" / "ui.md"), "summary": "Dark mode theme"}], mock=True,
+    )
+    session.stop()
+
+    # Assert
+    assert files == [str(tmp_path / "elsewhere" / "docs" / "ui.md")]
+    assert str(tmp_path) not in gzip.open(cassette_path, "rt").read()
+
+
+def test_cassette_anonymizes_names_and_emails(cassette_path, gitlab_env, mocker):
+    # Arrange
+    project = generate_project(10)
+    project.issues[2].description = "Reported by Jane Doe <jane@example.com>."
+    mocker.patch.dict(os.environ, {"GGW_SANITIZE_NAMES": "Jane Doe"})
+    with FakeGitlabServer(project) as server:
+        gitlab_env(server.url)
+        session = cassette.start_recording(cassette_path)
+        gitlab_client.get_project_issue(PROJECT_ID, 3)
+
+        # Act
+        session.stop()
+
+    # Assert
+    content = gzip.open(cassette_path, "rt").read()
+    assert "Jane Doe" not in content
+    assert "jane@example.com" not in content
+    assert "[NAME_" in content and "[EMAIL_" in content
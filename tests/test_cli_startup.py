@@ -0,0 +1,49 @@
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import gemini_gitlab_workflow
+
+# Cumulative import budget for `gemini_gitlab_workflow.cli`, in milliseconds.
+# Generous enough for slow CI runners; the eager imports used to cost >1s.
+IMPORT_BUDGET_MS = int(os.getenv("GGW_IMPORT_BUDGET_MS", "400"))
+
+# Modules that must not be imported just to build the Typer app.
+HEAVY_MODULES = ["google.generativeai", "gitlab", "rich", "yaml", "ruamel", "pydantic", "networkx"]
+
+SRC_DIR = Path(gemini_gitlab_workflow.__file__).resolve().parents[1]
+
+
+def _run_python(*args: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR)}
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, check=True)
+
+
+def test_cli_import_does_not_load_heavy_dependencies():
+    # Arrange
+    script = (
+        "import sys, gemini_gitlab_workflow.cli\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+
+    # Act
+    result = _run_python("-c", script)
+
+    # Assert
+    assert result.stdout.strip() == ""
+
+
+def test_cli_import_time_within_budget():
+    # Act
+    result = _run_python("-X", "importtime", "-c", "import gemini_gitlab_workflow.cli")
+
+    # Assert
+    match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| gemini_gitlab_workflow\.cli$", result.stderr, re.MULTILINE)
+    assert match, "Could not find gemini_gitlab_workflow.cli in the -X importtime output"
+    cumulative_ms = int(match.group(1)) / 1000
+    if cumulative_ms > IMPORT_BUDGET_MS:
+        pytest.fail(f"Importing the CLI took {cumulative_ms:.0f} ms (budget: {IMPORT_BUDGET_MS} ms)")
@@ -0,0 +1,120 @@
+import io
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+import typer
+
+from gemini_gitlab_workflow import daemon
+
+# A minimal app standing in for the real CLI, so no GitLab or Gemini access is needed.
+demo_app = typer.Typer()
+
+@demo_app.command()
+def hello(name: str):
+    print(f"Hello {name}")
+
+@demo_app.command()
+def fail():
+    raise typer.Exit(3)
+
+@demo_app.command()
+def ask():
+    if typer.confirm("Proceed?"):
+        print("confirmed")
+
+
+@pytest.fixture
+def socket_path(mocker):
+    """Unix socket paths are limited to ~100 characters, so avoid pytest's long tmp_path."""
+    path = Path(tempfile.mkdtemp(prefix="ggw-")) / "ggw.sock"
+    mocker.patch('gemini_gitlab_workflow.config.DAEMON_SOCKET_PATH', str(path))
+    mocker.patch('gemini_gitlab_workflow.config.PROJECT_ROOT', Path.cwd())
+    return path
+
+
+@pytest.fixture
+def running_daemon(socket_path, mocker):
+    """Runs the daemon on a background thread for the duration of a test."""
+    mocker.patch('gemini_gitlab_workflow.daemon._warm_up')
+    ready, stop = threading.Event(), threading.Event()
+    thread = threading.Thread(target=daemon.serve, args=(demo_app,), kwargs={"sync_interval": 0, "ready": ready, "stop": stop})
+    thread.start()
+    assert ready.wait(5)
+    yield socket_path
+    stop.set()
+    thread.join(5)
+
+
+def test_run_in_daemon_falls_back_without_daemon(socket_path):
+    assert daemon.run_in_daemon(["hello", "world"]) is None
+
+
+def test_run_in_daemon_keeps_local_commands_local(running_daemon):
+    assert daemon.run_in_daemon(["serve"]) is None
+    assert daemon.run_in_daemon(["hello", "--help"]) is None
+
+
+def test_run_in_daemon_streams_output(running_daemon, capsys):
+    # Act
+    exit_code = daemon.run_in_daemon(["hello", "world"])
+
+    # Assert
+    assert exit_code == 0
+    assert "Hello world" in capsys.readouterr().out
+
+
+def test_run_in_daemon_propagates_exit_code(running_daemon):
+    assert daemon.run_in_daemon(["fail"]) == 3
+
+
+def test_run_in_daemon_forwards_stdin_to_prompts(running_daemon, capsys, monkeypatch):
+    # Arrange
+    monkeypatch.setattr(sys, "stdin", io.StringIO("y\n"))
+
+    # Act
+    exit_code = daemon.run_in_daemon(["ask"])
+
+    # Assert
+    assert exit_code == 0
+    assert "confirmed" in capsys.readouterr().out
+
+
+def test_daemon_refuses_other_project_roots(running_daemon, mocker, tmp_path):
+    # Arrange
+    mocker.patch('pathlib.Path.cwd', return_value=tmp_path)
+
+    # Act / Assert
+    assert daemon.run_in_daemon(["hello", "world"]) is None
+
+
+def test_serve_refuses_to_start_twice(running_daemon):
+    with pytest.raises(RuntimeError):
+        daemon.serve(demo_app, sync_interval=0)
+
+
+def test_daemon_refuses_clients_with_other_settings(running_daemon, monkeypatch):
+    # Arrange
+    monkeypatch.setenv("GGW_LLM_BUDGET", "10")
+
+    # Act / Assert
+    assert daemon.run_in_daemon(["hello", "world"]) is None
+
+
+def test_background_sync_is_skipped_while_a_command_runs(mocker):
+    # Arrange
+    sync_once = mocker.patch('gemini_gitlab_workflow.daemon._sync_once')
+    server = mocker.Mock(command_lock=threading.Lock())
+    busy_stop = mocker.Mock(**{"wait.side_effect": [False, True]})
+    idle_stop = mocker.Mock(**{"wait.side_effect": [False, True]})
+
+    # Act
+    with server.command_lock:  # A command waiting at a prompt
+        daemon._sync_periodically(server, 1, busy_stop)
+    daemon._sync_periodically(server, 1, idle_stop)
+
+    # Assert
+    assert sync_once.call_count == 1
+    assert not server.command_lock.locked()
@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from gemini_gitlab_workflow import config, duplicates
+from gemini_gitlab_workflow.search_index import SearchIndex
+
+
+def _write_issue(iid: int, title: str, body: str):
+    path = Path(config.DATA_DIR) / "backbones" / f"issue-{iid}.md"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\niid: {iid}\ntitle: {title}\n---\n\n{body}\n", encoding="utf-8")
+
+
+@pytest.fixture
+def index(mocker, tmp_path):
+    """Two synced issues and no docs."""
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    mocker.patch('gemini_gitlab_workflow.config.DOCS_DIR', docs_dir)
+    _write_issue(1, "Export invoices as PDF", "Users download their invoice history as a PDF file.")
+    _write_issue(2, "Reset password", "Send a reset link by email.")
+    index = SearchIndex()
+    index.update()
+    return index
+
+
+def test_find_duplicates_flags_near_duplicates_of_synced_issues(index):
+    # Arrange
+    proposed = [
+        {"id": "NEW_1", "title": "Export invoice as PDF", "description": "Users download their invoice history as PDF."},
+        {"id": "NEW_2", "title": "Pay by card", "description": "Accept credit cards at checkout."},
+    ]
+
+    # Act
+    found = duplicates.find_duplicates(proposed, index, threshold=0.8)
+
+    # Assert
+    assert len(found) == 1
+    assert found[0]["id"] == "NEW_1"
+    assert (found[0]["duplicate_of"], found[0]["duplicate_title"], found[0]["existing"]) == (1, "Export invoices as PDF", True)
+    assert 0.8 <= found[0]["score"] <= 1
+
+
+def test_find_duplicates_flags_near_duplicate_siblings(index):
+    # Arrange
+    proposed = [
+        {"id": "NEW_1", "title": "Pay by card", "description": "Accept credit cards at checkout."},
+        {"id": "NEW_2", "title": "Pay by credit card", "description": "Accept credit cards at checkout."},
+        {"id": "NEW_3", "title": "Pay by bank transfer", "description": "Show the bank details at checkout."},
+    ]
+
+    # Act
+    found = duplicates.find_duplicates(proposed, index, threshold=0.8)
+
+    # Assert
+    assert [(d["id"], d["duplicate_of"], d["existing"]) for d in found] == [("NEW_2", "NEW_1", False)]
+
+
+def test_find_duplicates_can_be_disabled(index):
+    # Arrange
+    proposed = [{"id": "NEW_1", "title": "Reset password", "description": "Send a reset link by email."}]
+
+    # Act
+    enabled = duplicates.find_duplicates(proposed, index, threshold=0.8)
+    disabled = duplicates.find_duplicates(proposed, index, threshold=0)
+
+    # Assert
+    assert [d["duplicate_of"] for d in enabled] == [2]
+    assert disabled == []
@@ -0,0 +1,166 @@
+import os
+import time
+
+import gitlab
+import pytest
+import requests
+
+from benchmarks.fake_gitlab_server import DEFAULT_TOKEN, FakeGitlabServer
+from benchmarks.generator import generate_project
+from gemini_gitlab_workflow import gitlab_client, project_mapper
+
+PROJECT_ID = "1000"
+
+
+@pytest.fixture
+def project():
+    return generate_project(60)
+
+
+@pytest.fixture
+def connect(mocker):
+    """Points gitlab_client at a running FakeGitlabServer."""
+    def _connect(server: FakeGitlabServer):
+        mocker.patch.dict(os.environ, {
+            "GGW_GITLAB_URL": server.url,
+            "GGW_GITLAB_PRIVATE_TOKEN": DEFAULT_TOKEN,
+            "GGW_GITLAB_PROJECT_ID": PROJECT_ID,
+            "GGW_GITLAB_BOARD_ID": "1",
+        })
+        gitlab_client.get_gitlab_client.cache_clear()
+    yield _connect
+    gitlab_client.get_gitlab_client.cache_clear()
+
+
+def test_lists_all_issues_across_pages(project, connect):
+    with FakeGitlabServer(project) as server:
+        # Arrange
+        connect(server)
+
+        # Act
+        issues = gitlab_client.get_project_issues(PROJECT_ID, all=True, per_page=20)
+
+        # Assert
+        assert sorted(i.iid for i in issues) == list(range(1, 61))
+        assert server.requests["list_issues"] == 3
+
+
+def test_issue_write_endpoints_round_trip(project, connect):
+    with FakeGitlabServer(project) as server:
+        # Arrange
+        connect(server)
+
+        # Act
+        issue = gitlab_client.create_project_issue(PROJECT_ID, {"title": "New story", "labels": ["Type::Story"]})
+        gitlab_client.create_issue_note(PROJECT_ID, issue.iid, {"body": "Blocked by #3"})
+        gitlab_client.create_issue_link(PROJECT_ID, issue.iid, 1)
+        gitlab_client.create_project_label(PROJECT_ID, {"name": "Backbone::New", "color": "#F0AD4E"})
+        gitlab_client.move_issue_in_board_list(PROJECT_ID, issue.iid, move_before_id=project.issues[0].id)
+
+        # Assert
+        assert issue.iid == 61
+        assert [n.body for n in gitlab_client.get_issue_notes(PROJECT_ID, issue.iid)] == ["Blocked by #3"]
+        assert [link.iid for link in gitlab_client.get_issue_links(PROJECT_ID, issue.iid)] == [1]
+        assert "Backbone::New" in [label.name for label in gitlab_client.get_project_labels(PROJECT_ID)]
+        board = gitlab_client.get_project_board(PROJECT_ID)
+        assert len(board.lists.list(all=True)) == len(project.backbones)
+
+        gitlab_client.delete_project_label(PROJECT_ID, "Backbone::New")
+        gitlab_client.delete_project_issue(PROJECT_ID, issue.iid)
+        with pytest.raises(gitlab.exceptions.GitlabGetError):
+            gitlab_client.get_project_issue(PROJECT_ID, issue.iid)
+
+
+def test_rejects_invalid_token(project, connect):
+    with FakeGitlabServer(project, token="other-token") as server:
+        # Arrange
+        connect(server)
+
+        # Act / Assert
+        with pytest.raises(ConnectionError):
+            gitlab_client.get_gitlab_client()
+
+
+def test_python_gitlab_retries_injected_throttling(project, connect):
+    with FakeGitlabServer(project, throttle_rate=0.3, seed=3) as server:
+        # Arrange
+        connect(server)
+
+        # Act
+        issues = gitlab_client.get_project_issues(PROJECT_ID, all=True, per_page=10)
+
+        # Assert
+        assert len(issues) == 60
+        assert server.statuses[429] > 0
+
+
+def test_injected_server_errors_surface_without_transient_retries(project, connect):
+    with FakeGitlabServer(project, error_rate=1.0) as server:
+        # Arrange
+        connect(server)
+
+        # Act / Assert
+        with pytest.raises(ConnectionError):
+            gitlab_client.get_gitlab_client()
+        assert server.statuses[503] == 1
+
+
+def test_rate_limit_headers_and_window(project):
+    with FakeGitlabServer(project, rate_limit=2, rate_limit_period=60) as server:
+        # Arrange
+        session = requests.Session()
+        session.headers["PRIVATE-TOKEN"] = DEFAULT_TOKEN
+
+        # Act
+        responses = [session.get(f"{server.url}/api/v4/projects/{PROJECT_ID}") for _ in range(3)]
+
+        # Assert
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert responses[0].headers["RateLimit-Limit"] == "2"
+        assert responses[1].headers["RateLimit-Remaining"] == "0"
+        assert int(responses[2].headers["Retry-After"]) > 0
+
+
+def test_latency_is_applied_per_request(project):
+    with FakeGitlabServer(project, latency=0.05) as server:
+        # Act
+        start = time.perf_counter()
+        requests.get(f"{server.url}/api/v4/user", headers={"PRIVATE-TOKEN": DEFAULT_TOKEN})
+
+        # Assert
+        assert time.perf_counter() - start >= 0.05
+
+
+def test_build_project_map_over_http(project, connect, mocker):
+    with FakeGitlabServer(project) as server:
+        # Arrange
+        connect(server)
+        mocker.patch('gemini_gitlab_workflow.file_system_repo.write_issue_file')
+        mocker.patch('gemini_gitlab_workflow.file_system_repo.write_project_map')
+
+        # Act
+        result = project_mapper.build_project_map(PROJECT_ID)
+
+        # Assert
+        assert result["status"] == "success"
+        assert result["issues_found"] == 60
+        assert server.requests["list_links"] == len(project.stories)
+
+
+def test_resync_fetches_only_new_notes_over_http(project, connect, mocker):
+    with FakeGitlabServer(project) as server:
+        # Arrange
+        connect(server)
+        mocker.patch('gemini_gitlab_workflow.file_system_repo.write_issue_file')
+        mocker.patch('gemini_gitlab_workflow.file_system_repo.write_project_map')
+        project_mapper.build_project_map(PROJECT_ID)
+        blocker, story = project.stories[0].iid, project.stories[-1].iid
+        gitlab_client.create_issue_note(PROJECT_ID, story, {"body": f"Blocked by #{blocker}"})
+        server.requests.clear()
+
+        # Act
+        result = project_mapper.build_project_map(PROJECT_ID)
+
+        # Assert
+        assert server.requests["list_notes"] == 1
+        assert {"source": blocker, "target": story, "type": "blocks"} in result["map_data"]["links"]
@@ -9,6 +9,7 @@ from gemini_gitlab_workflow.file_system_repo import (
     _generate_markdown_content,
     write_issue_file,
     write_project_map,
+    read_project_map,
     read_timestamps_cache,
     write_timestamps_cache,
 )
@@ -102,6 +103,15 @@ def test_write_project_map(mock_config_paths):
         data = yaml.safe_load(f)
     assert data["nodes"][0]["id"] == 1
 
+def test_read_project_map_roundtrip(mock_config_paths):
+    project_map_data = {"nodes": [{"id": 1, "title": "Node 1", "labels": ["Type::Epic"]}], "links": []}
+    write_project_map(project_map_data)
+
+    assert read_project_map() == project_map_data
+
+def test_read_project_map_not_found(mock_config_paths):
+    assert read_project_map() is None
+
 def test_timestamps_cache_read_write(mock_config_paths):
     # Test writing
     timestamps = {"1": "2025-01-01T00:00:00.000Z"}
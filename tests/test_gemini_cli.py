@@ -3,6 +3,7 @@ import typer
 from typer.testing import CliRunner
 import os
 import json
+from pathlib import Path
 from unittest.mock import MagicMock
 
 # The CLI app to be tested
@@ -36,7 +37,7 @@ def mock_issue_2():
 @pytest.fixture
 def mock_gitlab_client(mocker, mock_issue_1, mock_issue_2):
     """Fixture to mock the entire gitlab_service module and its functions."""
-    mock_smart_sync = mocker.patch('gemini_gitlab_workflow.gitlab_service.smart_sync')
+    mock_sync = mocker.patch('gemini_gitlab_workflow.gitlab_service.sync_project_map')
     
     mocker.patch('gemini_gitlab_workflow.ai_service.get_relevant_context_files', return_value=[])
     mocker.patch('gemini_gitlab_workflow.ai_service.generate_implementation_plan', return_value={
@@ -45,22 +46,24 @@ def mock_gitlab_client(mocker, mock_issue_1, mock_issue_2):
         ]
     })
     mocker.patch('typer.confirm', return_value=True)
-    mocker.patch('gemini_gitlab_workflow.gitlab_service.build_project_map_and_sync_files', return_value={
+    mock_sync.return_value = {
         "status": "success",
         "map_data": {"nodes": [], "links": []},
-        "issues_found": 0
-    })
-    return mock_smart_sync
+        "issues_found": 0,
+        "updated_count": 0
+    }
+    return mock_sync
 
 class TestCreateFeature:
 
     def test_sync_success_no_updates(self, mock_gitlab_client):
-        """Test the CLI output when smart_sync reports no updates."""
+        """Test the CLI output when the sync reports no updates."""
         # Arrange
         mock_gitlab_client.return_value = {
             "status": "success",
+            "map_data": {"nodes": [], "links": []},
             "updated_count": 0,
-            "total_issues": 120
+            "issues_found": 120
         }
 
         # Act
@@ -71,16 +74,17 @@ class TestCreateFeature:
         mock_gitlab_client.assert_called_once()
 
     def test_sync_success_with_updates(self, mock_gitlab_client):
-        """Test the CLI output when smart_sync reports updates."""
+        """Test the CLI output when the sync reports updates."""
         # Arrange
         mock_gitlab_client.return_value = {
             "status": "success",
+            "map_data": {"nodes": [], "links": []},
             "updated_count": 2,
             "updated_issues": [
                 {"iid": 1, "title": "First Issue"},
                 {"iid": 2, "title": "Second Issue"}
             ],
-            "total_issues": 2
+            "issues_found": 2
         }
 
         # Act
@@ -91,17 +95,12 @@ class TestCreateFeature:
         mock_gitlab_client.assert_called_once()
 
     def test_sync_error(self, mock_gitlab_client, mocker):
-        """Test the CLI output when smart_sync reports an error."""
+        """Test the CLI output when the sync reports an error."""
         # Arrange
         mock_gitlab_client.return_value = {
             "status": "error",
             "message": "Invalid GitLab token"
         }
-        # Ensure build_project_map also returns an error to trigger the exit
-        mocker.patch('gemini_gitlab_workflow.gitlab_service.build_project_map_and_sync_files', return_value={
-            "status": "error",
-            "message": "Build map error"
-        })
 
         # Act
         result = runner.invoke(app, ["create-feature", "test feature"])
@@ -138,8 +137,7 @@ class TestCreateFeature:
         """
         # Arrange
         # 1. Mock the services that are not under test
-        mocker.patch('gemini_gitlab_workflow.gitlab_service.smart_sync')
-        mocker.patch('gemini_gitlab_workflow.gitlab_service.build_project_map_and_sync_files', return_value={"status": "success", "map_data": {}})
+        mocker.patch('gemini_gitlab_workflow.gitlab_service.sync_project_map', return_value={"status": "success", "map_data": {}})
         mocker.patch('gemini_gitlab_workflow.ai_service.generate_implementation_plan', return_value={"proposed_issues": []}) # No new issues needed for this test
         
         # 2. Create a temporary directory structure to act as the project root
@@ -172,6 +170,137 @@ class TestCreateFeature:
         # Verify the AI was called and the files were "identified"
         assert "AI identified 2 relevant files" in result.stdout
 
+    def test_create_feature_prefilters_issues_that_arrive_with_the_sync(self, mocker, tmp_path):
+        """
+        Tests that the pre-filter starts on the docs before the sync finishes and that
+        issue sources introduced by the sync are pre-filtered and merged afterwards.
+        """
+        # Arrange
+        mocker.patch('pathlib.Path.cwd', return_value=tmp_path)
+        mocker.patch('gemini_gitlab_workflow.gitlab_service.sync_project_map', return_value={
+            "status": "success",
+            "map_data": {"nodes": [{"id": 7, "title": "Synced Story", "labels": [], "local_path": "story-7.md"}], "links": []}
+        })
+        mocker.patch('gemini_gitlab_workflow.ai_service.generate_implementation_plan', return_value={"proposed_issues": []})
+        mock_prefilter = mocker.patch(
+            'gemini_gitlab_workflow.ai_service.get_relevant_context_files',
+            side_effect=[["docs/doc1.md"], ["gitlab_data/story-7.md", "docs/doc1.md"]]
+        )
+
+        # Act
+        result = runner.invoke(app, ["create-feature", "test feature"])
+
+        # Assert
+        assert result.exit_code == 0
+        assert mock_prefilter.call_count == 2
+        late_sources = mock_prefilter.call_args_list[1].args[1]
+        assert [s["summary"] for s in late_sources] == ["Synced Story"]
+        assert "AI identified 2 relevant files" in result.stdout
+
+
+    def test_create_feature_batch_syncs_once_and_merges_overlapping_plans(self, mock_gitlab_client, mocker, tmp_path):
+        """
+        Tests that --batch syncs once, plans every feature, and writes one merged
+        plan in which an epic proposed by two features is only created once.
+        """
+        # Arrange
+        import yaml
+        from gemini_gitlab_workflow import file_system_repo
+        batch_file = tmp_path / "features.yaml"
+        batch_file.write_text(yaml.safe_dump(["Pay by card", {"description": "Pay by invoice"}]))
+        epic = {"id": "NEW_1", "title": "Payments", "description": "", "labels": ["Type::Epic", "Epic::Payments"]}
+
+        def plan(description, *_):
+            story = {"id": "NEW_2", "title": description, "description": "", "labels": ["Type::Story", "Epic::Payments"],
+                     "dependencies": {"is_blocked_by": ["NEW_1"]}}
+            return {"proposed_issues": [dict(epic), story]}
+
+        mock_plan = mocker.patch('gemini_gitlab_workflow.ai_service.generate_implementation_plan', side_effect=plan)
+
+        # Act
+        result = runner.invoke(app, ["create-feature", "--batch", str(batch_file)])
+
+        # Assert
+        assert result.exit_code == 0, result.stdout
+        mock_gitlab_client.assert_called_once()
+        assert mock_plan.call_count == 2
+        assert "Overlap: 'Payments'" in result.stdout
+        project_map = file_system_repo.read_project_map()
+        assert sorted(n["title"] for n in project_map["nodes"]) == ["Pay by card", "Pay by invoice", "Payments"]
+        assert {"source": "NEW_F1_1", "target": "NEW_F2_2", "type": "blocks"} in project_map["links"]
+        assert {"source": "NEW_F1_1", "target": "NEW_F2_2", "type": "contains"} in project_map["links"]
+
+    def test_create_feature_batch_rejects_an_invalid_file(self, mock_gitlab_client, tmp_path):
+        # Arrange
+        batch_file = tmp_path / "features.yaml"
+        batch_file.write_text("features: 3\n")
+
+        # Act
+        result = runner.invoke(app, ["create-feature", "--batch", str(batch_file)])
+
+        # Assert
+        assert result.exit_code == 1
+        mock_gitlab_client.assert_not_called()
+
+    def test_create_feature_revises_a_rejected_plan_from_feedback(self, mock_gitlab_client, mocker):
+        """
+        Tests that rejecting the plan asks for feedback and revises the plan with
+        one call, without syncing or planning again, before files are generated.
+        """
+        # Arrange
+        mocker.patch('typer.confirm', side_effect=[False, True])
+        mocker.patch('typer.prompt', return_value="Drop the admin epic")
+        mock_revise = mocker.patch('gemini_gitlab_workflow.ai_service.revise_implementation_plan', return_value={
+            "proposed_issues": [{"id": "NEW_1", "title": "Revised Story", "description": "", "labels": ["Type::Story"]}]
+        })
+        mock_generate_files = mocker.patch('gemini_gitlab_workflow.cli._generate_local_files')
+
+        # Act
+        result = runner.invoke(app, ["create-feature", "test feature"])
+
+        # Assert
+        assert result.exit_code == 0, result.stdout
+        mock_gitlab_client.assert_called_once()
+        ai_service.generate_implementation_plan.assert_called_once()
+        assert mock_revise.call_args.args[0][0]["title"] == "Mock Story"
+        assert mock_revise.call_args.args[1] == "Drop the admin epic"
+        plan = mock_generate_files.call_args.args[0]
+        assert [issue["title"] for issue in plan["proposed_issues"]] == ["Revised Story"]
+
+    def test_create_feature_aborts_on_empty_feedback(self, mock_gitlab_client, mocker):
+        # Arrange
+        mocker.patch('typer.confirm', return_value=False)
+        mocker.patch('typer.prompt', return_value="")
+        mock_generate_files = mocker.patch('gemini_gitlab_workflow.cli._generate_local_files')
+
+        # Act
+        result = runner.invoke(app, ["create-feature", "test feature"])
+
+        # Assert
+        assert result.exit_code == 1
+        mock_generate_files.assert_not_called()
+
+    def test_context_from_project_map_includes_qualified_ids(self):
+        """
+        Tests that issues of a multi-project map (ids like "shop/app#12") are
+        context sources, while local NEW_* issues are not.
+        """
+        # Arrange
+        from gemini_gitlab_workflow.cli import _get_context_from_project_map
+        from gemini_gitlab_workflow.config import DATA_DIR
+
+        project_map = {"nodes": [
+            {"id": 7, "title": "Single", "local_path": "story-7.md"},
+            {"id": "shop/app#12", "title": "Qualified", "local_path": "shop/app/story-12.md"},
+            {"id": "NEW_1", "title": "Planned", "local_path": "story-new.md"},
+        ]}
+
+        # Act
+        sources = _get_context_from_project_map(project_map)
+
+        # Assert
+        assert [source["summary"] for source in sources] == ["Single", "Qualified"]
+        assert sources[1]["path"] == Path(DATA_DIR) / "shop/app/story-12.md"
 
 class TestGenerateLocalFiles:
 
@@ -257,6 +386,140 @@ class TestGenerateLocalFiles:
             temp_id = issue_from_plan['id']
             assert temp_id in nodes_by_id
 
+    def test_generate_local_files_places_stories_under_existing_epics(self, mocker):
+        """
+        Tests that a story for an epic already in the map is written next to it
+        and recorded with a path relative to the data directory.
+        """
+        # Arrange
+        from gemini_gitlab_workflow.cli import _generate_local_files
+        from gemini_gitlab_workflow.config import DATA_DIR
+        from rich.console import Console
+
+        mock_write_map = mocker.patch('gemini_gitlab_workflow.file_system_repo.write_project_map')
+        project_map = {
+            "nodes": [{"id": 7, "title": "Checkout", "state": "opened", "labels": ["Type::Epic"],
+                       "local_path": "shop/checkout/epic.md"}],
+            "links": [],
+        }
+        plan = {"proposed_issues": [
+            {"id": "NEW_1", "title": "Pay by card", "labels": ["Type::Story", "Epic::Checkout"], "description": "Card."}
+        ]}
+
+        # Act
+        _generate_local_files(plan, Console(), project_map)
+
+        # Assert
+        written_map = mock_write_map.call_args.args[0]
+        new_node = written_map["nodes"][-1]
+        assert new_node["local_path"] == str(Path("shop/checkout/story-pay-by-card.md"))
+        assert (Path(DATA_DIR) / new_node["local_path"]).exists()
+        assert written_map["links"] == [{"source": 7, "target": "NEW_1", "type": "contains"}]
+
+    def test_generate_local_files_remaps_temp_ids_already_in_use(self, mocker):
+        """
+        Tests that a plan reusing the temp id of a pending issue in the map, or
+        repeating one of its own, gets fresh ids instead of failing.
+        """
+        # Arrange
+        from gemini_gitlab_workflow.cli import _generate_local_files
+        from rich.console import Console
+
+        mock_write_map = mocker.patch('gemini_gitlab_workflow.file_system_repo.write_project_map')
+        project_map = {
+            "nodes": [{"id": "NEW_1", "title": "Pending story", "state": "opened", "labels": ["Type::Story"],
+                       "local_path": "_unassigned/pending-story.md"}],
+            "links": [],
+        }
+        plan = {"proposed_issues": [
+            {"id": "NEW_1", "title": "Pay by card", "labels": ["Type::Story"], "description": "Card."},
+            {"id": "NEW_2", "title": "Send receipts", "labels": ["Type::Story"], "description": "Receipts.",
+             "dependencies": {"is_blocked_by": ["NEW_1"]}},
+            {"id": "NEW_2", "title": "Refund payments", "labels": ["Type::Story"], "description": "Refunds."},
+        ]}
+
+        # Act
+        _generate_local_files(plan, Console(), project_map)
+
+        # Assert
+        written_map = mock_write_map.call_args.args[0]
+        assert [(node["id"], node["title"]) for node in written_map["nodes"]] == [
+            ("NEW_1", "Pending story"), ("NEW_3", "Pay by card"), ("NEW_2", "Send receipts"), ("NEW_4", "Refund payments"),
+        ]
+        assert written_map["links"] == [{"source": "NEW_3", "target": "NEW_2", "type": "blocks"}]
+
+    def test_generate_local_files_skips_near_duplicates_and_relinks_to_them(self, mocker):
+        """
+        Tests that a proposed story nearly identical to a synced one is not
+        written, and that dependencies on it point to the synced story instead.
+        """
+        # Arrange
+        from gemini_gitlab_workflow.cli import _generate_local_files
+        from gemini_gitlab_workflow.config import DATA_DIR
+        from rich.console import Console
+
+        mock_write_map = mocker.patch('gemini_gitlab_workflow.file_system_repo.write_project_map')
+        mocker.patch('gemini_gitlab_workflow.config.DUPLICATE_THRESHOLD', 0.85)
+        existing_path = Path(DATA_DIR) / "shop" / "checkout" / "story-pay-by-card.md"
+        existing_path.parent.mkdir(parents=True)
+        existing_path.write_text("---\niid: 8\ntitle: Pay by card\n---\n\nAccept credit cards at checkout.\n", encoding="utf-8")
+        project_map = {
+            "nodes": [{"id": 8, "title": "Pay by card", "state": "opened", "labels": ["Type::Story"],
+                       "local_path": "shop/checkout/story-pay-by-card.md"}],
+            "links": [],
+        }
+        plan = {"proposed_issues": [
+            {"id": "NEW_1", "title": "Pay by credit card", "labels": ["Type::Story"],
+             "description": "Accept credit cards at checkout."},
+            {"id": "NEW_2", "title": "Send receipts", "labels": ["Type::Story"],
+             "description": "Email a receipt after payment.", "dependencies": {"is_blocked_by": ["NEW_1"]}},
+        ]}
+
+        # Act
+        _generate_local_files(plan, Console(), project_map)
+
+        # Assert
+        written_map = mock_write_map.call_args.args[0]
+        assert [node["id"] for node in written_map["nodes"]] == [8, "NEW_2"]
+        assert written_map["links"] == [{"source": 8, "target": "NEW_2", "type": "blocks"}]
+
+    def test_generate_local_files_keeps_an_epic_that_nearly_duplicates_a_story(self, mocker):
+        """
+        Tests that a proposed epic nearly identical to a synced story is kept,
+        so that its stories are not placed under the story's directory.
+        """
+        # Arrange
+        from gemini_gitlab_workflow.cli import _generate_local_files
+        from gemini_gitlab_workflow.config import DATA_DIR
+        from rich.console import Console
+
+        mock_write_map = mocker.patch('gemini_gitlab_workflow.file_system_repo.write_project_map')
+        mocker.patch('gemini_gitlab_workflow.config.DUPLICATE_THRESHOLD', 0.85)
+        existing_path = Path(DATA_DIR) / "shop" / "checkout" / "story-pay-by-card.md"
+        existing_path.parent.mkdir(parents=True)
+        existing_path.write_text("---\niid: 8\ntitle: Pay by card\n---\n\nAccept credit cards at checkout.\n", encoding="utf-8")
+        project_map = {
+            "nodes": [{"id": 8, "title": "Pay by card", "state": "opened", "labels": ["Type::Story"],
+                       "local_path": "shop/checkout/story-pay-by-card.md"}],
+            "links": [],
+        }
+        plan = {"proposed_issues": [
+            {"id": "NEW_1", "title": "Pay by credit card", "labels": ["Type::Epic", "Epic::Pay by credit card", "Backbone::Shop"],
+             "description": "Accept credit cards at checkout."},
+            {"id": "NEW_2", "title": "Send receipts", "labels": ["Type::Story", "Epic::Pay by credit card", "Backbone::Shop"],
+             "description": "Email a receipt after payment."},
+        ]}
+
+        # Act
+        _generate_local_files(plan, Console(), project_map)
+
+        # Assert
+        written_map = mock_write_map.call_args.args[0]
+        nodes = {node["id"]: node for node in written_map["nodes"]}
+        assert list(nodes) == [8, "NEW_1", "NEW_2"]
+        assert Path(nodes["NEW_2"]["local_path"]).parent == Path(nodes["NEW_1"]["local_path"]).parent
+        assert {"source": "NEW_1", "target": "NEW_2", "type": "contains"} in written_map["links"]
+
 
 class TestUploadStoryMap:
 
@@ -276,6 +539,29 @@ class TestUploadStoryMap:
         assert "not" in result.stdout and "found" in result.stdout
         assert "Please generate a story map first" in result.stdout
 
+    def test_upload_story_map_reports_multi_project_mode(self, mocker):
+        """
+        Tests that uploading in multi-project mode reports that upload is
+        single-project only, and leaves the local map untouched.
+        """
+        # Arrange
+        import yaml
+        from gemini_gitlab_workflow import config
+
+        mocker.patch.dict(os.environ, {"GGW_GITLAB_PROJECT_IDS": "shop/app,shop/lib"})
+        project_map = {"nodes": [{"id": "NEW_1", "title": "New story", "labels": []}], "links": []}
+        with open(config.PROJECT_MAP_PATH, "w") as f:
+            yaml.dump(project_map, f)
+
+        # Act
+        result = runner.invoke(app, ["upload", "story-map"])
+
+        # Assert
+        assert result.exit_code == 1
+        assert "single-project only" in result.stdout
+        with open(config.PROJECT_MAP_PATH) as f:
+            assert yaml.safe_load(f) == project_map
+
 
 class TestAnonymization:
 
@@ -293,8 +579,7 @@ class TestAnonymization:
         deanonymize functions at the right points in the workflow.
         """
         # Arrange
-        mocker.patch('gemini_gitlab_workflow.gitlab_service.smart_sync')
-        mocker.patch('gemini_gitlab_workflow.gitlab_service.build_project_map_and_sync_files', return_value={"status": "success", "map_data": {}})
+        mocker.patch('gemini_gitlab_workflow.gitlab_service.sync_project_map', return_value={"status": "success", "map_data": {}})
         mocker.patch('gemini_gitlab_workflow.ai_service.get_relevant_context_files', return_value=[])
         
         mock_plan = {
@@ -322,4 +607,108 @@ class TestAnonymization:
         # Check that deanonymization was called on the outputs from the AI
         mock_deanonymize_method.assert_any_call("Anonymized Title")
         mock_deanonymize_method.assert_any_call("Anonymized description.")
-        mock_deanonymize_method.assert_any_call("Anonymized::Label")
\ No newline at end of file
+        mock_deanonymize_method.assert_any_call("Anonymized::Label")
+
+class TestQuery:
+
+    @pytest.fixture
+    def project_map_file(self):
+        from gemini_gitlab_workflow import file_system_repo
+        file_system_repo.write_project_map({
+            "nodes": [
+                {"id": 1, "title": "Checkout", "state": "opened", "labels": ["Type::Epic", "Backbone::Shop"]},
+                {"id": 2, "title": "Cart", "state": "opened", "labels": ["Type::Story", "Backbone::Shop"]},
+                {"id": 3, "title": "Payment", "state": "closed", "labels": ["Type::Story", "Backbone::Shop"]},
+                {"id": 4, "title": "Receipt", "state": "opened", "labels": ["Type::Story", "Backbone::Mail"]},
+            ],
+            "links": [
+                {"source": 1, "target": 2, "type": "contains"},
+                {"source": 1, "target": 3, "type": "contains"},
+                {"source": 2, "target": 4, "type": "blocks"},
+                {"source": 3, "target": 4, "type": "blocks"},
+            ],
+        })
+
+    def test_query_issues_filters_and_prints_json(self, project_map_file):
+        # Act
+        result = runner.invoke(app, ["query", "issues", "--backbone", "Shop", "--type", "Story", "--state", "opened", "--json"])
+
+        # Assert
+        assert result.exit_code == 0
+        assert [row["id"] for row in json.loads(result.stdout)] == [2]
+
+    def test_query_blockers_resolves_titles(self, project_map_file):
+        # Act
+        result = runner.invoke(app, ["query", "blockers", "Receipt", "--open", "--json"])
+
+        # Assert
+        assert result.exit_code == 0
+        assert [row["title"] for row in json.loads(result.stdout)] == ["Cart"]
+
+    def test_query_children_prints_a_table(self, project_map_file):
+        # Act
+        result = runner.invoke(app, ["query", "children", "checkout"])
+
+        # Assert
+        assert result.exit_code == 0
+        assert "Cart" in result.stdout and "Payment" in result.stdout
+        assert "2 issue(s)" in result.stdout
+
+    def test_query_unknown_issue_fails(self, project_map_file):
+        # Act
+        result = runner.invoke(app, ["query", "blockers", "Nope"])
+
+        # Assert
+        assert result.exit_code == 1
+        assert "no issue matching 'Nope'" in result.stdout
+
+    def test_query_without_project_map_fails(self):
+        # Act
+        result = runner.invoke(app, ["query", "issues"])
+
+        # Assert
+        assert result.exit_code == 1
+        assert "ggw sync map" in result.stdout
+
+
+class TestSearch:
+
+    @pytest.fixture(autouse=True)
+    def mirror(self, mocker, tmp_path):
+        from gemini_gitlab_workflow import config, search_index
+        mocker.patch('gemini_gitlab_workflow.config.DOCS_DIR', tmp_path / "docs")
+        mocker.patch.object(search_index, "_index", None)
+        for iid, title in [(1, "Export invoices"), (2, "Reset password"), (3, "Invoice reminders")]:
+            path = Path(config.DATA_DIR) / f"issue-{iid}.md"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(f"---\niid: {iid}\ntitle: {title}\n---\n\n{title} description.\n", encoding="utf-8")
+
+    def test_search_prints_ranked_json(self):
+        # Act
+        result = runner.invoke(app, ["search", "invoice", "--json"])
+
+        # Assert
+        assert result.exit_code == 0
+        assert sorted(row["iid"] for row in json.loads(result.stdout)) == [1, 3]
+
+    def test_search_reports_no_results(self):
+        # Act
+        result = runner.invoke(app, ["search", "kubernetes"])
+
+        # Assert
+        assert result.exit_code == 0
+        assert "No results" in result.stdout
+
+    def test_narrow_sources_keeps_best_matches_above_the_limit(self, mocker):
+        # Arrange
+        from gemini_gitlab_workflow import config
+        from gemini_gitlab_workflow.cli import _narrow_sources
+        mocker.patch('gemini_gitlab_workflow.config.PREFILTER_MAX_SOURCES', 2)
+        sources = [{"path": Path(config.DATA_DIR) / f"issue-{iid}.md", "summary": str(iid)} for iid in (1, 2, 3)]
+
+        # Act
+        narrowed = _narrow_sources("invoice reminders", sources)
+
+        # Assert
+        assert [s["summary"] for s in narrowed] == ["3", "1"]
+        assert _narrow_sources("invoice", sources[:2]) == sources[:2]
@@ -17,6 +17,8 @@ from gemini_gitlab_workflow.gitlab_client import (
     delete_project_issue,
     create_issue_note,
     create_issue_link,
+    get_group_issues,
+    RateLimiter,
 )
 
 @pytest.fixture(scope="function")
@@ -102,8 +104,18 @@ def test_get_issue_notes(mock_gitlab_instance):
     mock_project.issues.get.return_value = mock_issue
     mock_gitlab_instance.projects.get.return_value = mock_project
     get_issue_notes("123", 456)
+    mock_project.issues.get.assert_called_once_with(456, lazy=True)
     mock_issue.notes.list.assert_called_once_with(all=True)
 
+def test_get_issue_notes_passes_list_arguments(mock_gitlab_instance):
+    """Tests listing issue notes page by page in a given order."""
+    mock_issue = MagicMock()
+    mock_project = MagicMock()
+    mock_project.issues.get.return_value = mock_issue
+    mock_gitlab_instance.projects.get.return_value = mock_project
+    get_issue_notes("123", 456, order_by="updated_at", sort="desc", iterator=True)
+    mock_issue.notes.list.assert_called_once_with(order_by="updated_at", sort="desc", iterator=True)
+
 def test_get_project_labels(mock_gitlab_instance):
     """Tests listing project labels."""
     mock_project = MagicMock()
@@ -174,3 +186,22 @@ def test_move_issue_in_board_list(mock_gitlab_instance):
     mock_gitlab_instance.projects.get.assert_called_once_with("123")
     mock_project.issues.get.assert_called_once_with(10)
     mock_issue_to_move.reorder.assert_called_once_with(move_before_id=99)
+
+def test_get_group_issues(mock_gitlab_instance):
+    """Tests listing the issues of a whole group at once."""
+    mock_group = MagicMock()
+    mock_gitlab_instance.groups.get.return_value = mock_group
+    get_group_issues("shop", all=True)
+    mock_gitlab_instance.groups.get.assert_called_once_with("shop", lazy=True)
+    mock_group.issues.list.assert_called_once_with(all=True)
+
+def test_rate_limiter_spaces_out_requests_beyond_the_burst(mocker):
+    """Tests that requests beyond the burst wait for their share of the rate."""
+    sleep = mocker.patch('gemini_gitlab_workflow.gitlab_client.time.sleep')
+    limiter = RateLimiter(rate=10, burst=2)
+    for _ in range(4):
+        limiter.acquire()
+    waits = [c.args[0] for c in sleep.call_args_list]
+    assert len(waits) == 2
+    assert waits[0] == pytest.approx(0.1, abs=0.02)
+    assert waits[1] == pytest.approx(0.2, abs=0.02)
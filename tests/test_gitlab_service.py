@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock
 
 from gemini_gitlab_workflow.gitlab_service import (
     smart_sync,
+    sync_project_map,
     build_project_map_and_sync_files,
     upload_new_artifacts,
 )
@@ -65,6 +66,49 @@ def test_smart_sync_orchestration(mock_gitlab_client, mock_file_system_repo):
     mock_gitlab_client.get_project_issue.assert_called_once_with("12345", 2)
     mock_file_system_repo.write_timestamps_cache.assert_called_once()
 
+def test_sync_project_map_lists_issues_once(mock_gitlab_client, mock_file_system_repo, mock_project_mapper):
+    # Arrange
+    mock_file_system_repo.read_timestamps_cache.return_value = {"1": "2025-01-01T00:00:00.000Z"}
+
+    issue1 = MagicMock()
+    issue1.iid = 1
+    issue1.updated_at = "2025-01-01T00:00:00.000Z" # Not updated
+
+    issue2 = MagicMock()
+    issue2.iid = 2
+    issue2.title = "Updated Issue"
+    issue2.updated_at = "2025-01-02T00:00:00.000Z" # Updated
+
+    mock_gitlab_client.get_project_issues.return_value = [issue1, issue2]
+    mock_project_mapper.build_project_map.return_value = {"status": "success", "map_data": {"nodes": []}, "issues_found": 2}
+
+    # Act
+    result = sync_project_map()
+
+    # Assert
+    assert result["status"] == "success"
+    assert result["updated_count"] == 1
+    assert result["updated_issues"] == [{"iid": 2, "title": "Updated Issue"}]
+    mock_gitlab_client.get_project_issues.assert_called_once_with("12345", all=True)
+    mock_gitlab_client.get_project_issue.assert_not_called()
+    mock_project_mapper.build_project_map.assert_called_once_with("12345", issues_list=[issue1, issue2])
+    mock_file_system_repo.write_timestamps_cache.assert_called_once_with({
+        "1": "2025-01-01T00:00:00.000Z",
+        "2": "2025-01-02T00:00:00.000Z",
+    })
+
+def test_sync_project_map_keeps_timestamps_on_error(mock_gitlab_client, mock_file_system_repo, mock_project_mapper):
+    # Arrange
+    mock_gitlab_client.get_project_issues.return_value = []
+    mock_project_mapper.build_project_map.return_value = {"status": "error", "message": "boom"}
+
+    # Act
+    result = sync_project_map()
+
+    # Assert
+    assert result["status"] == "error"
+    mock_file_system_repo.write_timestamps_cache.assert_not_called()
+
 def test_build_project_map_orchestration(mock_project_mapper):
     # Arrange
     mock_project_mapper.build_project_map.return_value = {"status": "success", "issues_found": 5}
@@ -88,4 +132,71 @@ def test_upload_new_artifacts_orchestration(mock_gitlab_uploader):
     # Assert
     assert result["status"] == "success"
     assert result["issues_created"] == 1
-    mock_gitlab_uploader.upload_artifacts_to_gitlab.assert_called_once_with("12345", project_map)
\ No newline at end of file
+    mock_gitlab_uploader.upload_artifacts_to_gitlab.assert_called_once_with("12345", project_map)
+
+
+def test_upload_new_artifacts_refuses_multi_project_maps(mock_gitlab_uploader, mock_project_mapper, monkeypatch):
+    # Arrange
+    monkeypatch.setenv("GGW_GITLAB_GROUP_ID", "shop")
+    project_map = {"nodes": [{"id": "NEW_1", "title": "New story"}], "links": []}
+
+    # Act
+    result = upload_new_artifacts(project_map)
+
+    # Assert
+    assert result["status"] == "error"
+    assert "single-project" in result["message"]
+    mock_gitlab_uploader.upload_artifacts_to_gitlab.assert_not_called()
+    mock_project_mapper.build_project_map.assert_not_called()
+
+
+def test_sync_project_map_uses_the_mirror_while_webhooks_are_live(mock_gitlab_client, mock_file_system_repo, mock_project_mapper, mocker):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.gitlab_service.webhook.mirror_is_live', return_value=True)
+    mock_file_system_repo.read_project_map.return_value = {"nodes": [{"id": 1}], "links": []}
+
+    # Act
+    result = sync_project_map()
+    forced = sync_project_map(force=True)
+
+    # Assert
+    assert result["status"] == "success"
+    assert result["source"] == "webhook"
+    assert result["issues_found"] == 1
+    mock_gitlab_client.get_project_issues.assert_called_once_with("12345", all=True)  # Only the forced sync
+    assert "source" not in forced
+
+def _issue(project_id: int, iid: int, title: str, labels: list[str], description: str = "") -> MagicMock:
+    issue = MagicMock(project_id=project_id, iid=iid, title=title, labels=labels, description=description,
+                      state="opened", updated_at="2025-01-01T00:00:00Z", user_notes_count=0)
+    issue.web_url = f"https://gitlab.example.com/{project_id}/-/issues/{iid}"
+    return issue
+
+def test_sync_project_map_merges_a_group_into_one_map(mock_gitlab_client, mocker, monkeypatch):
+    # Arrange
+    monkeypatch.setenv("GGW_GITLAB_GROUP_ID", "shop")
+    mocker.patch('gemini_gitlab_workflow.file_system_repo.write_issue_file')
+    mocker.patch('gemini_gitlab_workflow.project_mapper.gitlab_client', mock_gitlab_client)
+    mock_gitlab_client.get_group_projects.return_value = [
+        MagicMock(id=1, path_with_namespace="shop/app"), MagicMock(id=2, path_with_namespace="shop/lib"),
+    ]
+    mock_gitlab_client.get_group_issues.return_value = [
+        _issue(1, 1, "Checkout", ["Type::Epic", "Backbone::Shop"]),
+        _issue(1, 2, "Pay", ["Type::Story", "Epic::Checkout"], description="/blocked by lib#1"),
+        _issue(2, 1, "Client", ["Type::Story"]),
+    ]
+    mock_gitlab_client.get_issue_links.return_value = []
+    mock_gitlab_client.get_issue_notes.return_value = []
+
+    # Act
+    result = sync_project_map()
+
+    # Assert
+    assert result["status"] == "success"
+    assert result["projects"] == ["shop/app", "shop/lib"]
+    assert sorted(n["id"] for n in result["map_data"]["nodes"]) == ["shop/app#1", "shop/app#2", "shop/lib#1"]
+    assert {"source": "shop/app#1", "target": "shop/app#2", "type": "contains"} in result["map_data"]["links"]
+    assert {"source": "shop/lib#1", "target": "shop/app#2", "type": "blocks"} in result["map_data"]["links"]
+    assert result["updated_count"] == 3
+    mock_gitlab_client.get_group_issues.assert_called_once_with("shop", all=True)
+    mock_gitlab_client.get_project_issues.assert_not_called()  # Listed once for the whole group
@@ -0,0 +1,145 @@
+import json
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from typer.testing import CliRunner
+
+from gemini_gitlab_workflow import instrumentation
+from gemini_gitlab_workflow.cli import app
+from gemini_gitlab_workflow.instrumentation import Recorder
+
+runner = CliRunner()
+
+
+@pytest.fixture(autouse=True)
+def reset_global_recorder():
+    instrumentation.recorder.reset()
+    yield
+    instrumentation.recorder.reset()
+
+
+def test_recorder_is_a_no_op_when_disabled():
+    # Arrange
+    recorder = Recorder()
+
+    # Act
+    with recorder.span("stage"):
+        pass
+    recorder.count("things", 3)
+
+    # Assert
+    assert recorder.spans == []
+    assert recorder.counters == {}
+
+
+def test_recorder_summary_aggregates_spans_by_name():
+    # Arrange
+    recorder = Recorder()
+    recorder.reset(enabled=True)
+
+    # Act
+    recorder.add_span("fast", 0.0, 0.001)
+    recorder.add_span("slow", 0.0, 0.5)
+    recorder.add_span("slow", 0.0, 0.25)
+
+    # Assert
+    summary = recorder.summary()
+    assert [row["name"] for row in summary] == ["slow", "fast"]
+    assert summary[0]["calls"] == 2
+    assert summary[0]["total"] == pytest.approx(0.75)
+    assert summary[0]["max"] == pytest.approx(0.5)
+    assert summary[0]["mean"] == pytest.approx(0.375)
+
+
+def test_chrome_trace_contains_complete_and_counter_events():
+    # Arrange
+    recorder = Recorder()
+    recorder.reset(enabled=True)
+    with recorder.span("yaml.write_project_map", path="project_map.yaml"):
+        pass
+    recorder.count("http.requests", 2)
+
+    # Act
+    trace = recorder.to_chrome_trace()
+
+    # Assert
+    complete = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    counters = [e for e in trace["traceEvents"] if e["ph"] == "C"]
+    assert complete[0]["name"] == "yaml.write_project_map"
+    assert complete[0]["cat"] == "yaml"
+    assert complete[0]["args"] == {"path": "project_map.yaml"}
+    assert counters == [{"name": "http.requests", "ph": "C", "ts": pytest.approx(complete[0]["ts"] + complete[0]["dur"]),
+                         "pid": complete[0]["pid"], "tid": 0, "args": {"value": 2}}]
+
+
+def test_record_http_response_counts_requests_bytes_and_retries():
+    # Arrange
+    instrumentation.recorder.reset(enabled=True)
+    ok = MagicMock(status_code=200, content=b"12345", url="http://x/api/v4/projects/1", elapsed=timedelta(milliseconds=20))
+    ok.request.method = "GET"
+    throttled = MagicMock(status_code=429, content=b"", url="http://x/api/v4/projects/1", elapsed=timedelta(milliseconds=5))
+    throttled.request.method = "GET"
+
+    # Act
+    instrumentation.record_http_response(throttled)
+    instrumentation.record_http_response(ok)
+
+    # Assert
+    assert instrumentation.recorder.counters == {"http.requests": 2, "http.bytes": 5, "http.retries": 1}
+    assert [s.name for s in instrumentation.recorder.spans] == ["http.GET", "http.GET"]
+    assert instrumentation.recorder.spans[1].duration == pytest.approx(0.02)
+
+
+def test_record_llm_usage_reads_usage_metadata():
+    # Arrange
+    instrumentation.recorder.reset(enabled=True)
+    response = MagicMock()
+    response.usage_metadata.prompt_token_count = 1200
+    response.usage_metadata.candidates_token_count = 300
+    response.usage_metadata.total_token_count = 1500
+
+    # Act
+    instrumentation.record_llm_usage(response)
+
+    # Assert
+    assert instrumentation.recorder.counters == {
+        "llm.prompt_tokens": 1200, "llm.output_tokens": 300, "llm.total_tokens": 1500
+    }
+
+
+def _fake_sync(force: bool = False):
+    with instrumentation.span("map.build"):
+        instrumentation.count("sync.issues", 3)
+    return {"status": "success", "map_data": {}, "issues_found": 3}
+
+
+def test_cli_profile_prints_summary(mocker):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.gitlab_service.sync_project_map', side_effect=_fake_sync)
+
+    # Act
+    result = runner.invoke(app, ["--profile", "sync", "map"])
+
+    # Assert
+    assert result.exit_code == 0
+    assert "Profile: stages" in result.stdout
+    assert "map.build" in result.stdout
+    assert "sync.issues" in result.stdout
+
+
+def test_cli_trace_writes_chrome_trace(mocker, tmp_path):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.gitlab_service.sync_project_map', side_effect=_fake_sync)
+    trace_path = tmp_path / "trace.json"
+
+    # Act
+    result = runner.invoke(app, ["--trace", str(trace_path), "sync", "map"])
+
+    # Assert
+    assert result.exit_code == 0
+    trace = json.loads(trace_path.read_text())
+    assert any(e["name"] == "map.build" and e["ph"] == "X" for e in trace["traceEvents"])
+    assert trace["otherData"]["counters"] == {"sync.issues": 3}
+    # Recording is switched off again once the command finishes.
+    assert instrumentation.recorder.enabled is False
@@ -0,0 +1,241 @@
+import json
+import time
+
+import pytest
+
+from gemini_gitlab_workflow import ai_service, instrumentation, llm_backend
+from gemini_gitlab_workflow.ai_service import IMPLEMENTATION_PLAN_SCHEMA, RELEVANT_FILES_SCHEMA, ImplementationPlan, RelevantFiles
+from gemini_gitlab_workflow.llm_backend import StubBackend
+
+
+@pytest.fixture(autouse=True)
+def fresh_backends():
+    llm_backend.reset_backends()
+    yield
+    llm_backend.reset_backends()
+    instrumentation.recorder.reset()
+
+
+def _messages(user_content: str) -> list:
+    return [{"role": "model", "parts": ["system"]}, {"role": "user", "parts": [user_content]}]
+
+
+def test_get_backend_uses_configured_name(mocker):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.config.LLM_BACKEND', "stub")
+
+    # Act
+    backend = llm_backend.get_backend()
+
+    # Assert
+    assert isinstance(backend, StubBackend)
+    assert llm_backend.get_backend() is backend
+
+
+def test_get_backend_rejects_unknown_names():
+    with pytest.raises(ValueError, match="Unknown LLM backend 'gpt'"):
+        llm_backend.get_backend("gpt")
+
+
+def test_stub_selects_sources_overlapping_the_request():
+    # Arrange
+    content = (
+        'User Request: "Let users upload a profile picture"\n\n'
+        "Available context files:\n"
+        "- File: docs/profile.md, Description: User profile page\n"
+        "- File: docs/billing.md, Description: Invoices and payments\n"
+        "- File: docs/upload.md, Description: Picture upload limits\n"
+    )
+
+    # Act
+    payload = StubBackend().generate(_messages(content), "fast-model", RELEVANT_FILES_SCHEMA)
+
+    # Assert
+    files = RelevantFiles.model_validate_json(payload).relevant_files
+    assert files == ["docs/upload.md", "docs/profile.md"]
+
+
+def test_stub_plan_is_schema_valid_and_deterministic():
+    # Arrange
+    content = (
+        '**User Request:** "Export invoices as PDF"\n\n'
+        "**Already Existing Epics and Stories (Analyze these first!):**\n"
+        "- Title: \"Billing\", Labels: ['Type::Epic', 'Backbone::Billing'], State: \"opened\"\n"
+    )
+
+    # Act
+    first = StubBackend().generate(_messages(content), "smart-model", IMPLEMENTATION_PLAN_SCHEMA)
+    second = StubBackend().generate(_messages(content), "smart-model", IMPLEMENTATION_PLAN_SCHEMA)
+
+    # Assert
+    assert first == second
+    plan = ImplementationPlan.model_validate_json(first)
+    epic, *stories = plan.proposed_issues
+    assert "Type::Epic" in epic.labels
+    assert "Backbone::Billing" in epic.labels
+    assert stories and all(f"Epic::{epic.title}" in story.labels for story in stories)
+
+
+def test_stub_reports_latency_and_token_usage(mocker):
+    # Arrange
+    sleep = mocker.patch('gemini_gitlab_workflow.llm_backend.time.sleep')
+    instrumentation.recorder.reset(enabled=True)
+    backend = StubBackend(latency=0.5, tokens_per_second=100)
+
+    # Act
+    payload = backend.generate(_messages("x" * 400), "model", {"type": "object", "properties": {"answer": {"type": "string"}}, "required": ["answer"]})
+
+    # Assert
+    assert json.loads(payload) == {"answer": ""}
+    output_tokens = llm_backend.estimate_tokens(payload)
+    sleep.assert_called_once_with(pytest.approx(0.5 + output_tokens / 100))
+    assert backend.usage["requests"] == 1
+    assert backend.usage["prompt_tokens"] == 102
+    assert instrumentation.recorder.counters["llm.prompt_tokens"] == 102
+    assert instrumentation.recorder.counters["llm.output_tokens"] == output_tokens
+
+
+def test_mock_flag_routes_ai_service_through_the_stub(mocker):
+    # Arrange
+    gemini = mocker.patch.object(llm_backend.GeminiBackend, "generate")
+
+    # Act
+    plan = ai_service.generate_implementation_plan("Add a dark mode", "context", [], mock=True)
+
+    # Assert
+    gemini.assert_not_called()
+    assert plan["proposed_issues"][0]["id"] == "NEW_1"
+
+
+def test_gemini_models_are_pooled_and_calls_have_a_deadline(mocker):
+    # Arrange
+    genai = mocker.MagicMock()
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_genai', return_value=genai)
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_safety_settings', return_value=[])
+    mocker.patch('gemini_gitlab_workflow.config.LLM_TIMEOUT', 30)
+    genai.GenerativeModel.return_value.generate_content.return_value.text = "{}"
+    backend = llm_backend.GeminiBackend()
+
+    # Act
+    for _ in range(3):
+        backend.generate(_messages("hello"), "pooled-model", RELEVANT_FILES_SCHEMA)
+
+    # Assert
+    genai.GenerativeModel.assert_called_once_with("pooled-model", safety_settings=[])
+    _, kwargs = genai.GenerativeModel.return_value.generate_content.call_args
+    assert kwargs["request_options"] == {"timeout": 30}
+
+
+def test_call_many_runs_requests_concurrently_and_applies_the_deadline(mocker):
+    # Arrange
+    ai_service.clear_response_cache()
+    sleep = {"fast": 0.05, "slow": 2.0}
+
+    def generate(messages, model_name, response_schema, prefix_messages=0):
+        time.sleep(sleep[messages[-1]["parts"][0]])
+        return json.dumps({"relevant_files": [messages[-1]["parts"][0]]})
+
+    mocker.patch.object(llm_backend.GeminiBackend, "generate", side_effect=generate)
+    requests = [
+        {"messages": _messages(kind), "model_name": "m", "response_schema": RELEVANT_FILES_SCHEMA, "backend": "gemini"}
+        for kind in ("fast", "fast", "fast", "slow")
+    ]
+
+    # Act
+    start = time.perf_counter()
+    results = ai_service.call_many(requests, timeout=0.5)
+    elapsed = time.perf_counter() - start
+
+    # Assert
+    assert results[:3] == [json.dumps({"relevant_files": ["fast"]})] * 3
+    assert results[3] is None
+    assert elapsed < 0.5 + 0.1  # Not 3 * 0.05 + 2.0
+
+
+def _long_prefix_messages(user_content: str) -> list:
+    return [{"role": "model", "parts": ["instructions " * 200, "existing issues " * 200]},
+            {"role": "user", "parts": [user_content]}]
+
+
+def test_gemini_caches_the_prompt_prefix_across_runs(mocker):
+    # Arrange
+    genai = mocker.MagicMock()
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_genai', return_value=genai)
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_safety_settings', return_value=[])
+    mocker.patch('gemini_gitlab_workflow.config.LLM_PREFIX_CACHE_MIN_TOKENS', 100)
+    genai.caching.CachedContent.create.return_value.name = "cachedContents/abc"
+    cached_model = genai.GenerativeModel.from_cached_content.return_value
+    cached_model.generate_content.return_value.text = "{}"
+
+    # Act
+    llm_backend.GeminiBackend().generate(_long_prefix_messages("first"), "smart", RELEVANT_FILES_SCHEMA, prefix_messages=1)
+    llm_backend.reset_backends()  # A later run
+    llm_backend.GeminiBackend().generate(_long_prefix_messages("second"), "smart", RELEVANT_FILES_SCHEMA, prefix_messages=1)
+
+    # Assert
+    genai.caching.CachedContent.create.assert_called_once()
+    assert genai.caching.CachedContent.create.call_args.kwargs["contents"] == _long_prefix_messages("")[:1]
+    genai.caching.CachedContent.get.assert_called_once_with("cachedContents/abc")
+    sent = [c.args[0] for c in cached_model.generate_content.call_args_list]
+    assert sent == [[{"role": "user", "parts": ["first"]}], [{"role": "user", "parts": ["second"]}]]
+
+
+def test_gemini_sends_the_whole_prompt_when_the_prefix_cannot_be_cached(mocker):
+    # Arrange
+    genai = mocker.MagicMock()
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_genai', return_value=genai)
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_safety_settings', return_value=[])
+    mocker.patch('gemini_gitlab_workflow.config.LLM_PREFIX_CACHE_MIN_TOKENS', 100)
+    genai.caching.CachedContent.create.side_effect = Exception("too small")
+    model = genai.GenerativeModel.return_value
+    model.generate_content.return_value.text = "{}"
+    messages = _long_prefix_messages("request")
+
+    # Act
+    for _ in range(2):
+        llm_backend.GeminiBackend().generate(messages, "smart", RELEVANT_FILES_SCHEMA, prefix_messages=1)
+
+    # Assert
+    genai.caching.CachedContent.create.assert_called_once()  # The refusal is remembered
+    assert [c.args[0] for c in model.generate_content.call_args_list] == [messages, messages]
+
+
+def test_gemini_retries_caching_the_prefix_after_a_transient_error(mocker):
+    # Arrange
+    genai = mocker.MagicMock()
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_genai', return_value=genai)
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_safety_settings', return_value=[])
+    mocker.patch('gemini_gitlab_workflow.config.LLM_PREFIX_CACHE_MIN_TOKENS', 100)
+    cached_content = mocker.MagicMock()
+    cached_content.name = "cachedContents/abc"
+    genai.caching.CachedContent.create.side_effect = [Exception("503 Service Unavailable"), cached_content]
+    genai.GenerativeModel.return_value.generate_content.return_value.text = "{}"
+    cached_model = genai.GenerativeModel.from_cached_content.return_value
+    cached_model.generate_content.return_value.text = "{}"
+    messages = _long_prefix_messages("request")
+
+    # Act
+    for _ in range(2):
+        llm_backend.GeminiBackend().generate(messages, "smart", RELEVANT_FILES_SCHEMA, prefix_messages=1)
+
+    # Assert
+    assert genai.caching.CachedContent.create.call_count == 2
+    assert [c.args[0] for c in genai.GenerativeModel.return_value.generate_content.call_args_list] == [messages]
+    assert [c.args[0] for c in cached_model.generate_content.call_args_list] == [messages[1:]]
+
+
+def test_stub_reports_cached_prefix_tokens_on_later_calls(mocker):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.config.LLM_PREFIX_CACHE_MIN_TOKENS', 100)
+    backend = StubBackend()
+    schema = {"type": "object", "properties": {"answer": {"type": "string"}}, "required": ["answer"]}
+
+    # Act
+    backend.generate(_long_prefix_messages("first"), "smart", schema, prefix_messages=1)
+    first_cached = backend.usage["cached_tokens"]
+    backend.generate(_long_prefix_messages("second"), "smart", schema, prefix_messages=1)
+
+    # Assert
+    assert first_cached == 0
+    prefix = _long_prefix_messages("")[0]["parts"]
+    assert backend.usage["cached_tokens"] == sum(llm_backend.estimate_tokens(part) for part in prefix)
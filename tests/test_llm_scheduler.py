@@ -0,0 +1,144 @@
+import pytest
+
+from gemini_gitlab_workflow import ai_service, config, instrumentation, llm_backend, llm_scheduler
+from gemini_gitlab_workflow.ai_service import RELEVANT_FILES_SCHEMA
+from gemini_gitlab_workflow.llm_scheduler import RetryableLLMError
+
+
+@pytest.fixture(autouse=True)
+def scheduler_config(mocker):
+    mocker.patch.object(config, "GEMINI_SMART_MODEL", "smart")
+    mocker.patch.object(config, "GEMINI_FAST_MODEL", "fast")
+    mocker.patch.object(config, "LLM_ROUTE_FAST_MAX_TOKENS", 10)
+    mocker.patch.object(config, "LLM_FALLBACK_SECONDS", 30)
+    mocker.patch.object(config, "LLM_MAX_RETRIES", 2)
+    instrumentation.recorder.reset(enabled=True)
+    llm_backend.reset_backends()
+    yield
+    llm_backend.reset_backends()
+    instrumentation.recorder.reset()
+
+
+def _messages(user_content: str) -> list:
+    return [{"role": "model", "parts": ["A long static prefix " * 20]}, {"role": "user", "parts": [user_content]}]
+
+
+def test_route_sends_low_complexity_requests_to_the_fast_model():
+    # Arrange
+    short_request = [{"role": "user", "parts": ["Add a logout button"]}]
+
+    # Act
+    short = llm_scheduler.route(short_request, "smart")
+    long = llm_scheduler.route([{"role": "user", "parts": ["Context " * 50]}], "smart")
+    large_prefix = llm_scheduler.route(_messages("Add a logout button"), "smart")  # The existing issues count too
+    fast = llm_scheduler.route(_messages("Context " * 50), "fast")
+
+    # Assert
+    assert (short, long, large_prefix, fast) == ("fast", "smart", "smart", "fast")
+    assert instrumentation.recorder.counters["llm.routed_fast"] == 1
+
+
+def test_call_retries_retryable_errors_with_jittered_backoff(mocker):
+    # Arrange
+    sleep = mocker.patch('gemini_gitlab_workflow.llm_scheduler.time.sleep')
+    generate = mocker.Mock(side_effect=[RetryableLLMError("429 Too Many Requests"), "{}"])
+
+    # Act
+    response, model = llm_scheduler.call(generate, "smart")
+
+    # Assert
+    assert (response, model) == ("{}", "smart")
+    assert generate.call_count == 2
+    delay = sleep.call_args.args[0]
+    assert 0 <= delay <= config.LLM_RETRY_BASE_DELAY
+    assert instrumentation.recorder.counters["llm.retries"] == 1
+
+
+def test_call_gives_up_after_the_last_retry(mocker):
+    # Arrange
+    mocker.patch('gemini_gitlab_workflow.llm_scheduler.time.sleep')
+    generate = mocker.Mock(side_effect=RetryableLLMError("503 Service Unavailable"))
+
+    # Act
+    response, _ = llm_scheduler.call(generate, "smart")
+
+    # Assert
+    assert response is None
+    assert generate.call_count == 3
+
+
+def test_call_falls_back_to_the_fast_model_when_the_budget_is_nearly_spent(mocker):
+    # Arrange
+    generate = mocker.Mock(return_value="{}")
+
+    # Act
+    with llm_scheduler.budget(10):
+        response, model = llm_scheduler.call(generate, "smart")
+
+    # Assert
+    generate.assert_called_once_with("fast")
+    assert model == "fast"
+    assert instrumentation.recorder.counters["llm.fallbacks"] == 1
+
+
+def test_call_sends_nothing_once_the_budget_is_spent(mocker):
+    # Arrange
+    generate = mocker.Mock(return_value="{}")
+    mocker.patch('gemini_gitlab_workflow.llm_scheduler.remaining', return_value=0.0)
+
+    # Act
+    response, _ = llm_scheduler.call(generate, "smart")
+
+    # Assert
+    assert response is None
+    generate.assert_not_called()
+    assert instrumentation.recorder.counters["llm.deadline_exceeded"] == 1
+
+
+def test_budget_bounds_the_request_timeout(mocker):
+    # Arrange
+    mocker.patch.object(config, "LLM_TIMEOUT", 120)
+
+    # Act
+    with llm_scheduler.budget(60):
+        bounded = llm_scheduler.request_timeout()
+    unbounded = llm_scheduler.request_timeout()
+
+    # Assert
+    assert 59 < bounded <= 60
+    assert unbounded == 120
+
+
+def test_scaled_budget_grants_the_budget_per_round_of_items(mocker):
+    # Arrange
+    mocker.patch.object(config, "LLM_BUDGET", 100)
+    mocker.patch.object(config, "LLM_CONCURRENCY", 4)
+
+    # Act
+    with llm_scheduler.scaled_budget(3):
+        one_round = llm_scheduler.remaining()
+    with llm_scheduler.scaled_budget(9):
+        three_rounds = llm_scheduler.remaining()
+
+    # Assert
+    assert 99 < one_round <= 100
+    assert 299 < three_rounds <= 300
+
+
+def test_gemini_rate_limits_are_retried_through_the_service(mocker):
+    # Arrange
+    genai = mocker.MagicMock()
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_genai', return_value=genai)
+    mocker.patch('gemini_gitlab_workflow.llm_backend._get_safety_settings', return_value=[])
+    mocker.patch('gemini_gitlab_workflow.llm_scheduler.time.sleep')
+    rate_limited = Exception("429 Resource exhausted")
+    rate_limited.code = 429
+    response = mocker.MagicMock(text='{"relevant_files": ["a.md"]}')
+    genai.GenerativeModel.return_value.generate_content.side_effect = [rate_limited, response]
+
+    # Act
+    result = ai_service.call_google_gemini_api(_messages("Context " * 50), "smart", RELEVANT_FILES_SCHEMA, backend="gemini")
+
+    # Assert
+    assert result == '{"relevant_files": ["a.md"]}'
+    assert genai.GenerativeModel.return_value.generate_content.call_count == 2
@@ -0,0 +1,181 @@
+import os
+
+import pytest
+
+from gemini_gitlab_workflow.project_graph import ProjectGraph
+
+
+@pytest.fixture
+def project_map():
+    return {
+        "nodes": [
+            {"id": 1, "title": "Checkout", "state": "opened", "labels": ["Type::Epic", "Backbone::Shop"],
+             "local_path": "shop/checkout/epic.md"},
+            {"id": 2, "title": "Cart", "state": "opened", "labels": ["Type::Story", "Backbone::Shop"],
+             "local_path": "shop/checkout/story-cart.md"},
+            {"id": 3, "title": "Payment", "state": "opened", "labels": ["Type::Story", "Backbone::Shop"],
+             "local_path": "shop/checkout/story-payment.md"},
+            {"id": 4, "title": "Receipt", "state": "opened", "labels": ["Type::Story", "Backbone::Mail"],
+             "local_path": "mail/story-receipt.md"},
+            {"id": 5, "title": "Legacy cart", "state": "closed", "labels": ["Type::Story"],
+             "local_path": "_unassigned/legacy-cart.md"},
+        ],
+        "links": [
+            {"source": 1, "target": 2, "type": "contains"},
+            {"source": 1, "target": 3, "type": "contains"},
+            {"source": 2, "target": 3, "type": "blocks"},
+            {"source": 3, "target": 4, "type": "blocks"},
+            {"source": 5, "target": 2, "type": "blocks"},
+        ],
+    }
+
+
+def test_indexes_nodes_by_title_label_and_epic(project_map):
+    # Act
+    graph = ProjectGraph.from_map(project_map)
+
+    # Assert
+    assert graph.node(3)["title"] == "Payment"
+    assert graph.id_for_title("Receipt") == 4
+    assert graph.in_backbone("Shop") == {1, 2, 3}
+    assert graph.epic_for_label("Epic::Checkout")["id"] == 1
+    assert graph.epic_for_title("  CHECKOUT ")["id"] == 1
+    assert graph.node(42) is None
+
+
+def test_relationship_queries(project_map):
+    # Arrange
+    graph = ProjectGraph.from_map(project_map)
+
+    # Act / Assert
+    assert graph.children(1) == [2, 3]
+    assert graph.parent_epic(3) == 1
+    assert graph.parent_epic(4) is None
+    assert sorted(graph.blockers(2)) == [5]
+    assert graph.blocked_by_this(3) == [4]
+    order = graph.topological_order()
+    assert order.index(5) < order.index(2) < order.index(3) < order.index(4)
+
+
+def test_critical_path_ignores_closed_blockers(project_map):
+    # Arrange
+    graph = ProjectGraph.from_map(project_map)
+
+    # Act / Assert
+    assert graph.critical_path() == [2, 3, 4]
+    assert graph.critical_path(3) == [2, 3]
+    assert graph.critical_path(1) == [1]
+
+
+def test_incremental_updates_invalidate_cached_queries_and_write_through(project_map):
+    # Arrange
+    graph = ProjectGraph.from_map(project_map)
+    assert graph.children(1) == [2, 3]
+
+    # Act
+    graph.add_node({"id": "NEW_1", "title": "Invoice", "labels": ["Type::Story"], "local_path": "x.md"})
+    added = graph.add_link(1, "NEW_1", "contains")
+    duplicate = graph.add_link(1, "NEW_1", "contains")
+
+    # Assert
+    assert (added, duplicate) == (True, False)
+    assert graph.children(1) == [2, 3, "NEW_1"]
+    assert project_map["nodes"][-1]["id"] == "NEW_1"
+    assert project_map["links"][-1] == {"source": 1, "target": "NEW_1", "type": "contains"}
+    with pytest.raises(ValueError):
+        graph.add_node({"id": 2, "title": "Cart again"})
+
+
+def test_relabel_replaces_temporary_ids(project_map):
+    # Arrange
+    graph = ProjectGraph.from_map(project_map)
+    graph.add_node({"id": "NEW_1", "title": "Invoice", "labels": ["Type::Story"]})
+    graph.add_link("NEW_1", 4, "blocks")
+
+    # Act
+    graph.relabel({"NEW_1": 6})
+
+    # Assert
+    assert graph.id_for_title("Invoice") == 6
+    assert graph.blockers(4) == [3, 6]
+    assert {"source": 6, "target": 4, "type": "blocks"} in project_map["links"]
+
+
+def test_update_node_and_remove_links_reindex(project_map):
+    # Arrange
+    graph = ProjectGraph.from_map(project_map)
+
+    # Act
+    graph.update_node(4, title="Invoice", labels=["Type::Story", "Backbone::Shop"])
+    removed = graph.remove_links(3, "blocks")
+
+    # Assert
+    assert removed == 2
+    assert graph.id_for_title("Invoice") == 4
+    assert graph.in_backbone("Shop") == {1, 2, 3, 4}
+    assert graph.blockers(3) == [] and graph.blocked_by_this(3) == []
+    assert {"source": 5, "target": 2, "type": "blocks"} in project_map["links"]
+    with pytest.raises(ValueError):
+        graph.update_node(42, title="Missing")
+
+
+def test_cycles_are_reported(project_map):
+    # Arrange
+    project_map["links"].append({"source": 4, "target": 2, "type": "blocks"})
+    graph = ProjectGraph.from_map(project_map)
+
+    # Act / Assert
+    assert sorted(graph.cycles()[0]) == [2, 3, 4]
+    with pytest.raises(ValueError, match="cycle"):
+        graph.topological_order()
+    with pytest.raises(ValueError, match="cycle"):
+        graph.critical_path()
+
+
+def test_filter_combines_labels_state_backbone_and_epic(project_map):
+    # Arrange
+    graph = ProjectGraph.from_map(project_map)
+
+    # Act / Assert
+    assert [n["id"] for n in graph.filter(backbone="Shop", issue_type="Story")] == [2, 3]
+    assert [n["id"] for n in graph.filter(epic="checkout")] == [2, 3]
+    assert [n["id"] for n in graph.filter(issue_type="Story", state="closed")] == [5]
+    assert graph.filter(labels=["Backbone::Mail"], epic=1) == []
+    assert graph.all_blockers(4) == [3, 2, 5]
+
+
+def test_load_project_graph_persists_and_reuses_the_graph(project_map, mocker):
+    # Arrange
+    from gemini_gitlab_workflow import config, file_system_repo, project_graph
+
+    file_system_repo.write_project_map(project_map)
+    graph = project_graph.load_project_graph()
+    project_graph._loaded = None
+    build = mocker.spy(ProjectGraph, "from_map")
+
+    # Act
+    reloaded = project_graph.load_project_graph()
+
+    # Assert
+    assert build.call_count == 0
+    assert reloaded is not graph
+    assert reloaded.blockers(3) == [2]
+    assert reloaded.epic_for_label("Epic::Checkout")["id"] == 1
+    assert os.path.exists(config.PROJECT_GRAPH_CACHE_PATH)
+
+
+def test_load_project_graph_rebuilds_after_the_map_changes(project_map):
+    # Arrange
+    from gemini_gitlab_workflow import file_system_repo, project_graph
+
+    file_system_repo.write_project_map(project_map)
+    project_graph.load_project_graph()
+    project_map["nodes"].append({"id": 9, "title": "Wishlist", "labels": ["Type::Story"]})
+    file_system_repo.write_project_map(project_map)
+    project_graph._loaded = None
+
+    # Act
+    graph = project_graph.load_project_graph()
+
+    # Assert
+    assert graph.id_for_title("Wishlist") == 9
@@ -3,6 +3,7 @@ from unittest.mock import MagicMock, patch, call
 from pathlib import Path
 
 from gemini_gitlab_workflow.project_mapper import build_project_map
+from gemini_gitlab_workflow.relationships import PARSER_VERSION
 
 # --- Mocks and Fixtures ---
 
@@ -99,3 +100,169 @@ def test_build_project_map_api_error(mock_gitlab_client, mock_file_system_repo):
     assert result["status"] == "error"
     assert "API is down" in result["message"]
     mock_file_system_repo.write_project_map.assert_not_called()
+
+
+def test_build_project_map_reuses_prefetched_issues(mock_gitlab_client, mock_file_system_repo, mock_issues):
+    # Arrange
+    mock_gitlab_client.get_issue_links.return_value = []
+    mock_gitlab_client.get_issue_notes.return_value = []
+    mock_file_system_repo.get_issue_filepath.return_value = Path("_unassigned/issue.md")
+
+    # Act
+    result = build_project_map("123", issues_list=mock_issues)
+
+    # Assert
+    assert result["status"] == "success"
+    assert result["issues_found"] == 3
+    mock_gitlab_client.get_project_issues.assert_not_called()
+
+
+def test_build_project_map_reuses_notes_of_unchanged_issues(mock_gitlab_client, mock_file_system_repo, mock_issues):
+    # Arrange
+    for issue in mock_issues:
+        issue.updated_at, issue.user_notes_count = "2025-01-01", 0
+    mock_issues[2].user_notes_count = 2  # Story 2 got a new note since the last sync
+    mock_file_system_repo.read_issue_notes.return_value = {
+        "1": {"updated_at": "2025-01-01", "user_notes_count": 0, "notes": []},
+        "2": {"updated_at": "2025-01-01", "user_notes_count": 0, "notes": [
+            {"id": 20, "body": "Blocked by #1", "updated_at": "2025-01-01", "system": False,
+             "relationships": [{"source": 1, "target": 2, "type": "blocks"}], "parser": PARSER_VERSION},
+        ]},
+        "3": {"updated_at": "2025-01-01", "user_notes_count": 1, "notes": [
+            {"id": 30, "body": "Blocked by #1", "updated_at": "2025-01-01", "system": False,
+             "relationships": [{"source": 99, "target": 3, "type": "blocks"}], "parser": PARSER_VERSION},  # Cached parse result
+        ]},
+    }
+    old_note = MagicMock(id=30, body="Blocked by #1", updated_at="2025-01-01", system=False)
+    new_note = MagicMock(id=31, body="Blocked by #1", updated_at="2025-01-02", system=False)
+    mock_gitlab_client.get_issue_notes.return_value = [old_note, new_note]
+    mock_gitlab_client.get_issue_links.return_value = []
+    mock_file_system_repo.get_issue_filepath.return_value = Path("_unassigned/issue.md")
+
+    # Act
+    result = build_project_map("123", issues_list=mock_issues)
+
+    # Assert
+    mock_gitlab_client.get_issue_notes.assert_called_once_with("123", 3)
+    links = result["map_data"]["links"]
+    assert {"source": 1, "target": 2, "type": "blocks"} in links  # From the stored notes of #2
+    assert {"source": 99, "target": 3, "type": "blocks"} in links  # Unchanged note #30 was not parsed again
+    assert {"source": 1, "target": 3, "type": "blocks"} in links  # Parsed from the new note #31
+    stored = mock_file_system_repo.write_issue_notes.call_args.args[0]
+    assert stored["3"]["user_notes_count"] == 2
+    assert [n["id"] for n in stored["3"]["notes"]] == [30, 31]
+
+
+def test_build_project_map_reparses_notes_stored_by_an_older_parser(mock_gitlab_client, mock_file_system_repo, mock_issues):
+    # Arrange
+    for issue in mock_issues:
+        issue.updated_at, issue.user_notes_count = "2025-01-01", 0
+    mock_issues[2].user_notes_count = 1
+    mock_file_system_repo.read_issue_notes.return_value = {
+        "3": {"updated_at": "2025-01-01", "user_notes_count": 1, "notes": [
+            {"id": 30, "body": "I think this blocks #1", "updated_at": "2025-01-01", "system": False,
+             "relationships": [{"source": 3, "target": 1, "type": "blocks"}]},  # Parsed before prose was ignored
+        ]},
+    }
+    mock_gitlab_client.get_issue_notes.return_value = []
+    mock_gitlab_client.get_issue_links.return_value = []
+    mock_file_system_repo.get_issue_filepath.return_value = Path("_unassigned/issue.md")
+
+    # Act
+    result = build_project_map("123", issues_list=mock_issues)
+
+    # Assert
+    assert mock_gitlab_client.get_issue_notes.call_count == 2  # Issues 1 and 2 had no stored notes; #3 is unchanged
+    assert {"source": 3, "target": 1, "type": "blocks"} not in result["map_data"]["links"]
+    stored = mock_file_system_repo.write_issue_notes.call_args.args[0]
+    assert stored["3"]["notes"][0]["relationships"] == []
+
+
+def test_build_project_map_drops_cross_project_references(mock_gitlab_client, mock_file_system_repo, mock_issues):
+    # Arrange
+    mock_issues[2].description = "/blocked by lib#4 #1"
+    mock_gitlab_client.get_issue_notes.return_value = []
+    mock_gitlab_client.get_issue_links.return_value = []
+    mock_file_system_repo.read_issue_notes.return_value = {}
+    mock_file_system_repo.get_issue_filepath.return_value = Path("_unassigned/issue.md")
+
+    # Act
+    result = build_project_map("123", issues_list=mock_issues)
+
+    # Assert
+    blocks = [(link["source"], link["target"]) for link in result["map_data"]["links"] if link["type"] == "blocks"]
+    assert sorted(blocks) == [(1, 3), (2, 3)]  # Not ("lib#4", 3): the map has no node for it
+
+
+def test_build_project_map_fetches_only_notes_after_the_cursor(mock_gitlab_client, mock_file_system_repo, mock_issues):
+    # Arrange
+    for issue in mock_issues:
+        issue.updated_at, issue.user_notes_count = "2025-01-01", 0
+    story = mock_issues[2]
+    story.updated_at, story.user_notes_count = "2025-01-03", 2
+    stored_note = {"id": 30, "body": "Looks good", "updated_at": "2025-01-01", "system": False, "relationships": []}
+    unchanged = {"updated_at": "2025-01-01", "user_notes_count": 0, "cursor": None, "notes": []}
+    mock_file_system_repo.read_issue_notes.return_value = {
+        "1": unchanged, "2": unchanged,
+        "3": {"updated_at": "2025-01-01", "user_notes_count": 1, "cursor": {"id": 30, "updated_at": "2025-01-01"},
+              "notes": [stored_note]},
+    }
+    new_note = MagicMock(id=31, body="Blocked by #1", updated_at="2025-01-03", system=False)
+    old_note = MagicMock(id=30, body="Looks good", updated_at="2025-01-01", system=False)
+    never_reached = MagicMock(id=29, updated_at="2024-12-01")
+    mock_gitlab_client.get_issue_notes.return_value = iter([new_note, old_note, never_reached])
+    mock_gitlab_client.get_issue_links.return_value = []
+    mock_file_system_repo.get_issue_filepath.return_value = Path("_unassigned/issue.md")
+
+    # Act
+    result = build_project_map("123", issues_list=mock_issues)
+
+    # Assert
+    mock_gitlab_client.get_issue_notes.assert_called_once_with(
+        "123", 3, order_by="updated_at", sort="desc", iterator=True, per_page=20,
+    )
+    assert {"source": 1, "target": 3, "type": "blocks"} in result["map_data"]["links"]
+    stored = mock_file_system_repo.write_issue_notes.call_args.args[0]["3"]
+    assert [n["id"] for n in stored["notes"]] == [30, 31]
+    assert stored["cursor"] == {"id": 31, "updated_at": "2025-01-03"}
+
+
+def test_build_project_map_refetches_all_notes_after_a_deletion(mock_gitlab_client, mock_file_system_repo, mock_issues):
+    # Arrange
+    for issue in mock_issues:
+        issue.updated_at, issue.user_notes_count = "2025-01-01", 0
+    story = mock_issues[2]
+    story.updated_at, story.user_notes_count = "2025-01-03", 1
+    mock_file_system_repo.read_issue_notes.return_value = {
+        "3": {"updated_at": "2025-01-01", "user_notes_count": 2, "cursor": {"id": 31, "updated_at": "2025-01-02"},
+              "notes": [
+                  {"id": 30, "body": "Blocked by #1", "updated_at": "2025-01-01", "system": False,
+                   "relationships": [{"source": 1, "target": 3, "type": "blocks"}]},
+                  {"id": 31, "body": "Ok", "updated_at": "2025-01-02", "system": False, "relationships": []},
+              ]},
+    }
+    remaining_note = MagicMock(id=31, body="Ok", updated_at="2025-01-02", system=False)
+    mock_gitlab_client.get_issue_notes.side_effect = lambda project_id, iid, **kwargs: (
+        iter([remaining_note]) if kwargs else [remaining_note]
+    )
+    mock_gitlab_client.get_issue_links.return_value = []
+    mock_file_system_repo.get_issue_filepath.return_value = Path("_unassigned/issue.md")
+
+    # Act
+    result = build_project_map("123", issues_list=mock_issues)
+
+    # Assert
+    assert call("123", 3) in mock_gitlab_client.get_issue_notes.call_args_list
+    assert {"source": 1, "target": 3, "type": "blocks"} not in result["map_data"]["links"]
+    stored = mock_file_system_repo.write_issue_notes.call_args.args[0]["3"]
+    assert [n["id"] for n in stored["notes"]] == [31]
+
+def test_qualify_resolves_references_relative_to_the_project():
+    # Arrange
+    from gemini_gitlab_workflow.project_mapper import qualify
+
+    # Act / Assert
+    assert qualify(12, "shop/app") == "shop/app#12"
+    assert qualify("lib#3", "shop/app") == "shop/lib#3"
+    assert qualify("other/lib#3", "shop/app") == "other/lib#3"
+    assert qualify(12, None) == 12
@@ -0,0 +1,56 @@
+from gemini_gitlab_workflow.relationships import extract_relationships, local_only
+
+
+def test_extracts_all_supported_forms():
+    # Arrange
+    text = (
+        "/blocking #3\n"
+        "/blocked by #4\n"
+        "Blocked by #5\n"
+        "/blocks #6\n"
+        "/blocked_by #7, #8\n"
+    )
+
+    # Act
+    links = extract_relationships(2, text)
+
+    # Assert
+    assert [(link["source"], link["target"]) for link in links] == [
+        (2, 3), (4, 2), (5, 2), (2, 6), (7, 2), (8, 2),
+    ]
+    assert {link["type"] for link in links} == {"blocks"}
+
+
+def test_cross_project_references_stay_qualified():
+    # Act
+    links = extract_relationships(2, "/blocking group/sub/app#12 and /blocked by other#9")
+
+    # Assert
+    assert links == [
+        {"source": 2, "target": "group/sub/app#12", "type": "blocks"},
+        {"source": "other#9", "target": 2, "type": "blocks"},
+    ]
+
+
+def test_ignores_unrelated_text():
+    # Act / Assert
+    assert extract_relationships(2, None) == []
+    assert extract_relationships(2, "Fixes #3, see the blocking issue list") == []
+    assert extract_relationships(2, "path/blocking #3 or unblocked by #4") == []
+
+
+def test_ignores_keywords_in_prose():
+    # Act / Assert
+    assert extract_relationships(2, "I think this blocks #3") == []
+    assert extract_relationships(2, "It is not blocked by #5 anymore") == []
+    assert extract_relationships(2, "blocked by #5") == []  # Not the uploader's spelling
+    assert extract_relationships(2, "Blocked by #5 and #6") == []  # Not a line of its own
+    assert extract_relationships(2, "Thanks!\nBlocked by #5\n") == [{"source": 5, "target": 2, "type": "blocks"}]
+
+
+def test_local_only_drops_cross_project_references():
+    # Arrange
+    links = extract_relationships(2, "/blocking lib#3 #4")
+
+    # Act / Assert
+    assert local_only(links) == [{"source": 2, "target": 4, "type": "blocks"}]
@@ -0,0 +1,77 @@
+import json
+
+from gemini_gitlab_workflow.ai_service import ProposedIssue
+from gemini_gitlab_workflow.response_parser import loads, parse_list
+
+
+def _issue(iid: int, **fields) -> dict:
+    return {"id": f"NEW_{iid}", "title": f"Issue {iid}", "description": "# Story", "labels": ["Type::Story"], **fields}
+
+
+def test_parse_list_ignores_fences_and_trailing_prose():
+    # Arrange
+    raw = "Here is the plan:\n```json\n" + json.dumps({"proposed_issues": [_issue(1)]}) + "\n```\nLet me know!"
+
+    # Act
+    parsed = parse_list(raw, "proposed_issues", ProposedIssue)
+
+    # Assert
+    assert [issue.id for issue in parsed.items] == ["NEW_1"]
+    assert parsed.problems == []
+
+
+def test_parse_list_keeps_the_complete_items_of_a_truncated_response():
+    # Arrange
+    complete = json.dumps({"proposed_issues": [_issue(1), _issue(2)]})
+    raw = complete[:complete.index('"Issue 2"') + 5]
+
+    # Act
+    parsed = parse_list(raw, "proposed_issues", ProposedIssue)
+
+    # Assert
+    assert parsed.truncated
+    assert [issue.id for issue in parsed.items] == ["NEW_1"]
+    assert parsed.problems[0].startswith("the response was cut off")
+    assert parsed.problems[1].startswith("item 2 (NEW_2) was dropped: title")
+
+
+def test_parse_list_repairs_nulls_and_strings_for_lists():
+    # Arrange
+    raw = json.dumps({"proposed_issues": [_issue(1, labels="Type::Epic", dependencies=None)]})
+
+    # Act
+    parsed = parse_list(raw, "proposed_issues", ProposedIssue)
+
+    # Assert
+    assert parsed.items[0].labels == ["Type::Epic"]
+    assert parsed.items[0].dependencies is None
+    assert parsed.problems == []
+
+
+def test_parse_list_drops_only_invalid_items():
+    # Act
+    parsed = parse_list('{"relevant_files": ["a.md", 3, "b.md"]}', "relevant_files", str)
+
+    # Assert
+    assert parsed.items == ["a.md", "b.md"]
+    assert parsed.invalid == [3]
+    assert parsed.problems == ["item 2 was dropped: Input should be a valid string"]
+
+
+def test_parse_list_reports_responses_without_the_list():
+    # Act
+    no_json = parse_list("I cannot help with that.", "relevant_files", str)
+    no_list = parse_list('{"files": []}', "relevant_files", str)
+
+    # Assert
+    assert no_json.items == [] and no_json.problems == ["the response holds no JSON"]
+    assert no_list.problems == ["the response has no 'relevant_files' list"]
+
+
+def test_loads_keeps_escaped_quotes_and_brackets_in_strings():
+    # Act
+    data, truncated = loads('{"a": ["x \\"]\\" y", "b"], "c": "{')
+
+    # Assert
+    assert data == {"a": ['x "]" y', "b"]}
+    assert truncated
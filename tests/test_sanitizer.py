@@ -38,4 +38,41 @@ def test_anonymize_text_no_match(sanitizer_instance):
 def test_deanonymize_text_no_match(sanitizer_instance):
     anonymized_text = "No placeholders here."
     deanonymized = sanitizer_instance.deanonymize_text(anonymized_text)
-    assert deanonymized == anonymized_text
\ No newline at end of file
+    assert deanonymized == anonymized_text
+
+
+def test_empty_identifiers_are_not_replaced(monkeypatch):
+    monkeypatch.setenv("GGW_GITLAB_PROJECT_ID", "")
+    sanitizer = Sanitizer()
+    assert sanitizer.anonymize_text("ID 12") == "ID 12"
+
+def test_project_id_is_only_replaced_as_a_whole_number(sanitizer_instance):
+    assert sanitizer_instance.anonymize_text("12345 but not 123456") == "[PROJECT_ID] but not 123456"
+
+def test_names_emails_and_issue_urls_round_trip(monkeypatch):
+    monkeypatch.setenv("GGW_SANITIZE_NAMES", "jdoe, Acme Corp")
+    sanitizer = Sanitizer()
+    original = ("jdoe (jdoe@acme.io) of Acme Corp asked in "
+                "https://gitlab.com/other/lib/-/issues/7 to update https://gitlab.com/my-org/my-project/-/boards")
+
+    anonymized = sanitizer.anonymize_text(original)
+
+    assert "jdoe" not in anonymized and "acme.io" not in anonymized and "Acme" not in anonymized
+    assert "other/lib" not in anonymized
+    assert anonymized.endswith("[PROJECT_URL]/-/boards")
+    assert sanitizer.deanonymize_text(anonymized) == original
+    # Placeholders only depend on the value, so they are stable across sessions
+    assert Sanitizer().anonymize_text(original) == anonymized
+
+def test_configured_entities_limit_what_is_replaced(monkeypatch):
+    monkeypatch.setenv("GGW_SANITIZE_ENTITIES", "url")
+    sanitizer = Sanitizer()
+    assert sanitizer.anonymize_text("12345 a@b.io") == "12345 a@b.io"
+
+def test_anonymize_nested_payload(sanitizer_instance):
+    payload = {"issues": [{"title": "Fix 12345", "labels": ("Project::12345",), "weight": 3}], "id": 12345}
+
+    anonymized = sanitizer_instance.anonymize(payload)
+
+    assert anonymized == {"issues": [{"title": "Fix [PROJECT_ID]", "labels": ("Project::[PROJECT_ID]",), "weight": 3}], "id": 12345}
+    assert sanitizer_instance.deanonymize(anonymized) == payload
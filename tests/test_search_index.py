@@ -0,0 +1,88 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from gemini_gitlab_workflow import config, file_system_repo, search_index
+from gemini_gitlab_workflow.search_index import SearchIndex
+
+
+def _write_issue(iid: int, title: str, body: str, updated_at: str = "2025-01-01T00:00:00.000Z") -> Path:
+    path = Path(config.DATA_DIR) / "backbones" / f"issue-{iid}.md"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\niid: {iid}\ntitle: {title}\nupdated_at: '{updated_at}'\n---\n\n{body}\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture(autouse=True)
+def mirror(mocker, tmp_path):
+    """A small mirror: two issues (one with notes) and one doc."""
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    mocker.patch('gemini_gitlab_workflow.config.DOCS_DIR', docs_dir)
+    mocker.patch.object(search_index, "_index", None)
+
+    _write_issue(1, "Export invoices as PDF", "Users download their invoice history.")
+    _write_issue(2, "Reset password", "Send a reset link by email.")
+    file_system_repo.write_issue_notes({
+        "2": {"updated_at": "x", "user_notes_count": 1, "notes": [
+            {"id": 10, "body": "Also support SMS verification codes.", "updated_at": "x", "system": False},
+        ]},
+    })
+    (docs_dir / "billing.md").write_text("# Billing\n\nInvoices are generated monthly.\n", encoding="utf-8")
+
+
+def test_search_ranks_titles_and_covers_notes_and_docs():
+    # Arrange
+    index = SearchIndex()
+    index.update()
+
+    # Act
+    invoice_results = index.search("invoice")
+    sms_results = index.search("sms")
+    doc_results = index.search("monthly", kind="doc")
+
+    # Assert
+    assert [r["iid"] for r in invoice_results] == [1, None]  # The issue, then the doc
+    assert invoice_results[0]["title"] == "Export invoices as PDF"
+    assert "invoice history" in invoice_results[0]["snippet"]
+    assert [r["iid"] for r in sms_results] == [2]
+    assert "SMS verification" in sms_results[0]["snippet"]
+    assert [r["title"] for r in doc_results] == ["Billing"]
+    assert index.search("nothing-matches") == []
+
+
+def test_update_is_incremental():
+    # Arrange
+    index = SearchIndex()
+    assert index.update()["added"] == 3
+
+    # Act
+    unchanged = index.update()
+    _write_issue(2, "Reset password", "Send a reset link by email, again.")  # Rewritten, same updated_at
+    rewritten = index.update()
+    _write_issue(1, "Export invoices as CSV", "Spreadsheet export.", updated_at="2025-02-01T00:00:00.000Z")
+    os.remove(Path(config.DOCS_DIR) / "billing.md")
+    changed = index.update()
+
+    # Assert
+    assert unchanged == {"added": 0, "updated": 0, "removed": 0, "unchanged": 3}
+    assert rewritten["updated"] == 0
+    assert changed == {"added": 0, "updated": 1, "removed": 1, "unchanged": 1}
+    assert [r["title"] for r in index.search("spreadsheet")] == ["Export invoices as CSV"]
+    assert index.search("pdf") == []
+
+
+def test_load_search_index_persists_between_processes(mocker):
+    # Arrange
+    search_index.load_search_index()
+    mocker.patch.object(search_index, "_index", None)
+    add = mocker.spy(SearchIndex, "_add")
+
+    # Act
+    index = search_index.load_search_index()
+
+    # Assert
+    assert os.path.exists(config.SEARCH_INDEX_PATH)
+    assert add.call_count == 0
+    assert len(index) == 3
@@ -0,0 +1,112 @@
+import os
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from gemini_gitlab_workflow import ai_service, cli, config, summary_cache
+
+
+@pytest.fixture(autouse=True)
+def context_files(mocker, tmp_path):
+    """One doc and one issue file."""
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    mocker.patch('gemini_gitlab_workflow.config.DOCS_DIR', docs_dir)
+    (docs_dir / "billing.md").write_text("# Billing\n\nInvoices are generated monthly.\n", encoding="utf-8")
+    issue_path = Path(config.DATA_DIR) / "backbones" / "epic-export.md"
+    issue_path.parent.mkdir(parents=True)
+    issue_path.write_text("---\niid: 1\ntitle: Export\n---\n\nUsers download their invoice history.\n", encoding="utf-8")
+    return docs_dir / "billing.md", issue_path
+
+
+def test_refresh_summarizes_files_once_per_content(context_files, mocker):
+    # Arrange
+    doc_path, issue_path = context_files
+    summarize = mocker.spy(ai_service, "summarize_documents")
+
+    # Act
+    first = summary_cache.refresh(mock=True)
+    summary_cache.reset()  # A later run, which reads the stored cache
+    second = summary_cache.refresh(mock=True)
+
+    # Assert
+    assert first == {"summarized": 2, "cached": 0, "failed": 0}
+    assert second == {"summarized": 0, "cached": 2, "failed": 0}
+    assert summarize.call_count == 1
+    cache = summary_cache.load()
+    assert cache.summary(doc_path) == "Billing Invoices are generated monthly."
+    assert cache.summary(issue_path) == "Users download their invoice history."
+
+
+def test_refresh_resummarizes_only_changed_files(context_files, mocker):
+    # Arrange
+    doc_path, issue_path = context_files
+    summary_cache.refresh(mock=True)
+    doc_path.write_text("# Billing\n\nInvoices are generated weekly now.\n", encoding="utf-8")
+    summarize = mocker.spy(ai_service, "summarize_documents")
+
+    # Act
+    stats = summary_cache.refresh(mock=True)
+
+    # Assert
+    assert stats == {"summarized": 1, "cached": 1, "failed": 0}
+    documents = summarize.call_args.args[0]
+    assert [d["content"] for d in documents] == ["# Billing\n\nInvoices are generated weekly now.\n"]
+    assert summary_cache.load().summary(doc_path) == "Billing Invoices are generated weekly now."
+    assert len(summary_cache.load().summaries) == 2  # The old summary is dropped
+
+
+def test_refresh_anonymizes_documents_and_keeps_failed_files_pending(context_files, mocker):
+    # Arrange
+    doc_path, _ = context_files
+    doc_path.write_text("# Billing\n\nSee http://mock-gitlab.com/docs for details.\n", encoding="utf-8")
+    mocker.patch.object(ai_service, "summarize_documents", return_value={"0": "Billing at [PROJECT_URL]."})
+
+    # Act
+    stats = summary_cache.refresh([doc_path, context_files[1]])
+
+    # Assert
+    documents = ai_service.summarize_documents.call_args.args[0]
+    assert "http://mock-gitlab.com" not in documents[0]["content"]
+    assert summary_cache.load().summary(doc_path) == "Billing at http://mock-gitlab.com."
+    assert stats == {"summarized": 1, "cached": 0, "failed": 1}
+
+
+def test_summarize_documents_batches_requests(mocker):
+    # Arrange
+    mocker.patch.object(config, "SUMMARY_BATCH_SIZE", 2)
+    documents = [{"id": str(i), "content": f"# Topic {i}\n\nDetails."} for i in range(5)]
+    call_many = mocker.spy(ai_service, "call_many")
+
+    # Act
+    summaries = ai_service.summarize_documents(documents, mock=True)
+
+    # Assert
+    assert len(call_many.call_args.args[0]) == 3
+    assert summaries["4"] == "Topic 4 Details."
+    assert sorted(summaries) == ["0", "1", "2", "3", "4"]
+
+
+def test_context_sources_use_cached_summaries(context_files):
+    # Arrange
+    doc_path, issue_path = context_files
+    summary_cache.refresh([doc_path], mock=True)
+    project_map = {"nodes": [{"id": 1, "title": "Export", "local_path": os.path.join("backbones", "epic-export.md")}]}
+
+    # Act
+    doc_sources = cli._get_context_from_docs()
+    issue_sources = cli._get_context_from_project_map(project_map)
+
+    # Assert
+    assert doc_sources == [{"path": str(doc_path), "summary": "Billing Invoices are generated monthly."}]
+    assert issue_sources[0]["summary"] == "Export"  # Not summarized yet: the title
+
+
+def test_sync_summaries_command_reports_counts(context_files):
+    # Act
+    result = CliRunner().invoke(cli.app, ["sync", "summaries", "--mock-ai"])
+
+    # Assert
+    assert result.exit_code == 0, result.output
+    assert "2 files summarized, 0 unchanged" in result.output
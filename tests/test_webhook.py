@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from gemini_gitlab_workflow import config, file_system_repo, webhook
+
+SECRET = "s3cret"
+
+
+def _issue_payload(iid: int, title: str, labels: list[str], description: str = "", **attributes) -> dict:
+    return {
+        "object_kind": "issue",
+        "project": {"id": 12345, "path_with_namespace": "group/app"},
+        "object_attributes": {
+            "iid": iid, "title": title, "description": description, "state": "opened",
+            "url": f"https://gitlab.example.com/group/app/-/issues/{iid}",
+            "created_at": "2025-01-01 09:00:00 UTC", "updated_at": "2025-01-02 10:00:00 UTC",
+            "action": "update", **attributes,
+        },
+        "labels": [{"title": label} for label in labels],
+    }
+
+
+def _note_payload(note_id: int, iid: int, body: str) -> dict:
+    return {
+        "object_kind": "note",
+        "project": {"id": 12345, "path_with_namespace": "group/app"},
+        "object_attributes": {
+            "id": note_id, "note": body, "noteable_type": "Issue", "system": False,
+            "created_at": "2025-01-03 08:00:00 UTC", "updated_at": "2025-01-03 08:00:00 UTC",
+        },
+        "issue": {
+            "iid": iid, "title": "Cart", "description": "", "state": "opened",
+            "created_at": "2025-01-01 09:00:00 UTC", "updated_at": "2025-01-03 08:00:00 UTC",
+        },
+    }
+
+
+@pytest.fixture
+def mirror():
+    """A synced mirror: epic #1 containing story #2, story #3 blocked by #2 (from #3's description)."""
+    project_map = {
+        "nodes": [
+            {"id": 1, "title": "Checkout", "type": "Issue", "state": "opened", "web_url": "u1",
+             "labels": ["Type::Epic", "Backbone::Shop"], "local_path": "backbones/shop/checkout/epic.md"},
+            {"id": 2, "title": "Cart", "type": "Issue", "state": "opened", "web_url": "u2",
+             "labels": ["Type::Story", "Backbone::Shop"], "local_path": "backbones/shop/checkout/story-cart.md"},
+            {"id": 3, "title": "Payment", "type": "Issue", "state": "opened", "web_url": "u3",
+             "labels": ["Type::Story"], "local_path": "_unassigned/story-payment.md"},
+        ],
+        "links": [
+            {"source": 1, "target": 2, "type": "contains"},
+            {"source": 2, "target": 3, "type": "blocks"},
+        ],
+    }
+    file_system_repo.write_project_map(project_map)
+    file_system_repo.write_issue_notes({
+        "1": {"updated_at": "x", "user_notes_count": 0, "cursor": None, "relationships": [], "notes": []},
+        "2": {"updated_at": "x", "user_notes_count": 0, "cursor": None, "relationships": [], "notes": []},
+        "3": {"updated_at": "x", "user_notes_count": 0, "cursor": None, "notes": [],
+              "relationships": [{"source": 2, "target": 3, "type": "blocks"}]},
+    })
+    for node in project_map["nodes"]:
+        path = Path(config.DATA_DIR) / node["local_path"]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"---\niid: {node['id']}\n---\n", encoding="utf-8")
+    return project_map
+
+
+def test_issue_event_updates_file_map_and_relationships(mirror):
+    # Arrange
+    payload = _issue_payload(3, "Payment", ["Type::Story"], description="- [x] Card\n- [ ] Invoice\n\n/blocking #4")
+
+    # Act
+    result = webhook.apply_event(payload)
+
+    # Assert
+    assert result["status"] == "applied"
+    content = (Path(config.DATA_DIR) / "_unassigned/story-payment.md").read_text(encoding="utf-8")
+    assert "updated_at: '2025-01-02T10:00:00.000Z'" in content
+    assert "count: 2" in content and "completed_count: 1" in content
+    links = file_system_repo.read_project_map()["links"]
+    assert {"source": 3, "target": 4, "type": "blocks"} in links
+    assert {"source": 2, "target": 3, "type": "blocks"} not in links  # No longer in the description
+
+
+def test_new_story_is_placed_under_its_epic(mirror):
+    # Act
+    webhook.apply_event(_issue_payload(5, "Wishlist", ["Type::Story", "Epic::Checkout"], action="open"))
+
+    # Assert
+    project_map = file_system_repo.read_project_map()
+    node = next(n for n in project_map["nodes"] if n["id"] == 5)
+    assert node["local_path"] == str(Path("backbones/shop/checkout/story-wishlist.md"))
+    assert {"source": 1, "target": 5, "type": "contains"} in project_map["links"]
+    assert (Path(config.DATA_DIR) / node["local_path"]).exists()
+
+
+def test_renamed_epic_moves_its_stories(mirror):
+    # Act
+    webhook.apply_event(_issue_payload(1, "Checkout Flow", ["Type::Epic", "Backbone::Shop"]))
+
+    # Assert
+    nodes = {n["id"]: n for n in file_system_repo.read_project_map()["nodes"]}
+    assert nodes[1]["local_path"] == str(Path("backbones/shop/checkout-flow/epic.md"))
+    assert nodes[2]["local_path"] == str(Path("backbones/shop/checkout-flow/story-cart.md"))
+    assert (Path(config.DATA_DIR) / nodes[2]["local_path"]).exists()
+    assert not (Path(config.DATA_DIR) / "backbones/shop/checkout/epic.md").exists()
+
+
+def test_note_event_stores_the_note_and_its_relationships(mirror):
+    # Act
+    result = webhook.apply_event(_note_payload(40, 2, "Blocked by #1"))
+
+    # Assert
+    assert result["status"] == "applied"
+    entry = file_system_repo.read_issue_notes()["2"]
+    assert [n["body"] for n in entry["notes"]] == ["Blocked by #1"]
+    assert entry["notes"][0]["updated_at"] == "2025-01-03T08:00:00.000Z"
+    assert entry["updated_at"] == "x"  # The next polling sync still checks the issue
+    links = file_system_repo.read_project_map()["links"]
+    assert {"source": 1, "target": 2, "type": "blocks"} in links
+    assert {"source": 2, "target": 3, "type": "blocks"} in links
+    assert "2025-01-03T08:00:00.000Z" in (Path(config.DATA_DIR) / "backbones/shop/checkout/story-cart.md").read_text()
+
+
+def test_out_of_order_events_do_not_roll_the_mirror_back(mirror):
+    # Arrange
+    newer = _issue_payload(3, "Payment v2", ["Type::Story"], updated_at="2025-01-05 10:00:00 UTC")
+    older = _issue_payload(3, "Payment v1", ["Type::Story"], updated_at="2025-01-04 10:00:00 UTC")
+    note = _note_payload(40, 2, "Blocked by #1")
+    edited_note = _note_payload(40, 2, "Looks good now")
+    edited_note["object_attributes"]["updated_at"] = "2025-01-04 08:00:00 UTC"
+
+    # Act
+    results = [webhook.apply_event(payload) for payload in (newer, older, edited_note, note)]
+
+    # Assert
+    assert [r["status"] for r in results] == ["applied", "ignored", "applied", "ignored"]
+    nodes = {n["id"]: n for n in file_system_repo.read_project_map()["nodes"]}
+    assert nodes[3]["title"] == "Payment v2"
+    assert [n["body"] for n in file_system_repo.read_issue_notes()["2"]["notes"]] == ["Looks good now"]
+    assert {"source": 1, "target": 2, "type": "blocks"} not in file_system_repo.read_project_map()["links"]
+
+
+def test_unrelated_events_are_ignored(mirror):
+    # Arrange
+    other_project = _issue_payload(3, "Payment", ["Type::Story"])
+    other_project["project"] = {"id": 999, "path_with_namespace": "other/app"}
+    merge_request_note = _note_payload(41, 2, "LGTM")
+    merge_request_note["object_attributes"]["noteable_type"] = "MergeRequest"
+
+    # Act
+    results = [webhook.apply_event(p) for p in (other_project, merge_request_note, {"object_kind": "push"})]
+
+    # Assert
+    assert [r["status"] for r in results] == ["ignored"] * 3
+    assert file_system_repo.read_project_map() == mirror
+
+
+def test_replay_applies_recorded_payloads_in_order(mirror, tmp_path):
+    # Arrange
+    recorded = tmp_path / "recorded"
+    recorded.mkdir()
+    (recorded / "1-note.json").write_text(json.dumps(_note_payload(40, 2, "Blocked by #1")))
+    (recorded / "2-issue.json").write_text(json.dumps([_issue_payload(3, "Payment", ["Type::Story"])]))
+
+    # Act
+    results = webhook.replay([recorded])
+
+    # Assert
+    assert [r["status"] for r in results] == ["applied", "applied"]
+    assert len(file_system_repo.read_issue_notes()["2"]["notes"]) == 1
+
+
+def test_receiver_validates_the_token_records_payloads_and_keeps_a_heartbeat(mirror, tmp_path):
+    # Arrange
+    ready, stop = threading.Event(), threading.Event()
+    record_dir = tmp_path / "recorded"
+    thread = threading.Thread(target=webhook.serve, kwargs={
+        "host": "127.0.0.1", "port": 0, "secret": SECRET, "record_dir": record_dir, "ready": ready, "stop": stop,
+    })
+    thread.start()
+    try:
+        assert ready.wait(5)
+        url = webhook.read_state()["url"]
+
+        # Act
+        rejected = requests.post(url, json=_note_payload(40, 2, "Blocked by #1"), headers={"X-Gitlab-Token": "wrong"})
+        accepted = requests.post(url, json=_note_payload(40, 2, "Blocked by #1"), headers={"X-Gitlab-Token": SECRET})
+        state = webhook.read_state()
+    finally:
+        stop.set()
+        thread.join(5)
+
+    # Assert
+    assert rejected.status_code == 401
+    assert accepted.status_code == 200 and accepted.json()["status"] == "applied"
+    assert state["events"] == 1
+    assert len(list(record_dir.glob("*-note.json"))) == 1
+    assert webhook.read_state() is None  # Removed on shutdown
+
+
+def test_serve_requires_a_secret(mocker):
+    # Arrange
+    mocker.patch.object(config, "WEBHOOK_SECRET", "")
+
+    # Act / Assert
+    with pytest.raises(RuntimeError, match="secret"):
+        webhook.serve(port=0)
+
+
+def test_mirror_is_live_only_without_downtime_since_the_last_sync():
+    # Arrange
+    file_system_repo.write_timestamps_cache({})
+    last_sync = os.stat(config.TIMESTAMPS_CACHE_PATH).st_mtime
+    now = time.time()
+
+    # Act / Assert
+    assert webhook.mirror_is_live(now) is False  # No receiver
+    webhook._write_state({"started_at": last_sync - 60, "heartbeat_at": now})
+    assert webhook.mirror_is_live(now) is True
+    assert webhook.mirror_is_live(now + 3 * config.WEBHOOK_HEARTBEAT_INTERVAL) is False  # Heartbeat is stale
+    webhook._write_state({"started_at": last_sync + 60, "heartbeat_at": now})
+    assert webhook.mirror_is_live(now) is False  # Started after the last sync: events may have been missed